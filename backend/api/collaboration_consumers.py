@@ -1,14 +1,16 @@
 """
 WebSocket consumers для совместной работы (Clean Architecture)
 """
-import json
+import asyncio
 import uuid
 from datetime import datetime, timezone
 from typing import Dict, List, Any
 from channels.generic.websocket import AsyncWebsocketConsumer
 from channels.db import database_sync_to_async
+from django.conf import settings
 from django.contrib.auth import get_user_model
 from django.core.exceptions import ObjectDoesNotExist
+from rest_framework.exceptions import APIException
 import logging
 
 from backend.apps.workspaces.models import Workspace, WorkspaceMember
@@ -16,13 +18,19 @@ from backend.apps.notes.models import Page
 from backend.apps.databases.models import Database
 from backend.apps.tasks.models import TaskBoard, Task
 from backend.apps.collaboration.models import ActiveSession
+from backend.apps.collaboration.heartbeat import HeartbeatMixin
+from backend.apps.collaboration.protocol import WireProtocolMixin, decode
+from backend.apps.collaboration.traffic import RoomTrafficMixin
+from backend.apps.databases.serializers import DatabaseRecordSerializer
 from backend.services.collaboration_service import CollaborationService
+from backend.services.databases import DatabaseRecordService
+from backend.core.exceptions import NotFoundException
 
 User = get_user_model()
 logger = logging.getLogger(__name__)
 
 
-class CollaborationConsumer(AsyncWebsocketConsumer):
+class CollaborationConsumer(WireProtocolMixin, AsyncWebsocketConsumer):
     """WebSocket consumer для совместной работы в реальном времени"""
     
     def __init__(self, *args, **kwargs):
@@ -72,22 +80,19 @@ class CollaborationConsumer(AsyncWebsocketConsumer):
             self.channel_name
         )
 
-        await self.accept()
+        await self.accept_with_protocol()
 
         # Создаем активную сессию через сервис
         await self.collaboration_service.create_active_session(self.session_id)
 
         # Уведомляем других о подключении
-        await self.channel_layer.group_send(
-            self.room_group_name,
-            {
-                'type': 'user_joined',
-                'user_id': str(self.user.id),
-                'user_name': self.user.full_name or self.user.email,
-                'session_id': self.session_id,
-                'timestamp': datetime.now(timezone.utc).isoformat(),
-            }
-        )
+        await self.broadcast({
+            'type': 'user_joined',
+            'user_id': str(self.user.id),
+            'user_name': self.user.full_name or self.user.email,
+            'session_id': self.session_id,
+            'timestamp': datetime.now(timezone.utc).isoformat(),
+        })
 
         # Отправляем список активных пользователей
         await self.send_active_users()
@@ -96,15 +101,12 @@ class CollaborationConsumer(AsyncWebsocketConsumer):
         """Отключение пользователя от WebSocket"""
         if hasattr(self, 'room_group_name') and self.room_group_name:
             # Уведомляем других об отключении
-            await self.channel_layer.group_send(
-                self.room_group_name,
-                {
-                    'type': 'user_left',
-                    'user_id': str(self.user.id),
-                    'session_id': self.session_id,
-                    'timestamp': datetime.now(timezone.utc).isoformat(),
-                }
-            )
+            await self.broadcast({
+                'type': 'user_left',
+                'user_id': str(self.user.id),
+                'session_id': self.session_id,
+                'timestamp': datetime.now(timezone.utc).isoformat(),
+            })
 
             # Удаляем активную сессию через сервис
             if self.collaboration_service:
@@ -116,10 +118,10 @@ class CollaborationConsumer(AsyncWebsocketConsumer):
                 self.channel_name
             )
 
-    async def receive(self, text_data):
+    async def receive(self, text_data=None, bytes_data=None):
         """Обработка входящих сообщений"""
         try:
-            data = json.loads(text_data)
+            data = decode(text_data, bytes_data)
             message_type = data.get('type')
             
             if message_type == 'cursor_move':
@@ -133,14 +135,14 @@ class CollaborationConsumer(AsyncWebsocketConsumer):
             elif message_type == 'reaction_add':
                 await self.handle_reaction_add(data)
             else:
-                await self.send(text_data=json.dumps({
+                await self.send_payload({
                     'error': 'Неизвестный тип сообщения'
-                }))
+                })
                 
-        except json.JSONDecodeError:
-            await self.send(text_data=json.dumps({
-                'error': 'Неверный формат JSON'
-            }))
+        except ValueError:
+            await self.send_payload({
+                'error': 'Неверный формат сообщения'
+            })
 
     async def handle_cursor_move(self, data):
         """Обработка движения курсора"""
@@ -152,13 +154,10 @@ class CollaborationConsumer(AsyncWebsocketConsumer):
         }
         
         # Отправляем всем участникам
-        await self.channel_layer.group_send(
-            self.room_group_name,
-            {
-                'type': 'cursor_moved',
-                'data': cursor_data
-            }
-        )
+        await self.broadcast({
+            'type': 'cursor_moved',
+            'data': cursor_data
+        })
 
     async def handle_selection_change(self, data):
         """Обработка изменения выделения"""
@@ -169,13 +168,10 @@ class CollaborationConsumer(AsyncWebsocketConsumer):
             'timestamp': datetime.now(timezone.utc).isoformat(),
         }
         
-        await self.channel_layer.group_send(
-            self.room_group_name,
-            {
-                'type': 'selection_changed',
-                'data': selection_data
-            }
-        )
+        await self.broadcast({
+            'type': 'selection_changed',
+            'data': selection_data
+        })
 
     async def handle_content_change(self, data):
         """Обработка изменения контента"""
@@ -191,13 +187,10 @@ class CollaborationConsumer(AsyncWebsocketConsumer):
             'timestamp': datetime.now(timezone.utc).isoformat(),
         }
         
-        await self.channel_layer.group_send(
-            self.room_group_name,
-            {
-                'type': 'content_changed',
-                'data': change_data
-            }
-        )
+        await self.broadcast({
+            'type': 'content_changed',
+            'data': change_data
+        })
 
     async def handle_comment_add(self, data):
         """Обработка добавления комментария"""
@@ -207,13 +200,10 @@ class CollaborationConsumer(AsyncWebsocketConsumer):
             data['comment_id'] = comment.id
         
         # Отправляем всем участникам
-        await self.channel_layer.group_send(
-            self.room_group_name,
-            {
-                'type': 'comment_added',
-                'data': data
-            }
-        )
+        await self.broadcast({
+            'type': 'comment_added',
+            'data': data
+        })
 
     async def handle_reaction_add(self, data):
         """Обработка добавления реакции"""
@@ -223,22 +213,19 @@ class CollaborationConsumer(AsyncWebsocketConsumer):
             data['reaction_id'] = reaction.id
         
         # Отправляем всем участникам
-        await self.channel_layer.group_send(
-            self.room_group_name,
-            {
-                'type': 'reaction_added',
-                'data': data
-            }
-        )
+        await self.broadcast({
+            'type': 'reaction_added',
+            'data': data
+        })
 
     async def send_active_users(self):
         """Отправка списка активных пользователей"""
         if self.collaboration_service:
             active_users = await self.collaboration_service.get_active_users()
-            await self.send(text_data=json.dumps({
+            await self.send_payload({
                 'type': 'active_users',
                 'users': active_users
-            }))
+            })
 
     @database_sync_to_async
     def check_resource_access(self):
@@ -269,69 +256,24 @@ class CollaborationConsumer(AsyncWebsocketConsumer):
         except ObjectDoesNotExist:
             return False
 
-    # WebSocket event handlers
-    async def user_joined(self, event):
-        """Обработка подключения пользователя"""
-        await self.send(text_data=json.dumps({
-            'type': 'user_joined',
-            'user_id': event['user_id'],
-            'user_name': event['user_name'],
-            'session_id': event['session_id'],
-            'timestamp': event['timestamp'],
-        }))
-
-    async def user_left(self, event):
-        """Обработка отключения пользователя"""
-        await self.send(text_data=json.dumps({
-            'type': 'user_left',
-            'user_id': event['user_id'],
-            'session_id': event['session_id'],
-            'timestamp': event['timestamp'],
-        }))
-
-    async def cursor_moved(self, event):
-        """Обработка движения курсора"""
-        await self.send(text_data=json.dumps({
-            'type': 'cursor_moved',
-            'data': event['data']
-        }))
-
-    async def selection_changed(self, event):
-        """Обработка изменения выделения"""
-        await self.send(text_data=json.dumps({
-            'type': 'selection_changed',
-            'data': event['data']
-        }))
-
-    async def content_changed(self, event):
-        """Обработка изменения контента"""
-        await self.send(text_data=json.dumps({
-            'type': 'content_changed',
-            'data': event['data']
-        }))
-
-    async def comment_added(self, event):
-        """Обработка добавления комментария"""
-        await self.send(text_data=json.dumps({
-            'type': 'comment_added',
-            'data': event['data']
-        }))
-
-    async def reaction_added(self, event):
-        """Обработка добавления реакции"""
-        await self.send(text_data=json.dumps({
-            'type': 'reaction_added',
-            'data': event['data']
-        }))
-
 
-class DatabaseCollaborationConsumer(AsyncWebsocketConsumer):
+class DatabaseCollaborationConsumer(RoomTrafficMixin, HeartbeatMixin, WireProtocolMixin, AsyncWebsocketConsumer):
     """WebSocket consumer для real-time обновлений базы данных"""
+
+    room_prefix = 'database'
+    room_kwargs = ('database_id',)
     
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        # Изменения записей, накопленные за текущий тик: record_id -> данные
+        self.pending_updates = {}
+        self.flush_task = None
+        self.batch_window = getattr(settings, 'DATABASE_COLLABORATION_BATCH_WINDOW', 0.05)
+
     async def connect(self):
         """Подключение к WebSocket"""
         self.database_id = self.scope['url_route']['kwargs']['database_id']
-        self.room_group_name = f'database_{self.database_id}'
+        self.room_group_name = self.room_name_for_scope(self.scope)
         
         # Проверяем авторизацию пользователя
         user = self.scope.get('user')
@@ -351,20 +293,23 @@ class DatabaseCollaborationConsumer(AsyncWebsocketConsumer):
             self.channel_name
         )
         
-        await self.accept()
+        await self.accept_with_protocol()
+        self.start_heartbeat()
         
         # Уведомляем о подключении пользователя
-        await self.channel_layer.group_send(
-            self.room_group_name,
-            {
-                'type': 'user_joined',
-                'user_id': str(user.id),
-                'username': user.username
-            }
-        )
+        await self.broadcast({
+            'type': 'user_joined',
+            'user_id': str(user.id),
+            'username': user.username
+        })
     
     async def disconnect(self, close_code):
         """Отключение от WebSocket"""
+        await self.stop_heartbeat()
+        # Применяем изменения, принятые до разрыва соединения
+        if self.flush_task:
+            await self.flush_task
+        
         # Покидаем группу
         await self.channel_layer.group_discard(
             self.room_group_name,
@@ -374,20 +319,21 @@ class DatabaseCollaborationConsumer(AsyncWebsocketConsumer):
         # Уведомляем об отключении пользователя
         user = self.scope.get('user')
         if user and not user.is_anonymous:
-            await self.channel_layer.group_send(
-                self.room_group_name,
-                {
-                    'type': 'user_left',
-                    'user_id': str(user.id),
-                    'username': user.username
-                }
-            )
+            await self.broadcast({
+                'type': 'user_left',
+                'user_id': str(user.id),
+                'username': user.username
+            })
     
-    async def receive(self, text_data):
+    async def receive(self, text_data=None, bytes_data=None):
         """Обработка входящих сообщений"""
         try:
-            data = json.loads(text_data)
+            data = decode(text_data, bytes_data)
             message_type = data.get('type')
+            if await self.handle_heartbeat(data):
+                return
+            if not await self.check_rate_limit(data):
+                return
             
             if message_type == 'record_update':
                 await self.handle_record_update(data)
@@ -399,67 +345,137 @@ class DatabaseCollaborationConsumer(AsyncWebsocketConsumer):
                 await self.handle_property_update(data)
             elif message_type == 'comment_create':
                 await self.handle_comment_create(data)
+            elif message_type == 'resume':
+                await self.handle_resume(data)
             
-        except json.JSONDecodeError:
-            logger.error(f"Invalid JSON received: {text_data}")
+        except ValueError:
+            logger.error(f"Invalid message received: {text_data or bytes_data!r}")
         except Exception as e:
             logger.error(f"Error processing message: {e}")
     
     async def handle_record_update(self, data):
-        """Обработка обновления записи"""
-        user = self.scope.get('user')
+        """
+        Обработка обновления записи.
+
+        Изменения не ретранслируются как есть: они копятся в течение
+        batch_window и применяются одним вызовом DatabaseRecordService,
+        после чего всем участникам рассылается каноническая запись
+        с вычисленными формулами.
+        """
         record_id = data.get('record_id')
-        changes = data.get('changes', {})
+        changes = data.get('changes')
+        try:
+            # Разные написания одного UUID попадают в одну запись буфера
+            record_id = str(uuid.UUID(str(record_id)))
+        except ValueError:
+            record_id = None
+        if not record_id or not isinstance(changes, dict):
+            await self.send_error('Некорректное обновление записи', [data.get('request_id')])
+            return
         
-        # Рассылаем обновление всем участникам
-        await self.channel_layer.group_send(
-            self.room_group_name,
-            {
+        pending = self.pending_updates.setdefault(
+            record_id, {'changes': {}, 'request_ids': []}
+        )
+        pending['changes'].update(changes)
+        if data.get('request_id'):
+            pending['request_ids'].append(data['request_id'])
+        
+        if self.flush_task is None:
+            self.flush_task = asyncio.ensure_future(self.flush_record_updates())
+    
+    async def flush_record_updates(self):
+        """Применение накопленных изменений тик за тиком, пока буфер не опустеет"""
+        while True:
+            await asyncio.sleep(self.batch_window)
+            pending, self.pending_updates = self.pending_updates, {}
+            if not pending:
+                break
+            await self.apply_pending_updates(pending)
+        self.flush_task = None
+    
+    async def apply_pending_updates(self, pending):
+        """Сохранение пакета изменений и рассылка канонических записей"""
+        user = self.scope.get('user')
+        request_ids = [rid for item in pending.values() for rid in item['request_ids']]
+        try:
+            records = await self.apply_record_changes(user, [
+                {'record_id': record_id, 'changes': item['changes']}
+                for record_id, item in pending.items()
+            ])
+        except APIException as e:
+            await self.send_error(str(e.detail), request_ids)
+            return
+        except Exception as e:
+            logger.error(f"Error applying record changes: {e}")
+            await self.send_error('Не удалось сохранить изменения', request_ids)
+            return
+        
+        records = {str(record['id']): record for record in records}
+        for record_id, item in pending.items():
+            record = records.get(record_id)
+            if record is None:
+                continue
+            await self.broadcast({
                 'type': 'record_updated',
-                'record_id': record_id,
-                'changes': changes,
+                'record_id': record['id'],
+                'changes': {key: record['properties'].get(key) for key in item['changes']},
+                'record': record,
+                'request_ids': item['request_ids'],
                 'updated_by': {
                     'id': str(user.id),
                     'username': user.username
                 }
-            }
-        )
+            }, durable=True)
     
     async def handle_record_create(self, data):
-        """Обработка создания записи"""
+        """Обработка создания записи: запись создается на сервере и рассылается"""
         user = self.scope.get('user')
         record_data = data.get('record_data', {})
+        if not isinstance(record_data, dict):
+            await self.send_error('Некорректные данные записи', [data.get('request_id')])
+            return
+        
+        try:
+            record = await self.create_record(user, record_data)
+        except APIException as e:
+            await self.send_error(str(e.detail), [data.get('request_id')])
+            return
         
         # Рассылаем уведомление о создании
-        await self.channel_layer.group_send(
-            self.room_group_name,
-            {
-                'type': 'record_created',
-                'record_data': record_data,
-                'created_by': {
-                    'id': str(user.id),
-                    'username': user.username
-                }
+        await self.broadcast({
+            'type': 'record_created',
+            'record_data': record,
+            'request_id': data.get('request_id'),
+            'created_by': {
+                'id': str(user.id),
+                'username': user.username
             }
-        )
+        }, durable=True)
     
     async def handle_record_delete(self, data):
         """Обработка удаления записи"""
         user = self.scope.get('user')
-        record_id = data.get('record_id')
+        try:
+            record_id = str(uuid.UUID(str(data.get('record_id'))))
+        except ValueError:
+            await self.send_error('Некорректный идентификатор записи', [data.get('request_id')])
+            return
+        
+        try:
+            await self.delete_record(user, record_id)
+        except APIException as e:
+            await self.send_error(str(e.detail), [data.get('request_id')])
+            return
         
         # Рассылаем уведомление об удалении
-        await self.channel_layer.group_send(
-            self.room_group_name,
-            {
-                'type': 'record_deleted',
-                'record_id': record_id,
-                'deleted_by': {
-                    'id': str(user.id),
-                    'username': user.username
-                }
+        await self.broadcast({
+            'type': 'record_deleted',
+            'record_id': record_id,
+            'deleted_by': {
+                'id': str(user.id),
+                'username': user.username
             }
-        )
+        }, durable=True)
     
     async def handle_property_update(self, data):
         """Обработка изменения свойств базы данных"""
@@ -467,17 +483,14 @@ class DatabaseCollaborationConsumer(AsyncWebsocketConsumer):
         property_data = data.get('property_data', {})
         
         # Рассылаем уведомление об изменении структуры
-        await self.channel_layer.group_send(
-            self.room_group_name,
-            {
-                'type': 'property_updated',
-                'property_data': property_data,
-                'updated_by': {
-                    'id': str(user.id),
-                    'username': user.username
-                }
+        await self.broadcast({
+            'type': 'property_updated',
+            'property_data': property_data,
+            'updated_by': {
+                'id': str(user.id),
+                'username': user.username
             }
-        )
+        }, durable=True)
     
     async def handle_comment_create(self, data):
         """Обработка создания комментария"""
@@ -485,75 +498,42 @@ class DatabaseCollaborationConsumer(AsyncWebsocketConsumer):
         comment_data = data.get('comment_data', {})
         
         # Рассылаем уведомление о новом комментарии
-        await self.channel_layer.group_send(
-            self.room_group_name,
-            {
-                'type': 'comment_created',
-                'comment_data': comment_data,
-                'created_by': {
-                    'id': str(user.id),
-                    'username': user.username
-                }
+        await self.broadcast({
+            'type': 'comment_created',
+            'comment_data': comment_data,
+            'created_by': {
+                'id': str(user.id),
+                'username': user.username
             }
-        )
-    
-    # Обработчики групповых сообщений
-    async def user_joined(self, event):
-        """Пользователь присоединился"""
-        await self.send(text_data=json.dumps({
-            'type': 'user_joined',
-            'user_id': event['user_id'],
-            'username': event['username']
-        }))
-    
-    async def user_left(self, event):
-        """Пользователь покинул"""
-        await self.send(text_data=json.dumps({
-            'type': 'user_left',
-            'user_id': event['user_id'],
-            'username': event['username']
-        }))
+        }, durable=True)
     
-    async def record_updated(self, event):
-        """Запись обновлена"""
-        await self.send(text_data=json.dumps({
-            'type': 'record_updated',
-            'record_id': event['record_id'],
-            'changes': event['changes'],
-            'updated_by': event['updated_by']
-        }))
+    async def send_error(self, message, request_ids=None):
+        """Отправка ошибки только инициатору изменения"""
+        await self.send_payload({
+            'type': 'error',
+            'message': message,
+            'request_ids': [rid for rid in request_ids or [] if rid]
+        })
     
-    async def record_created(self, event):
-        """Запись создана"""
-        await self.send(text_data=json.dumps({
-            'type': 'record_created',
-            'record_data': event['record_data'],
-            'created_by': event['created_by']
-        }))
-    
-    async def record_deleted(self, event):
-        """Запись удалена"""
-        await self.send(text_data=json.dumps({
-            'type': 'record_deleted',
-            'record_id': event['record_id'],
-            'deleted_by': event['deleted_by']
-        }))
+    @database_sync_to_async
+    def apply_record_changes(self, user, updates):
+        """Пакетное применение изменений через сервис"""
+        records = DatabaseRecordService.apply_record_changes(self.database_id, user, updates)
+        return [dict(DatabaseRecordSerializer(record).data) for record in records]
     
-    async def property_updated(self, event):
-        """Свойство обновлено"""
-        await self.send(text_data=json.dumps({
-            'type': 'property_updated',
-            'property_data': event['property_data'],
-            'updated_by': event['updated_by']
-        }))
+    @database_sync_to_async
+    def create_record(self, user, record_data):
+        """Создание записи через сервис"""
+        record = DatabaseRecordService.create_record(self.database_id, user, record_data)
+        return dict(DatabaseRecordSerializer(record).data)
     
-    async def comment_created(self, event):
-        """Комментарий создан"""
-        await self.send(text_data=json.dumps({
-            'type': 'comment_created',
-            'comment_data': event['comment_data'],
-            'created_by': event['created_by']
-        }))
+    @database_sync_to_async
+    def delete_record(self, user, record_id):
+        """Удаление записи через сервис с проверкой принадлежности к базе"""
+        record = DatabaseRecordService.get_record_by_id(record_id, user)
+        if str(record.database_id) != str(self.database_id):
+            raise NotFoundException("Запись не найдена")
+        DatabaseRecordService.delete_record(record_id, user)
     
     @database_sync_to_async
     def check_database_access(self, user, database_id):
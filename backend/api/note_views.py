@@ -8,10 +8,15 @@ from rest_framework.response import Response
 from backend.apps.notes.serializers import (
     TagSerializer, PageListSerializer, PageDetailSerializer,
     PageCreateSerializer, BlockSerializer, CommentSerializer,
-    PageVersionSerializer
+    PageVersionSerializer, PageVersionListSerializer
 )
 from backend.services.note_service import PageService, TagService, CommentService
+from backend.services.page_copy import PageCopier
+from backend.services.page_history import PageHistory
+from backend.services.page_tree import PageTree
+from backend.services.page_views import page_view_buffer
 from backend.apps.notes.models import Comment
+from backend.core.exceptions import ValidationException
 
 
 class PageViewSet(viewsets.ModelViewSet):
@@ -52,6 +57,19 @@ class PageViewSet(viewsets.ModelViewSet):
             from rest_framework.exceptions import NotFound
             raise NotFound("Страница не найдена")
     
+    def retrieve(self, request, *args, **kwargs):
+        """Получение страницы с учетом просмотра"""
+        page = self.get_object()
+        forwarded = request.META.get('HTTP_X_FORWARDED_FOR', '')
+        page_view_buffer.record(
+            page,
+            user=request.user,
+            ip_address=forwarded.split(',')[0].strip() or request.META.get('REMOTE_ADDR'),
+            user_agent=request.META.get('HTTP_USER_AGENT', '')
+        )
+        serializer = self.get_serializer(page)
+        return Response(serializer.data)
+    
     def perform_create(self, serializer):
         """Создание страницы через сервис"""
         page = PageService.create_page(
@@ -69,6 +87,21 @@ class PageViewSet(viewsets.ModelViewSet):
         )
         serializer.instance = page
     
+    @action(detail=False, methods=['get'])
+    def tree(self, request):
+        """Дерево страниц рабочего пространства или уровень под страницей root"""
+        depth = request.query_params.get('depth')
+        if depth is not None and not depth.isdigit():
+            raise ValidationException('depth должен быть числом')
+        tree = PageTree.get_tree(
+            user=request.user,
+            workspace_id=request.query_params.get('workspace'),
+            root_id=request.query_params.get('root'),
+            depth=int(depth) if depth is not None else None,
+            show_archived=request.query_params.get('archived', 'false').lower() == 'true'
+        )
+        return Response(tree)
+    
     @action(detail=True, methods=['get', 'post'])
     def blocks(self, request, pk=None):
         """Получение и создание блоков страницы"""
@@ -93,6 +126,55 @@ class PageViewSet(viewsets.ModelViewSet):
                     {'error': str(e)}, 
                     status=status.HTTP_400_BAD_REQUEST
                 )
+    
+    @action(detail=True, methods=['post'], url_path='blocks/batch')
+    def blocks_batch(self, request, pk=None):
+        """Пакетная вставка, перемещение, изменение и удаление блоков"""
+        operations = request.data.get('operations') if isinstance(request.data, dict) else request.data
+        result = PageService.apply_block_batch(
+            page_id=pk,
+            user=request.user,
+            operations=operations
+        )
+        return Response(result)
+    
+    @action(detail=True, methods=['post'])
+    def duplicate(self, request, pk=None):
+        """Копия страницы с подстраницами и блоками"""
+        page = PageCopier.duplicate(page_id=pk, user=request.user, title=request.data.get('title'))
+        page = PageService.get_page_by_id(page_id=page.id, user=request.user)
+        serializer = PageDetailSerializer(page, context={'request': request})
+        return Response(serializer.data, status=status.HTTP_201_CREATED)
+    
+    @action(detail=True, methods=['post'])
+    def instantiate(self, request, pk=None):
+        """Создание страниц из шаблона"""
+        page = PageCopier.instantiate(
+            page_id=pk,
+            user=request.user,
+            workspace_id=request.data.get('workspace'),
+            parent_id=request.data.get('parent'),
+            title=request.data.get('title')
+        )
+        page = PageService.get_page_by_id(page_id=page.id, user=request.user)
+        serializer = PageDetailSerializer(page, context={'request': request})
+        return Response(serializer.data, status=status.HTTP_201_CREATED)
+    
+    @action(detail=True, methods=['get'])
+    def versions(self, request, pk=None):
+        """История версий страницы"""
+        page = self.get_object()
+        versions = PageHistory.list_versions(page.id)
+        serializer = PageVersionListSerializer(versions, many=True, context={'request': request})
+        return Response(serializer.data)
+    
+    @action(detail=True, methods=['get'], url_path=r'versions/(?P<version_number>\d+)')
+    def version(self, request, pk=None, version_number=None):
+        """Версия страницы с восстановленным содержимым"""
+        page = self.get_object()
+        version = PageHistory.get_version(page.id, int(version_number))
+        serializer = PageVersionSerializer(version, context={'request': request})
+        return Response(serializer.data)
 
 
 class PageCommentsListView(generics.ListCreateAPIView):
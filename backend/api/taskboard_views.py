@@ -1,16 +1,33 @@
 """
 API контроллеры для управления досками задач (Clean Architecture)
 """
+from django.conf import settings
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
 from rest_framework import viewsets, permissions, status
 from rest_framework.decorators import action
 from rest_framework.response import Response
 
 from backend.apps.tasks.serializers import (
-    TaskBoardSerializer, TaskColumnSerializer, TaskSerializer
+    TaskActivitySerializer, TaskAttachmentSerializer, TaskBoardSerializer, TaskColumnSerializer,
+    TaskRecurrenceSerializer, TaskSerializer
 )
+from backend.core.exceptions import NotFoundException, ValidationException
+from backend.core.file_transfer import ChecksumUploadHandler, file_response
 from backend.services.taskboards import (
     TaskBoardService, TaskColumnService, TaskService
 )
+from backend.services.task_activity import TaskActivityLog
+from backend.services.task_attachments import TaskAttachmentService
+from backend.services.task_board_loader import TaskBoardLoader
+from backend.services.task_board_summary import TaskBoardSummary
+from backend.services.task_bulk import TaskBulkService
+from backend.services.task_dependencies import TaskDependencyGraph
+from backend.services.task_ordering import TaskOrdering
+from backend.services.task_recurrence import TaskRecurrenceService
+
+# Допуск на служебные части multipart сверх размера файла
+UPLOAD_OVERHEAD = 64 * 1024
 
 
 class TaskBoardViewSet(viewsets.ModelViewSet):
@@ -57,6 +74,34 @@ class TaskBoardViewSet(viewsets.ModelViewSet):
             user=self.request.user
         )
     
+    @action(detail=True, methods=['get'])
+    def summary(self, request, pk=None):
+        """Сводка доски по счетчикам: всего, по колонкам, статусам, приоритетам, исполнителям"""
+        board = TaskBoardService.get_board_by_id(pk, request.user)
+        return Response(TaskBoardSummary.summary(board))
+    
+    @action(detail=True, methods=['get'])
+    def schedule(self, request, pk=None):
+        """График связанных задач: топологический порядок, резервы, критический путь"""
+        return Response(TaskDependencyGraph.schedule(board_id=pk, user=request.user))
+    
+    @action(detail=True, methods=['get'])
+    def calendar(self, request, pk=None):
+        """Задачи и повторения задач доски со сроком в периоде [start, end)"""
+        try:
+            start = parse_datetime(request.query_params.get('start') or '')
+            end = parse_datetime(request.query_params.get('end') or '')
+        except ValueError:
+            start = end = None
+        if start is None or end is None:
+            raise ValidationException('Нужны start и end в формате ISO 8601')
+        return Response(TaskRecurrenceService.calendar(
+            board_id=pk,
+            user=request.user,
+            start=start if timezone.is_aware(start) else timezone.make_aware(start),
+            end=end if timezone.is_aware(end) else timezone.make_aware(end)
+        ))
+    
     @action(detail=True, methods=['get', 'post'])
     def columns(self, request, pk=None):
         """Управление колонками доски"""
@@ -113,6 +158,56 @@ class TaskBoardViewSet(viewsets.ModelViewSet):
                 return Response(serializer.data, status=status.HTTP_201_CREATED)
             return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
+    
+    @action(detail=True, methods=['get'])
+    def kanban(self, request, pk=None):
+        """Колонки доски с первыми задачами, размерами колонок и курсорами"""
+        result = TaskBoardLoader.load_board(
+            board_id=pk,
+            user=request.user,
+            limit=request.query_params.get('limit'),
+            **self._task_filters(request)
+        )
+        return Response({
+            'board': result['board'],
+            'columns': [
+                {
+                    **TaskColumnSerializer(item['column']).data,
+                    'total': item['total'],
+                    'tasks': TaskSerializer(item['tasks'], many=True).data,
+                    'next_cursor': item['next_cursor'],
+                }
+                for item in result['columns']
+            ]
+        })
+    
+    @action(detail=True, methods=['get'], url_path=r'columns/(?P<column_id>[^/.]+)/tasks')
+    def column_tasks(self, request, pk=None, column_id=None):
+        """Следующая страница задач колонки"""
+        tasks, next_cursor = TaskBoardLoader.load_column(
+            board_id=pk,
+            column_id=column_id,
+            user=request.user,
+            cursor=request.query_params.get('cursor'),
+            limit=request.query_params.get('limit'),
+            **self._task_filters(request)
+        )
+        return Response({
+            'results': TaskSerializer(tasks, many=True).data,
+            'next_cursor': next_cursor
+        })
+    
+    @staticmethod
+    def _task_filters(request):
+        filters = {}
+        if request.query_params.get('assignee'):
+            filters['assignee_id'] = request.query_params.get('assignee')
+        if request.query_params.get('status'):
+            filters['status'] = request.query_params.get('status')
+        if request.query_params.get('priority'):
+            filters['priority'] = request.query_params.get('priority')
+        return filters
+
 
 class TaskColumnViewSet(viewsets.ModelViewSet):
     """ViewSet для колонок задач"""
@@ -214,7 +309,6 @@ class TaskViewSet(viewsets.ModelViewSet):
     def move(self, request, pk=None):
         """Перемещение задачи в другую колонку"""
         column_id = request.data.get('column')
-        position = request.data.get('position', 0)
         
         if not column_id:
             return Response(
@@ -226,12 +320,158 @@ class TaskViewSet(viewsets.ModelViewSet):
             task_id=pk,
             user=request.user,
             column_id=column_id,
-            position=position
+            position=request.data.get('position'),
+            after_id=request.data.get('after'),
+            before_id=request.data.get('before')
         )
         
         serializer = TaskSerializer(task)
         return Response(serializer.data)
     
+    @action(detail=False, methods=['post'], url_path='move_many')
+    def move_many(self, request):
+        """Перемещение выделенных задач подряд в колонку"""
+        column_id = request.data.get('column')
+        task_ids = request.data.get('tasks')
+        
+        if not column_id or not isinstance(task_ids, list):
+            return Response(
+                {'error': 'Column ID and tasks list are required'}, 
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        tasks = TaskOrdering.move_many(
+            user=request.user,
+            task_ids=task_ids,
+            column_id=column_id,
+            after_id=request.data.get('after'),
+            before_id=request.data.get('before'),
+            index=request.data.get('position')
+        )
+        return Response({
+            'tasks': [{'id': str(task.id), 'column': str(task.column_id), 'rank': task.rank} for task in tasks]
+        })
+    
+    @action(detail=False, methods=['post'])
+    def bulk(self, request):
+        """Изменение или удаление выделенных задач одной операцией"""
+        task_ids = request.data.get('tasks')
+        
+        if not isinstance(task_ids, list):
+            return Response(
+                {'error': 'Tasks list is required'}, 
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        result = TaskBulkService.apply(
+            user=request.user,
+            task_ids=task_ids,
+            status=request.data.get('status'),
+            priority=request.data.get('priority'),
+            column_id=request.data.get('column'),
+            add_assignees=request.data.get('add_assignees'),
+            remove_assignees=request.data.get('remove_assignees'),
+            add_tags=request.data.get('add_tags'),
+            remove_tags=request.data.get('remove_tags'),
+            delete=bool(request.data.get('delete'))
+        )
+        return Response(result)
+    
+    @action(detail=True, methods=['get', 'post'])
+    def attachments(self, request, pk=None):
+        """Список вложений задачи и потоковая загрузка нового"""
+        if request.method == 'GET':
+            attachments = TaskAttachmentService.list_attachments(task_id=pk, user=request.user)
+            return Response(TaskAttachmentSerializer(attachments, many=True).data)
+        
+        max_size = settings.TASK_ATTACHMENT_MAX_SIZE
+        if int(request.META.get('CONTENT_LENGTH') or 0) > max_size + UPLOAD_OVERHEAD:
+            raise ValidationException('Файл слишком большой')
+        # Файл пишется на диск по частям с подсчетом sha256, а не в память
+        handler = ChecksumUploadHandler(request._request, max_size=max_size)
+        request._request.upload_handlers = [handler]
+        
+        uploaded_file = request.FILES.get('file')
+        if handler.exceeded:
+            raise ValidationException('Файл слишком большой')
+        if not uploaded_file:
+            return Response(
+                {'error': 'File is required'}, 
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        attachment = TaskAttachmentService.upload(task_id=pk, user=request.user, uploaded_file=uploaded_file)
+        return Response(TaskAttachmentSerializer(attachment).data, status=status.HTTP_201_CREATED)
+    
+    @action(detail=True, methods=['delete'], url_path=r'attachments/(?P<attachment_id>[0-9]+)')
+    def delete_attachment(self, request, pk=None, attachment_id=None):
+        """Удаление вложения"""
+        TaskAttachmentService.delete(task_id=pk, attachment_id=attachment_id, user=request.user)
+        return Response(status=status.HTTP_204_NO_CONTENT)
+    
+    @action(detail=True, methods=['get'], url_path=r'attachments/(?P<attachment_id>[0-9]+)/download')
+    def download_attachment(self, request, pk=None, attachment_id=None):
+        """Скачивание вложения (Range, X-Accel-Redirect)"""
+        attachment = TaskAttachmentService.get_attachment(task_id=pk, attachment_id=attachment_id, user=request.user)
+        return file_response(
+            request, attachment.file, attachment.original_name,
+            content_type=attachment.content_type, etag=attachment.sha256 or None
+        )
+    
+    @action(detail=True, methods=['get'], url_path=r'attachments/(?P<attachment_id>[0-9]+)/thumbnail')
+    def attachment_thumbnail(self, request, pk=None, attachment_id=None):
+        """Превью изображения-вложения"""
+        attachment = TaskAttachmentService.get_attachment(task_id=pk, attachment_id=attachment_id, user=request.user)
+        if not attachment.thumbnail:
+            raise NotFoundException("Превью еще не готово")
+        content_type = 'image/png' if attachment.thumbnail.name.endswith('.png') else 'image/jpeg'
+        return file_response(
+            request, attachment.thumbnail, f'thumbnail-{attachment.original_name}',
+            content_type=content_type, as_attachment=False
+        )
+    
+    @action(detail=True, methods=['get', 'post'])
+    def dependencies(self, request, pk=None):
+        """Связи задачи; POST {"blocker": id} -- задача blocker блокирует эту"""
+        if request.method == 'POST':
+            blocker_id = request.data.get('blocker')
+            if not blocker_id:
+                raise ValidationException('Нужен blocker')
+            TaskDependencyGraph.add(task_id=pk, blocker_id=blocker_id, user=request.user)
+            return Response(
+                TaskDependencyGraph.links(task_id=pk, user=request.user), status=status.HTTP_201_CREATED
+            )
+        return Response(TaskDependencyGraph.links(task_id=pk, user=request.user))
+    
+    @action(detail=True, methods=['delete'], url_path=r'dependencies/(?P<blocker_id>[0-9a-f-]+)')
+    def delete_dependency(self, request, pk=None, blocker_id=None):
+        """Удаление связи с блокирующей задачей"""
+        TaskDependencyGraph.remove(task_id=pk, blocker_id=blocker_id, user=request.user)
+        return Response(status=status.HTTP_204_NO_CONTENT)
+    
+    @action(detail=True, methods=['get', 'put', 'delete'])
+    def recurrence(self, request, pk=None):
+        """Правило повторения задачи"""
+        if request.method == 'GET':
+            recurrence = TaskRecurrenceService.get_recurrence(task_id=pk, user=request.user)
+            if recurrence is None:
+                raise NotFoundException("Задача не повторяется")
+            return Response(TaskRecurrenceSerializer(recurrence).data)
+        
+        if request.method == 'DELETE':
+            TaskRecurrenceService.clear(task_id=pk, user=request.user)
+            return Response(status=status.HTTP_204_NO_CONTENT)
+        
+        serializer = TaskRecurrenceSerializer(data=request.data)
+        if not serializer.is_valid():
+            return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+        recurrence = TaskRecurrenceService.set_rule(
+            task_id=pk,
+            user=request.user,
+            **serializer.validated_data
+        )
+        return Response(TaskRecurrenceSerializer(recurrence).data)
+    
     @action(detail=True, methods=['get', 'post'])
     def comments(self, request, pk=None):
         """Управление комментариями к задаче"""
@@ -245,14 +485,14 @@ class TaskViewSet(viewsets.ModelViewSet):
     
     @action(detail=True, methods=['get'])
     def activity(self, request, pk=None):
-        """Получение активности задачи"""
-        # Заглушка для активности
-        return Response([
-            {
-                'id': 1,
-                'type': 'task_created',
-                'description': 'Задача создана',
-                'timestamp': '2024-01-01T00:00:00Z'
-            }
-        ])
-
+        """Лента активности задачи страницами по курсору"""
+        events, next_cursor = TaskActivityLog.feed(
+            task_id=pk,
+            user=request.user,
+            cursor=request.query_params.get('cursor'),
+            limit=request.query_params.get('limit')
+        )
+        return Response({
+            'results': TaskActivitySerializer(events, many=True).data,
+            'next_cursor': next_cursor
+        })
@@ -6,13 +6,17 @@ from rest_framework.decorators import action
 from rest_framework.response import Response
 from django.db.models import Count, Q, Sum
 from django.utils import timezone
+from django.utils.dateparse import parse_date
 from datetime import timedelta
 
 from backend.apps.workspaces.models import Workspace, WorkspaceMember
-from backend.apps.notes.models import Page, PageView
+from backend.apps.notes.models import Page
 from backend.apps.tasks.models import Task, TaskBoard
 from backend.apps.databases.models import Database, DatabaseRecord
 from backend.apps.notifications.models import Notification
+from backend.services.page_views import PageViewRollups
+from backend.services.task_board_summary import TaskBoardSummary
+from backend.services.task_workload import DEFAULT_WEEKS, MAX_WEEKS, TaskWorkload
 
 
 class WorkspaceAnalyticsViewSet(viewsets.ViewSet):
@@ -76,6 +80,39 @@ class WorkspaceAnalyticsViewSet(viewsets.ViewSet):
             'activity': activity_stats
         })
     
+    @action(detail=False, methods=['get'], url_path='workload')
+    def workload(self, request):
+        """Открытые задачи и оценка часов исполнителей по неделям срока"""
+        workspace_id = request.query_params.get('workspace_id')
+        if not workspace_id:
+            return Response(
+                {'error': 'workspace_id обязателен'}, 
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        workspace = self.get_workspace(workspace_id)
+        if not workspace:
+            return Response(
+                {'error': 'Workspace не найден или нет доступа'}, 
+                status=status.HTTP_404_NOT_FOUND
+            )
+        
+        try:
+            start = parse_date(request.query_params.get('start') or '')
+            weeks = int(request.query_params.get('weeks') or DEFAULT_WEEKS)
+        except ValueError:
+            start, weeks = None, 0
+        if (request.query_params.get('start') and start is None) or not 1 <= weeks <= MAX_WEEKS:
+            return Response(
+                {'error': f'start -- дата YYYY-MM-DD, weeks -- от 1 до {MAX_WEEKS}'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        return Response({
+            'workspace_id': workspace.id,
+            **TaskWorkload.workload(workspace, start=start, weeks=weeks)
+        })
+    
     def _get_pages_stats(self, workspace, since_date):
         """Статистика по страницам"""
         pages = Page.objects.filter(workspace=workspace)
@@ -84,16 +121,11 @@ class WorkspaceAnalyticsViewSet(viewsets.ViewSet):
         # Страницы за период
         new_pages = pages.filter(created_at__gte=since_date).count()
         
-        # Просмотры страниц
-        page_views = PageView.objects.filter(
-            page__workspace=workspace,
-            viewed_at__gte=since_date
-        ).count()
+        # Просмотры страниц по дневным счетчикам
+        page_views = PageViewRollups.workspace_views(workspace, since_date)
         
         # Популярные страницы
-        popular_pages = pages.annotate(
-            view_count=Count('views')
-        ).order_by('-view_count')[:5]
+        popular_pages = PageViewRollups.annotate_view_count(pages).order_by('-view_count')[:5]
         
         return {
             'total': total_pages,
@@ -111,26 +143,20 @@ class WorkspaceAnalyticsViewSet(viewsets.ViewSet):
     def _get_tasks_stats(self, workspace, since_date):
         """Статистика по задачам"""
         tasks = Task.objects.filter(board__workspace=workspace)
-        total_tasks = tasks.count()
         
         # Задачи за период
         new_tasks = tasks.filter(created_at__gte=since_date).count()
         
-        # Статистика по статусам
-        status_stats = tasks.values('status').annotate(
-            count=Count('id')
-        )
-        
-        # Статистика по приоритетам
-        priority_stats = tasks.values('priority').annotate(
-            count=Count('id')
-        )
+        # Всего и разбивки -- из счетчиков досок
+        total_tasks = TaskBoardSummary.workspace_counts(workspace, 'total').get('', 0)
+        status_stats = TaskBoardSummary.workspace_counts(workspace, 'status')
+        priority_stats = TaskBoardSummary.workspace_counts(workspace, 'priority')
         
         return {
             'total': total_tasks,
             'new_this_period': new_tasks,
-            'by_status': list(status_stats),
-            'by_priority': list(priority_stats)
+            'by_status': [{'status': key, 'count': count} for key, count in status_stats.items()],
+            'by_priority': [{'priority': key, 'count': count} for key, count in priority_stats.items()]
         }
     
     def _get_databases_stats(self, workspace, since_date):
@@ -183,6 +209,7 @@ class WorkspaceAnalyticsViewSet(viewsets.ViewSet):
         """Статистика по активности"""
         # Активность по дням за последние 30 дней
         activity_by_day = []
+        views_by_day = PageViewRollups.views_by_day(workspace, timezone.now() - timedelta(days=29))
         for i in range(30):
             date = timezone.now() - timedelta(days=i)
             start_of_day = date.replace(hour=0, minute=0, second=0, microsecond=0)
@@ -203,11 +230,7 @@ class WorkspaceAnalyticsViewSet(viewsets.ViewSet):
             ).count()
             
             # Просмотры
-            page_views = PageView.objects.filter(
-                page__workspace=workspace,
-                viewed_at__gte=start_of_day,
-                viewed_at__lt=end_of_day
-            ).count()
+            page_views = views_by_day.get(start_of_day.date().isoformat(), 0)
             
             activity_by_day.append({
                 'date': start_of_day.date().isoformat(),
@@ -0,0 +1,405 @@
+"""
+Нагрузочный стенд для WebSocket consumers
+
+Поднимает ``backend.asgi.application`` (с JWT-middleware и проверкой Origin)
+поверх InMemoryChannelLayer, подключает N комнат по M клиентов через
+``WebsocketCommunicator`` и прогоняет поток событий. Для каждого сценария
+считаются p50/p99 задержки доставки, сообщений в секунду и SQL-запросов
+на событие, что позволяет ловить регрессии рассылки до production.
+
+Время отправки передается внутри пользовательских полей события
+(position, changes, request_id), поэтому задержка измеряется от отправки
+клиентом до получения каждым участником комнаты.
+"""
+import abc
+import asyncio
+import time
+from typing import Any, Dict, List, Optional
+
+from asgiref.sync import async_to_sync
+from channels.db import database_sync_to_async
+from channels.layers import get_channel_layer
+from channels.testing import WebsocketCommunicator
+from django.contrib.auth import get_user_model
+from django.db import connections
+from django.db.backends.signals import connection_created
+from django.test import override_settings
+from rest_framework_simplejwt.tokens import AccessToken
+
+from backend.apps.collaboration import protocol
+from backend.apps.collaboration.traffic import traffic_stats
+from backend.apps.notes.models import Page
+from backend.apps.workspaces.models import Workspace, WorkspaceMember
+
+User = get_user_model()
+
+BENCHMARK_CHANNEL_LAYERS = {
+    'default': {
+        'BACKEND': 'channels.layers.InMemoryChannelLayer',
+        'CONFIG': {'capacity': 10000},
+    },
+}
+
+# Время тишины, после которого клиент считается получившим все сообщения
+IDLE_TIMEOUT = 1.0
+
+
+class QueryCounter:
+    """Счетчик SQL-запросов во всех соединениях, включая созданные в потоках"""
+
+    def __init__(self):
+        self.count = 0
+        self.active = False
+        self.connections = []
+
+    def __call__(self, execute, sql, params, many, context):
+        if self.active:
+            self.count += 1
+        return execute(sql, params, many, context)
+
+    def _attach(self, sender, connection, **kwargs):
+        if self not in connection.execute_wrappers:
+            connection.execute_wrappers.append(self)
+            self.connections.append(connection)
+
+    def start(self):
+        for connection in connections.all():
+            self._attach(None, connection)
+        connection_created.connect(self._attach)
+        self.active = True
+
+    def stop(self):
+        self.active = False
+        connection_created.disconnect(self._attach)
+        for connection in self.connections:
+            if self in connection.execute_wrappers:
+                connection.execute_wrappers.remove(self)
+        self.connections = []
+
+    def take(self) -> int:
+        count, self.count = self.count, 0
+        return count
+
+
+def percentile(values: List[float], q: float) -> Optional[float]:
+    if not values:
+        return None
+    values = sorted(values)
+    return values[min(len(values) - 1, int(round(q * (len(values) - 1))))]
+
+
+class Scenario(abc.ABC):
+    """
+    Базовый сценарий: комнаты, клиенты и события.
+
+    setup, expected_deliveries и sent_times обязательны; make_event нужен
+    сценариям с client_events, push -- сценариям с серверными событиями.
+    """
+
+    name = ''
+    # Отправляют ли события клиенты (иначе события создаются в push)
+    client_events = True
+
+    @abc.abstractmethod
+    def setup(self, rooms: int, clients: int) -> List[List[Dict[str, Any]]]:
+        """Создание данных; возвращает комнаты со списком клиентов {user, path}"""
+
+    @abc.abstractmethod
+    def expected_deliveries(self, clients: int, events: int) -> int:
+        """Сколько событий должен получить каждый клиент"""
+
+    @abc.abstractmethod
+    def sent_times(self, message: Dict[str, Any]) -> List[Optional[float]]:
+        """Время отправки событий, доставленных сообщением (None -- без метки)"""
+
+    def make_event(self, client: Dict[str, Any], index: int, sent: float) -> Optional[Dict[str, Any]]:
+        """Сообщение, отправляемое клиентом (None -- клиент ничего не отправляет)"""
+        return None
+
+    async def push(self, room: List[Dict[str, Any]], events: int):
+        """Серверные события сценария (для сценариев без отправки клиентами)"""
+
+    @staticmethod
+    def create_members(workspace, prefix: str, clients: int):
+        users = []
+        for index in range(clients):
+            user = User(
+                username=f'{prefix}-{index}',
+                email=f'{prefix}-{index}@bench.local',
+                first_name='Bench',
+                last_name=str(index),
+            )
+            user.set_unusable_password()
+            users.append(user)
+        users = User.objects.bulk_create(users)
+        WorkspaceMember.objects.bulk_create([
+            WorkspaceMember(workspace=workspace, user=user, role='editor')
+            for user in users
+        ])
+        return users
+
+
+class CollaborationScenario(Scenario):
+    """Курсоры, изменения контента и индикаторы набора на странице"""
+
+    name = 'collaboration'
+    event_types = ('cursor_position', 'content_change', 'typing_start')
+
+    def setup(self, rooms, clients):
+        result = []
+        for room in range(rooms):
+            owner = User.objects.create(
+                username=f'collab-owner-{room}', email=f'collab-owner-{room}@bench.local'
+            )
+            workspace = Workspace.objects.create(name=f'Bench {room}', owner=owner)
+            page = Page.objects.create(
+                title='Bench', workspace=workspace, author=owner, last_edited_by=owner
+            )
+            path = f'/ws/collab/{workspace.id}/page/{page.id}/'
+            users = self.create_members(workspace, f'collab-{room}', clients)
+            result.append([{'user': user, 'path': path} for user in users])
+        return result
+
+    def make_event(self, client, index, sent):
+        message_type = self.event_types[index % len(self.event_types)]
+        if message_type == 'cursor_position':
+            return {'type': message_type, 'position': {'offset': index, 'sent': sent}}
+        if message_type == 'content_change':
+            return {'type': message_type, 'changes': [{'insert': 'x', 'sent': sent}]}
+        return {'type': message_type}
+
+    def expected_deliveries(self, clients, events):
+        # Отправитель не получает свои события, только ack
+        return (clients - 1) * events
+
+    def sent_times(self, message):
+        if message['type'] == 'cursor_position':
+            return [message['position']['sent']]
+        if message['type'] == 'content_change':
+            return [message['changes'][0]['sent']]
+        if message['type'] == 'typing_start':
+            return [None]
+        return []
+
+
+class DatabaseScenario(Scenario):
+    """Параллельные изменения записей базы данных"""
+
+    name = 'database'
+
+    def setup(self, rooms, clients):
+        from backend.services.databases import (
+            DatabasePropertyService, DatabaseRecordService, DatabaseService
+        )
+
+        result = []
+        for room in range(rooms):
+            owner = User.objects.create(
+                username=f'db-owner-{room}', email=f'db-owner-{room}@bench.local'
+            )
+            workspace = Workspace.objects.create(name=f'Bench {room}', owner=owner)
+            WorkspaceMember.objects.create(workspace=workspace, user=owner, role='owner')
+            database = DatabaseService.create_database(owner, workspace.id, title='Bench')
+            prop = DatabasePropertyService.create_property(
+                database.id, owner, name='Value', type='number', position=1
+            )
+            path = f'/ws/database/{database.id}/'
+            users = self.create_members(workspace, f'db-{room}', clients)
+            result.append([
+                {
+                    'user': user,
+                    'path': path,
+                    'property_id': str(prop.id),
+                    'record_id': str(DatabaseRecordService.create_record(database.id, owner, {}).id),
+                }
+                for user in users
+            ])
+        return result
+
+    def make_event(self, client, index, sent):
+        return {
+            'type': 'record_update',
+            'record_id': client['record_id'],
+            'changes': {client['property_id']: index},
+            'request_id': repr(sent),
+        }
+
+    def expected_deliveries(self, clients, events):
+        # Каноническая запись рассылается всем, включая отправителя
+        return clients * events
+
+    def sent_times(self, message):
+        if message['type'] == 'record_updated':
+            return [float(request_id) for request_id in message['request_ids']]
+        return []
+
+
+class NotificationScenario(Scenario):
+    """Серверная рассылка уведомлений в персональные группы (M вкладок на пользователя)"""
+
+    name = 'notifications'
+    client_events = False
+
+    def setup(self, rooms, clients):
+        result = []
+        for room in range(rooms):
+            user = User.objects.create(
+                username=f'notify-{room}', email=f'notify-{room}@bench.local'
+            )
+            result.append([{'user': user, 'path': '/ws/notifications/'} for _ in range(clients)])
+        return result
+
+    def expected_deliveries(self, clients, events):
+        return events
+
+    def sent_times(self, message):
+        if message.get('type') == 'notification':
+            return [message['sent']]
+        return []
+
+    async def push(self, room, events):
+        channel_layer = get_channel_layer()
+        group = f"user_{room[0]['user'].id}"
+        for index in range(events):
+            payload = {'type': 'notification', 'message': f'Bench {index}', 'sent': time.perf_counter()}
+            await channel_layer.group_send(group, {
+                'type': 'notification_message',
+                'frames': protocol.encode_frames(payload),
+            })
+            await asyncio.sleep(0)
+
+
+SCENARIOS = {
+    scenario.name: scenario
+    for scenario in (CollaborationScenario, DatabaseScenario, NotificationScenario)
+}
+
+
+async def _connect(application, client, wire_protocol):
+    token = str(AccessToken.for_user(client['user']))
+    communicator = WebsocketCommunicator(
+        application,
+        f"{client['path']}?token={token}",
+        headers=[(b'origin', b'http://localhost')],
+        subprotocols=[wire_protocol],
+    )
+    connected, _ = await communicator.connect(timeout=10)
+    if not connected:
+        raise RuntimeError(f"Не удалось подключиться к {client['path']}")
+    return communicator
+
+
+async def _drain(communicator, idle=0.2):
+    while not await communicator.receive_nothing(timeout=idle):
+        await communicator.receive_output()
+
+
+async def _send_events(scenario, communicator, client, events, wire_protocol):
+    for index in range(events):
+        message = scenario.make_event(client, index, time.perf_counter())
+        if message is None:
+            return
+        frame = protocol.encode(message, wire_protocol)
+        if isinstance(frame, bytes):
+            await communicator.send_to(bytes_data=frame)
+        else:
+            await communicator.send_to(text_data=frame)
+        await asyncio.sleep(0)
+
+
+async def _receive_events(scenario, communicator, expected, latencies):
+    """Прием сообщений до ожидаемого количества или тишины; возвращает (событий, кадров)"""
+    delivered = frames = 0
+    while delivered < expected:
+        if await communicator.receive_nothing(timeout=IDLE_TIMEOUT):
+            break
+        output = await communicator.receive_output()
+        received = time.perf_counter()
+        frames += 1
+        message = protocol.decode(output.get('text'), output.get('bytes'))
+        for sent in scenario.sent_times(message):
+            delivered += 1
+            if sent is not None:
+                latencies.append((received - sent) * 1000)
+    return delivered, frames
+
+
+async def _run(scenario, rooms, clients, events, wire_protocol, counter):
+    from backend.asgi import application
+
+    layout = await database_sync_to_async(scenario.setup)(rooms, clients)
+    counter.take()
+    sockets = []
+    for room in layout:
+        sockets.append([await _connect(application, client, wire_protocol) for client in room])
+    connect_queries = counter.take()
+    for room_sockets in sockets:
+        await asyncio.gather(*[_drain(communicator) for communicator in room_sockets])
+    counter.take()
+
+    latencies: List[float] = []
+    expected = scenario.expected_deliveries(clients, events)
+    stats_before = traffic_stats.copy()
+    started = time.perf_counter()
+    tasks = []
+    for room, room_sockets in zip(layout, sockets):
+        tasks.append(scenario.push(room, events))
+        for client, communicator in zip(room, room_sockets):
+            if scenario.client_events:
+                tasks.append(_send_events(scenario, communicator, client, events, wire_protocol))
+    receivers = [
+        _receive_events(scenario, communicator, expected, latencies)
+        for room_sockets in sockets for communicator in room_sockets
+    ]
+    results = await asyncio.gather(*receivers, *tasks)
+    elapsed = time.perf_counter() - started
+    event_queries = counter.take()
+
+    for room_sockets in sockets:
+        for communicator in room_sockets:
+            await communicator.disconnect()
+
+    delivered = sum(result[0] for result in results[:len(receivers)])
+    frames = sum(result[1] for result in results[:len(receivers)])
+    produced = rooms * clients * events if scenario.client_events else rooms * events
+    return {
+        'scenario': scenario.name,
+        'protocol': wire_protocol,
+        'rooms': rooms,
+        'clients': clients,
+        'events': produced,
+        'delivered': delivered,
+        'expected': expected * rooms * clients,
+        'p50_ms': percentile(latencies, 0.5),
+        'p99_ms': percentile(latencies, 0.99),
+        'messages_per_sec': frames / elapsed if elapsed else 0.0,
+        'queries_per_event': event_queries / produced if produced else 0.0,
+        'queries_per_connect': connect_queries / (rooms * clients),
+        'dropped': traffic_stats['dropped'] - stats_before['dropped'],
+        'limited': traffic_stats['limited'] - stats_before['limited'],
+        'elapsed': elapsed,
+    }
+
+
+def run_benchmark(scenario: str, rooms: int = 5, clients: int = 10, events: int = 20,
+                  wire_protocol: str = protocol.JSON_PROTOCOL) -> Dict[str, Any]:
+    """
+    Прогон одного сценария.
+
+    Должен вызываться с подготовленной (тестовой) базой данных: сценарий
+    создает пользователей, рабочие пространства и ресурсы.
+    """
+    # Синхронный код consumers выполняется в вызывающем потоке, поэтому
+    # счетчик подключается к его соединениям, а не внутри цикла событий
+    counter = QueryCounter()
+    counter.start()
+    try:
+        with override_settings(
+            CHANNEL_LAYERS=BENCHMARK_CHANNEL_LAYERS,
+            COLLABORATION_EVENT_LOG={'BACKEND': 'memory'},
+        ):
+            return async_to_sync(_run)(
+                SCENARIOS[scenario](), rooms, clients, events, wire_protocol, counter
+            )
+    finally:
+        counter.stop()
@@ -1,12 +1,15 @@
 """
 WebSocket consumer для совместной работы в реальном времени
 """
-import json
 import asyncio
+import logging
+import time
+import uuid
 from datetime import datetime, timezone
 from typing import Dict, List, Any
 from channels.generic.websocket import AsyncWebsocketConsumer
 from channels.db import database_sync_to_async
+from django.conf import settings
 from django.contrib.auth import get_user_model
 from django.core.exceptions import ObjectDoesNotExist
 from backend.apps.workspaces.models import Workspace, WorkspaceMember
@@ -14,13 +17,27 @@ from backend.apps.notes.models import Page
 from backend.apps.databases.models import Database
 from backend.apps.tasks.models import TaskBoard, Task
 from backend.apps.notifications.models import Notification
+from .event_log import get_room_event_log
+from .heartbeat import HeartbeatMixin
 from .models import ActiveSession
+from .protocol import WireProtocolMixin, decode
+from .traffic import RoomTrafficMixin
+from backend.services.block_storage import BlockStorage
+from backend.services.collaboration_service import ActiveSessionService
+from backend.services.page_text import PageTextIndexer
 
 User = get_user_model()
+logger = logging.getLogger(__name__)
 
 
-class CollaborationConsumer(AsyncWebsocketConsumer):
+class CollaborationConsumer(RoomTrafficMixin, HeartbeatMixin, WireProtocolMixin, AsyncWebsocketConsumer):
     """WebSocket consumer для совместной работы в реальном времени"""
+
+    ephemeral_message_types = frozenset({
+        'cursor_position', 'selection_change', 'typing_start', 'typing_stop'
+    })
+    room_prefix = 'collab'
+    room_kwargs = ('resource_type', 'resource_id')
     
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
@@ -30,6 +47,7 @@ class CollaborationConsumer(AsyncWebsocketConsumer):
         self.resource_id = None
         self.session_id = None
         self.room_group_name = None
+        self.last_touch = 0.0
 
     async def connect(self):
         """Подключение пользователя к WebSocket"""
@@ -51,7 +69,7 @@ class CollaborationConsumer(AsyncWebsocketConsumer):
             return
 
         # Создаем группу для комнаты
-        self.room_group_name = f"collab_{self.resource_type}_{self.resource_id}"
+        self.room_group_name = self.room_name_for_scope(self.scope)
         self.session_id = str(uuid.uuid4())
 
         # Присоединяемся к группе
@@ -60,39 +78,36 @@ class CollaborationConsumer(AsyncWebsocketConsumer):
             self.channel_name
         )
 
-        await self.accept()
+        await self.accept_with_protocol()
+        self.start_heartbeat()
 
         # Создаем активную сессию
         await self.create_active_session()
+        self.last_touch = time.monotonic()
 
         # Уведомляем других о подключении
-        await self.channel_layer.group_send(
-            self.room_group_name,
-            {
-                'type': 'user_joined',
-                'user_id': str(self.user.id),
-                'user_name': self.user.full_name or self.user.email,
-                'session_id': self.session_id,
-                'timestamp': datetime.now(timezone.utc).isoformat(),
-            }
-        )
+        await self.broadcast({
+            'type': 'user_joined',
+            'user_id': str(self.user.id),
+            'user_name': self.user.full_name or self.user.email,
+            'session_id': self.session_id,
+            'timestamp': datetime.now(timezone.utc),
+        })
 
         # Отправляем список активных пользователей
         await self.send_active_users()
 
     async def disconnect(self, close_code):
         """Отключение пользователя от WebSocket"""
+        await self.stop_heartbeat()
         if hasattr(self, 'room_group_name') and self.room_group_name:
             # Уведомляем других об отключении
-            await self.channel_layer.group_send(
-                self.room_group_name,
-                {
-                    'type': 'user_left',
-                    'user_id': str(self.user.id),
-                    'session_id': self.session_id,
-                    'timestamp': datetime.now(timezone.utc).isoformat(),
-                }
-            )
+            await self.broadcast({
+                'type': 'user_left',
+                'user_id': str(self.user.id),
+                'session_id': self.session_id,
+                'timestamp': datetime.now(timezone.utc),
+            })
 
             # Удаляем активную сессию
             await self.remove_active_session()
@@ -103,11 +118,17 @@ class CollaborationConsumer(AsyncWebsocketConsumer):
                 self.channel_name
             )
 
-    async def receive(self, text_data):
+    async def receive(self, text_data=None, bytes_data=None):
         """Получение сообщения от клиента"""
         try:
-            data = json.loads(text_data)
+            data = decode(text_data, bytes_data)
             message_type = data.get('type')
+
+            await self.touch_presence()
+            if await self.handle_heartbeat(data):
+                return
+            if not await self.check_rate_limit(data):
+                return
             
             if message_type == 'content_change':
                 await self.handle_content_change(data)
@@ -121,11 +142,13 @@ class CollaborationConsumer(AsyncWebsocketConsumer):
                 await self.handle_typing_start(data)
             elif message_type == 'typing_stop':
                 await self.handle_typing_stop(data)
+            elif message_type == 'resume':
+                await self.handle_resume(data)
             else:
                 await self.send_error('Unknown message type')
                 
-        except json.JSONDecodeError:
-            await self.send_error('Invalid JSON')
+        except ValueError:
+            await self.send_error('Invalid message format')
         except Exception as e:
             await self.send_error(f'Error processing message: {str(e)}')
 
@@ -138,18 +161,11 @@ class CollaborationConsumer(AsyncWebsocketConsumer):
             'session_id': self.session_id,
             'changes': data.get('changes', []),
             'version': data.get('version'),
-            'timestamp': datetime.now(timezone.utc).isoformat(),
+            'timestamp': datetime.now(timezone.utc),
         }
 
         # Отправляем изменения всем кроме отправителя
-        await self.channel_layer.group_send(
-            self.room_group_name,
-            {
-                'type': 'broadcast_content_change',
-                'data': change_data,
-                'sender_channel': self.channel_name,
-            }
-        )
+        await self.broadcast(change_data, exclude_sender=True, durable=True)
 
     async def handle_cursor_position(self, data):
         """Обработка изменения позиции курсора"""
@@ -159,18 +175,11 @@ class CollaborationConsumer(AsyncWebsocketConsumer):
             'user_name': self.user.full_name or self.user.email,
             'session_id': self.session_id,
             'position': data.get('position'),
-            'timestamp': datetime.now(timezone.utc).isoformat(),
+            'timestamp': datetime.now(timezone.utc),
         }
 
         # Отправляем позицию курсора всем кроме отправителя
-        await self.channel_layer.group_send(
-            self.room_group_name,
-            {
-                'type': 'broadcast_cursor_position',
-                'data': cursor_data,
-                'sender_channel': self.channel_name,
-            }
-        )
+        await self.broadcast(cursor_data, exclude_sender=True)
 
     async def handle_selection_change(self, data):
         """Обработка изменения выделения текста"""
@@ -180,18 +189,11 @@ class CollaborationConsumer(AsyncWebsocketConsumer):
             'user_name': self.user.full_name or self.user.email,
             'session_id': self.session_id,
             'selection': data.get('selection'),
-            'timestamp': datetime.now(timezone.utc).isoformat(),
+            'timestamp': datetime.now(timezone.utc),
         }
 
         # Отправляем выделение всем кроме отправителя
-        await self.channel_layer.group_send(
-            self.room_group_name,
-            {
-                'type': 'broadcast_selection_change',
-                'data': selection_data,
-                'sender_channel': self.channel_name,
-            }
-        )
+        await self.broadcast(selection_data, exclude_sender=True)
 
     async def handle_save_content(self, data):
         """Обработка сохранения контента"""
@@ -207,19 +209,13 @@ class CollaborationConsumer(AsyncWebsocketConsumer):
                 await self.save_task_content(content, version)
             
             # Уведомляем всех о сохранении
-            await self.channel_layer.group_send(
-                self.room_group_name,
-                {
-                    'type': 'broadcast_content_saved',
-                    'data': {
-                        'type': 'content_saved',
-                        'user_id': str(self.user.id),
-                        'user_name': self.user.full_name or self.user.email,
-                        'version': version,
-                        'timestamp': datetime.now(timezone.utc).isoformat(),
-                    }
-                }
-            )
+            await self.broadcast({
+                'type': 'content_saved',
+                'user_id': str(self.user.id),
+                'user_name': self.user.full_name or self.user.email,
+                'version': version,
+                'timestamp': datetime.now(timezone.utc),
+            }, durable=True)
             
         except Exception as e:
             await self.send_error(f'Error saving content: {str(e)}')
@@ -231,17 +227,10 @@ class CollaborationConsumer(AsyncWebsocketConsumer):
             'user_id': str(self.user.id),
             'user_name': self.user.full_name or self.user.email,
             'session_id': self.session_id,
-            'timestamp': datetime.now(timezone.utc).isoformat(),
+            'timestamp': datetime.now(timezone.utc),
         }
 
-        await self.channel_layer.group_send(
-            self.room_group_name,
-            {
-                'type': 'broadcast_typing_start',
-                'data': typing_data,
-                'sender_channel': self.channel_name,
-            }
-        )
+        await self.broadcast(typing_data, exclude_sender=True)
 
     async def handle_typing_stop(self, data):
         """Обработка окончания печати"""
@@ -249,79 +238,49 @@ class CollaborationConsumer(AsyncWebsocketConsumer):
             'type': 'typing_stop',
             'user_id': str(self.user.id),
             'session_id': self.session_id,
-            'timestamp': datetime.now(timezone.utc).isoformat(),
+            'timestamp': datetime.now(timezone.utc),
         }
 
-        await self.channel_layer.group_send(
-            self.room_group_name,
-            {
-                'type': 'broadcast_typing_stop',
-                'data': typing_data,
-                'sender_channel': self.channel_name,
-            }
-        )
+        await self.broadcast(typing_data, exclude_sender=True)
 
     # Методы для трансляции сообщений
 
-    async def user_joined(self, event):
-        """Трансляция подключения пользователя"""
-        await self.send(text_data=json.dumps(event))
-
-    async def user_left(self, event):
-        """Трансляция отключения пользователя"""
-        await self.send(text_data=json.dumps(event))
-
-    async def broadcast_content_change(self, event):
-        """Трансляция изменений контента"""
-        if self.channel_name != event.get('sender_channel'):
-            await self.send(text_data=json.dumps(event['data']))
-
-    async def broadcast_cursor_position(self, event):
-        """Трансляция позиции курсора"""
-        if self.channel_name != event.get('sender_channel'):
-            await self.send(text_data=json.dumps(event['data']))
-
-    async def broadcast_selection_change(self, event):
-        """Трансляция изменения выделения"""
-        if self.channel_name != event.get('sender_channel'):
-            await self.send(text_data=json.dumps(event['data']))
-
-    async def broadcast_content_saved(self, event):
-        """Трансляция сохранения контента"""
-        await self.send(text_data=json.dumps(event['data']))
-
-    async def broadcast_typing_start(self, event):
-        """Трансляция начала печати"""
-        if self.channel_name != event.get('sender_channel'):
-            await self.send(text_data=json.dumps(event['data']))
-
-    async def broadcast_typing_stop(self, event):
-        """Трансляция окончания печати"""
-        if self.channel_name != event.get('sender_channel'):
-            await self.send(text_data=json.dumps(event['data']))
-
     async def notification_message(self, event):
         """Трансляция уведомления"""
-        await self.send(text_data=json.dumps(event['data']))
+        await self.send_payload(event['data'])
 
     # Вспомогательные методы
 
     async def send_error(self, message):
         """Отправка сообщения об ошибке"""
-        await self.send(text_data=json.dumps({
+        await self.send_payload({
             'type': 'error',
             'message': message,
-            'timestamp': datetime.now(timezone.utc).isoformat(),
-        }))
+            'timestamp': datetime.now(timezone.utc),
+        })
 
     async def send_active_users(self):
         """Отправка списка активных пользователей"""
         active_users = await self.get_active_users()
-        await self.send(text_data=json.dumps({
+        await self.send_payload({
             'type': 'active_users',
             'users': active_users,
-            'timestamp': datetime.now(timezone.utc).isoformat(),
-        }))
+            # Точка отсчета для последующего resume
+            'seq': await get_room_event_log().last_seq(self.room_group_name),
+            'timestamp': datetime.now(timezone.utc),
+        })
+
+    def resource_filter(self):
+        """Фильтр ActiveSession для текущего ресурса"""
+        if self.resource_type == 'page':
+            return {'page_id': self.resource_id}
+        if self.resource_type == 'database':
+            return {'database_id': self.resource_id}
+        return {
+            'workspace_id': self.workspace_id,
+            'page__isnull': True,
+            'database__isnull': True,
+        }
 
     @database_sync_to_async
     def check_resource_access(self):
@@ -343,21 +302,32 @@ class CollaborationConsumer(AsyncWebsocketConsumer):
                 return False
                 
             return True
-        except ObjectDoesNotExist:
+        except (ObjectDoesNotExist, ValueError):
             return False
 
     @database_sync_to_async
     def create_active_session(self):
         """Создание активной сессии"""
+        filters = self.resource_filter()
+        filters.pop('page__isnull', None)
+        filters.pop('database__isnull', None)
         ActiveSession.objects.create(
             user=self.user,
             session_id=self.session_id,
-            resource_type=self.resource_type,
-            resource_id=self.resource_id,
+            channel_name=self.channel_name,
+            group_name=self.room_group_name,
             workspace_id=self.workspace_id,
-            last_seen=datetime.now(timezone.utc)
+            **filters
         )
 
+    async def touch_presence(self):
+        """Продление присутствия не чаще COLLABORATION_PRESENCE_TOUCH_INTERVAL"""
+        now = time.monotonic()
+        if now - self.last_touch < settings.COLLABORATION_PRESENCE_TOUCH_INTERVAL:
+            return
+        self.last_touch = now
+        await database_sync_to_async(ActiveSessionService.touch)(self.session_id)
+
     @database_sync_to_async
     def remove_active_session(self):
         """Удаление активной сессии"""
@@ -369,9 +339,11 @@ class CollaborationConsumer(AsyncWebsocketConsumer):
     @database_sync_to_async
     def get_active_users(self):
         """Получение списка активных пользователей"""
+        # Сессии без heartbeat дольше порога не показываются, даже если
+        # сборщик еще не успел их удалить
         sessions = ActiveSession.objects.filter(
-            resource_type=self.resource_type,
-            resource_id=self.resource_id
+            last_seen__gte=ActiveSessionService.stale_cutoff(),
+            **self.resource_filter()
         ).select_related('user')
         
         return [
@@ -379,7 +351,7 @@ class CollaborationConsumer(AsyncWebsocketConsumer):
                 'user_id': str(session.user.id),
                 'user_name': session.user.full_name or session.user.email,
                 'session_id': session.session_id,
-                'last_seen': session.last_seen.isoformat(),
+                'last_seen': session.last_seen,
             }
             for session in sessions
         ]
@@ -388,8 +360,14 @@ class CollaborationConsumer(AsyncWebsocketConsumer):
     def save_page_content(self, content, version):
         """Сохранение содержимого страницы"""
         page = Page.objects.get(id=self.resource_id)
-        page.content = content
-        page.save()
+        if BlockStorage.is_block_document(content):
+            BlockStorage.sync_from_content(page, self.user, content)
+        else:
+            page.content = content
+            page.content_revision = page.blocks_revision
+            page.last_edited_by = self.user
+            page.save(update_fields=['content', 'content_revision', 'last_edited_by', 'updated_at'])
+        PageTextIndexer.schedule(page.id)
 
     @database_sync_to_async
     def save_database_content(self, content, version):
@@ -405,62 +383,56 @@ class CollaborationConsumer(AsyncWebsocketConsumer):
         task.save()
 
 
-class NotificationConsumer(AsyncWebsocketConsumer):
+class NotificationConsumer(HeartbeatMixin, WireProtocolMixin, AsyncWebsocketConsumer):
     """WebSocket consumer для уведомлений"""
 
     async def connect(self):
-        print(f"NotificationConsumer.connect() called for user: {self.scope['user']}")
         self.user = self.scope["user"]
         
         if not self.user.is_authenticated:
-            print(f"User not authenticated, closing connection")
             await self.close()
             return
 
-        print(f"User authenticated: {self.user.email}")
         self.user_group_name = f"user_{self.user.id}"
-        print(f"User group name: {self.user_group_name}")
 
         # Присоединяемся к персональной группе пользователя
         await self.channel_layer.group_add(
             self.user_group_name,
             self.channel_name
         )
-        print(f"Added to channel layer group: {self.user_group_name}")
 
-        await self.accept()
-        print(f"WebSocket connection accepted for user: {self.user.email}")
+        await self.accept_with_protocol()
+        self.start_heartbeat()
+        logger.debug('Notification socket connected user_id=%s', self.user.id)
 
     async def disconnect(self, close_code):
-        print(f"NotificationConsumer.disconnect() called with code: {close_code}")
+        await self.stop_heartbeat()
         if hasattr(self, 'user_group_name'):
             await self.channel_layer.group_discard(
                 self.user_group_name,
                 self.channel_name
             )
-            print(f"Removed from channel layer group: {self.user_group_name}")
 
-    async def receive(self, text_data):
+    async def receive(self, text_data=None, bytes_data=None):
         try:
-            data = json.loads(text_data)
+            data = decode(text_data, bytes_data)
             message_type = data.get('type')
+            if await self.handle_heartbeat(data):
+                return
             
             if message_type == 'mark_read':
                 notification_id = data.get('notification_id')
                 await self.mark_notification_read(notification_id)
-            elif message_type == 'ping':
-                # Отвечаем на ping для keep-alive
-                await self.send(text_data=json.dumps({
-                    'type': 'pong',
-                    'timestamp': data.get('timestamp')
-                }))
                 
-        except json.JSONDecodeError:
+        except ValueError:
             pass
 
     async def notification_message(self, event):
         """Отправка уведомления пользователю"""
-        await self.send(text_data=json.dumps(event['message']))
+        if 'frames' in event:
+            await self.send_frame(event['frames'])
+        else:
+            await self.send_payload(event['message'])
 
     @database_sync_to_async
     def mark_notification_read(self, notification_id):
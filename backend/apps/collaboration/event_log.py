@@ -0,0 +1,178 @@
+"""
+Журнал событий комнат совместной работы
+
+Каждое значимое групповое событие получает монотонно возрастающий номер
+``seq`` в пределах комнаты и сохраняется в ограниченном журнале. После
+переподключения клиент присылает последний полученный номер и получает
+только пропущенные события вместо повторной загрузки документа.
+
+Бэкенды:
+    memory -- кольцевой буфер в памяти процесса (разработка, тесты,
+              один worker); журнал комнаты без событий дольше TTL и
+              давно не использованные комнаты сверх MAX_ROOMS удаляются,
+              как истекают ключи Redis
+    redis  -- Redis Streams: XADD с ограничением MAXLEN и XRANGE при
+              восстановлении, номер выдается атомарно Lua-скриптом
+"""
+import time
+from collections import OrderedDict, deque
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+import msgpack
+from django.conf import settings
+
+DEFAULT_CONFIG = {
+    'BACKEND': 'memory',
+    'MAXLEN': 500,
+    'TTL': 24 * 60 * 60,
+    'MAX_ROOMS': 10000,  # Только для memory
+}
+
+
+def _pack_default(value: Any) -> Any:
+    if isinstance(value, datetime):
+        return value.isoformat()
+    return str(value)
+
+
+class InMemoryRoomEventLog:
+    """
+    Кольцевой буфер событий для каждой комнаты в памяти процесса.
+
+    Комнаты хранятся в порядке последнего события: при каждой записи
+    удаляются журналы, не менявшиеся дольше ttl секунд, и самые старые
+    сверх max_rooms. Удаленная комната начинается с номера 0, и клиент со
+    старым номером получает запрос полного снимка -- так же, как после
+    истечения ключей в RedisRoomEventLog.
+    """
+
+    def __init__(self, maxlen: int, ttl: Optional[float] = None, max_rooms: Optional[int] = None):
+        self.maxlen = maxlen
+        self.ttl = ttl
+        self.max_rooms = max_rooms
+        self.rooms: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+
+    def _room(self, room: str) -> Optional[Dict[str, Any]]:
+        state = self.rooms.get(room)
+        if state is not None and self.ttl is not None and time.monotonic() - state['touched'] > self.ttl:
+            del self.rooms[room]
+            return None
+        return state
+
+    def _evict(self, now: float) -> None:
+        """Удаление простаивающих комнат и самых старых сверх лимита"""
+        while self.rooms:
+            room, state = next(iter(self.rooms.items()))
+            expired = self.ttl is not None and now - state['touched'] > self.ttl
+            overflow = self.max_rooms is not None and len(self.rooms) > self.max_rooms
+            if not (expired or overflow):
+                break
+            del self.rooms[room]
+
+    async def append(self, room: str, payload: Dict[str, Any]) -> int:
+        """Сохранение события, возвращает присвоенный номер"""
+        now = time.monotonic()
+        state = self._room(room)
+        if state is None:
+            state = self.rooms[room] = {'seq': 0, 'events': deque(maxlen=self.maxlen)}
+        state['seq'] += 1
+        state['events'].append(dict(payload, seq=state['seq']))
+        state['touched'] = now
+        self.rooms.move_to_end(room)
+        self._evict(now)
+        return state['seq']
+
+    async def last_seq(self, room: str) -> int:
+        state = self._room(room)
+        return state['seq'] if state is not None else 0
+
+    async def since(self, room: str, last_seq: int) -> Optional[List[Dict[str, Any]]]:
+        """
+        События после last_seq.
+
+        Returns:
+            Список событий или None, если часть событий уже вытеснена из
+            журнала и клиенту нужен полный снимок
+        """
+        state = self._room(room)
+        if state is None:
+            return [] if last_seq == 0 else None
+        if last_seq > state['seq']:
+            return None
+        events = [event for event in state['events'] if event['seq'] > last_seq]
+        if len(events) != state['seq'] - last_seq:
+            return None
+        return events
+
+
+class RedisRoomEventLog:
+    """Журнал событий на Redis Streams, общий для всех worker-процессов"""
+
+    # Номер и запись в поток выдаются одним скриптом, чтобы идентификаторы
+    # потока возрастали в том же порядке, что и номера событий
+    APPEND_SCRIPT = """
+    local seq = redis.call('INCR', KEYS[2])
+    redis.call('XADD', KEYS[1], 'MAXLEN', '~', ARGV[2], seq .. '-0', 'p', ARGV[1])
+    redis.call('EXPIRE', KEYS[1], ARGV[3])
+    redis.call('EXPIRE', KEYS[2], ARGV[3])
+    return seq
+    """
+
+    def __init__(self, url: str, maxlen: int, ttl: int, prefix: str = 'collab:log'):
+        import redis.asyncio as redis
+
+        self.client = redis.from_url(url)
+        self.maxlen = maxlen
+        self.ttl = ttl
+        self.prefix = prefix
+        self.append_script = self.client.register_script(self.APPEND_SCRIPT)
+
+    def _keys(self, room: str):
+        return f'{self.prefix}:{room}', f'{self.prefix}:{room}:seq'
+
+    async def append(self, room: str, payload: Dict[str, Any]) -> int:
+        """Сохранение события, возвращает присвоенный номер"""
+        stream_key, seq_key = self._keys(room)
+        packed = msgpack.packb(payload, default=_pack_default, use_bin_type=True)
+        return int(await self.append_script(
+            keys=[stream_key, seq_key], args=[packed, self.maxlen, self.ttl]
+        ))
+
+    async def last_seq(self, room: str) -> int:
+        _, seq_key = self._keys(room)
+        return int(await self.client.get(seq_key) or 0)
+
+    async def since(self, room: str, last_seq: int) -> Optional[List[Dict[str, Any]]]:
+        """События после last_seq или None, если нужен полный снимок"""
+        stream_key, _ = self._keys(room)
+        current = await self.last_seq(room)
+        if last_seq > current:
+            return None
+        if last_seq == current:
+            return []
+
+        entries = await self.client.xrange(stream_key, min=f'{last_seq + 1}-0', max='+')
+        if len(entries) != current - last_seq:
+            return None
+
+        events = []
+        for entry_id, fields in entries:
+            seq = int(entry_id.decode().split('-')[0])
+            events.append(dict(msgpack.unpackb(fields[b'p'], raw=False), seq=seq))
+        return events
+
+
+_event_logs: Dict[Any, Any] = {}
+
+
+def get_room_event_log():
+    """Журнал событий по настройке COLLABORATION_EVENT_LOG"""
+    config = dict(DEFAULT_CONFIG, **getattr(settings, 'COLLABORATION_EVENT_LOG', {}))
+    key = tuple(sorted(config.items()))
+    if key not in _event_logs:
+        if config['BACKEND'] == 'redis':
+            _event_logs[key] = RedisRoomEventLog(config['URL'], config['MAXLEN'], config['TTL'])
+        else:
+            _event_logs[key] = InMemoryRoomEventLog(config['MAXLEN'], config['TTL'], config['MAX_ROOMS'])
+    return _event_logs[key]
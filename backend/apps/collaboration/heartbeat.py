@@ -0,0 +1,66 @@
+"""
+Heartbeat для WebSocket-соединений совместной работы
+
+Клиент периодически отправляет ``ping`` (фронтенд делает это раз в 30
+секунд) и получает ``pong``. Любое входящее сообщение считается признаком
+жизни; соединение без сообщений дольше COLLABORATION_IDLE_TIMEOUT
+закрывается сервером, а его disconnect убирает присутствие и группы.
+"""
+import asyncio
+import time
+from datetime import datetime, timezone
+from typing import Any, Dict
+
+from django.conf import settings
+
+# Код закрытия соединения по таймауту простоя (диапазон 4000-4999 для приложений)
+IDLE_CLOSE_CODE = 4408
+# Код закрытия соединения, признанного зомби сборщиком сессий
+REAPED_CLOSE_CODE = 4410
+
+
+class HeartbeatMixin:
+    """Ping/pong и серверный таймаут простоя для AsyncWebsocketConsumer"""
+
+    heartbeat_task = None
+    last_activity = 0.0
+
+    def start_heartbeat(self):
+        """Запуск сторожа простоя после accept"""
+        self.last_activity = time.monotonic()
+        self.heartbeat_task = asyncio.ensure_future(self.watch_idle())
+
+    async def stop_heartbeat(self):
+        if self.heartbeat_task and self.heartbeat_task is not asyncio.current_task():
+            self.heartbeat_task.cancel()
+        self.heartbeat_task = None
+
+    async def watch_idle(self):
+        timeout = settings.COLLABORATION_IDLE_TIMEOUT
+        while True:
+            idle = time.monotonic() - self.last_activity
+            if idle >= timeout:
+                await self.close(code=IDLE_CLOSE_CODE)
+                return
+            await asyncio.sleep(timeout - idle)
+
+    async def handle_heartbeat(self, data: Dict[str, Any]) -> bool:
+        """
+        Отметка активности и ответ на ping.
+
+        Returns:
+            True, если сообщение служебное и дальнейшая обработка не нужна
+        """
+        self.last_activity = time.monotonic()
+        message_type = data.get('type')
+        if message_type == 'ping':
+            await self.send_payload({
+                'type': 'pong',
+                'timestamp': data.get('timestamp') or datetime.now(timezone.utc),
+            })
+            return True
+        return message_type == 'pong'
+
+    async def force_disconnect(self, event: Dict[str, Any]):
+        """Закрытие соединения по команде сборщика сессий"""
+        await self.close(code=event.get('code', REAPED_CLOSE_CODE))
@@ -0,0 +1,28 @@
+"""
+Сборка зависших сессий присутствия и зомби-каналов
+"""
+import time
+
+from django.core.management.base import BaseCommand
+
+from backend.services.collaboration_service import ActiveSessionService
+
+
+class Command(BaseCommand):
+    help = 'Удаляет ActiveSession без heartbeat и отключает их каналы'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--interval', type=int, default=0,
+            help='Повторять каждые N секунд (0 -- однократный запуск, например из cron)'
+        )
+        parser.add_argument('--batch-size', type=int, default=500, help='Сессий за один DELETE')
+
+    def handle(self, *args, **options):
+        while True:
+            reaped = ActiveSessionService.reap_stale_sessions(batch_size=options['batch_size'])
+            if reaped or options['verbosity'] > 1:
+                self.stdout.write(f'Удалено зависших сессий: {reaped}')
+            if not options['interval']:
+                break
+            time.sleep(options['interval'])
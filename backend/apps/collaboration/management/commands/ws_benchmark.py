@@ -0,0 +1,67 @@
+"""
+Нагрузочный прогон WebSocket consumers на временной тестовой базе
+"""
+from django.core.management.base import BaseCommand
+from django.test.utils import setup_databases, teardown_databases
+
+from backend.apps.collaboration import protocol
+from backend.apps.collaboration.benchmark import SCENARIOS, run_benchmark
+
+
+class Command(BaseCommand):
+    help = 'Нагрузочный тест WebSocket consumers: задержка рассылки, сообщений/с и SQL-запросов на событие'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--scenario', choices=[*SCENARIOS, 'all'], default='all',
+            help='Сценарий: collaboration, database, notifications или all'
+        )
+        parser.add_argument('--rooms', type=int, default=5, help='Количество комнат')
+        parser.add_argument('--clients', type=int, default=10, help='Клиентов в комнате')
+        parser.add_argument('--events', type=int, default=20, help='Событий на клиента')
+        parser.add_argument(
+            '--protocol', choices=list(protocol.PROTOCOL_ALIASES), default='json',
+            help='Протокол клиентов'
+        )
+        parser.add_argument(
+            '--keepdb', action='store_true', help='Не пересоздавать тестовую базу'
+        )
+
+    def handle(self, *args, **options):
+        scenarios = list(SCENARIOS) if options['scenario'] == 'all' else [options['scenario']]
+        wire_protocol = protocol.PROTOCOL_ALIASES[options['protocol']]
+
+        old_config = setup_databases(
+            verbosity=0, interactive=False, keepdb=options['keepdb'], aliases={'default'}
+        )
+        try:
+            for scenario in scenarios:
+                result = run_benchmark(
+                    scenario,
+                    rooms=options['rooms'],
+                    clients=options['clients'],
+                    events=options['events'],
+                    wire_protocol=wire_protocol,
+                )
+                self.report(result)
+        finally:
+            teardown_databases(old_config, verbosity=0, keepdb=options['keepdb'])
+
+    def report(self, result):
+        self.stdout.write(self.style.MIGRATE_HEADING(
+            f"{result['scenario']} ({result['protocol']}): "
+            f"{result['rooms']} комнат x {result['clients']} клиентов"
+        ))
+        self.stdout.write(f"  событий:              {result['events']}")
+        self.stdout.write(f"  доставлено:           {result['delivered']} из {result['expected']}")
+        self.stdout.write(f"  p50 / p99, мс:        {self.format_ms(result['p50_ms'])} / {self.format_ms(result['p99_ms'])}")
+        self.stdout.write(f"  сообщений/с:          {result['messages_per_sec']:.0f}")
+        self.stdout.write(f"  SQL на событие:       {result['queries_per_event']:.2f}")
+        self.stdout.write(f"  SQL на подключение:   {result['queries_per_connect']:.2f}")
+        self.stdout.write(f"  отброшено / отклонено: {result['dropped']} / {result['limited']}")
+        if result['delivered'] < result['expected']:
+            self.stdout.write(self.style.WARNING('  часть сообщений не доставлена'))
+
+    @staticmethod
+    def format_ms(value):
+        return '-' if value is None else f'{value:.2f}'
@@ -1,6 +1,13 @@
-import json
+import logging
+import time
+from collections import OrderedDict
+from threading import Lock
+from typing import Any, Dict, Optional, Tuple
+from urllib.parse import parse_qs
+
 from channels.middleware import BaseMiddleware
 from channels.db import database_sync_to_async
+from django.conf import settings
 from django.contrib.auth import get_user_model
 from rest_framework_simplejwt.tokens import AccessToken
 from rest_framework_simplejwt.exceptions import TokenError, InvalidToken
@@ -8,60 +15,134 @@ from django.contrib.auth.models import AnonymousUser
 
 User = get_user_model()
 
+logger = logging.getLogger(__name__)
+
+# Подпротокол для передачи токена из браузера, где нельзя задать заголовки:
+# new WebSocket(url, ['notion.json.v1', 'bearer.' + token]). Клиент обязан
+# предложить и прикладной подпротокол: сервер выбирает его, а токен никогда
+# не возвращается в ответе, без него браузер закроет соединение.
+TOKEN_SUBPROTOCOL_PREFIX = 'bearer.'
+
+
+class UserCache:
+    """
+    LRU-кэш пользователей по (user_id, jti) с истечением вместе с токеном.
+
+    Переподключение с тем же токеном не обращается к базе данных. Время
+    жизни записи ограничено сроком действия токена и max_ttl, чтобы
+    деактивация пользователя вступала в силу без ожидания конца токена.
+    """
+
+    def __init__(self, max_size: int, max_ttl: Optional[int]):
+        self.max_size = max_size
+        self.max_ttl = max_ttl
+        self.entries: 'OrderedDict[Tuple[str, str], Tuple[Any, float]]' = OrderedDict()
+        self.lock = Lock()
+
+    def get(self, key: Tuple[str, str]):
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                return None
+            user, expires_at = entry
+            if expires_at <= time.time():
+                del self.entries[key]
+                return None
+            self.entries.move_to_end(key)
+            return user
+
+    def set(self, key: Tuple[str, str], user, token_exp: float):
+        expires_at = token_exp
+        if self.max_ttl is not None:
+            expires_at = min(expires_at, time.time() + self.max_ttl)
+        with self.lock:
+            self.entries[key] = (user, expires_at)
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_size:
+                self.entries.popitem(last=False)
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+
+
+user_cache = UserCache(
+    max_size=getattr(settings, 'WEBSOCKET_AUTH_CACHE_SIZE', 10000),
+    max_ttl=getattr(settings, 'WEBSOCKET_AUTH_CACHE_MAX_TTL', 300),
+)
+
+
+def extract_token(scope: Dict[str, Any]) -> Tuple[Optional[str], str]:
+    """
+    Поиск токена: заголовок Authorization, подпротокол ``bearer.<token>``
+    или параметр ``token`` в query string.
+
+    Подпротокол с токеном удаляется из scope, чтобы consumer не выбрал
+    и не вернул его клиенту при согласовании протокола. Токен из
+    подпротокола принимается, только если клиент предложил и прикладной
+    подпротокол; одиночный ``bearer.<token>`` игнорируется.
+
+    Returns:
+        Кортеж (токен или None, источник токена)
+    """
+    for name, value in scope.get('headers', []):
+        if name == b'authorization':
+            scheme, _, credentials = value.decode('latin1').partition(' ')
+            if scheme.lower() == 'bearer' and credentials:
+                return credentials.strip(), 'header'
+
+    subprotocols = scope.get('subprotocols') or []
+    tokens = [item for item in subprotocols if item.startswith(TOKEN_SUBPROTOCOL_PREFIX)]
+    if tokens:
+        scope['subprotocols'] = [item for item in subprotocols if item not in tokens]
+        if scope['subprotocols']:
+            return tokens[0][len(TOKEN_SUBPROTOCOL_PREFIX):], 'subprotocol'
+
+    query = parse_qs(scope.get('query_string', b'').decode())
+    token = (query.get('token') or [None])[0]
+    return token, 'query'
+
 
 class JWTAuthMiddleware(BaseMiddleware):
     """
     Middleware для аутентификации WebSocket соединений с JWT токенами
     """
-    
+
     async def __call__(self, scope, receive, send):
-        print(f"WebSocket middleware called for {scope.get('type', 'unknown')}")
-        print(f"URL: {scope.get('path', 'unknown')}")
-        print(f"Query string: {scope.get('query_string', b'').decode()}")
-        
-        # Получаем токен из query параметров
-        query_string = scope.get('query_string', b'').decode()
-        query_params = {}
-        if query_string:
-            for param in query_string.split('&'):
-                if '=' in param:
-                    key, value = param.split('=', 1)
-                    query_params[key] = value
-        token = query_params.get('token', None)
-        
-        print(f"Token found: {bool(token)}")
-        
+        scope = dict(scope)
+        token, source = extract_token(scope)
+        scope['user'] = AnonymousUser()
+
         if token:
             try:
-                # Валидируем JWT токен
+                # Подпись и срок действия проверяются при каждом подключении,
+                # из кэша берется только пользователь
                 access_token = AccessToken(token)
-                user_id = access_token['user_id']
-                print(f"User ID from token: {user_id}")
-                
-                # Получаем пользователя из базы данных
-                user = await self.get_user(user_id)
+                key = (str(access_token['user_id']), str(access_token.get('jti', '')))
+
+                user = user_cache.get(key)
+                cached = user is not None
+                if user is None:
+                    user = await self.get_user(key[0])
+                    if user:
+                        user_cache.set(key, user, access_token['exp'])
+
                 if user:
                     scope['user'] = user
-                    print(f"User authenticated: {user.email}")
-                else:
-                    scope['user'] = AnonymousUser()
-                    print("User not found in database")
+
+                if logger.isEnabledFor(logging.DEBUG):
+                    logger.debug(
+                        'WebSocket auth path=%s source=%s user_id=%s cached=%s authenticated=%s',
+                        scope.get('path'), source, key[0], cached, bool(user),
+                    )
             except (TokenError, InvalidToken, KeyError) as e:
-                print(f"Token validation error: {e}")
-                scope['user'] = AnonymousUser()
-        else:
-            print("No token provided, using anonymous user")
-            scope['user'] = AnonymousUser()
-        
-        print(f"Final user: {scope['user']}")
-        # Убираем лишние print'ы для production
-        print(f"Middleware completed, user: {scope['user']}")
-        # Убираем лишние print'ы для production
+                logger.debug('WebSocket auth path=%s source=%s error=%s', scope.get('path'), source, e)
+
         return await super().__call__(scope, receive, send)
-    
+
     @database_sync_to_async
     def get_user(self, user_id):
         try:
-            return User.objects.get(id=user_id)
+            return User.objects.get(id=user_id, is_active=True)
         except User.DoesNotExist:
             return None
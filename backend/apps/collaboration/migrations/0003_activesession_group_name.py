@@ -0,0 +1,26 @@
+# Generated by Django 4.2.7 on 2026-10-18 23:48
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        (
+            "collaboration",
+            "0002_collaborationcomment_activesession_last_activity_and_more",
+        ),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="activesession",
+            name="group_name",
+            field=models.CharField(blank=True, max_length=200),
+        ),
+        migrations.AddIndex(
+            model_name="activesession",
+            index=models.Index(
+                fields=["last_seen"], name="collaborati_last_se_a9bc98_idx"
+            ),
+        ),
+    ]
@@ -26,6 +26,8 @@ class ActiveSession(models.Model):
     
     session_id = models.CharField(max_length=100, unique=True)
     channel_name = models.CharField(max_length=100)
+    # Группа комнаты, из которой сборщик удаляет канал зависшей сессии
+    group_name = models.CharField(max_length=200, blank=True)
     
     # Cursor position for collaborative editing
     cursor_position = models.JSONField(default=dict)
@@ -39,6 +41,7 @@ class ActiveSession(models.Model):
         indexes = [
             models.Index(fields=['page', 'last_seen']),
             models.Index(fields=['database', 'last_seen']),
+            models.Index(fields=['last_seen']),
         ]
     
     def __str__(self):
@@ -0,0 +1,241 @@
+"""
+Протоколы передачи сообщений для WebSocket-соединений совместной работы
+
+Клиент выбирает протокол через Sec-WebSocket-Protocol (или параметр
+``protocol`` в query string). Кроме JSON поддерживается компактный
+MessagePack: короткие коды полей, время в миллисекундах epoch и бинарные
+кадры через ``bytes_data``. Кадры для группы кодируются один раз
+отправителем, получатели пересылают готовые байты без повторной сериализации.
+"""
+import json
+from datetime import datetime
+from typing import Any, Dict, Optional
+from urllib.parse import parse_qs
+
+import msgpack
+
+from backend.apps.collaboration.event_log import get_room_event_log
+
+JSON_PROTOCOL = 'notion.json.v1'
+MSGPACK_PROTOCOL = 'notion.msgpack.v1'
+
+# Порядок определяет приоритет, если клиент предложил несколько протоколов
+SUPPORTED_PROTOCOLS = (MSGPACK_PROTOCOL, JSON_PROTOCOL)
+
+# Короткие имена для query string: ?protocol=msgpack
+PROTOCOL_ALIASES = {
+    'json': JSON_PROTOCOL,
+    'msgpack': MSGPACK_PROTOCOL,
+}
+
+# Коды полей конверта сообщения. Содержимое пользовательских полей
+# (changes, position, selection, content, message) не переименовывается.
+FIELD_CODES = {
+    'type': 't',
+    'user_id': 'u',
+    'user_name': 'n',
+    'session_id': 's',
+    'timestamp': 'ts',
+    'position': 'p',
+    'selection': 'sl',
+    'changes': 'c',
+    'content': 'ct',
+    'version': 'v',
+    'users': 'us',
+    'last_seen': 'ls',
+    'message': 'm',
+    'notification_id': 'ni',
+    'username': 'un',
+    'record_id': 'ri',
+    'record': 'r',
+    'request_id': 'q',
+    'request_ids': 'qs',
+    'seq': 'sq',
+    'last_seq': 'lq',
+}
+FIELD_NAMES = {code: name for name, code in FIELD_CODES.items()}
+
+# Поля со списком вложенных конвертов
+NESTED_FIELDS = ('users',)
+
+
+def negotiate_protocol(scope: Dict[str, Any]) -> str:
+    """Выбор протокола по подпротоколам рукопожатия или query string"""
+    offered = scope.get('subprotocols') or []
+    for protocol in SUPPORTED_PROTOCOLS:
+        if protocol in offered:
+            return protocol
+
+    query = parse_qs(scope.get('query_string', b'').decode())
+    requested = (query.get('protocol') or [''])[0]
+    return PROTOCOL_ALIASES.get(requested, JSON_PROTOCOL)
+
+
+def _json_default(value: Any) -> Any:
+    if isinstance(value, datetime):
+        return value.isoformat()
+    return str(value)
+
+
+def _epoch_ms(value: Any) -> Any:
+    if isinstance(value, datetime):
+        return int(value.timestamp() * 1000)
+    if isinstance(value, str):
+        try:
+            return int(datetime.fromisoformat(value).timestamp() * 1000)
+        except ValueError:
+            return value
+    return value
+
+
+def compact(payload: Dict[str, Any]) -> Dict[str, Any]:
+    """Переименование полей конверта в короткие коды и перевод времени в epoch ms"""
+    result = {}
+    for key, value in payload.items():
+        if key in ('timestamp', 'last_seen'):
+            value = _epoch_ms(value)
+        elif key in NESTED_FIELDS and isinstance(value, list):
+            value = [compact(item) if isinstance(item, dict) else item for item in value]
+        result[FIELD_CODES.get(key, key)] = value
+    return result
+
+
+def expand(payload: Dict[str, Any]) -> Dict[str, Any]:
+    """Обратное преобразование компактного конверта"""
+    result = {}
+    for key, value in payload.items():
+        name = FIELD_NAMES.get(key, key)
+        if name in NESTED_FIELDS and isinstance(value, list):
+            value = [expand(item) if isinstance(item, dict) else item for item in value]
+        result[name] = value
+    return result
+
+
+def encode(payload: Dict[str, Any], protocol: str):
+    """Кодирование сообщения: str для JSON, bytes для MessagePack"""
+    if protocol == MSGPACK_PROTOCOL:
+        return msgpack.packb(compact(payload), default=_json_default, use_bin_type=True)
+    return json.dumps(payload, default=_json_default)
+
+
+def encode_frames(payload: Dict[str, Any]) -> Dict[str, Any]:
+    """Однократное кодирование группового сообщения во все поддерживаемые протоколы"""
+    return {protocol: encode(payload, protocol) for protocol in SUPPORTED_PROTOCOLS}
+
+
+def decode(text_data: Optional[str] = None, bytes_data: Optional[bytes] = None) -> Dict[str, Any]:
+    """
+    Декодирование входящего сообщения.
+
+    Raises:
+        ValueError: если сообщение не является объектом в одном из протоколов
+    """
+    if bytes_data is not None:
+        try:
+            data = msgpack.unpackb(bytes_data, raw=False)
+        except (msgpack.ExtraData, msgpack.FormatError, msgpack.StackError, ValueError) as e:
+            raise ValueError(str(e))
+        if not isinstance(data, dict):
+            raise ValueError('Message must be an object')
+        return expand(data)
+
+    data = json.loads(text_data)
+    if not isinstance(data, dict):
+        raise ValueError('Message must be an object')
+    return data
+
+
+class WireProtocolMixin:
+    """
+    Согласование протокола и отправка сообщений для AsyncWebsocketConsumer.
+
+    Групповые события имеют тип ``frame_message`` и несут поле ``frames``
+    с уже закодированными кадрами: получатель только выбирает кадр своего
+    протокола и пересылает его без разбора и повторной сериализации.
+
+    Значимые события (durable) перед рассылкой записываются в журнал комнаты
+    и получают номер ``seq``; по сообщению ``resume`` клиент получает
+    пропущенные события. Курсоры и индикаторы набора не журналируются.
+    """
+    protocol = JSON_PROTOCOL
+
+    async def accept_with_protocol(self):
+        """Принятие соединения с подтверждением выбранного подпротокола"""
+        self.protocol = negotiate_protocol(self.scope)
+        offered = self.scope.get('subprotocols') or []
+        await self.accept(subprotocol=self.protocol if self.protocol in offered else None)
+
+    async def broadcast(self, payload: Dict[str, Any], exclude_sender: bool = False,
+                        durable: bool = False):
+        """Рассылка сообщения группе комнаты: кадры кодируются один раз отправителем"""
+        if durable:
+            seq = await get_room_event_log().append(self.room_group_name, payload)
+            payload = dict(payload, seq=seq)
+            if exclude_sender:
+                # Отправитель не получает эхо, но должен узнать номер события
+                await self.send_payload({'type': 'ack', 'seq': seq})
+
+        await self.channel_layer.group_send(
+            self.room_group_name,
+            {
+                'type': 'frame_message',
+                'frames': encode_frames(payload),
+                'sender_channel': self.channel_name if exclude_sender else None,
+            }
+        )
+
+    async def frame_message(self, event: Dict[str, Any]):
+        """Пересылка группового кадра; эхо отправителю отсекается до любой обработки"""
+        if event.get('sender_channel') == self.channel_name:
+            return
+        await self.send_frame(event['frames'])
+
+    async def handle_resume(self, data: Dict[str, Any]):
+        """
+        Восстановление сессии после переподключения.
+
+        Клиент передает последний полученный ``last_seq``; в ответ приходят
+        пропущенные события и ``resumed`` с текущим номером либо
+        ``snapshot_required``, если журнал уже не содержит нужных событий.
+        """
+        event_log = get_room_event_log()
+        last_seq = data.get('last_seq')
+        if last_seq is None:
+            await self.send_payload({
+                'type': 'resumed',
+                'seq': await event_log.last_seq(self.room_group_name),
+            })
+            return
+
+        try:
+            last_seq = int(last_seq)
+        except (TypeError, ValueError):
+            last_seq = -1
+        events = await event_log.since(self.room_group_name, last_seq) if last_seq >= 0 else None
+        if events is None:
+            await self.send_payload({
+                'type': 'snapshot_required',
+                'seq': await event_log.last_seq(self.room_group_name),
+            })
+            return
+
+        for event in events:
+            await self.send_payload(event)
+        await self.send_payload({
+            'type': 'resumed',
+            'seq': events[-1]['seq'] if events else last_seq,
+        })
+
+    async def send_payload(self, payload: Dict[str, Any]):
+        """Отправка одного сообщения текущему соединению"""
+        await self.send_encoded(encode(payload, self.protocol))
+
+    async def send_frame(self, frames: Dict[str, Any]):
+        """Пересылка заранее закодированного группового кадра"""
+        await self.send_encoded(frames[self.protocol])
+
+    async def send_encoded(self, frame):
+        if isinstance(frame, bytes):
+            await self.send(bytes_data=frame)
+        else:
+            await self.send(text_data=frame)
@@ -0,0 +1,174 @@
+"""
+Распределение и ограничение трафика комнат совместной работы
+
+Шардирование: комнаты распределяются по нескольким channel layer
+(алиасы из CHANNEL_LAYERS) через кольцо консистентного хеширования по
+``room_group_name``. Все участники комнаты попадают на один backend,
+а горячая комната нагружает только свой шард.
+
+Ограничение частоты: token bucket на пользователя и на комнату в пределах
+процесса. Эфемерные события (курсоры, выделение, набор) при превышении
+молча отбрасываются, остальные отклоняются с ошибкой ``rate_limited``.
+"""
+import bisect
+import hashlib
+import time
+from collections import Counter
+from typing import Any, Dict, List, Optional, Tuple
+
+from django.conf import settings
+
+# Счетчики трафика процесса: dropped -- отброшенные эфемерные события,
+# limited -- отклоненные значимые события
+traffic_stats: Counter = Counter()
+
+
+class ChannelLayerRing:
+    """Кольцо консистентного хеширования алиасов channel layer"""
+
+    def __init__(self, aliases: List[str], replicas: int = 100):
+        self.aliases = list(aliases)
+        self.points: List[Tuple[int, str]] = sorted(
+            (self._hash(f'{alias}:{index}'), alias)
+            for alias in self.aliases
+            for index in range(replicas)
+        )
+        self.keys = [point for point, _ in self.points]
+
+    @staticmethod
+    def _hash(value: str) -> int:
+        return int.from_bytes(hashlib.md5(value.encode()).digest()[:8], 'big')
+
+    def alias_for(self, room: str) -> str:
+        """Алиас channel layer для комнаты"""
+        if len(self.aliases) == 1:
+            return self.aliases[0]
+        index = bisect.bisect(self.keys, self._hash(room)) % len(self.points)
+        return self.points[index][1]
+
+
+_rings: Dict[Tuple[str, ...], ChannelLayerRing] = {}
+
+
+def get_channel_layer_ring() -> ChannelLayerRing:
+    aliases = tuple(getattr(settings, 'COLLABORATION_CHANNEL_LAYER_RING', None) or ['default'])
+    if aliases not in _rings:
+        _rings[aliases] = ChannelLayerRing(list(aliases))
+    return _rings[aliases]
+
+
+def channel_layer_alias_for(room: Optional[str]) -> str:
+    """Алиас channel layer для группы комнаты (default для прочих групп)"""
+    if not room:
+        return 'default'
+    return get_channel_layer_ring().alias_for(room)
+
+
+class TokenBucket:
+    """Token bucket: rate токенов в секунду, не более burst"""
+
+    __slots__ = ('rate', 'burst', 'tokens', 'updated')
+
+    def __init__(self, rate: float, burst: float):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.updated = time.monotonic()
+
+    def refill(self, now: float) -> float:
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        return self.tokens
+
+
+class RateLimiter:
+    """Набор token bucket по ключам с вытеснением давно заполненных корзин"""
+
+    def __init__(self, max_buckets: int = 10000):
+        self.max_buckets = max_buckets
+        self.buckets: Dict[Tuple[str, str], TokenBucket] = {}
+
+    def _bucket(self, key: Tuple[str, str], rate: float, burst: float) -> TokenBucket:
+        bucket = self.buckets.get(key)
+        if bucket is None or (bucket.rate, bucket.burst) != (rate, burst):
+            if len(self.buckets) >= self.max_buckets:
+                self._sweep()
+            bucket = self.buckets[key] = TokenBucket(rate, burst)
+        return bucket
+
+    def _sweep(self):
+        """Удаление корзин, которые успели заполниться: они эквивалентны новым"""
+        now = time.monotonic()
+        for key, bucket in list(self.buckets.items()):
+            if bucket.rate <= 0 or bucket.refill(now) >= bucket.burst:
+                del self.buckets[key]
+
+    def allow(self, limits: List[Tuple[Tuple[str, str], float, float]]) -> bool:
+        """
+        Списание по одному токену из всех корзин сразу.
+
+        Args:
+            limits: список (ключ, rate, burst)
+
+        Returns:
+            False, если хотя бы в одной корзине нет токена (ничего не списывается)
+        """
+        now = time.monotonic()
+        buckets = [self._bucket(key, rate, burst) for key, rate, burst in limits]
+        if any(bucket.refill(now) < 1 for bucket in buckets):
+            return False
+        for bucket in buckets:
+            bucket.tokens -= 1
+        return True
+
+
+rate_limiter = RateLimiter()
+
+
+class RoomTrafficMixin:
+    """
+    Шардирование и ограничение частоты для consumer'ов комнат.
+
+    Имя комнаты по умолчанию -- ``room_prefix`` и параметры маршрута
+    ``room_kwargs`` через "_"; consumer задает их или переопределяет
+    ``room_name_for_scope``. Алиас channel layer выбирается до того, как
+    AsyncConsumer.__call__ создаст канал.
+    """
+
+    ephemeral_message_types = frozenset()
+    room_prefix = 'room'
+    room_kwargs: Tuple[str, ...] = ()
+
+    @classmethod
+    def room_name_for_scope(cls, scope: Dict[str, Any]) -> str:
+        kwargs = scope['url_route']['kwargs']
+        names = cls.room_kwargs or tuple(kwargs)
+        return '_'.join([cls.room_prefix, *(str(kwargs[name]) for name in names)])
+
+    async def __call__(self, scope, receive, send):
+        self.channel_layer_alias = channel_layer_alias_for(self.room_name_for_scope(scope))
+        return await super().__call__(scope, receive, send)
+
+    async def check_rate_limit(self, data: Dict[str, Any]) -> bool:
+        """Проверка лимитов пользователя и комнаты; False -- сообщение не обрабатывать"""
+        user_rate, user_burst = settings.COLLABORATION_RATE_LIMITS['user']
+        room_rate, room_burst = settings.COLLABORATION_RATE_LIMITS['room']
+        user = self.scope.get('user')
+        allowed = rate_limiter.allow([
+            (('user', str(getattr(user, 'id', ''))), user_rate, user_burst),
+            (('room', self.room_group_name), room_rate, room_burst),
+        ])
+        if allowed:
+            return True
+
+        if data.get('type') in self.ephemeral_message_types:
+            traffic_stats['dropped'] += 1
+        else:
+            traffic_stats['limited'] += 1
+            await self.send_payload({
+                'type': 'error',
+                'code': 'rate_limited',
+                'message': 'Слишком много сообщений',
+                'request_ids': [data['request_id']] if data.get('request_id') else [],
+            })
+        return False
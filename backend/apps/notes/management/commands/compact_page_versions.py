@@ -0,0 +1,35 @@
+"""
+Сжатие и прореживание истории версий страниц
+"""
+import time
+
+from django.core.management.base import BaseCommand
+
+from backend.services.page_history import PageHistory
+
+
+class Command(BaseCommand):
+    help = 'Пересобирает цепочки дельт PageVersion и удаляет старые версии по PAGE_VERSION_RETENTION'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--interval', type=int, default=0,
+            help='Повторять каждые N секунд (0 -- однократный запуск, например из cron)'
+        )
+        parser.add_argument('--page', help='Сжать историю только этой страницы')
+
+    def handle(self, *args, **options):
+        while True:
+            page_ids = [options['page']] if options['page'] else PageHistory.pages_to_compact()
+            kept = removed = 0
+            for page_id in page_ids:
+                page_kept, page_removed = PageHistory.compact(page_id)
+                kept += page_kept
+                removed += page_removed
+            if page_ids or options['verbosity'] > 1:
+                self.stdout.write(
+                    f'Страниц: {len(page_ids)}, версий сохранено: {kept}, удалено: {removed}'
+                )
+            if not options['interval']:
+                break
+            time.sleep(options['interval'])
@@ -0,0 +1,25 @@
+"""
+Полная переиндексация текста страниц
+"""
+from django.core.management.base import BaseCommand
+
+from backend.apps.notes.models import Page
+from backend.services.page_text import PageTextIndexer
+
+
+class Command(BaseCommand):
+    help = 'Пересчитывает Page.content_text и SearchIndex для всех страниц (или одного пространства)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workspace', type=int, help='Только страницы этого пространства')
+
+    def handle(self, *args, **options):
+        queryset = Page.objects.filter(is_deleted=False)
+        if options['workspace']:
+            queryset = queryset.filter(workspace_id=options['workspace'])
+
+        total = 0
+        for page_id in queryset.values_list('id', flat=True).iterator():
+            PageTextIndexer.reindex(page_id)
+            total += 1
+        self.stdout.write(f'Переиндексировано страниц: {total}')
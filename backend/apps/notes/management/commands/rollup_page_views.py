@@ -0,0 +1,20 @@
+"""
+Пересчет счетчиков просмотров страниц
+"""
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from backend.services.page_views import PageViewRollups
+
+
+class Command(BaseCommand):
+    help = 'Пересчитывает PageViewRollup по сырым PageView за последние N дней'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, default=2, help='Глубина пересчета в днях')
+
+    def handle(self, *args, **options):
+        created = PageViewRollups.rebuild(timezone.now() - timedelta(days=options['days']))
+        self.stdout.write(f'Счетчиков просмотров пересчитано: {created}')
@@ -0,0 +1,22 @@
+# Generated by Django 4.2.7 on 2026-10-18 23:56
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("notes", "0001_initial"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="page",
+            name="blocks_revision",
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name="page",
+            name="content_revision",
+            field=models.PositiveIntegerField(default=0),
+        ),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 4.2.7 on 2026-10-19 00:00
+
+from django.db import migrations, models
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("notes", "0002_page_block_revisions"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="pageversion",
+            name="chain_position",
+            field=models.PositiveSmallIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name="pageversion",
+            name="delta",
+            field=models.JSONField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name="pageversion",
+            name="updated_at",
+            field=models.DateTimeField(default=django.utils.timezone.now),
+        ),
+        migrations.AlterField(
+            model_name="pageversion",
+            name="content",
+            field=models.JSONField(blank=True, null=True),
+        ),
+    ]
@@ -0,0 +1,50 @@
+# Generated by Django 4.2.7 on 2026-10-19 00:04
+
+from django.db import migrations, models
+
+
+def build_tree_paths(apps, schema_editor):
+    """Заполнение путей существующих страниц по уровням, начиная с корней"""
+    Page = apps.get_model("notes", "Page")
+    paths = {}
+    level = list(Page.objects.filter(parent__isnull=True).only("id", "parent_id"))
+    depth = 0
+    while level:
+        for page in level:
+            parent_path = paths.get(page.parent_id, "")
+            page.tree_path = f"{parent_path}{page.id.hex}/"
+            page.depth = depth
+            paths[page.id] = page.tree_path
+        Page.objects.bulk_update(level, ["tree_path", "depth"], batch_size=500)
+        level = list(
+            Page.objects.filter(parent_id__in=[page.id for page in level]).only("id", "parent_id")
+        )
+        depth += 1
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("notes", "0003_pageversion_deltas"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="page",
+            name="depth",
+            field=models.PositiveSmallIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name="page",
+            name="tree_path",
+            field=models.CharField(blank=True, max_length=2048),
+        ),
+        migrations.AddIndex(
+            model_name="page",
+            index=models.Index(
+                fields=["tree_path"],
+                name="notes_page_tree_path_idx",
+                opclasses=["varchar_pattern_ops"],
+            ),
+        ),
+        migrations.RunPython(build_tree_paths, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,103 @@
+# Generated by Django 4.2.7 on 2026-10-19 00:10
+
+from django.db import migrations, models
+import django.db.models.deletion
+import django.utils.timezone
+
+
+def build_rollups(apps, schema_editor):
+    """Агрегация накопленных просмотров в почасовые и дневные счетчики"""
+    from django.db.models import Count
+    from django.db.models.functions import TruncDay, TruncHour
+
+    PageView = apps.get_model("notes", "PageView")
+    PageViewRollup = apps.get_model("notes", "PageViewRollup")
+    for granularity, trunc in (("hour", TruncHour), ("day", TruncDay)):
+        rows = (
+            PageView.objects.annotate(bucket=trunc("viewed_at"))
+            .values("page_id", "page__workspace_id", "bucket")
+            .annotate(views=Count("id"))
+            .order_by()
+        )
+        PageViewRollup.objects.bulk_create(
+            (
+                PageViewRollup(
+                    page_id=row["page_id"],
+                    workspace_id=row["page__workspace_id"],
+                    granularity=granularity,
+                    bucket=row["bucket"],
+                    views=row["views"],
+                )
+                for row in rows.iterator()
+            ),
+            batch_size=1000,
+        )
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("workspaces", "0001_initial"),
+        ("notes", "0004_page_tree_path"),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name="pageview",
+            name="viewed_at",
+            field=models.DateTimeField(default=django.utils.timezone.now),
+        ),
+        migrations.CreateModel(
+            name="PageViewRollup",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "granularity",
+                    models.CharField(
+                        choices=[("hour", "Hour"), ("day", "Day")], max_length=4
+                    ),
+                ),
+                ("bucket", models.DateTimeField()),
+                ("views", models.PositiveIntegerField(default=0)),
+                (
+                    "page",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="view_rollups",
+                        to="notes.page",
+                    ),
+                ),
+                (
+                    "workspace",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="page_view_rollups",
+                        to="workspaces.workspace",
+                    ),
+                ),
+            ],
+            options={
+                "indexes": [
+                    models.Index(
+                        fields=["workspace", "granularity", "bucket"],
+                        name="notes_pagev_workspa_60b1b2_idx",
+                    )
+                ],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name="pageviewrollup",
+            constraint=models.UniqueConstraint(
+                fields=("page", "granularity", "bucket"),
+                name="notes_pageviewrollup_unique_bucket",
+            ),
+        ),
+        migrations.RunPython(build_rollups, migrations.RunPython.noop),
+    ]
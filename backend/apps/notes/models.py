@@ -1,4 +1,8 @@
-from django.db import models
+from django.core.exceptions import ValidationError
+from django.db import models, transaction
+from django.db.models import F, Value
+from django.db.models.functions import Concat, Substr
+from django.utils import timezone
 from django.contrib.auth import get_user_model
 from django.contrib.contenttypes.models import ContentType
 from django.contrib.contenttypes.fields import GenericForeignKey
@@ -56,23 +60,85 @@ class Page(models.Model):
     # Ordering
     position = models.FloatField(default=0)
     
+    # Ревизия блоков и ревизия, которой соответствует столбец content
+    # (см. backend.services.block_storage)
+    blocks_revision = models.PositiveIntegerField(default=0)
+    content_revision = models.PositiveIntegerField(default=0)
+    
+    # Материализованный путь: hex id предков и самой страницы через '/',
+    # поддерево -- tree_path LIKE '<путь>%' (см. backend.services.page_tree)
+    tree_path = models.CharField(max_length=2048, blank=True)
+    depth = models.PositiveSmallIntegerField(default=0)
+    
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     
     class Meta:
         ordering = ['position', '-updated_at']
+        indexes = [
+            models.Index(
+                fields=['tree_path'],
+                name='notes_page_tree_path_idx',
+                opclasses=['varchar_pattern_ops'],
+            ),
+        ]
     
     def __str__(self):
         return self.title
     
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._loaded_parent_id = instance.__dict__.get('parent_id')
+        return instance
+    
+    def save(self, *args, **kwargs):
+        """Сохранение с пересчетом пути страницы и ее поддерева при смене родителя"""
+        parent_changed = (
+            'parent_id' in self.__dict__
+            and self.parent_id != getattr(self, '_loaded_parent_id', None)
+        )
+        if not parent_changed and (self.tree_path or 'tree_path' not in self.__dict__):
+            return super().save(*args, **kwargs)
+        
+        old_path, old_depth = self.tree_path, self.depth
+        with transaction.atomic():
+            parent_path = ''
+            if self.parent_id:
+                parent_path = Page.objects.filter(pk=self.parent_id).values_list(
+                    'tree_path', flat=True
+                ).first() or ''
+            if old_path and parent_path.startswith(old_path):
+                raise ValidationError('Страницу нельзя переместить внутрь ее поддерева')
+            
+            self.tree_path = f'{parent_path}{self.id.hex}/'
+            self.depth = self.tree_path.count('/') - 1
+            if kwargs.get('update_fields') is not None:
+                kwargs['update_fields'] = {*kwargs['update_fields'], 'tree_path', 'depth'}
+            super().save(*args, **kwargs)
+            
+            if old_path and old_path != self.tree_path:
+                # Поддерево переносится одним UPDATE
+                Page.objects.filter(tree_path__startswith=old_path).exclude(pk=self.pk).update(
+                    tree_path=Concat(Value(self.tree_path), Substr('tree_path', len(old_path) + 1)),
+                    depth=F('depth') + (self.depth - old_depth),
+                )
+        self._loaded_parent_id = self.parent_id
+    
+    def ancestor_ids(self):
+        """Id предков от корня, без запросов к базе"""
+        return [uuid.UUID(segment) for segment in self.tree_path.split('/')[:-2]]
+    
     def get_path(self):
         """Get full path from root to this page"""
-        path = []
-        current = self
-        while current:
-            path.insert(0, current.title)
-            current = current.parent
-        return ' / '.join(path)
+        titles = getattr(self, '_path_titles', None)
+        if titles is None:
+            ancestor_ids = self.ancestor_ids()
+            found = dict(
+                Page.objects.filter(id__in=ancestor_ids).values_list('id', 'title')
+            ) if ancestor_ids else {}
+            titles = [found[page_id] for page_id in ancestor_ids if page_id in found]
+        return ' / '.join([*titles, self.title])
 
 
 class Block(models.Model):
@@ -127,11 +193,16 @@ class PageVersion(models.Model):
     page = models.ForeignKey(Page, on_delete=models.CASCADE, related_name='versions')
     version_number = models.PositiveIntegerField()
     title = models.CharField(max_length=200)
-    content = models.JSONField()
+    # Снимок хранит content и content_text целиком, дельта -- только delta
+    # относительно предыдущей версии (см. backend.services.page_history)
+    content = models.JSONField(null=True, blank=True)
     content_text = models.TextField(blank=True)
+    delta = models.JSONField(null=True, blank=True)
+    chain_position = models.PositiveSmallIntegerField(default=0)  # Дельт после снимка
     
     created_by = models.ForeignKey(User, on_delete=models.CASCADE)
     created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(default=timezone.now)
     
     class Meta:
         unique_together = ['page', 'version_number']
@@ -139,6 +210,10 @@ class PageVersion(models.Model):
     
     def __str__(self):
         return f"{self.page.title} v{self.version_number}"
+    
+    @property
+    def is_snapshot(self):
+        return self.delta is None
 
 
 class Comment(models.Model):
@@ -178,9 +253,39 @@ class PageView(models.Model):
     user = models.ForeignKey(User, on_delete=models.CASCADE, null=True, blank=True)
     ip_address = models.GenericIPAddressField(null=True, blank=True)
     user_agent = models.TextField(blank=True)
-    viewed_at = models.DateTimeField(auto_now_add=True)
+    # Время просмотра, а не записи: просмотры пишутся пакетами с задержкой
+    viewed_at = models.DateTimeField(default=timezone.now)
     
     class Meta:
         indexes = [
             models.Index(fields=['page', 'viewed_at']),
         ]
+
+
+class PageViewRollup(models.Model):
+    """Количество просмотров страницы за час или день (см. backend.services.page_views)"""
+    GRANULARITY_CHOICES = [
+        ('hour', 'Hour'),
+        ('day', 'Day'),
+    ]
+    
+    page = models.ForeignKey(Page, on_delete=models.CASCADE, related_name='view_rollups')
+    workspace = models.ForeignKey(
+        'workspaces.Workspace',
+        on_delete=models.CASCADE,
+        related_name='page_view_rollups'
+    )
+    granularity = models.CharField(max_length=4, choices=GRANULARITY_CHOICES)
+    bucket = models.DateTimeField()  # Начало часа или дня (UTC)
+    views = models.PositiveIntegerField(default=0)
+    
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['page', 'granularity', 'bucket'],
+                name='notes_pageviewrollup_unique_bucket',
+            ),
+        ]
+        indexes = [
+            models.Index(fields=['workspace', 'granularity', 'bucket']),
+        ]
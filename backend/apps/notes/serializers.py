@@ -1,5 +1,6 @@
 from rest_framework import serializers
 from django.contrib.auth import get_user_model
+from backend.services.block_storage import BlockStorage
 from .models import Tag, Page, Block, PageVersion, Comment, PageView
 
 User = get_user_model()
@@ -44,6 +45,9 @@ class PageListSerializer(serializers.ModelSerializer):
         ]
     
     def get_children_count(self, obj):
+        # Списки и дерево аннотируют количество одним запросом (PageTree)
+        if hasattr(obj, 'children_count'):
+            return obj.children_count
         return obj.children.filter(is_deleted=False).count()
 
 
@@ -73,25 +77,20 @@ class PageDetailSerializer(serializers.ModelSerializer):
         ]
         read_only_fields = ['id', 'author', 'created_at', 'updated_at']
     
+    def validate_parent(self, parent):
+        if parent and self.instance and parent.tree_path.startswith(self.instance.tree_path):
+            raise serializers.ValidationError('Страницу нельзя переместить внутрь ее поддерева')
+        return parent
+    
     def update(self, instance, validated_data):
         instance.last_edited_by = self.context['request'].user
-        
-        # Extract content text for search
-        if 'content' in validated_data:
-            content_text = self.extract_text_from_content(validated_data['content'])
-            validated_data['content_text'] = content_text
-        
         return super().update(instance, validated_data)
     
-    def extract_text_from_content(self, content):
-        """Extract plain text from rich content for search indexing"""
-        # Simple implementation - can be improved
-        if isinstance(content, dict):
-            text = content.get('text', '')
-            for block in content.get('blocks', []):
-                text += ' ' + block.get('text', '')
-            return text
-        return str(content)
+    def to_representation(self, instance):
+        data = super().to_representation(instance)
+        # Содержимое блочных страниц собирается из блоков
+        data['content'] = BlockStorage.materialize(instance)
+        return data
 
 
 class PageCreateSerializer(serializers.ModelSerializer):
@@ -113,21 +112,7 @@ class PageCreateSerializer(serializers.ModelSerializer):
         request = self.context['request']
         validated_data['author'] = request.user
         validated_data['last_edited_by'] = request.user
-        
-        # Extract content text
-        if 'content' in validated_data:
-            content_text = self.extract_text_from_content(validated_data['content'])
-            validated_data['content_text'] = content_text
-        
         return super().create(validated_data)
-    
-    def extract_text_from_content(self, content):
-        if isinstance(content, dict):
-            text = content.get('text', '')
-            for block in content.get('blocks', []):
-                text += ' ' + block.get('text', '')
-            return text
-        return str(content)
 
 
 class CommentSerializer(serializers.ModelSerializer):
@@ -173,5 +158,17 @@ class PageVersionSerializer(serializers.ModelSerializer):
         model = PageVersion
         fields = [
             'id', 'version_number', 'title', 'content', 'content_text',
-            'created_by', 'created_by_name', 'created_at'
+            'created_by', 'created_by_name', 'created_at', 'updated_at'
+        ]
+
+
+class PageVersionListSerializer(serializers.ModelSerializer):
+    """Версия без содержимого: дельты восстанавливаются только по запросу"""
+    created_by_name = serializers.CharField(source='created_by.full_name', read_only=True)
+    
+    class Meta:
+        model = PageVersion
+        fields = [
+            'id', 'version_number', 'title',
+            'created_by', 'created_by_name', 'created_at', 'updated_at'
         ]
@@ -0,0 +1,42 @@
+"""
+Отправка наступивших напоминаний и уведомлений о сроках задач
+"""
+import time
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from backend.services.reminders import DueSchedule, ReminderDispatcher
+
+
+class Command(BaseCommand):
+    help = 'Создает Notification для наступивших Reminder и задач с подходящим сроком'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--loop', action='store_true',
+            help='Работать постоянно, просыпаясь к ближайшему срабатыванию (иначе однократный проход, например из cron)'
+        )
+        parser.add_argument(
+            '--horizon', type=int, default=60,
+            help='Окно в секундах, на которое читаются ближайшие срабатывания'
+        )
+        parser.add_argument('--batch-size', type=int, default=500, help='Записей в одной пачке')
+
+    def handle(self, *args, **options):
+        if not options['loop']:
+            self._report(ReminderDispatcher.dispatch(batch_size=options['batch_size']), options)
+            return
+
+        schedule = DueSchedule(horizon=timedelta(seconds=options['horizon']))
+        while True:
+            self._report(schedule.run_due(timezone.now(), options['batch_size']), options)
+            now = timezone.now()
+            time.sleep(max((schedule.next_wakeup(now) - now).total_seconds(), 0.1))
+
+    def _report(self, sent, options):
+        if any(sent.values()) or options['verbosity'] > 1:
+            self.stdout.write(
+                f'Отправлено напоминаний: {sent["reminders"]}, уведомлений о сроках: {sent["tasks"]}'
+            )
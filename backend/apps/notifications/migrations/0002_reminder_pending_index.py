@@ -0,0 +1,20 @@
+# Generated by Django 4.2.7 on 2026-10-19 00:34
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("notifications", "0001_initial"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="reminder",
+            index=models.Index(
+                condition=models.Q(("is_sent", False)),
+                fields=["remind_at"],
+                name="notif_reminder_pending_idx",
+            ),
+        ),
+    ]
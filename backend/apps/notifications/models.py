@@ -114,6 +114,14 @@ class Reminder(models.Model):
     
     class Meta:
         ordering = ['remind_at']
+        indexes = [
+            # Очередь неотправленных напоминаний (см. backend.services.reminders)
+            models.Index(
+                fields=['remind_at'],
+                name='notif_reminder_pending_idx',
+                condition=models.Q(is_sent=False),
+            ),
+        ]
     
     def __str__(self):
         return f"Reminder for {self.user.email}: {self.title}"
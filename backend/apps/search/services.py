@@ -103,7 +103,7 @@ class SearchService:
             q_objects = Q()
             words = query.split()
             for word in words:
-                q_objects |= Q(title__icontains=word) | Q(content__icontains=word)
+                q_objects |= Q(title__icontains=word) | Q(content_text__icontains=word)
             queryset = queryset.filter(q_objects)
         
         # Применение фильтров
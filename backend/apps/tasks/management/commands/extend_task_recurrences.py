@@ -0,0 +1,19 @@
+"""
+Продление окна материализованных повторений задач
+"""
+from django.core.management.base import BaseCommand
+
+from backend.services.task_recurrence import DEFAULT_BATCH_SIZE, TaskRecurrenceService
+
+
+class Command(BaseCommand):
+    help = 'Дописывает повторения задач в TaskOccurrence на TASK_RECURRENCE_WINDOW_DAYS вперед'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=DEFAULT_BATCH_SIZE)
+
+    def handle(self, *args, **options):
+        result = TaskRecurrenceService.extend_due(batch_size=options['batch_size'])
+        self.stdout.write(
+            f"Продлено правил: {result['recurrences']}, новых повторений: {result['occurrences']}"
+        )
@@ -0,0 +1,18 @@
+"""
+Сверка счетчиков задач досок
+"""
+from django.core.management.base import BaseCommand
+
+from backend.services.task_board_summary import TaskBoardSummary
+
+
+class Command(BaseCommand):
+    help = 'Сверяет TaskBoardCounter с задачами и исправляет расхождения'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--board', action='append', dest='boards', help='Только указанные доски (можно повторять)')
+
+    def handle(self, *args, **options):
+        fixed = TaskBoardSummary.reconcile(options['boards'])
+        pruned = TaskBoardSummary.prune(options['boards'])
+        self.stdout.write(f'Исправлено счетчиков: {fixed}, удалено нулевых: {pruned}')
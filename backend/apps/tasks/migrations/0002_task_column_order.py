@@ -0,0 +1,19 @@
+# Generated by Django 4.2.7 on 2026-10-19 00:23
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("tasks", "0001_initial"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="task",
+            index=models.Index(
+                fields=["column", "position", "-created_at", "id"],
+                name="tasks_task_column_order_idx",
+            ),
+        ),
+    ]
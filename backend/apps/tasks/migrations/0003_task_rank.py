@@ -0,0 +1,49 @@
+# Generated by Django 4.2.7 on 2026-10-19 00:26
+
+from django.db import migrations, models
+
+
+def assign_ranks(apps, schema_editor):
+    """Ключи порядка по прежней сортировке (position, -created_at) в каждой колонке"""
+    from backend.core.fractional_index import spread_keys
+
+    Task = apps.get_model("tasks", "Task")
+    column_ids = Task.objects.values_list("column_id", flat=True).distinct().order_by()
+    for column_id in column_ids.iterator():
+        tasks = list(
+            Task.objects.filter(column_id=column_id)
+            .order_by("position", "-created_at", "id")
+            .only("id")
+        )
+        for task, rank in zip(tasks, spread_keys(len(tasks))):
+            task.rank = rank
+        Task.objects.bulk_update(tasks, ["rank"], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("tasks", "0002_task_column_order"),
+    ]
+
+    operations = [
+        migrations.AlterModelOptions(
+            name="task",
+            options={"ordering": ["rank", "id"]},
+        ),
+        migrations.RemoveIndex(
+            model_name="task",
+            name="tasks_task_column_order_idx",
+        ),
+        migrations.AddField(
+            model_name="task",
+            name="rank",
+            field=models.CharField(blank=True, default="", max_length=64),
+        ),
+        migrations.AddIndex(
+            model_name="task",
+            index=models.Index(
+                fields=["column", "rank", "id"], name="tasks_task_column_rank_idx"
+            ),
+        ),
+        migrations.RunPython(assign_ranks, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,31 @@
+# Generated by Django 4.2.7 on 2026-10-19 00:31
+
+from django.db import migrations, models
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("tasks", "0003_task_rank"),
+    ]
+
+    operations = [
+        migrations.AlterModelOptions(
+            name="taskactivity",
+            options={
+                "ordering": ["-created_at", "-id"],
+                "verbose_name_plural": "Task activities",
+            },
+        ),
+        migrations.AlterField(
+            model_name="taskactivity",
+            name="created_at",
+            field=models.DateTimeField(default=django.utils.timezone.now),
+        ),
+        migrations.AddIndex(
+            model_name="taskactivity",
+            index=models.Index(
+                fields=["task", "-created_at", "-id"], name="tasks_activity_feed_idx"
+            ),
+        ),
+    ]
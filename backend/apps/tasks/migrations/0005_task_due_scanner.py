@@ -0,0 +1,59 @@
+# Generated by Django 4.2.7 on 2026-10-19 00:34
+
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import migrations, models
+from django.utils import timezone
+
+
+def mark_past_notices_sent(apps, schema_editor):
+    """
+    Существующие задачи, момент уведомления которых уже прошел, считаются
+    уведомленными: иначе первый запуск dispatch_reminders разослал бы
+    "Срок задачи истек" по всем давно просроченным задачам.
+    """
+    Task = apps.get_model("tasks", "Task")
+    now = timezone.now()
+    lead = timedelta(minutes=settings.TASK_DUE_NOTICE_MINUTES)
+    Task.objects.filter(
+        due_date__isnull=False, due_date__lte=now + lead, due_notified_at__isnull=True
+    ).exclude(status="done").update(due_notified_at=now)
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("tasks", "0004_task_activity_feed"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="task",
+            name="due_notified_at",
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.RunPython(mark_past_notices_sent, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name="task",
+            index=models.Index(
+                condition=models.Q(
+                    ("due_date__isnull", False),
+                    models.Q(("status", "done"), _negated=True),
+                ),
+                fields=["due_date"],
+                name="tasks_task_open_due_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="task",
+            index=models.Index(
+                condition=models.Q(
+                    ("due_date__isnull", False),
+                    ("due_notified_at__isnull", True),
+                    models.Q(("status", "done"), _negated=True),
+                ),
+                fields=["due_date"],
+                name="tasks_task_due_pending_idx",
+            ),
+        ),
+    ]
@@ -0,0 +1,92 @@
+# Generated by Django 4.2.7 on 2026-10-19 00:42
+
+from datetime import timezone
+
+from django.db import migrations, models
+from django.db.models.functions import TruncDate
+import django.db.models.deletion
+
+
+def fill_counters(apps, schema_editor):
+    """Начальные счетчики досок по существующим задачам"""
+    Task = apps.get_model("tasks", "Task")
+    TaskBoardCounter = apps.get_model("tasks", "TaskBoardCounter")
+    tasks = Task.objects.order_by()
+    grouped = (
+        ("total", tasks.values("board_id")),
+        ("column", tasks.values("board_id", key=models.F("column_id"))),
+        ("status", tasks.values("board_id", key=models.F("status"))),
+        ("priority", tasks.values("board_id", key=models.F("priority"))),
+        ("assignee", Task.assignees.through.objects.order_by().values(
+            board_id=models.F("task__board_id"), key=models.F("user_id")
+        )),
+        ("due", tasks.filter(due_date__isnull=False).exclude(status="done").values(
+            "board_id", key=TruncDate("due_date", tzinfo=timezone.utc)
+        )),
+    )
+    for dimension, rows in grouped:
+        counters = []
+        for row in rows.annotate(total=models.Count("*")):
+            key = row.get("key", "")
+            counters.append(TaskBoardCounter(
+                board_id=row["board_id"],
+                dimension=dimension,
+                key=key.isoformat() if hasattr(key, "isoformat") else str(key),
+                count=row["total"],
+            ))
+        TaskBoardCounter.objects.bulk_create(counters, batch_size=1000)
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("tasks", "0005_task_due_scanner"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="TaskBoardCounter",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "dimension",
+                    models.CharField(
+                        choices=[
+                            ("total", "Total"),
+                            ("column", "Column"),
+                            ("status", "Status"),
+                            ("priority", "Priority"),
+                            ("assignee", "Assignee"),
+                            ("due", "Due date"),
+                        ],
+                        max_length=10,
+                    ),
+                ),
+                ("key", models.CharField(blank=True, max_length=64)),
+                ("count", models.IntegerField(default=0)),
+                (
+                    "board",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="counters",
+                        to="tasks.taskboard",
+                    ),
+                ),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name="taskboardcounter",
+            constraint=models.UniqueConstraint(
+                fields=("board", "dimension", "key"),
+                name="tasks_boardcounter_unique_key",
+            ),
+        ),
+        migrations.RunPython(fill_counters, migrations.RunPython.noop),
+    ]
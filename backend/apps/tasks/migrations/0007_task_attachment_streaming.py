@@ -0,0 +1,34 @@
+# Generated by Django 4.2.7 on 2026-10-19 00:48
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("tasks", "0006_task_board_counters"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="taskattachment",
+            name="content_type",
+            field=models.CharField(default="application/octet-stream", max_length=100),
+        ),
+        migrations.AddField(
+            model_name="taskattachment",
+            name="sha256",
+            field=models.CharField(blank=True, max_length=64),
+        ),
+        migrations.AddField(
+            model_name="taskattachment",
+            name="size",
+            field=models.BigIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name="taskattachment",
+            name="thumbnail",
+            field=models.FileField(
+                blank=True, upload_to="task_attachments/thumbnails/"
+            ),
+        ),
+    ]
@@ -0,0 +1,116 @@
+# Generated by Django 4.2.7 on 2026-10-19 00:55
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("tasks", "0007_task_attachment_streaming"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="TaskOccurrence",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("due_at", models.DateTimeField()),
+                ("starts_at", models.DateTimeField(blank=True, null=True)),
+            ],
+            options={
+                "ordering": ["due_at", "id"],
+            },
+        ),
+        migrations.CreateModel(
+            name="TaskRecurrence",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("rule", models.CharField(max_length=255)),
+                ("starts_at", models.DateTimeField()),
+                ("duration", models.DurationField(blank=True, null=True)),
+                ("generated_until", models.DateTimeField(blank=True, null=True)),
+                ("generated_count", models.PositiveIntegerField(default=0)),
+                ("is_finished", models.BooleanField(default=False)),
+                ("created_at", models.DateTimeField(auto_now_add=True)),
+                ("updated_at", models.DateTimeField(auto_now=True)),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name="task",
+            index=models.Index(
+                fields=["board", "due_date"], name="tasks_task_board_due_idx"
+            ),
+        ),
+        migrations.AddField(
+            model_name="taskrecurrence",
+            name="task",
+            field=models.OneToOneField(
+                on_delete=django.db.models.deletion.CASCADE,
+                related_name="recurrence",
+                to="tasks.task",
+            ),
+        ),
+        migrations.AddField(
+            model_name="taskoccurrence",
+            name="board",
+            field=models.ForeignKey(
+                on_delete=django.db.models.deletion.CASCADE,
+                related_name="task_occurrences",
+                to="tasks.taskboard",
+            ),
+        ),
+        migrations.AddField(
+            model_name="taskoccurrence",
+            name="recurrence",
+            field=models.ForeignKey(
+                on_delete=django.db.models.deletion.CASCADE,
+                related_name="occurrences",
+                to="tasks.taskrecurrence",
+            ),
+        ),
+        migrations.AddField(
+            model_name="taskoccurrence",
+            name="task",
+            field=models.ForeignKey(
+                on_delete=django.db.models.deletion.CASCADE,
+                related_name="occurrences",
+                to="tasks.task",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="taskrecurrence",
+            index=models.Index(
+                condition=models.Q(("is_finished", False)),
+                fields=["generated_until"],
+                name="tasks_recurrence_extend_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="taskoccurrence",
+            index=models.Index(
+                fields=["board", "due_at"], name="tasks_occurrence_board_idx"
+            ),
+        ),
+        migrations.AddConstraint(
+            model_name="taskoccurrence",
+            constraint=models.UniqueConstraint(
+                fields=("recurrence", "due_at"), name="tasks_occurrence_unique_due"
+            ),
+        ),
+    ]
@@ -0,0 +1,88 @@
+# Generated by Django 4.2.7 on 2026-10-19 01:02
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ("tasks", "0008_task_recurrence"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="taskboard",
+            name="schedule_revision",
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.CreateModel(
+            name="TaskDependency",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("created_at", models.DateTimeField(auto_now_add=True)),
+                (
+                    "blocked",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="blocked_by_links",
+                        to="tasks.task",
+                    ),
+                ),
+                (
+                    "blocker",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="blocking_links",
+                        to="tasks.task",
+                    ),
+                ),
+                (
+                    "board",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="dependencies",
+                        to="tasks.taskboard",
+                    ),
+                ),
+                (
+                    "created_by",
+                    models.ForeignKey(
+                        blank=True,
+                        null=True,
+                        on_delete=django.db.models.deletion.SET_NULL,
+                        to=settings.AUTH_USER_MODEL,
+                    ),
+                ),
+            ],
+            options={
+                "indexes": [
+                    models.Index(
+                        fields=["blocked"], name="tasks_dependency_blocked_idx"
+                    )
+                ],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name="taskdependency",
+            constraint=models.UniqueConstraint(
+                fields=("blocker", "blocked"), name="tasks_dependency_unique_link"
+            ),
+        ),
+        migrations.AddConstraint(
+            model_name="taskdependency",
+            constraint=models.CheckConstraint(
+                check=models.Q(("blocker", models.F("blocked")), _negated=True),
+                name="tasks_dependency_not_self",
+            ),
+        ),
+    ]
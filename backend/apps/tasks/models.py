@@ -1,7 +1,10 @@
 from django.db import models
 from django.contrib.auth import get_user_model
+from django.utils import timezone
 import uuid
 
+from backend.core.fractional_index import key_between
+
 User = get_user_model()
 
 
@@ -18,6 +21,9 @@ class TaskBoard(models.Model):
     )
     
     created_by = models.ForeignKey(User, on_delete=models.CASCADE, related_name='created_boards')
+    # Растет при изменении зависимостей или сроков связанных задач; ключ
+    # кэша графика доски (см. backend.services.task_dependencies)
+    schedule_revision = models.PositiveIntegerField(default=0)
     
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
@@ -67,6 +73,8 @@ class Task(models.Model):
     board = models.ForeignKey(TaskBoard, on_delete=models.CASCADE, related_name='tasks')
     column = models.ForeignKey(TaskColumn, on_delete=models.CASCADE, related_name='tasks')
     position = models.FloatField(default=0)
+    # Ключ порядка в колонке (см. backend.services.task_ordering)
+    rank = models.CharField(max_length=64, default='', blank=True)
     
     # Task properties
     priority = models.CharField(max_length=10, choices=PRIORITY_CHOICES, default='medium')
@@ -80,6 +88,8 @@ class Task(models.Model):
     due_date = models.DateTimeField(null=True, blank=True)
     start_date = models.DateTimeField(null=True, blank=True)
     completed_at = models.DateTimeField(null=True, blank=True)
+    # Когда отправлено уведомление о сроке (см. backend.services.reminders)
+    due_notified_at = models.DateTimeField(null=True, blank=True)
     
     # Metadata
     tags = models.ManyToManyField('notes.Tag', blank=True, related_name='tasks')
@@ -89,19 +99,153 @@ class Task(models.Model):
     updated_at = models.DateTimeField(auto_now=True)
     
     class Meta:
-        ordering = ['position', '-created_at']
+        ordering = ['rank', 'id']
+        indexes = [
+            # Порядок задач в колонке (см. backend.services.task_ordering)
+            models.Index(fields=['column', 'rank', 'id'], name='tasks_task_column_rank_idx'),
+            # Календарь доски (см. backend.services.task_recurrence)
+            models.Index(fields=['board', 'due_date'], name='tasks_task_board_due_idx'),
+            # Просроченные задачи: только незавершенные
+            models.Index(
+                fields=['due_date'],
+                name='tasks_task_open_due_idx',
+                condition=models.Q(due_date__isnull=False) & ~models.Q(status='done'),
+            ),
+            # Очередь уведомлений о сроке: уведомленные задачи из индекса выпадают
+            models.Index(
+                fields=['due_date'],
+                name='tasks_task_due_pending_idx',
+                condition=models.Q(due_date__isnull=False, due_notified_at__isnull=True) & ~models.Q(status='done'),
+            ),
+        ]
     
     def __str__(self):
         return self.title
     
+    def save(self, *args, **kwargs):
+        """Новая задача без ключа порядка встает в конец колонки"""
+        if not self.rank and self.column_id:
+            last = Task.objects.filter(column_id=self.column_id).exclude(rank='').order_by(
+                '-rank'
+            ).values_list('rank', flat=True).first()
+            self.rank = key_between(last, None)
+            if kwargs.get('update_fields') is not None:
+                kwargs['update_fields'] = {*kwargs['update_fields'], 'rank'}
+        super().save(*args, **kwargs)
+    
     @property
     def is_overdue(self):
         if not self.due_date or self.status == 'done':
             return False
-        from django.utils import timezone
         return self.due_date < timezone.now()
 
 
+class TaskBoardCounter(models.Model):
+    """Счетчик задач доски по измерению (см. backend.services.task_board_summary)"""
+    DIMENSION_CHOICES = [
+        ('total', 'Total'),
+        ('column', 'Column'),
+        ('status', 'Status'),
+        ('priority', 'Priority'),
+        ('assignee', 'Assignee'),
+        ('due', 'Due date'),
+    ]
+    
+    board = models.ForeignKey(TaskBoard, on_delete=models.CASCADE, related_name='counters')
+    dimension = models.CharField(max_length=10, choices=DIMENSION_CHOICES)
+    key = models.CharField(max_length=64, blank=True)  # id колонки/пользователя, статус, дата срока
+    count = models.IntegerField(default=0)
+    
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['board', 'dimension', 'key'],
+                name='tasks_boardcounter_unique_key',
+            ),
+        ]
+    
+    def __str__(self):
+        return f"{self.board_id} {self.dimension}:{self.key} = {self.count}"
+
+
+class TaskDependency(models.Model):
+    """Связь "blocker блокирует blocked" (см. backend.services.task_dependencies)"""
+    blocker = models.ForeignKey(Task, on_delete=models.CASCADE, related_name='blocking_links')
+    blocked = models.ForeignKey(Task, on_delete=models.CASCADE, related_name='blocked_by_links')
+    board = models.ForeignKey(TaskBoard, on_delete=models.CASCADE, related_name='dependencies')
+    created_by = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['blocker', 'blocked'], name='tasks_dependency_unique_link'),
+            models.CheckConstraint(
+                check=~models.Q(blocker=models.F('blocked')),
+                name='tasks_dependency_not_self',
+            ),
+        ]
+        indexes = [
+            models.Index(fields=['blocked'], name='tasks_dependency_blocked_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.blocker_id} -> {self.blocked_id}"
+
+
+class TaskRecurrence(models.Model):
+    """Правило повторения задачи (см. backend.services.task_recurrence)"""
+    task = models.OneToOneField(Task, on_delete=models.CASCADE, related_name='recurrence')
+    rule = models.CharField(max_length=255)  # RRULE, например FREQ=WEEKLY;BYDAY=MO,WE
+    # Срок первого повторения (DTSTART) и длительность (срок минус начало)
+    starts_at = models.DateTimeField()
+    duration = models.DurationField(null=True, blank=True)
+
+    # Повторения материализованы в TaskOccurrence до generated_until
+    generated_until = models.DateTimeField(null=True, blank=True)
+    generated_count = models.PositiveIntegerField(default=0)
+    is_finished = models.BooleanField(default=False)
+
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [
+            # Очередь продления окна: завершенные правила из индекса выпадают
+            models.Index(
+                fields=['generated_until'],
+                name='tasks_recurrence_extend_idx',
+                condition=models.Q(is_finished=False),
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.task_id}: {self.rule}"
+
+
+class TaskOccurrence(models.Model):
+    """Материализованное повторение задачи для календаря и таймлайна"""
+    recurrence = models.ForeignKey(TaskRecurrence, on_delete=models.CASCADE, related_name='occurrences')
+    task = models.ForeignKey(Task, on_delete=models.CASCADE, related_name='occurrences')
+    board = models.ForeignKey(TaskBoard, on_delete=models.CASCADE, related_name='task_occurrences')
+    due_at = models.DateTimeField()
+    starts_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ['due_at', 'id']
+        constraints = [
+            models.UniqueConstraint(
+                fields=['recurrence', 'due_at'],
+                name='tasks_occurrence_unique_due',
+            ),
+        ]
+        indexes = [
+            models.Index(fields=['board', 'due_at'], name='tasks_occurrence_board_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.task_id} @ {self.due_at}"
+
+
 class TaskComment(models.Model):
     task = models.ForeignKey(Task, on_delete=models.CASCADE, related_name='comments')
     author = models.ForeignKey(User, on_delete=models.CASCADE)
@@ -121,6 +265,11 @@ class TaskAttachment(models.Model):
     task = models.ForeignKey(Task, on_delete=models.CASCADE, related_name='attachments')
     file = models.FileField(upload_to='task_attachments/')
     original_name = models.CharField(max_length=255)
+    # Заполняются при потоковой загрузке (см. backend.services.task_attachments)
+    size = models.BigIntegerField(default=0)
+    content_type = models.CharField(max_length=100, default='application/octet-stream')
+    sha256 = models.CharField(max_length=64, blank=True)
+    thumbnail = models.FileField(upload_to='task_attachments/thumbnails/', blank=True)
     uploaded_by = models.ForeignKey(User, on_delete=models.CASCADE)
     uploaded_at = models.DateTimeField(auto_now_add=True)
     
@@ -147,11 +296,16 @@ class TaskActivity(models.Model):
     description = models.TextField()
     metadata = models.JSONField(default=dict)  # Additional context
     
-    created_at = models.DateTimeField(auto_now_add=True)
+    # Время события, а не записи строки (см. backend.services.task_activity)
+    created_at = models.DateTimeField(default=timezone.now)
     
     class Meta:
-        ordering = ['-created_at']
+        ordering = ['-created_at', '-id']
         verbose_name_plural = 'Task activities'
+        indexes = [
+            # Лента задачи с курсором (created_at, id)
+            models.Index(fields=['task', '-created_at', '-id'], name='tasks_activity_feed_idx'),
+        ]
     
     def __str__(self):
         return f"{self.user.email} {self.activity_type} {self.task.title}"
@@ -3,7 +3,7 @@
 """
 from rest_framework import serializers
 from django.contrib.auth import get_user_model
-from .models import TaskBoard, Task, TaskComment
+from .models import TaskBoard, Task, TaskActivity, TaskAttachment, TaskComment, TaskRecurrence
 from backend.apps.notes.models import Tag
 from backend.apps.workspaces.models import Workspace
 from backend.apps.tasks.models import TaskColumn
@@ -27,6 +27,10 @@ class TaskBoardSerializer(serializers.ModelSerializer):
         read_only_fields = ['id', 'created_by', 'created_at', 'updated_at']
     
     def get_tasks_count(self, obj):
+        # Аннотация из TaskBoardSummary.annotate_tasks_count, если есть
+        count = getattr(obj, 'tasks_count', None)
+        if count is not None:
+            return count
         return obj.tasks.count()
 
 
@@ -58,15 +62,19 @@ class TaskSerializer(serializers.ModelSerializer):
         model = Task
         fields = [
             'id', 'title', 'description', 'board', 'board_title', 
-            'column', 'column_title', 'position', 'priority', 'status', 
+            'column', 'column_title', 'position', 'rank', 'priority', 'status', 
             'created_by', 'created_by_name',
             'due_date', 'start_date', 'completed_at', 'estimated_hours',
             'tags', 'tag_ids', 'comments_count',
             'created_at', 'updated_at'
         ]
-        read_only_fields = ['id', 'created_by', 'completed_at', 'created_at', 'updated_at', 'position', 'board', 'column']
+        read_only_fields = ['id', 'created_by', 'completed_at', 'created_at', 'updated_at', 'position', 'rank', 'board', 'column']
     
     def get_comments_count(self, obj):
+        # Аннотация из TaskService.with_comments_count, если есть
+        count = getattr(obj, 'comments_count', None)
+        if count is not None:
+            return count
         return obj.comments.count()
 
 
@@ -85,3 +93,40 @@ class TaskCommentSerializer(serializers.ModelSerializer):
     def create(self, validated_data):
         validated_data['author'] = self.context['request'].user
         return super().create(validated_data)
+
+
+class TaskActivitySerializer(serializers.ModelSerializer):
+    """Сериалайзер для событий активности задачи"""
+    user_name = serializers.CharField(source='user.full_name', read_only=True)
+    
+    class Meta:
+        model = TaskActivity
+        fields = ['id', 'activity_type', 'description', 'metadata', 'user', 'user_name', 'created_at']
+        read_only_fields = fields
+
+
+class TaskRecurrenceSerializer(serializers.ModelSerializer):
+    """Сериалайзер для правила повторения задачи"""
+    starts_at = serializers.DateTimeField(required=False)
+    
+    class Meta:
+        model = TaskRecurrence
+        fields = ['rule', 'starts_at', 'duration', 'generated_until', 'is_finished']
+        read_only_fields = ['duration', 'generated_until', 'is_finished']
+
+
+class TaskAttachmentSerializer(serializers.ModelSerializer):
+    """Сериалайзер для вложений задачи"""
+    uploaded_by_name = serializers.CharField(source='uploaded_by.full_name', read_only=True)
+    has_thumbnail = serializers.SerializerMethodField()
+    
+    class Meta:
+        model = TaskAttachment
+        fields = [
+            'id', 'original_name', 'size', 'content_type', 'sha256', 'has_thumbnail',
+            'uploaded_by', 'uploaded_by_name', 'uploaded_at'
+        ]
+        read_only_fields = fields
+    
+    def get_has_thumbnail(self, obj):
+        return bool(obj.thumbnail)
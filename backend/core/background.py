@@ -0,0 +1,87 @@
+"""
+Фоновая очередь задач процесса
+
+Задачи выполняются в отдельном потоке-воркере вне пути запроса. Задачи с
+одинаковым ключом объединяются: пока задача ждет в очереди, новая
+постановка лишь заменяет ее аргументы (для переиндексации страницы важно
+только последнее состояние).
+
+При BACKGROUND_TASKS_SYNC задачи выполняются сразу в вызывающем потоке
+(тесты, management-команды).
+
+Почему очередь процесса, а не брокер: в проекте нет Celery и отдельных
+воркеров, а отложенная работа (переиндексация текста, журнал активности,
+счетчики просмотров, миниатюры вложений) лишь выносится из пути запроса.
+Задачи не переживают остановку процесса, поэтому через очередь идет
+только то, что можно пересчитать (reindex_page_text, rebuild счетчиков)
+или допустимо потерять; буферы на ее основе не возвращают в очередь
+строки, которые база отвергла (IntegrityError), -- повтор их не запишет.
+"""
+import logging
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Hashable, Optional
+
+from django.conf import settings
+from django.db import close_old_connections, transaction
+
+logger = logging.getLogger(__name__)
+
+
+class BackgroundQueue:
+    """Очередь задач с одним потоком-воркером"""
+
+    def __init__(self, name: str = 'background'):
+        self.name = name
+        self._pending: 'OrderedDict[Hashable, tuple]' = OrderedDict()
+        self._condition = threading.Condition()
+        self._thread: Optional[threading.Thread] = None
+        self._running = 0
+
+    def enqueue(self, func: Callable, *args: Any, key: Optional[Hashable] = None, **kwargs: Any) -> None:
+        """Постановка задачи; задача с тем же ключом, ожидающая в очереди, заменяется"""
+        if getattr(settings, 'BACKGROUND_TASKS_SYNC', False):
+            self._execute(func, args, kwargs)
+            return
+
+        with self._condition:
+            self._pending[key if key is not None else object()] = (func, args, kwargs)
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._work, name=self.name, daemon=True)
+                self._thread.start()
+            self._condition.notify()
+
+    def enqueue_on_commit(self, func: Callable, *args: Any, key: Optional[Hashable] = None, **kwargs: Any) -> None:
+        """Постановка после фиксации текущей транзакции"""
+        transaction.on_commit(lambda: self.enqueue(func, *args, key=key, **kwargs))
+
+    def drain(self, timeout: Optional[float] = None) -> bool:
+        """Ожидание опустошения очереди; False, если не дождались"""
+        with self._condition:
+            return self._condition.wait_for(
+                lambda: not self._pending and not self._running, timeout=timeout
+            )
+
+    def _work(self):
+        while True:
+            with self._condition:
+                self._condition.wait_for(lambda: self._pending)
+                _, (func, args, kwargs) = self._pending.popitem(last=False)
+                self._running += 1
+            try:
+                self._execute(func, args, kwargs)
+                close_old_connections()
+            finally:
+                with self._condition:
+                    self._running -= 1
+                    self._condition.notify_all()
+
+    @staticmethod
+    def _execute(func: Callable, args: tuple, kwargs: dict) -> None:
+        try:
+            func(*args, **kwargs)
+        except Exception:
+            logger.exception('Фоновая задача %s завершилась ошибкой', getattr(func, '__qualname__', func))
+
+
+background = BackgroundQueue()
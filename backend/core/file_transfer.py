@@ -0,0 +1,148 @@
+"""
+Потоковая загрузка и отдача файлов
+
+ChecksumUploadHandler пишет загружаемый файл во временный файл на диске
+по частям и по ходу считает sha256 и размер: файл не держится в памяти
+и не перечитывается после загрузки.
+
+file_response отдает файл хранилища либо через X-Accel-Redirect (nginx
+читает файл сам, воркер приложения освобождается сразу), либо потоком
+FileResponse с поддержкой одного диапазона Range (206/416), ETag и
+If-Range.
+"""
+import hashlib
+import re
+from typing import Iterator, Optional, Tuple
+from urllib.parse import quote
+
+from django.conf import settings
+from django.core.files.uploadhandler import StopUpload, TemporaryFileUploadHandler
+from django.http import (
+    FileResponse, HttpResponse, HttpResponseNotModified, StreamingHttpResponse
+)
+from django.utils.http import content_disposition_header
+
+CHUNK_SIZE = 64 * 1024
+
+RANGE_PATTERN = re.compile(r'^bytes=(\d*)-(\d*)$')
+
+
+class ChecksumUploadHandler(TemporaryFileUploadHandler):
+    """Загрузка во временный файл с подсчетом sha256; max_size -- предел размера файла"""
+
+    def __init__(self, request=None, max_size: Optional[int] = None):
+        super().__init__(request)
+        self.max_size = max_size
+        self.sha256 = None
+        self.exceeded = False
+
+    def new_file(self, *args, **kwargs):
+        super().new_file(*args, **kwargs)
+        self.sha256 = hashlib.sha256()
+
+    def receive_data_chunk(self, raw_data, start):
+        if self.max_size is not None and start + len(raw_data) > self.max_size:
+            self.exceeded = True
+            self.file.close()
+            raise StopUpload()
+        self.sha256.update(raw_data)
+        return super().receive_data_chunk(raw_data, start)
+
+    def file_complete(self, file_size):
+        uploaded = super().file_complete(file_size)
+        uploaded.sha256 = self.sha256.hexdigest()
+        return uploaded
+
+
+def parse_range(header: Optional[str], size: int) -> Optional[Tuple[int, int]]:
+    """
+    Диапазон из заголовка Range: (начало, конец включительно).
+
+    Returns:
+        None -- заголовка нет или он не поддерживается (отдается весь файл)
+
+    Raises:
+        ValueError: диапазон за пределами файла (416)
+    """
+    match = RANGE_PATTERN.match(header or '')
+    if not match or match.groups() == ('', ''):
+        return None
+    first, last = match.groups()
+    if first == '':
+        # Суффикс: последние N байт
+        length = int(last)
+        if length == 0:
+            raise ValueError(header)
+        return max(size - length, 0), size - 1
+    start = int(first)
+    end = min(int(last), size - 1) if last else size - 1
+    if start >= size or start > end:
+        raise ValueError(header)
+    return start, end
+
+
+def _read_range(handle, start: int, end: int) -> Iterator[bytes]:
+    try:
+        handle.seek(start)
+        remaining = end - start + 1
+        while remaining > 0:
+            chunk = handle.read(min(CHUNK_SIZE, remaining))
+            if not chunk:
+                break
+            remaining -= len(chunk)
+            yield chunk
+    finally:
+        handle.close()
+
+
+def file_response(
+    request,
+    field_file,
+    filename: str,
+    content_type: str = 'application/octet-stream',
+    etag: Optional[str] = None,
+    as_attachment: bool = True
+) -> HttpResponse:
+    """Ответ с файлом хранилища: X-Accel-Redirect при FILE_ACCEL_REDIRECT_PREFIX, иначе поток"""
+    quoted_etag = f'"{etag}"' if etag else None
+    if quoted_etag and request.headers.get('If-None-Match') == quoted_etag:
+        return HttpResponseNotModified()
+
+    prefix = settings.FILE_ACCEL_REDIRECT_PREFIX
+    if prefix:
+        # Range, If-Range и Content-Length обрабатывает nginx
+        response = HttpResponse(content_type=content_type)
+        response['X-Accel-Redirect'] = prefix.rstrip('/') + '/' + quote(field_file.name)
+        response['Content-Disposition'] = content_disposition_header(as_attachment, filename)
+    else:
+        size = field_file.size
+        range_header = request.headers.get('Range')
+        if_range = request.headers.get('If-Range')
+        if if_range and if_range != quoted_etag:
+            # Файл изменился с момента первой части -- отдается целиком
+            range_header = None
+        try:
+            byte_range = parse_range(range_header, size)
+        except ValueError:
+            response = HttpResponse(status=416)
+            response['Content-Range'] = f'bytes */{size}'
+            return response
+
+        handle = field_file.storage.open(field_file.name, 'rb')
+        if byte_range is None:
+            response = FileResponse(
+                handle, as_attachment=as_attachment, filename=filename, content_type=content_type
+            )
+        else:
+            start, end = byte_range
+            response = StreamingHttpResponse(
+                _read_range(handle, start, end), status=206, content_type=content_type
+            )
+            response['Content-Range'] = f'bytes {start}-{end}/{size}'
+            response['Content-Length'] = str(end - start + 1)
+            response['Content-Disposition'] = content_disposition_header(as_attachment, filename)
+
+    response['Accept-Ranges'] = 'bytes'
+    if quoted_etag:
+        response['ETag'] = quoted_etag
+    return response
@@ -0,0 +1,148 @@
+"""
+Дробные позиции для упорядоченных списков
+
+Элемент вставляется между соседями с позицией посередине, поэтому
+перемещение пишет одну строку, а не перенумеровывает весь список. Когда
+зазор между соседями исчерпан (точность float), список соседей
+перераспределяется с шагом POSITION_STEP.
+
+Строковые ключи (key_between и др.) -- то же для сортировки строк: ключ
+-- дробь в [0, 1), записанная цифрами base36 без завершающих нулей, и
+лексикографический порядок ключей совпадает с числовым. Алфавит только
+из цифр и строчных букв, поэтому порядок одинаков в любой обычной
+сортировке базы. Ключ удлиняется только при вставке в один и тот же
+промежуток; длинные ключи перераспределяются (spread_keys).
+"""
+from typing import List, Optional
+
+# Шаг между соседними позициями после перераспределения
+POSITION_STEP = 1.0
+# Минимальный зазор, при котором еще можно взять середину
+MIN_POSITION_GAP = 1e-9
+
+
+def position_between(before: Optional[float], after: Optional[float]) -> Optional[float]:
+    """
+    Позиция между соседями; None -- края списка.
+
+    Returns:
+        Новая позиция или None, если зазор исчерпан и нужно перераспределение
+    """
+    if before is None and after is None:
+        return 0.0
+    if before is None:
+        return after - POSITION_STEP
+    if after is None:
+        return before + POSITION_STEP
+    if after - before < MIN_POSITION_GAP:
+        return None
+    middle = (before + after) / 2
+    if not before < middle < after:
+        return None
+    return middle
+
+
+def spread_positions(count: int, start: float = 0.0) -> List[float]:
+    """Равномерные позиции для count элементов"""
+    return [start + index * POSITION_STEP for index in range(count)]
+
+
+KEY_DIGITS = '0123456789abcdefghijklmnopqrstuvwxyz'
+KEY_BASE = len(KEY_DIGITS)
+# Ширина "целой" части ключа и шаг при добавлении в начало или конец
+KEY_HEAD_WIDTH = 6
+KEY_HEAD_STEP = KEY_BASE ** 2
+# Длина, после которой ключи промежутка стоит перераспределить
+MAX_KEY_LENGTH = 32
+
+
+def _format_key(value: int, width: int) -> str:
+    digits = []
+    for _ in range(width):
+        value, digit = divmod(value, KEY_BASE)
+        digits.append(KEY_DIGITS[digit])
+    return ''.join(reversed(digits)).rstrip('0')
+
+
+def _head(key: str) -> int:
+    value = 0
+    for char in key[:KEY_HEAD_WIDTH].ljust(KEY_HEAD_WIDTH, '0'):
+        value = value * KEY_BASE + KEY_DIGITS.index(char)
+    return value
+
+
+def _midpoint(lower: str, upper: Optional[str]) -> str:
+    """Ключ строго между lower и upper (None -- верхняя граница 1)"""
+    if upper is not None:
+        common = 0
+        while common < len(upper) and (lower[common] if common < len(lower) else '0') == upper[common]:
+            common += 1
+        if common:
+            return upper[:common] + _midpoint(lower[common:], upper[common:])
+
+    low = KEY_DIGITS.index(lower[0]) if lower else 0
+    high = KEY_DIGITS.index(upper[0]) if upper is not None else KEY_BASE
+    if high - low > 1:
+        return KEY_DIGITS[(low + high + 1) // 2]
+    if upper is not None and len(upper) > 1:
+        return upper[0]
+    return KEY_DIGITS[low] + _midpoint(lower[1:], None)
+
+
+def validate_key(key: str) -> None:
+    if not key or key.endswith('0') or any(char not in KEY_DIGITS for char in key):
+        raise ValueError(f'Некорректный ключ: {key!r}')
+
+
+def key_between(before: Optional[str], after: Optional[str]) -> str:
+    """Ключ между соседями; None -- края списка"""
+    for key in (before, after):
+        if key is not None:
+            validate_key(key)
+    if before is not None and after is not None and before >= after:
+        raise ValueError(f'Ключи не упорядочены: {before!r} >= {after!r}')
+
+    if before is None and after is None:
+        return KEY_DIGITS[KEY_BASE // 2]
+    if after is None:
+        head = _head(before) + KEY_HEAD_STEP
+        if head < KEY_BASE ** KEY_HEAD_WIDTH:
+            return _format_key(head, KEY_HEAD_WIDTH)
+        return _midpoint(before, None)
+    if before is None:
+        head = _head(after) - KEY_HEAD_STEP
+        if head > 0:
+            return _format_key(head, KEY_HEAD_WIDTH)
+        return _midpoint('', after)
+    return _midpoint(before, after)
+
+
+def keys_between(before: Optional[str], after: Optional[str], count: int) -> List[str]:
+    """count возрастающих ключей между соседями"""
+    if count <= 0:
+        return []
+    if after is None:
+        keys, key = [], before
+        for _ in range(count):
+            key = key_between(key, None)
+            keys.append(key)
+        return keys
+    if before is None:
+        keys, key = [], after
+        for _ in range(count):
+            key = key_between(None, key)
+            keys.append(key)
+        return list(reversed(keys))
+    # Деление пополам дает ключи длиной O(log count) от общей части
+    middle = count // 2
+    key = key_between(before, after)
+    return keys_between(before, key, middle) + [key] + keys_between(key, after, count - middle - 1)
+
+
+def spread_keys(count: int) -> List[str]:
+    """Равномерно распределенные короткие ключи для count элементов"""
+    width = 1
+    while KEY_BASE ** width < (count + 1) * KEY_BASE:
+        width += 1
+    step = KEY_BASE ** width // (count + 1)
+    return [_format_key(step * (index + 1), width) for index in range(count)]
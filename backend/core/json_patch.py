@@ -0,0 +1,153 @@
+"""
+Разница между JSON-документами в виде списка операций
+
+Формат операций -- подмножество RFC 6902 (``add``, ``remove``, ``replace``
+с путями JSON Pointer) и расширение ``splice`` для строк: замена ``remove``
+символов начиная с ``at`` на ``insert``. Для HTML редактора и текста это
+позволяет хранить правку одного абзаца, а не всю строку.
+"""
+import copy
+from typing import Any, List, Tuple
+
+# Строки короче этого порога заменяются целиком
+MIN_SPLICE_LENGTH = 64
+
+
+def _escape(token: Any) -> str:
+    return str(token).replace('~', '~0').replace('/', '~1')
+
+
+def _unescape(token: str) -> str:
+    return token.replace('~1', '/').replace('~0', '~')
+
+
+def _split(path: str) -> List[str]:
+    if not path:
+        return []
+    if not path.startswith('/'):
+        raise ValueError(f'Некорректный путь: {path}')
+    return [_unescape(token) for token in path[1:].split('/')]
+
+
+def make_patch(source: Any, target: Any) -> List[dict]:
+    """Операции, превращающие source в target"""
+    patch: List[dict] = []
+    _diff(source, target, '', patch)
+    return patch
+
+
+def _same(source: Any, target: Any) -> bool:
+    """Равенство с учетом типов на всех уровнях: 1, 1.0 и True различаются"""
+    if type(source) is not type(target):
+        return False
+    if isinstance(source, dict):
+        return source.keys() == target.keys() and all(_same(value, target[key]) for key, value in source.items())
+    if isinstance(source, list):
+        return len(source) == len(target) and all(map(_same, source, target))
+    return source == target
+
+
+def _diff(source: Any, target: Any, path: str, patch: List[dict]) -> None:
+    if _same(source, target):
+        return
+    if isinstance(source, dict) and isinstance(target, dict):
+        for key in source:
+            if key not in target:
+                patch.append({'op': 'remove', 'path': f'{path}/{_escape(key)}'})
+        for key, value in target.items():
+            if key in source:
+                _diff(source[key], value, f'{path}/{_escape(key)}', patch)
+            else:
+                patch.append({'op': 'add', 'path': f'{path}/{_escape(key)}', 'value': value})
+    elif isinstance(source, list) and isinstance(target, list):
+        _diff_list(source, target, path, patch)
+    elif isinstance(source, str) and isinstance(target, str) and len(target) >= MIN_SPLICE_LENGTH:
+        at, remove, insert = _splice(source, target)
+        patch.append({'op': 'splice', 'path': path, 'at': at, 'remove': remove, 'insert': insert})
+    else:
+        patch.append({'op': 'replace', 'path': path, 'value': target})
+
+
+def _diff_list(source: list, target: list, path: str, patch: List[dict]) -> None:
+    """Общие начало и конец пропускаются, середина сравнивается поэлементно"""
+    start = 0
+    while start < len(source) and start < len(target) and _same(source[start], target[start]):
+        start += 1
+    end = 0
+    while (end < len(source) - start and end < len(target) - start
+           and _same(source[-1 - end], target[-1 - end])):
+        end += 1
+
+    source_middle = source[start:len(source) - end]
+    target_middle = target[start:len(target) - end]
+    common = min(len(source_middle), len(target_middle))
+    for offset in range(common):
+        _diff(source_middle[offset], target_middle[offset], f'{path}/{start + offset}', patch)
+    # Удаление с конца, чтобы индексы оставшихся элементов не сдвигались
+    for offset in range(len(source_middle) - 1, common - 1, -1):
+        patch.append({'op': 'remove', 'path': f'{path}/{start + offset}'})
+    for offset in range(common, len(target_middle)):
+        patch.append({'op': 'add', 'path': f'{path}/{start + offset}', 'value': target_middle[offset]})
+
+
+def _splice(source: str, target: str) -> Tuple[int, int, str]:
+    start = 0
+    limit = min(len(source), len(target))
+    while start < limit and source[start] == target[start]:
+        start += 1
+    end = 0
+    while end < limit - start and source[-1 - end] == target[-1 - end]:
+        end += 1
+    return start, len(source) - start - end, target[start:len(target) - end]
+
+
+def apply_patch(document: Any, patch: List[dict]) -> Any:
+    """Применение операций к копии документа"""
+    document = copy.deepcopy(document)
+    for operation in patch:
+        document = _apply(document, operation)
+    return document
+
+
+def _apply(document: Any, operation: dict) -> Any:
+    tokens = _split(operation['path'])
+    op = operation['op']
+    if not tokens:
+        if op == 'splice':
+            return _apply_splice(document, operation)
+        if op in ('add', 'replace'):
+            return copy.deepcopy(operation['value'])
+        raise ValueError('Нельзя удалить корень документа')
+
+    parent = document
+    for token in tokens[:-1]:
+        parent = parent[int(token)] if isinstance(parent, list) else parent[token]
+    key = tokens[-1]
+
+    if isinstance(parent, list):
+        index = len(parent) if key == '-' else int(key)
+        if op == 'add':
+            parent.insert(index, copy.deepcopy(operation['value']))
+        elif op == 'remove':
+            del parent[index]
+        elif op == 'replace':
+            parent[index] = copy.deepcopy(operation['value'])
+        elif op == 'splice':
+            parent[index] = _apply_splice(parent[index], operation)
+        else:
+            raise ValueError(f'Неизвестная операция: {op}')
+    else:
+        if op in ('add', 'replace'):
+            parent[key] = copy.deepcopy(operation['value'])
+        elif op == 'remove':
+            del parent[key]
+        elif op == 'splice':
+            parent[key] = _apply_splice(parent[key], operation)
+        else:
+            raise ValueError(f'Неизвестная операция: {op}')
+    return document
+
+
+def _apply_splice(value: str, operation: dict) -> str:
+    at = operation['at']
+    return value[:at] + operation['insert'] + value[at + operation['remove']:]
@@ -0,0 +1,189 @@
+"""
+Правила повторения в формате RRULE (RFC 5545)
+
+Поддерживается подмножество, нужное для повторяющихся задач: FREQ
+(DAILY, WEEKLY, MONTHLY, YEARLY), INTERVAL, COUNT, UNTIL, BYDAY (дни
+недели для DAILY и WEEKLY) и BYMONTHDAY (для MONTHLY).
+
+RecurrenceRule.between начинает перебор с периода, в который попадает
+граница after, а не с первого повторения: продление окна стоит столько
+же, сколько новых повторений в нем, независимо от возраста правила.
+Повторения считаются по местному времени (TIME_ZONE), поэтому задача
+"каждый день в 9:00" остается в 9:00 при переходе на летнее время.
+"""
+import calendar
+from datetime import date, datetime, timedelta, timezone as dt_timezone
+from typing import Iterator, List, Optional
+
+from django.utils import timezone
+
+FREQUENCIES = ('DAILY', 'WEEKLY', 'MONTHLY', 'YEARLY')
+WEEKDAYS = ('MO', 'TU', 'WE', 'TH', 'FR', 'SA', 'SU')
+
+MAX_INTERVAL = 1000
+# Сколько периодов подряд без повторений перебирается, прежде чем правило
+# считается исчерпанным (например, BYMONTHDAY=31 с INTERVAL=12 с апреля)
+MAX_EMPTY_PERIODS = 1000
+
+
+class RecurrenceRule:
+    """Разобранное правило повторения"""
+
+    def __init__(
+        self,
+        freq: str,
+        interval: int = 1,
+        count: Optional[int] = None,
+        until: Optional[datetime] = None,
+        by_day: Optional[List[int]] = None,
+        by_month_day: Optional[List[int]] = None
+    ):
+        self.freq = freq
+        self.interval = interval
+        self.count = count
+        self.until = until
+        self.by_day = by_day or []
+        self.by_month_day = by_month_day or []
+
+    @classmethod
+    def parse(cls, text: str) -> 'RecurrenceRule':
+        """
+        Разбор строки вида FREQ=WEEKLY;INTERVAL=2;BYDAY=MO,TH.
+
+        Raises:
+            ValueError: некорректное или неподдерживаемое правило
+        """
+        text = (text or '').strip()
+        if text.upper().startswith('RRULE:'):
+            text = text[6:]
+        parts = {}
+        for part in filter(None, text.upper().split(';')):
+            name, separator, value = part.partition('=')
+            if not separator or not value or name in parts:
+                raise ValueError(f'Некорректная часть правила: {part}')
+            parts[name] = value
+
+        unknown = set(parts) - {'FREQ', 'INTERVAL', 'COUNT', 'UNTIL', 'BYDAY', 'BYMONTHDAY', 'WKST'}
+        if unknown:
+            raise ValueError(f'Неподдерживаемые части правила: {", ".join(sorted(unknown))}')
+        freq = parts.get('FREQ')
+        if freq not in FREQUENCIES:
+            raise ValueError('FREQ должен быть одним из: ' + ', '.join(FREQUENCIES))
+        if 'COUNT' in parts and 'UNTIL' in parts:
+            raise ValueError('COUNT и UNTIL не могут быть заданы одновременно')
+
+        interval = cls._positive(parts.get('INTERVAL', '1'), 'INTERVAL')
+        if interval > MAX_INTERVAL:
+            raise ValueError(f'INTERVAL не больше {MAX_INTERVAL}')
+        count = cls._positive(parts['COUNT'], 'COUNT') if 'COUNT' in parts else None
+        until = cls._parse_until(parts['UNTIL']) if 'UNTIL' in parts else None
+
+        by_day = []
+        if 'BYDAY' in parts:
+            if freq not in ('DAILY', 'WEEKLY'):
+                raise ValueError('BYDAY поддерживается только для DAILY и WEEKLY')
+            for day in parts['BYDAY'].split(','):
+                if day not in WEEKDAYS:
+                    raise ValueError(f'Некорректный день недели: {day}')
+                by_day.append(WEEKDAYS.index(day))
+        by_month_day = []
+        if 'BYMONTHDAY' in parts:
+            if freq != 'MONTHLY':
+                raise ValueError('BYMONTHDAY поддерживается только для MONTHLY')
+            for day in parts['BYMONTHDAY'].split(','):
+                try:
+                    value = int(day)
+                except ValueError:
+                    raise ValueError(f'Некорректный день месяца: {day}')
+                if not 1 <= abs(value) <= 31:
+                    raise ValueError(f'Некорректный день месяца: {day}')
+                by_month_day.append(value)
+
+        return cls(freq, interval, count, until, sorted(set(by_day)), sorted(set(by_month_day)))
+
+    def between(
+        self,
+        dtstart: datetime,
+        after: Optional[datetime] = None,
+        before: Optional[datetime] = None
+    ) -> Iterator[datetime]:
+        """
+        Повторения правила от dtstart строго после after и не позже before.
+
+        COUNT здесь не учитывается: перебор может начинаться с середины
+        последовательности, число уже выданных повторений знает вызывающий.
+        """
+        tz = timezone.get_current_timezone()
+        start = timezone.localtime(dtstart, tz).replace(tzinfo=None)
+        lower = timezone.localtime(after, tz).replace(tzinfo=None) if after else None
+        empty = 0
+        period = self._first_period(start, lower)
+        while empty < MAX_EMPTY_PERIODS:
+            found = False
+            for day in self._period_days(start.date(), period):
+                moment = timezone.make_aware(datetime.combine(day, start.time()), tz)
+                if moment < dtstart or (after is not None and moment <= after):
+                    continue
+                if (self.until is not None and moment > self.until) or (before is not None and moment > before):
+                    return
+                found = True
+                yield moment
+            empty = 0 if found else empty + 1
+            period += 1
+
+    def _first_period(self, start: datetime, lower: Optional[datetime]) -> int:
+        """Номер первого периода, который может содержать повторения после lower"""
+        if lower is None or lower <= start:
+            return 0
+        if self.freq == 'DAILY':
+            span = (lower.date() - start.date()).days
+        elif self.freq == 'WEEKLY':
+            span = (lower.date() - start.date()).days // 7
+        elif self.freq == 'MONTHLY':
+            span = (lower.year - start.year) * 12 + lower.month - start.month
+        else:
+            span = lower.year - start.year
+        return max(span // self.interval, 0)
+
+    def _period_days(self, start: date, period: int) -> List[date]:
+        """Дни повторений в периоде с номером period, по возрастанию"""
+        step = period * self.interval
+        if self.freq == 'DAILY':
+            day = start + timedelta(days=step)
+            return [day] if not self.by_day or day.weekday() in self.by_day else []
+        if self.freq == 'WEEKLY':
+            week = start - timedelta(days=start.weekday()) + timedelta(weeks=step)
+            return [week + timedelta(days=weekday) for weekday in (self.by_day or [start.weekday()])]
+
+        if self.freq == 'MONTHLY':
+            year, month = divmod(start.month - 1 + step, 12)
+            year, month = start.year + year, month + 1
+            month_days = self.by_month_day or [start.day]
+        else:
+            year, month = start.year + step, start.month
+            month_days = [start.day]
+        length = calendar.monthrange(year, month)[1]
+        # Несуществующие дни (31 апреля, 29 февраля) пропускаются, как в RFC 5545
+        days = {length + day + 1 if day < 0 else day for day in month_days}
+        return [date(year, month, day) for day in sorted(days) if 1 <= day <= length]
+
+    @staticmethod
+    def _positive(value: str, name: str) -> int:
+        try:
+            number = int(value)
+        except ValueError:
+            number = 0
+        if number < 1:
+            raise ValueError(f'{name} должен быть положительным числом')
+        return number
+
+    @staticmethod
+    def _parse_until(value: str) -> datetime:
+        """UNTIL: дата (конец дня по местному времени) или время UTC вида 20250101T090000Z"""
+        try:
+            if 'T' in value:
+                return datetime.strptime(value, '%Y%m%dT%H%M%SZ').replace(tzinfo=dt_timezone.utc)
+            day = datetime.strptime(value, '%Y%m%d')
+        except ValueError:
+            raise ValueError(f'Некорректный UNTIL: {value}')
+        return timezone.make_aware(datetime.combine(day.date(), datetime.max.time()))
@@ -0,0 +1,482 @@
+"""
+Поблочное хранение содержимого страниц
+
+Документ в блочном формате ``{"blocks": [{"id", "type", "content",
+"children"}, ...]}`` хранится строками Block: правка записывает только
+затронутые блоки и увеличивает ``Page.blocks_revision``. Столбец
+``Page.content`` при этом не переписывается; материализованный документ
+собирается из блоков при чтении и кэшируется по (page_id, revision).
+
+``Page.content_revision`` -- ревизия блоков, которой соответствует
+столбец ``Page.content``. Пока ревизии равны (или содержимое не в блочном
+формате, например HTML редактора), источником остается столбец.
+"""
+import uuid
+from collections import defaultdict
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+
+from backend.apps.notes.models import Block, Page
+from backend.core.exceptions import ValidationException
+from backend.core.fractional_index import position_between, spread_positions
+
+User = get_user_model()
+
+CONTENT_CACHE_TIMEOUT = 60 * 60
+
+# Поля блока, хранящиеся в отдельных столбцах, а не в Block.content
+BLOCK_FIELDS = ('id', 'type', 'content', 'children', 'position', 'parent_id')
+
+BATCH_OPERATIONS = ('insert', 'move', 'update', 'delete')
+MAX_BATCH_OPERATIONS = 1000
+
+
+class _BlockLayout:
+    """Расположение блоков страницы в памяти: родители и упорядоченные соседи"""
+
+    def __init__(self, rows: Iterable[Tuple[Any, Any, float]]):
+        self.parent: Dict[str, Optional[str]] = {}
+        self.position: Dict[str, float] = {}
+        self.children: Dict[Optional[str], List[str]] = defaultdict(list)
+        # Блоки, у которых изменились позиция или родитель
+        self.moved = set()
+        for block_id, parent_id, position in rows:
+            block_id = str(block_id)
+            parent_id = str(parent_id) if parent_id else None
+            self.parent[block_id] = parent_id
+            self.position[block_id] = position
+            self.children[parent_id].append(block_id)
+
+    def place(self, block_id: str, parent_id: Optional[str], op: Dict[str, Any]) -> None:
+        """Вставка блока среди детей parent_id по after_id/before_id операции"""
+        if parent_id is not None and parent_id not in self.parent:
+            raise ValidationException('Родительский блок не найден на странице')
+        if block_id in self.parent:
+            self.children[self.parent[block_id]].remove(block_id)
+
+        siblings = self.children[parent_id]
+        if 'after_id' in op:
+            index = self._index(siblings, op['after_id']) + 1 if op['after_id'] else 0
+        elif op.get('before_id'):
+            index = self._index(siblings, op['before_id'])
+        else:
+            index = len(siblings)
+
+        before = self.position[siblings[index - 1]] if index > 0 else None
+        after = self.position[siblings[index]] if index < len(siblings) else None
+        siblings.insert(index, block_id)
+        self.parent[block_id] = parent_id
+        self.moved.add(block_id)
+
+        position = position_between(before, after)
+        if position is not None:
+            self.position[block_id] = position
+            return
+        # Зазор исчерпан: перераспределяются только соседи этого родителя
+        for sibling, value in zip(siblings, spread_positions(len(siblings))):
+            self.position[sibling] = value
+        self.moved.update(siblings)
+
+    def remove(self, block_id: str) -> List[str]:
+        """Удаление блока с потомками; возвращает удаленные идентификаторы"""
+        self.children[self.parent[block_id]].remove(block_id)
+        removed, stack = [], [block_id]
+        while stack:
+            current = stack.pop()
+            removed.append(current)
+            stack.extend(self.children.pop(current, []))
+            del self.parent[current]
+            self.position.pop(current, None)
+        return removed
+
+    def is_ancestor(self, ancestor_id: str, block_id: str) -> bool:
+        parent_id = self.parent.get(block_id)
+        while parent_id is not None:
+            if parent_id == ancestor_id:
+                return True
+            parent_id = self.parent.get(parent_id)
+        return False
+
+    def _index(self, siblings: List[str], sibling_id: Any) -> int:
+        try:
+            return siblings.index(BlockStorage._block_id(sibling_id, required=True))
+        except ValueError:
+            raise ValidationException('Соседний блок не найден среди детей родителя')
+
+
+class BlockStorage:
+    """Хранилище содержимого страницы на уровне блоков"""
+
+    @staticmethod
+    def is_block_document(content: Any) -> bool:
+        """Содержимое в блочном формате (пустой документ тоже считается блочным)"""
+        return isinstance(content, dict) and (
+            not content or isinstance(content.get('blocks'), list)
+        )
+
+    @staticmethod
+    def cache_key(page_id, revision: int) -> str:
+        return f'page_content:{page_id}:{revision}'
+
+    @staticmethod
+    def materialize(page: Page) -> Any:
+        """Актуальное содержимое страницы; блоки собираются один раз на ревизию"""
+        if page.content_revision == page.blocks_revision or not BlockStorage.is_block_document(page.content):
+            return page.content
+
+        key = BlockStorage.cache_key(page.id, page.blocks_revision)
+        content = cache.get(key)
+        if content is None:
+            content = BlockStorage.build_document(page.id)
+            cache.set(key, content, CONTENT_CACHE_TIMEOUT)
+        return content
+
+    @staticmethod
+    def build_document(page_id) -> Dict[str, Any]:
+        """Сборка дерева блоков одним запросом"""
+        rows = Block.objects.filter(page_id=page_id).order_by('position', 'created_at').values(
+            'id', 'type', 'content', 'parent_block_id'
+        )
+        return BlockStorage.assemble(rows)
+
+    @staticmethod
+    def assemble(rows: Iterable[Dict[str, Any]]) -> Dict[str, Any]:
+        """Дерево документа из строк блоков, упорядоченных по позиции"""
+        nodes = {}
+        children: Dict[Optional[str], List[Dict[str, Any]]] = {}
+        for row in rows:
+            node = {'id': str(row['id']), 'type': row['type'], 'content': row['content'], 'children': []}
+            nodes[node['id']] = node
+            parent_id = str(row['parent_block_id']) if row['parent_block_id'] else None
+            children.setdefault(parent_id, []).append(node)
+
+        for parent_id, items in children.items():
+            if parent_id is not None and parent_id in nodes:
+                nodes[parent_id]['children'] = items
+        return {'blocks': children.get(None, [])}
+
+    @staticmethod
+    def _normalize(block: Dict[str, Any]) -> Dict[str, Any]:
+        """Содержимое блока из входного документа: поле content или прочие ключи"""
+        content = block.get('content')
+        if isinstance(content, dict):
+            return content
+        return {key: value for key, value in block.items() if key not in BLOCK_FIELDS}
+
+    @staticmethod
+    def flatten(content: Dict[str, Any]) -> List[Dict[str, Any]]:
+        """Плоский список блоков документа с позициями среди соседей"""
+        result = []
+
+        def walk(blocks, parent_id):
+            for index, block in enumerate(blocks):
+                if not isinstance(block, dict):
+                    raise ValidationException('Блок должен быть объектом')
+                block_id = BlockStorage._block_id(block.get('id'))
+                result.append({
+                    'id': block_id,
+                    'type': block.get('type') or 'text',
+                    'content': BlockStorage._normalize(block),
+                    'position': float(index),
+                    'parent_id': parent_id,
+                })
+                walk(block.get('children') or [], block_id)
+
+        walk(content.get('blocks') or [], None)
+        return result
+
+    @staticmethod
+    def apply_operations(
+        page: Page,
+        user: User,
+        operations: List[Dict[str, Any]],
+        import_legacy: bool = True
+    ) -> int:
+        """
+        Применение операций над блоками одной транзакцией.
+
+        Операции:
+            {"op": "upsert", "id", "type", "content", "position", "parent_id"}
+                -- создание блока или изменение переданных полей
+            {"op": "delete", "id"} -- удаление блока вместе с дочерними
+
+        Returns:
+            Новая ревизия блоков страницы
+        """
+        if any(op.get('op') not in ('upsert', 'delete') for op in operations):
+            raise ValidationException('Неизвестная операция над блоком')
+
+        upserts = [op for op in operations if op['op'] == 'upsert']
+        delete_ids = [BlockStorage._block_id(op.get('id'), required=True) for op in operations if op['op'] == 'delete']
+        for op in upserts:
+            op['id'] = BlockStorage._block_id(op.get('id'))
+            if op.get('parent_id'):
+                op['parent_id'] = BlockStorage._block_id(op['parent_id'], required=True)
+
+        with transaction.atomic():
+            BlockStorage._lock(page, import_legacy)
+            BlockStorage._write(page.pk, upserts, delete_ids)
+            return BlockStorage._bump_revision(page, user)
+
+    @staticmethod
+    def apply_batch(page: Page, user: User, operations: List[Dict[str, Any]]) -> Tuple[int, Dict[str, float]]:
+        """
+        Пакет вставок, перемещений, изменений и удалений одной транзакцией.
+
+        Операции выполняются по порядку и видят результат предыдущих:
+            {"op": "insert", "id"?, "type", "content", "parent_id", "after_id" | "before_id"}
+            {"op": "move", "id", "parent_id"?, "after_id" | "before_id"}
+            {"op": "update", "id", "type"?, "content"?}
+            {"op": "delete", "id"}
+
+        ``after_id: null`` -- в начало списка соседей, без after_id и
+        before_id -- в конец. Позиции дробные (см. core.fractional_index):
+        переписываются только перемещенные блоки и, при исчерпании зазора,
+        соседи одного родителя.
+
+        Returns:
+            (новая ревизия блоков, позиции блоков, изменивших позицию)
+        """
+        if not isinstance(operations, list) or not operations:
+            raise ValidationException('Не переданы операции над блоками')
+        if len(operations) > MAX_BATCH_OPERATIONS:
+            raise ValidationException(f'Не более {MAX_BATCH_OPERATIONS} операций за запрос')
+        if any(not isinstance(op, dict) or op.get('op') not in BATCH_OPERATIONS for op in operations):
+            raise ValidationException('Неизвестная операция над блоком')
+
+        with transaction.atomic():
+            BlockStorage._lock(page, import_legacy=True)
+            layout = _BlockLayout(
+                Block.objects.filter(page_id=page.pk).order_by('position', 'created_at').values_list(
+                    'id', 'parent_block_id', 'position'
+                )
+            )
+            original = set(layout.parent)
+            changes: Dict[str, Dict[str, Any]] = {}
+
+            for op in operations:
+                kind = op['op']
+                block_id = BlockStorage._block_id(op.get('id'), required=kind != 'insert')
+                if kind == 'insert':
+                    if block_id in layout.parent:
+                        raise ValidationException('Блок с таким идентификатором уже существует')
+                    changes[block_id] = {'type': op.get('type') or 'text', 'content': op.get('content') or {}}
+                    layout.place(block_id, BlockStorage._target_parent(op, None), op)
+                    continue
+
+                if block_id not in layout.parent:
+                    raise ValidationException('Блок не найден на странице')
+                if kind == 'delete':
+                    for removed in layout.remove(block_id):
+                        changes.pop(removed, None)
+                elif kind == 'move':
+                    parent_id = BlockStorage._target_parent(op, layout.parent[block_id])
+                    if parent_id is not None and (parent_id == block_id or layout.is_ancestor(block_id, parent_id)):
+                        raise ValidationException('Блок нельзя переместить внутрь самого себя')
+                    layout.place(block_id, parent_id, op)
+                else:
+                    fields = changes.setdefault(block_id, {})
+                    for field in ('type', 'content'):
+                        if field in op:
+                            fields[field] = op[field]
+
+            upserts = []
+            for block_id in set(changes) | (layout.moved & set(layout.parent)):
+                operation = dict(changes.get(block_id, {}), op='upsert', id=block_id)
+                if block_id in layout.moved or block_id not in original:
+                    operation['position'] = layout.position[block_id]
+                    operation['parent_id'] = layout.parent[block_id]
+                upserts.append(operation)
+            delete_ids = sorted(original - set(layout.parent))
+
+            BlockStorage._write(page.pk, upserts, delete_ids)
+            revision = BlockStorage._bump_revision(page, user)
+
+        positions = {
+            block_id: layout.position[block_id]
+            for block_id in layout.moved if block_id in layout.parent
+        }
+        return revision, positions
+
+    @staticmethod
+    def _target_parent(op: Dict[str, Any], current: Optional[str]) -> Optional[str]:
+        if 'parent_id' not in op:
+            return current
+        return BlockStorage._block_id(op['parent_id'], required=True) if op['parent_id'] else None
+
+    @staticmethod
+    def _lock(page: Page, import_legacy: bool) -> None:
+        locked = Page.objects.select_for_update().only(
+            'id', 'blocks_revision', 'content_revision'
+        ).get(pk=page.pk)
+        if import_legacy:
+            BlockStorage._import_legacy_document(locked)
+
+    @staticmethod
+    def _write(page_id, upserts: List[Dict[str, Any]], delete_ids: List[str]) -> None:
+        """Запись upsert-операций и удалений в строки Block"""
+        existing = {
+            str(block.id): block
+            for block in Block.objects.filter(page_id=page_id, id__in=[op['id'] for op in upserts])
+        }
+        if BlockStorage._foreign_ids(page_id, [op['id'] for op in upserts if op['id'] not in existing]):
+            raise ValidationException('Блок с таким идентификатором принадлежит другой странице')
+        BlockStorage._check_parents(page_id, upserts, existing)
+
+        created, updated, update_fields = [], [], set()
+        for op in upserts:
+            block = existing.get(op['id'])
+            if block is None:
+                created.append(Block(
+                    id=op['id'],
+                    page_id=page_id,
+                    type=op.get('type') or 'text',
+                    content=op.get('content') or {},
+                    position=op.get('position') or 0,
+                    parent_block_id=op.get('parent_id'),
+                ))
+                continue
+            for field, attr in (('type', 'type'), ('content', 'content'),
+                                ('position', 'position'), ('parent_id', 'parent_block_id')):
+                if field in op:
+                    setattr(block, attr, op[field])
+                    update_fields.add(attr)
+            updated.append(block)
+
+        if created:
+            Block.objects.bulk_create(created)
+        if updated and update_fields:
+            update_fields.add('updated_at')
+            now = timezone.now()
+            for block in updated:
+                block.updated_at = now
+            Block.objects.bulk_update(updated, sorted(update_fields))
+        if delete_ids:
+            Block.objects.filter(page_id=page_id, id__in=delete_ids).delete()
+
+    @staticmethod
+    def sync_from_content(page: Page, user: User, content: Dict[str, Any]) -> int:
+        """
+        Сохранение целого документа как разницы с текущими блоками.
+
+        Страница блокируется до чтения текущих блоков, как в apply_batch,
+        поэтому параллельные сохранения не считают разницу с одним и тем же
+        состоянием. Записываются только новые, измененные и удаленные
+        блоки; блоки с id, уже занятыми на другой странице (вставка из
+        другого документа), получают новые id.
+
+        Returns:
+            Ревизия блоков после сохранения
+        """
+        incoming = BlockStorage.flatten(content)
+        with transaction.atomic():
+            # Документ заменяется целиком, перенос старого содержимого не нужен
+            BlockStorage._lock(page, import_legacy=False)
+            current = {
+                str(row['id']): row
+                for row in Block.objects.filter(page_id=page.pk).values(
+                    'id', 'type', 'content', 'position', 'parent_block_id'
+                )
+            }
+            foreign = BlockStorage._foreign_ids(
+                page.pk, [block['id'] for block in incoming if block['id'] not in current]
+            )
+            if foreign:
+                block_map = {block_id: str(uuid.uuid4()) for block_id in foreign}
+                for block in incoming:
+                    block['id'] = block_map.get(block['id'], block['id'])
+                    block['parent_id'] = block_map.get(block['parent_id'], block['parent_id'])
+
+            upserts = []
+            for block in incoming:
+                row = current.get(block['id'])
+                parent_id = str(row['parent_block_id']) if row and row['parent_block_id'] else None
+                if row and (row['type'], row['content'], row['position'], parent_id) == (
+                    block['type'], block['content'], block['position'], block['parent_id']
+                ):
+                    continue
+                upserts.append(dict(block, op='upsert'))
+
+            incoming_ids = {block['id'] for block in incoming}
+            delete_ids = [block_id for block_id in current if block_id not in incoming_ids]
+
+            if not upserts and not delete_ids:
+                return page.blocks_revision
+            if not BlockStorage.is_block_document(page.content):
+                # Переход с HTML/текста на блочный формат: столбец больше не источник
+                Page.objects.filter(pk=page.pk).update(content={})
+                page.content = {}
+            BlockStorage._write(page.pk, upserts, delete_ids)
+            return BlockStorage._bump_revision(page, user)
+
+    @staticmethod
+    def _foreign_ids(page_id, block_ids: List[str]) -> set:
+        """Идентификаторы из block_ids, занятые блоками других страниц"""
+        if not block_ids:
+            return set()
+        return {
+            str(block_id) for block_id in Block.objects.filter(id__in=block_ids).exclude(
+                page_id=page_id
+            ).values_list('id', flat=True)
+        }
+
+    @staticmethod
+    def _block_id(value: Any, required: bool = False) -> str:
+        if not value:
+            if required:
+                raise ValidationException('Не указан идентификатор блока')
+            return str(uuid.uuid4())
+        try:
+            return str(uuid.UUID(str(value)))
+        except ValueError:
+            raise ValidationException('Некорректный идентификатор блока')
+
+    @staticmethod
+    def _bump_revision(page: Page, user: Optional[User]) -> int:
+        values = {'blocks_revision': F('blocks_revision') + 1, 'updated_at': timezone.now()}
+        if user is not None:
+            values['last_edited_by'] = user
+        Page.objects.filter(pk=page.pk).update(**values)
+        page.blocks_revision = Page.objects.filter(pk=page.pk).values_list(
+            'blocks_revision', flat=True
+        ).get()
+        return page.blocks_revision
+
+    @staticmethod
+    def _import_legacy_document(locked: Page) -> None:
+        """
+        Перенос блоков из столбца content перед первой поблочной правкой,
+        чтобы содержимое, сохраненное целиком, не потерялось.
+        """
+        if locked.content_revision != locked.blocks_revision:
+            return
+        content = Page.objects.filter(pk=locked.pk).values_list('content', flat=True).get()
+        if not BlockStorage.is_block_document(content) or not content.get('blocks'):
+            return
+
+        if Block.objects.filter(page_id=locked.pk).exists():
+            return
+        Block.objects.bulk_create([
+            Block(
+                id=block['id'],
+                page_id=locked.pk,
+                type=block['type'],
+                content=block['content'],
+                position=block['position'],
+                parent_block_id=block['parent_id'],
+            )
+            for block in BlockStorage.flatten(content)
+        ])
+
+    @staticmethod
+    def _check_parents(page_id, upserts: List[Dict[str, Any]], existing: Dict[str, Block]) -> None:
+        parent_ids = {str(op['parent_id']) for op in upserts if op.get('parent_id')}
+        known = {op['id'] for op in upserts} | set(existing)
+        missing = parent_ids - known
+        if missing and Block.objects.filter(page_id=page_id, id__in=missing).count() != len(missing):
+            raise ValidationException('Родительский блок не найден на странице')
@@ -1,12 +1,20 @@
 """
 Сервисный слой для совместной работы
 """
+from datetime import timedelta
+from itertools import groupby
 from typing import List, Dict, Any, Optional
+from asgiref.sync import async_to_sync
+from channels.exceptions import ChannelFull
+from channels.layers import get_channel_layer
+from django.conf import settings
 from django.contrib.auth import get_user_model
 from django.utils import timezone
 from django.db.models import Count
 
 from backend.apps.collaboration.models import ActiveSession, CollaborationComment, CollaborationReaction
+from backend.apps.collaboration.protocol import encode_frames
+from backend.apps.collaboration.traffic import channel_layer_alias_for
 from backend.apps.workspaces.models import Workspace
 from backend.core.exceptions import BusinessLogicException, NotFoundException
 
@@ -204,3 +212,76 @@ class CollaborationService:
             id=self.workspace_id,
             members__user=self.user
         ).exists()
+
+
+class ActiveSessionService:
+    """Сервис присутствия: продление и сборка зависших сессий"""
+
+    @staticmethod
+    def stale_cutoff():
+        """Граница, после которой сессия без heartbeat считается зависшей"""
+        return timezone.now() - timedelta(seconds=settings.COLLABORATION_SESSION_STALE_AFTER)
+
+    @staticmethod
+    def touch(session_id: str) -> None:
+        """Продление присутствия одним UPDATE без чтения строки"""
+        now = timezone.now()
+        ActiveSession.objects.filter(session_id=session_id).update(
+            last_seen=now, last_activity=now
+        )
+
+    @staticmethod
+    def reap_stale_sessions(batch_size: int = 500) -> int:
+        """
+        Удаление сессий, переживших свои соединения (падение worker'а,
+        обрыв без disconnect), пачками по batch_size.
+
+        Для каждой сессии канал удаляется из группы комнаты, участникам
+        рассылается user_left, а самому каналу отправляется force_disconnect:
+        если соединение все-таки живо, consumer закроет его.
+
+        Returns:
+            Количество удаленных сессий
+        """
+        cutoff = ActiveSessionService.stale_cutoff()
+        reaped = 0
+        while True:
+            sessions = list(
+                ActiveSession.objects.filter(last_seen__lt=cutoff)
+                .order_by('group_name')
+                .values('id', 'session_id', 'user_id', 'channel_name', 'group_name')[:batch_size]
+            )
+            if not sessions:
+                break
+            ActiveSession.objects.filter(id__in=[session['id'] for session in sessions]).delete()
+            async_to_sync(ActiveSessionService._evict_channels)(sessions)
+            reaped += len(sessions)
+        return reaped
+
+    @staticmethod
+    async def _evict_channels(sessions: List[Dict[str, Any]]) -> None:
+        now = timezone.now()
+        for group_name, group_sessions in groupby(sessions, key=lambda session: session['group_name']):
+            # Канал комнаты живет на том же шарде channel layer, что и группа
+            channel_layer = get_channel_layer(channel_layer_alias_for(group_name))
+            if channel_layer is None:
+                continue
+
+            for session in group_sessions:
+                try:
+                    await channel_layer.send(session['channel_name'], {'type': 'force_disconnect'})
+                except ChannelFull:
+                    pass
+                if not group_name:
+                    continue
+                await channel_layer.group_discard(group_name, session['channel_name'])
+                await channel_layer.group_send(group_name, {
+                    'type': 'frame_message',
+                    'frames': encode_frames({
+                        'type': 'user_left',
+                        'user_id': str(session['user_id']),
+                        'session_id': session['session_id'],
+                        'timestamp': now,
+                    }),
+                    'sender_channel': None,
+                })
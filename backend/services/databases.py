@@ -1,6 +1,7 @@
 """
 Сервисный слой для управления базами данных
 """
+import uuid
 from typing import List, Dict, Any, Optional
 from django.contrib.auth import get_user_model
 from django.db.models import Q
@@ -323,9 +324,91 @@ class DatabaseRecordService:
             return True
     
     @staticmethod
-    def _compute_formulas(data: Dict[str, Any], database: Database) -> Dict[str, Any]:
-        """Вычисляет значения формул в данных записи"""
+    def apply_record_changes(
+        database_id: str,
+        user: User,
+        updates: List[Dict[str, Any]]
+    ) -> List[DatabaseRecord]:
+        """
+        Пакетное применение изменений к записям одной базы данных.
+
+        Используется WebSocket-каналом: одна проверка доступа, одна выборка
+        свойств и записей и одна транзакция на весь пакет. Изменения одной и
+        той же записи внутри пакета объединяются (последнее значение выигрывает).
+        Возвращает записи с вычисленными формулами в порядке первого упоминания.
+        """
+        database = DatabaseService.get_database_by_id(database_id, user)
         properties = list(database.properties.all())
+        formula_ids = {str(prop.id) for prop in properties if prop.type == 'formula'}
+
+        merged: Dict[str, Dict[str, Any]] = {}
+        for update in updates:
+            try:
+                record_id = str(uuid.UUID(str(update.get('record_id'))))
+            except ValueError:
+                raise NotFoundException("Запись не найдена")
+            changes = update.get('changes')
+            if not isinstance(changes, dict):
+                raise BusinessLogicException("Изменения записи должны быть объектом")
+            # Значения формул вычисляются только на сервере
+            merged.setdefault(record_id, {}).update(
+                {key: value for key, value in changes.items() if key not in formula_ids}
+            )
+
+        if not merged:
+            return []
+
+        with transaction.atomic():
+            records = {
+                str(record.id): record
+                for record in DatabaseRecord.objects.select_for_update().filter(
+                    database=database,
+                    id__in=list(merged.keys())
+                )
+            }
+            missing = [record_id for record_id in merged if record_id not in records]
+            if missing:
+                raise NotFoundException("Запись не найдена")
+
+            revisions = []
+            updated = []
+            for record_id, changes in merged.items():
+                record = records[record_id]
+                old_data = record.properties.copy()
+                record.properties = DatabaseRecordService._compute_formulas(
+                    {**old_data, **changes}, database, properties
+                )
+                record.last_edited_by = user
+
+                diff = {
+                    key: {'old': old_data.get(key), 'new': value}
+                    for key, value in record.properties.items()
+                    if old_data.get(key) != value
+                }
+                if diff:
+                    revisions.append(DatabaseRecordRevision(
+                        record=record,
+                        author=user,
+                        changes=diff,
+                        change_type='update'
+                    ))
+                    updated.append(record)
+
+            for record in updated:
+                record.save(update_fields=['properties', 'last_edited_by', 'updated_at'])
+            DatabaseRecordRevision.objects.bulk_create(revisions)
+
+        return [records[record_id] for record_id in merged]
+
+    @staticmethod
+    def _compute_formulas(
+        data: Dict[str, Any],
+        database: Database,
+        properties: Optional[List[DatabaseProperty]] = None
+    ) -> Dict[str, Any]:
+        """Вычисляет значения формул в данных записи"""
+        if properties is None:
+            properties = list(database.properties.all())
         computed_data = data.copy()
         
         # Вычисляем формулы
@@ -3,11 +3,15 @@
 """
 from typing import List, Optional
 from django.contrib.auth import get_user_model
-from django.db.models import Q
+from django.db.models import Prefetch, Q
 
-from backend.apps.notes.models import Tag, Page, Block, PageVersion, Comment
+from backend.apps.notes.models import Tag, Page, Block, Comment
 from backend.apps.workspaces.models import Workspace
 from backend.core.exceptions import BusinessLogicException, NotFoundException
+from backend.services.block_storage import BlockStorage
+from backend.services.page_history import PageHistory
+from backend.services.page_text import PageTextIndexer
+from backend.services.page_tree import PageTree
 
 User = get_user_model()
 
@@ -48,7 +52,11 @@ class PageService:
         if not show_templates:
             queryset = queryset.filter(is_template=False)
         
-        return list(queryset.order_by('position', '-updated_at'))
+        pages = list(PageTree.with_children_count(queryset, include_archived=show_archived).order_by(
+            'position', '-updated_at'
+        ))
+        PageTree.attach_paths(pages)
+        return pages
     
     @staticmethod
     def get_page_by_id(page_id: str, user: User) -> Page:
@@ -57,15 +65,21 @@ class PageService:
             members__user=user
         ).values_list('id', flat=True)
         
+        children = PageTree.with_children_count(Page.objects.all()).select_related(
+            'author', 'last_edited_by', 'workspace'
+        ).prefetch_related('tags')
         page = Page.objects.filter(
             id=page_id,
             workspace__in=user_workspaces,
             is_deleted=False
-        ).select_related('author', 'last_edited_by', 'workspace').prefetch_related('tags').first()
+        ).select_related('author', 'last_edited_by', 'workspace').prefetch_related(
+            'tags', Prefetch('children', queryset=children)
+        ).first()
         
         if not page:
             raise NotFoundException("Страница не найдена")
         
+        PageTree.attach_paths([page, *page.children.all()])
         return page
     
     @staticmethod
@@ -77,15 +91,10 @@ class PageService:
         
         page = Page.objects.create(**data)
         
-        # Создание начальной версии
-        PageVersion.objects.create(
-            page=page,
-            version_number=1,
-            title=page.title,
-            content=page.content,
-            content_text=page.content_text,
-            created_by=user
-        )
+        # Создание начальной версии; текст страницы и версии допишет
+        # фоновая переиндексация
+        PageHistory.record(page, user, page.content)
+        PageTextIndexer.schedule(page.id)
         
         return page
     
@@ -100,26 +109,28 @@ class PageService:
         if not page:
             raise NotFoundException("Страница не найдена")
         
+        # Блочный документ сохраняется поблочно, столбец content не переписывается
+        if 'content' in data and BlockStorage.is_block_document(data['content']):
+            BlockStorage.sync_from_content(page, user, data.pop('content'))
+        elif 'content' in data:
+            page.content_revision = page.blocks_revision
+            data['content_revision'] = page.blocks_revision
+        
+        tags = data.pop('tags', None)
+        
         # Обновление страницы
         for field, value in data.items():
             setattr(page, field, value)
         
         # Обновляем поле последнего редактирования
         page.last_edited_by = user
-        page.save()
-        
-        # Создание новой версии
-        last_version = page.versions.first()
-        new_version_number = (last_version.version_number + 1) if last_version else 1
+        page.save(update_fields=[*data, 'last_edited_by', 'updated_at'])
+        if tags is not None:
+            page.tags.set(tags)
         
-        PageVersion.objects.create(
-            page=page,
-            version_number=new_version_number,
-            title=page.title,
-            content=page.content,
-            content_text=page.content_text,
-            created_by=user
-        )
+        # Создание новой версии (или объединение с последней правкой автора)
+        PageHistory.record(page, user, BlockStorage.materialize(page))
+        PageTextIndexer.schedule(page.id)
         
         return page
     
@@ -162,11 +173,10 @@ class PageService:
         if not page:
             raise NotFoundException("Страница не найдена")
         
-        block = Block.objects.create(
-            page=page,
-            **data
-        )
-        return block
+        operation = PageService._block_operation(data)
+        BlockStorage.apply_operations(page, user, [operation])
+        PageTextIndexer.schedule(page.id)
+        return Block.objects.get(id=operation['id'])
     
     @staticmethod
     def update_block(block_id: int, user: User, **data) -> Block:
@@ -174,15 +184,17 @@ class PageService:
         block = Block.objects.filter(
             id=block_id,
             page__workspace__members__user=user
-        ).first()
+        ).select_related('page').first()
         
         if not block:
             raise NotFoundException("Блок не найден")
         
-        for field, value in data.items():
-            setattr(block, field, value)
-        
-        block.save()
+        data.pop('page', None)
+        operation = PageService._block_operation(data)
+        operation['id'] = block.id
+        BlockStorage.apply_operations(block.page, user, [operation])
+        PageTextIndexer.schedule(block.page_id)
+        block.refresh_from_db()
         return block
     
     @staticmethod
@@ -191,12 +203,40 @@ class PageService:
         block = Block.objects.filter(
             id=block_id,
             page__workspace__members__user=user
-        ).first()
+        ).select_related('page').first()
         
         if not block:
             raise NotFoundException("Блок не найден")
         
-        block.delete()
+        BlockStorage.apply_operations(block.page, user, [{'op': 'delete', 'id': block.id}])
+        PageTextIndexer.schedule(block.page_id)
+    
+    @staticmethod
+    def apply_block_batch(page_id: int, user: User, operations: list) -> dict:
+        """Пакет операций над блоками страницы с одной проверкой доступа"""
+        page = Page.objects.filter(
+            id=page_id,
+            workspace__members__user=user
+        ).only('id', 'content', 'blocks_revision', 'content_revision').first()
+        
+        if not page:
+            raise NotFoundException("Страница не найдена")
+        
+        revision, positions = BlockStorage.apply_batch(page, user, operations)
+        PageTextIndexer.schedule(page.id)
+        return {'revision': revision, 'positions': positions}
+    
+    @staticmethod
+    def _block_operation(data: dict) -> dict:
+        """Операция upsert для BlockStorage из полей блока"""
+        operation = {'op': 'upsert'}
+        for field in ('id', 'type', 'content', 'position'):
+            if field in data:
+                operation[field] = data[field]
+        if 'parent_block' in data:
+            parent = data['parent_block']
+            operation['parent_id'] = getattr(parent, 'pk', parent)
+        return operation
     
     @staticmethod
     def get_all_blocks(user: User) -> List[Block]:
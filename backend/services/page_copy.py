@@ -0,0 +1,266 @@
+"""
+Копирование поддерева страниц
+
+Дублирование страницы и создание страниц из шаблона копируют поддерево
+целиком: страницы, строки Block, связи с тегами, записи SearchIndex и
+начальную версию истории. Каждая таблица пишется одним bulk_create с
+заранее выданными UUID, так что число запросов не зависит от размера
+поддерева. Идентификаторы блоков внутри блочных документов в
+Page.content переназначаются так же, как строки Block.
+"""
+import uuid
+from collections import defaultdict
+from typing import Any, Dict, List, Optional, Tuple
+
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.db.models import Max
+
+from backend.apps.notes.models import Block, Page, PageVersion
+from backend.apps.search.models import SearchIndex
+from backend.apps.workspaces.models import Workspace
+from backend.core.exceptions import NotFoundException, ValidationException
+from backend.core.fractional_index import POSITION_STEP, position_between
+from backend.services.block_storage import BlockStorage
+from backend.services.page_tree import PageTree
+
+User = get_user_model()
+
+BATCH_SIZE = 500
+
+# Поля страницы, переносимые в копию без изменений
+COPIED_FIELDS = (
+    'content_text', 'icon', 'cover_image', 'permissions', 'is_template', 'is_archived',
+    'position', 'blocks_revision', 'content_revision',
+)
+
+
+class PageCopier:
+    """Пакетное копирование страниц"""
+
+    @staticmethod
+    def duplicate(page_id: str, user: User, title: Optional[str] = None) -> Page:
+        """Копия страницы с поддеревом рядом с оригиналом"""
+        source = PageCopier._get_source(page_id, user)
+        next_position = Page.objects.filter(
+            workspace_id=source.workspace_id, parent_id=source.parent_id,
+            is_deleted=False, position__gt=source.position
+        ).order_by('position').values_list('position', flat=True).first()
+        position = position_between(source.position, next_position)
+        if position is None:
+            position = source.position
+
+        return PageCopier.copy_subtree(
+            source, user,
+            workspace_id=source.workspace_id,
+            parent=source.parent,
+            title=title or f'{source.title} (копия)',
+            position=position,
+        )
+
+    @staticmethod
+    def instantiate(
+        page_id: str,
+        user: User,
+        workspace_id: Optional[int] = None,
+        parent_id: Optional[str] = None,
+        title: Optional[str] = None
+    ) -> Page:
+        """Новые страницы из шаблона; копии шаблонами не являются"""
+        source = PageCopier._get_source(page_id, user)
+        if not source.is_template:
+            raise ValidationException('Страница не является шаблоном')
+
+        workspace_id = workspace_id or source.workspace_id
+        if not Workspace.objects.filter(id=workspace_id, members__user=user).exists():
+            raise NotFoundException('Рабочее пространство не найдено')
+
+        parent = None
+        if parent_id:
+            parent = Page.objects.filter(id=parent_id, workspace_id=workspace_id, is_deleted=False).first()
+            if parent is None:
+                raise NotFoundException('Родительская страница не найдена')
+            if parent.tree_path.startswith(source.tree_path):
+                raise ValidationException('Шаблон нельзя создать внутри самого шаблона')
+
+        last = Page.objects.filter(
+            workspace_id=workspace_id, parent=parent, is_deleted=False
+        ).aggregate(last=Max('position'))['last']
+
+        return PageCopier.copy_subtree(
+            source, user,
+            workspace_id=workspace_id,
+            parent=parent,
+            title=title or source.title,
+            position=last + POSITION_STEP if last is not None else 0.0,
+            as_template=False,
+        )
+
+    @staticmethod
+    def copy_subtree(
+        source: Page,
+        user: User,
+        workspace_id: int,
+        parent: Optional[Page],
+        title: str,
+        position: float,
+        as_template: Optional[bool] = None
+    ) -> Page:
+        """
+        Копирование source и его неудаленных потомков.
+
+        Args:
+            parent: родитель копии корня (None -- корень пространства)
+            as_template: значение is_template для копий; None -- как в оригинале
+
+        Returns:
+            Копия корня поддерева
+        """
+        pages = list(PageTree.subtree(source).filter(is_deleted=False).order_by('depth'))
+        page_map: Dict[Any, uuid.UUID] = {}
+        paths: Dict[Optional[uuid.UUID], str] = {None: parent.tree_path if parent else ''}
+        copies: List[Page] = []
+
+        # Родители идут раньше потомков (порядок по depth)
+        for page in pages:
+            if page.pk == source.pk:
+                copy_parent_id = parent.pk if parent else None
+            elif page.parent_id in page_map:
+                copy_parent_id = page_map[page.parent_id]
+            else:
+                # Потомок удаленной страницы
+                continue
+
+            copy = Page(
+                id=uuid.uuid4(),
+                title=page.title,
+                content=page.content,
+                workspace_id=workspace_id,
+                parent_id=copy_parent_id,
+                author=user,
+                last_edited_by=user,
+                **{field: getattr(page, field) for field in COPIED_FIELDS},
+            )
+            parent_path = paths[None] if page.pk == source.pk else paths[copy_parent_id]
+            copy.tree_path = f'{parent_path}{copy.id.hex}/'
+            copy.depth = copy.tree_path.count('/') - 1
+            if as_template is not None:
+                copy.is_template = as_template
+            page_map[page.pk] = copy.id
+            paths[copy.id] = copy.tree_path
+            copies.append(copy)
+
+        root = copies[0]
+        root.title = title
+        root.position = position
+
+        blocks, materialized = PageCopier._copy_blocks(copies, page_map)
+        with transaction.atomic():
+            Page.objects.bulk_create(copies, batch_size=BATCH_SIZE)
+            Block.objects.bulk_create(blocks, batch_size=BATCH_SIZE)
+            PageCopier._copy_tags(page_map)
+            PageCopier._copy_search_index(copies, page_map)
+            PageVersion.objects.bulk_create([
+                PageVersion(
+                    page_id=copy.id,
+                    version_number=1,
+                    title=copy.title,
+                    content=materialized[copy.id],
+                    content_text=copy.content_text,
+                    created_by=user,
+                )
+                for copy in copies
+            ], batch_size=BATCH_SIZE)
+
+        for copy in copies:
+            copy._loaded_parent_id = copy.parent_id
+        return root
+
+    @staticmethod
+    def _copy_blocks(
+        copies: List[Page], page_map: Dict[Any, uuid.UUID]
+    ) -> Tuple[List[Block], Dict[uuid.UUID, Any]]:
+        """
+        Переназначение id блоков в строках и в блочных документах копий.
+
+        Returns:
+            (строки Block копий, материализованное содержимое копий по id)
+        """
+        block_map: Dict[str, str] = {}
+
+        def new_block_id(old_id) -> str:
+            return block_map.setdefault(str(old_id), str(uuid.uuid4()))
+
+        rows = Block.objects.filter(page_id__in=list(page_map)).order_by('position', 'created_at').values(
+            'id', 'page_id', 'parent_block_id', 'type', 'content', 'position'
+        )
+        blocks, by_page = [], defaultdict(list)
+        for row in rows:
+            block = Block(
+                id=new_block_id(row['id']),
+                page_id=page_map[row['page_id']],
+                parent_block_id=new_block_id(row['parent_block_id']) if row['parent_block_id'] else None,
+                type=row['type'],
+                content=row['content'],
+                position=row['position'],
+            )
+            blocks.append(block)
+            by_page[block.page_id].append({
+                'id': block.id, 'type': block.type, 'content': block.content,
+                'parent_block_id': block.parent_block_id,
+            })
+
+        def remap(nodes):
+            return [
+                dict(node, id=new_block_id(node['id']), children=remap(node.get('children') or []))
+                if isinstance(node, dict) and node.get('id') else node
+                for node in nodes
+            ]
+
+        materialized = {}
+        for copy in copies:
+            if BlockStorage.is_block_document(copy.content) and copy.content.get('blocks'):
+                copy.content = dict(copy.content, blocks=remap(copy.content['blocks']))
+            if copy.content_revision == copy.blocks_revision or not BlockStorage.is_block_document(copy.content):
+                materialized[copy.id] = copy.content
+            else:
+                materialized[copy.id] = BlockStorage.assemble(by_page[copy.id])
+        return blocks, materialized
+
+    @staticmethod
+    def _copy_tags(page_map: Dict[Any, uuid.UUID]) -> None:
+        PageTags = Page.tags.through
+        PageTags.objects.bulk_create([
+            PageTags(page_id=page_map[page_id], tag_id=tag_id)
+            for page_id, tag_id in PageTags.objects.filter(
+                page_id__in=list(page_map)
+            ).values_list('page_id', 'tag_id')
+        ], batch_size=BATCH_SIZE)
+
+    @staticmethod
+    def _copy_search_index(copies: List[Page], page_map: Dict[Any, uuid.UUID]) -> None:
+        titles = {copy.id: copy.title for copy in copies}
+        workspace_id = copies[0].workspace_id
+        SearchIndex.objects.bulk_create([
+            SearchIndex(
+                content_type='page',
+                object_id=page_map[entry.object_id],
+                workspace_id=workspace_id,
+                title=titles[page_map[entry.object_id]],
+                content=entry.content,
+                tags=entry.tags,
+                metadata=entry.metadata,
+            )
+            for entry in SearchIndex.objects.filter(content_type='page', object_id__in=list(page_map))
+        ], batch_size=BATCH_SIZE)
+
+    @staticmethod
+    def _get_source(page_id: str, user: User) -> Page:
+        page = Page.objects.filter(
+            id=page_id,
+            workspace__members__user=user,
+            is_deleted=False
+        ).first()
+        if not page:
+            raise NotFoundException('Страница не найдена')
+        return page
@@ -0,0 +1,289 @@
+"""
+История версий страниц с дельта-сжатием
+
+Каждая PAGE_VERSION_SNAPSHOT_INTERVAL-я версия хранится снимком (content и
+content_text целиком), остальные -- дельтой (backend.core.json_patch)
+относительно предыдущей версии. Восстановление версии -- один запрос на
+цепочку от ближайшего снимка и не больше INTERVAL - 1 применений дельт.
+
+Правки одного автора в пределах PAGE_VERSION_COALESCE_WINDOW секунд
+объединяются в последнюю версию: она переписывается на месте, поэтому
+восстановленные версии кэшируются по (номер, updated_at), а база дельты
+при записи собирается из БД под блокировкой, без кэша. Команда compact_page_versions прореживает
+старые версии по PAGE_VERSION_RETENTION и пересобирает цепочки.
+"""
+import json
+from datetime import timedelta
+from typing import Any, Dict, List, Optional, Tuple
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Count, F, Min, Q
+from django.utils import timezone
+
+from backend.apps.notes.models import Page, PageVersion
+from backend.core.exceptions import NotFoundException
+from backend.core.json_patch import apply_patch, make_patch
+
+User = get_user_model()
+
+VERSION_CACHE_TIMEOUT = 60 * 60
+
+
+class PageHistory:
+    """Запись, восстановление и сжатие версий страниц"""
+
+    @staticmethod
+    def cache_key(page_id, version_number: int, updated_at) -> str:
+        return f'page_version:{page_id}:{version_number}:{updated_at.timestamp()}'
+
+    @staticmethod
+    def record(page: Page, user: User, content: Any) -> PageVersion:
+        """
+        Запись текущего состояния страницы в историю.
+
+        Args:
+            content: материализованное содержимое страницы
+        """
+        document = {'content': content, 'content_text': page.content_text}
+        interval = settings.PAGE_VERSION_SNAPSHOT_INTERVAL
+        window = timedelta(seconds=settings.PAGE_VERSION_COALESCE_WINDOW)
+        now = timezone.now()
+
+        with transaction.atomic():
+            latest = PageVersion.objects.select_for_update().filter(
+                page=page
+            ).order_by('-version_number').first()
+
+            if latest and latest.created_by_id == user.pk and now - latest.updated_at <= window:
+                base = None
+                if not latest.is_snapshot:
+                    _, base = PageHistory._load_document(page.pk, latest.version_number, inclusive=False)
+                PageHistory._store(latest, base, document, latest.chain_position)
+                latest.title = page.title
+                latest.updated_at = now
+                latest.save(update_fields=[
+                    'title', 'content', 'content_text', 'delta', 'chain_position', 'updated_at'
+                ])
+                version = latest
+            else:
+                version = PageVersion(
+                    page=page,
+                    version_number=latest.version_number + 1 if latest else 1,
+                    title=page.title,
+                    created_by=user,
+                    updated_at=now,
+                )
+                base = None
+                if latest and latest.chain_position + 1 < interval:
+                    _, base = PageHistory._load_document(page.pk, latest.version_number)
+                PageHistory._store(version, base, document, latest.chain_position + 1 if latest else 0)
+                version.save()
+
+        cache.set(
+            PageHistory.cache_key(page.pk, version.version_number, version.updated_at),
+            document, VERSION_CACHE_TIMEOUT
+        )
+        return version
+
+    @staticmethod
+    def fill_text(page_id, content: Any, text: str) -> bool:
+        """
+        Запись извлеченного текста в последнюю версию страницы.
+
+        Версия записывается до фоновой переиндексации с прежним текстом
+        страницы; переиндексация дописывает текст, если содержимое версии
+        совпадает с проиндексированным. updated_at не меняется, чтобы не
+        продлевать окно объединения правок, поэтому кэш версии удаляется.
+
+        Returns:
+            True, если версия обновлена
+        """
+        with transaction.atomic():
+            latest = PageVersion.objects.select_for_update().filter(
+                page_id=page_id
+            ).order_by('-version_number').first()
+            if latest is None:
+                return False
+            _, document = PageHistory._load_document(page_id, latest.version_number)
+            if document['content_text'] == text or document['content'] != content:
+                return False
+
+            base = None
+            if not latest.is_snapshot:
+                _, base = PageHistory._load_document(page_id, latest.version_number, inclusive=False)
+            PageHistory._store(latest, base, dict(document, content_text=text), latest.chain_position)
+            latest.save(update_fields=['content', 'content_text', 'delta', 'chain_position'])
+
+        cache.delete(PageHistory.cache_key(page_id, latest.version_number, latest.updated_at))
+        return True
+
+    @staticmethod
+    def list_versions(page_id) -> List[PageVersion]:
+        """Версии страницы без содержимого"""
+        return list(
+            PageVersion.objects.filter(page_id=page_id)
+            .select_related('created_by')
+            .defer('content', 'content_text', 'delta')
+            .order_by('-version_number')
+        )
+
+    @staticmethod
+    def get_version(page_id, version_number: int) -> PageVersion:
+        """Версия страницы с восстановленными content и content_text"""
+        version = PageVersion.objects.filter(
+            page_id=page_id, version_number=version_number
+        ).select_related('created_by').defer('content', 'content_text', 'delta').first()
+        if not version:
+            raise NotFoundException("Версия не найдена")
+
+        _, document = PageHistory._load_document(page_id, version_number, updated_at=version.updated_at)
+        version.content = document['content']
+        version.content_text = document['content_text']
+        return version
+
+    @staticmethod
+    def compact(page_id, now=None) -> Tuple[int, int]:
+        """
+        Прореживание истории страницы и пересборка цепочек дельт.
+
+        Версии моложе KEEP_ALL_DAYS сохраняются все, из более старых --
+        последняя версия каждого дня. Первая и последняя версии сохраняются
+        всегда.
+
+        Returns:
+            (количество сохраненных версий, количество удаленных)
+        """
+        now = now or timezone.now()
+        cutoff = now - timedelta(days=settings.PAGE_VERSION_RETENTION['KEEP_ALL_DAYS'])
+        interval = settings.PAGE_VERSION_SNAPSHOT_INTERVAL
+
+        with transaction.atomic():
+            versions = list(
+                PageVersion.objects.select_for_update().filter(page_id=page_id).order_by('version_number')
+            )
+            if not versions:
+                return 0, 0
+
+            documents = PageHistory._replay(versions)
+            kept, removed = [], []
+            for index, version in enumerate(versions):
+                is_edge = index in (0, len(versions) - 1)
+                next_version = versions[index + 1] if index + 1 < len(versions) else None
+                last_of_day = (
+                    next_version is None
+                    or next_version.created_at.date() != version.created_at.date()
+                )
+                if is_edge or version.created_at >= cutoff or last_of_day:
+                    kept.append((version, documents[index]))
+                else:
+                    removed.append(version.pk)
+
+            changed = []
+            base, position = None, 0
+            for version, document in kept:
+                before = (version.delta, version.chain_position)
+                PageHistory._store(version, base if position < interval else None, document, position)
+                if (version.delta, version.chain_position) != before:
+                    changed.append(version)
+                base = document
+                position = version.chain_position + 1
+
+            if changed:
+                PageVersion.objects.bulk_update(
+                    changed, ['content', 'content_text', 'delta', 'chain_position']
+                )
+            if removed:
+                PageVersion.objects.filter(pk__in=removed).delete()
+
+        return len(kept), len(removed)
+
+    @staticmethod
+    def pages_to_compact(now=None) -> List[Any]:
+        """Страницы со старыми версиями или с лишними снимками"""
+        now = now or timezone.now()
+        cutoff = now - timedelta(days=settings.PAGE_VERSION_RETENTION['KEEP_ALL_DAYS'])
+        interval = settings.PAGE_VERSION_SNAPSHOT_INTERVAL
+        return list(
+            PageVersion.objects.values('page_id').annotate(
+                total=Count('id'),
+                snapshots=Count('id', filter=Q(delta__isnull=True)),
+                oldest=Min('created_at'),
+            ).filter(
+                Q(oldest__lt=cutoff) | Q(snapshots__gt=F('total') / interval + 1)
+            ).values_list('page_id', flat=True)
+        )
+
+    @staticmethod
+    def _store(version: PageVersion, base: Optional[Dict[str, Any]], document: Dict[str, Any],
+               position: int) -> None:
+        """Запись версии дельтой от base или снимком, если дельта не выгодна"""
+        delta = None
+        if base is not None:
+            delta = make_patch(base, document)
+            if len(json.dumps(delta, default=str)) * 2 >= len(json.dumps(document, default=str)):
+                delta = None
+
+        if delta is None:
+            version.content = document['content']
+            version.content_text = document['content_text']
+            version.delta = None
+            version.chain_position = 0
+        else:
+            version.content = None
+            version.content_text = ''
+            version.delta = delta
+            version.chain_position = position
+
+    @staticmethod
+    def _load_document(page_id, version_number: int, inclusive: bool = True,
+                       updated_at=None) -> Tuple[int, Dict[str, Any]]:
+        """
+        Восстановление версии по цепочке от ближайшего снимка.
+
+        Кэш читается, только если известен updated_at версии; при записи
+        (без него) база дельты всегда собирается из БД.
+        """
+        if inclusive and updated_at is not None:
+            cached = cache.get(PageHistory.cache_key(page_id, version_number, updated_at))
+            if cached is not None:
+                return version_number, cached
+
+        lookup = 'version_number__lte' if inclusive else 'version_number__lt'
+        queryset = PageVersion.objects.filter(
+            page_id=page_id, **{lookup: version_number}
+        ).order_by('-version_number').only('version_number', 'content', 'content_text', 'delta', 'updated_at')
+
+        rows = list(queryset[:settings.PAGE_VERSION_SNAPSHOT_INTERVAL])
+        if not any(row.is_snapshot for row in rows):
+            # Цепочка длиннее интервала (например, после изменения настройки)
+            rows = list(queryset)
+
+        chain = []
+        for row in rows:
+            chain.append(row)
+            if row.is_snapshot:
+                break
+        chain.reverse()
+        if not chain or not chain[0].is_snapshot:
+            raise NotFoundException("Версия не найдена")
+
+        document = PageHistory._replay(chain)[-1]
+        number = chain[-1].version_number
+        cache.set(PageHistory.cache_key(page_id, number, chain[-1].updated_at), document, VERSION_CACHE_TIMEOUT)
+        return number, document
+
+    @staticmethod
+    def _replay(versions: List[PageVersion]) -> List[Dict[str, Any]]:
+        """Содержимое каждой версии последовательной цепочки"""
+        documents = []
+        document = None
+        for version in versions:
+            if version.is_snapshot:
+                document = {'content': version.content, 'content_text': version.content_text}
+            else:
+                document = apply_patch(document, version.delta)
+            documents.append(document)
+        return documents
@@ -0,0 +1,204 @@
+"""
+Извлечение текста страниц для поиска
+
+Содержимое бывает трех видов: HTML редактора (строка), TipTap JSON
+(``{"type": "doc", "content": [...]}``) и блочный документ
+(``{"blocks": [...]}``, см. block_storage). Документ делится на сегменты
+верхнего уровня (абзацы, узлы, блоки); текст сегмента кэшируется по хешу,
+и при сохранении заново разбираются только измененные сегменты.
+
+Извлечение выполняется в фоновой очереди после фиксации транзакции и
+пишет Page.content_text, запись SearchIndex страницы и текст последней
+версии истории (PageHistory.fill_text), если версия соответствует
+проиндексированному содержимому.
+"""
+import hashlib
+import html
+import json
+import re
+from html.parser import HTMLParser
+from typing import Any, Dict, List, Optional, Tuple
+
+from django.core.cache import cache
+
+from backend.apps.notes.models import Page
+from backend.apps.search.models import SearchIndex
+from backend.core.background import background
+from backend.services.block_storage import BlockStorage
+from backend.services.page_history import PageHistory
+
+SEGMENT_CACHE_TIMEOUT = 24 * 60 * 60
+
+# Граница сегментов HTML: закрывающий тег блочного элемента
+HTML_SEGMENT_BOUNDARY = re.compile(
+    r'(</(?:p|h[1-6]|li|ul|ol|blockquote|pre|div|table|tr)\s*>)', re.IGNORECASE
+)
+BLOCK_TAGS = {
+    'p', 'h1', 'h2', 'h3', 'h4', 'h5', 'h6', 'li', 'blockquote', 'pre',
+    'div', 'tr', 'td', 'th', 'br',
+}
+# Ключи блочного содержимого, не являющиеся текстом
+NON_TEXT_KEYS = {'id', 'type', 'url', 'src', 'href', 'color', 'checked', 'language', 'marks', 'attrs'}
+
+
+class _HTMLTextParser(HTMLParser):
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.parts: List[str] = []
+
+    def handle_starttag(self, tag, attrs):
+        if tag in BLOCK_TAGS:
+            self.parts.append(' ')
+
+    def handle_endtag(self, tag):
+        if tag in BLOCK_TAGS:
+            self.parts.append(' ')
+
+    def handle_data(self, data):
+        self.parts.append(data)
+
+
+def _normalize(text: str) -> str:
+    return ' '.join(text.split())
+
+
+class PageTextExtractor:
+    """Инкрементальное извлечение текста из содержимого страницы"""
+
+    @staticmethod
+    def segments(content: Any) -> List[Any]:
+        """Сегменты верхнего уровня, текст которых извлекается независимо"""
+        if isinstance(content, str):
+            parts = HTML_SEGMENT_BOUNDARY.split(content)
+            # Сегмент -- фрагмент вместе со своим закрывающим тегом
+            segments = [''.join(parts[index:index + 2]) for index in range(0, len(parts), 2)]
+            return [segment for segment in segments if segment.strip()]
+        if isinstance(content, dict):
+            if isinstance(content.get('blocks'), list):
+                head = [content['text']] if content.get('text') else []
+                return head + content['blocks']
+            if isinstance(content.get('content'), list):
+                return content['content']
+            return [content]
+        if isinstance(content, list):
+            return content
+        return [] if content is None else [str(content)]
+
+    @staticmethod
+    def segment_text(segment: Any) -> str:
+        """Текст одного сегмента"""
+        if isinstance(segment, str):
+            parser = _HTMLTextParser()
+            parser.feed(segment)
+            parser.close()
+            return _normalize(html.unescape(''.join(parser.parts)))
+
+        parts: List[str] = []
+
+        def walk(node):
+            if isinstance(node, str):
+                parts.extend((' ', node, ' '))
+            elif isinstance(node, list):
+                for item in node:
+                    walk(item)
+            elif isinstance(node, dict):
+                if node.get('type') == 'text' and isinstance(node.get('text'), str):
+                    # Текстовые узлы TipTap делятся по разметке внутри слова
+                    parts.append(node['text'])
+                    return
+                parts.append(' ')
+                for key, value in node.items():
+                    if key not in NON_TEXT_KEYS:
+                        walk(value)
+                parts.append(' ')
+
+        walk(segment)
+        return _normalize(''.join(parts))
+
+    @staticmethod
+    def segment_hash(segment: Any) -> str:
+        if isinstance(segment, str):
+            payload = segment.encode()
+        else:
+            payload = json.dumps(segment, sort_keys=True, default=str).encode()
+        return hashlib.blake2b(payload, digest_size=16).hexdigest()
+
+    @staticmethod
+    def extract(content: Any, known: Optional[Dict[str, str]] = None) -> Tuple[str, Dict[str, str], int]:
+        """
+        Текст содержимого.
+
+        Args:
+            known: тексты сегментов предыдущего извлечения по хешу
+
+        Returns:
+            (текст, тексты текущих сегментов по хешу, число разобранных сегментов)
+        """
+        known = known or {}
+        texts: Dict[str, str] = {}
+        parts = []
+        parsed = 0
+        for segment in PageTextExtractor.segments(content):
+            digest = PageTextExtractor.segment_hash(segment)
+            text = texts.get(digest)
+            if text is None:
+                text = known.get(digest)
+            if text is None:
+                text = PageTextExtractor.segment_text(segment)
+                parsed += 1
+            texts[digest] = text
+            if text:
+                parts.append(text)
+        return ' '.join(parts), texts, parsed
+
+
+class PageTextIndexer:
+    """Фоновое обновление content_text и поискового индекса страниц"""
+
+    @staticmethod
+    def cache_key(page_id) -> str:
+        return f'page_text_segments:{page_id}'
+
+    @staticmethod
+    def schedule(page_id) -> None:
+        """Переиндексация после фиксации транзакции; повторные постановки объединяются"""
+        background.enqueue_on_commit(PageTextIndexer.reindex, page_id, key=('page_text', str(page_id)))
+
+    @staticmethod
+    def extract_text(page_id, content: Any) -> str:
+        """Текст содержимого страницы с кэшем сегментов предыдущего извлечения"""
+        key = PageTextIndexer.cache_key(page_id)
+        text, segments, _ = PageTextExtractor.extract(content, cache.get(key))
+        cache.set(key, segments, SEGMENT_CACHE_TIMEOUT)
+        return text
+
+    @staticmethod
+    def reindex(page_id) -> Optional[str]:
+        """Извлечение текста страницы и запись в content_text и SearchIndex"""
+        page = Page.objects.filter(pk=page_id).only(
+            'id', 'title', 'content', 'content_text', 'blocks_revision', 'content_revision',
+            'workspace', 'is_deleted'
+        ).first()
+        if page is None:
+            return None
+        if page.is_deleted:
+            SearchIndex.objects.filter(content_type='page', object_id=page.pk).delete()
+            return None
+
+        content = BlockStorage.materialize(page)
+        text = PageTextIndexer.extract_text(page.pk, content)
+        if text != page.content_text:
+            Page.objects.filter(pk=page.pk).update(content_text=text)
+        PageHistory.fill_text(page.pk, content, text)
+
+        tags = ','.join(page.tags.values_list('name', flat=True))
+        updated = SearchIndex.objects.filter(content_type='page', object_id=page.pk).update(
+            workspace_id=page.workspace_id, title=page.title, content=text, tags=tags
+        )
+        if not updated:
+            SearchIndex.objects.create(
+                content_type='page', object_id=page.pk, workspace_id=page.workspace_id,
+                title=page.title, content=text, tags=tags
+            )
+        return text
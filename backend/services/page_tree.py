@@ -0,0 +1,147 @@
+"""
+Дерево страниц на материализованном пути
+
+``Page.tree_path`` содержит hex id всех предков и самой страницы, поэтому
+поддерево -- один запрос ``tree_path LIKE '<путь>%'``, а предки известны
+без обхода ``parent``. Путь поддерживает ``Page.save``: смена родителя
+переносит поддерево одним UPDATE.
+"""
+import uuid
+from typing import Any, Dict, Iterable, List, Optional
+
+from django.contrib.auth import get_user_model
+from django.db.models import Count, IntegerField, OuterRef, QuerySet, Subquery
+from django.db.models.functions import Coalesce
+
+from backend.apps.notes.models import Page
+from backend.apps.workspaces.models import Workspace
+from backend.core.exceptions import NotFoundException, ValidationException
+
+User = get_user_model()
+
+
+class PageTree:
+    """Запросы к иерархии страниц"""
+
+    @staticmethod
+    def with_children_count(queryset: QuerySet, include_archived: bool = False) -> QuerySet:
+        """
+        Аннотация children_count подзапросом: неудаленные дочерние
+        страницы, архивные -- только при include_archived (как в get_tree)
+        """
+        children = Page.objects.filter(parent=OuterRef('pk'), is_deleted=False)
+        if not include_archived:
+            children = children.filter(is_archived=False)
+        children = children.order_by().values('parent').annotate(total=Count('pk')).values('total')
+        return queryset.annotate(
+            children_count=Coalesce(Subquery(children, output_field=IntegerField()), 0)
+        )
+
+    @staticmethod
+    def subtree(page: Page, include_self: bool = True) -> QuerySet:
+        """Страница и все ее потомки"""
+        queryset = Page.objects.filter(tree_path__startswith=page.tree_path)
+        if not include_self:
+            queryset = queryset.exclude(pk=page.pk)
+        return queryset
+
+    @staticmethod
+    def ancestors(page: Page) -> QuerySet:
+        """Предки страницы от корня"""
+        return Page.objects.filter(id__in=page.ancestor_ids()).order_by('depth')
+
+    @staticmethod
+    def attach_paths(pages: Iterable[Page]) -> None:
+        """Заголовки предков для Page.get_path одним запросом на весь список"""
+        pages = list(pages)
+        ancestor_ids = {page_id for page in pages for page_id in page.ancestor_ids()}
+        titles = dict(
+            Page.objects.filter(id__in=ancestor_ids).values_list('id', 'title')
+        ) if ancestor_ids else {}
+        for page in pages:
+            page._path_titles = [
+                titles[page_id] for page_id in page.ancestor_ids() if page_id in titles
+            ]
+
+    @staticmethod
+    def get_tree(
+        user: User,
+        workspace_id: Optional[int] = None,
+        root_id: Optional[str] = None,
+        depth: Optional[int] = None,
+        show_archived: bool = False
+    ) -> List[Dict[str, Any]]:
+        """
+        Дерево страниц рабочего пространства одним запросом.
+
+        Args:
+            root_id: вернуть только потомков этой страницы
+            depth: число уровней; у узлов последнего уровня остается
+                children_count для ленивого раскрытия
+
+        Returns:
+            Список корневых узлов с вложенными children
+        """
+        if depth is not None and depth < 1:
+            raise ValidationException('depth должен быть положительным')
+        if workspace_id and not str(workspace_id).isdigit():
+            raise ValidationException('Некорректный workspace')
+        if root_id:
+            try:
+                root_id = uuid.UUID(str(root_id))
+            except ValueError:
+                raise ValidationException('Некорректный root')
+
+        root = None
+        if root_id:
+            root = Page.objects.filter(
+                id=root_id, workspace__members__user=user, is_deleted=False
+            ).only('id', 'workspace_id', 'tree_path', 'depth').first()
+            if not root:
+                raise NotFoundException("Страница не найдена")
+            workspace_id = root.workspace_id
+        elif not workspace_id:
+            raise ValidationException('Укажите workspace или root')
+        elif not Workspace.objects.filter(id=workspace_id, members__user=user).exists():
+            raise NotFoundException("Рабочее пространство не найдено")
+
+        queryset = Page.objects.filter(
+            workspace_id=workspace_id, is_deleted=False, is_template=False
+        )
+        if not show_archived:
+            queryset = queryset.filter(is_archived=False)
+
+        base_depth = -1
+        if root is not None:
+            base_depth = root.depth
+            queryset = queryset.filter(tree_path__startswith=root.tree_path, depth__gt=root.depth)
+        if depth is not None:
+            queryset = queryset.filter(depth__lte=base_depth + depth)
+
+        rows = PageTree.with_children_count(queryset, include_archived=show_archived).order_by(
+            'depth', 'position', '-updated_at'
+        ).values('id', 'title', 'icon', 'parent_id', 'position', 'depth', 'children_count')
+
+        nodes = {}
+        top = []
+        top_parent = root.id if root is not None else None
+        for row in rows:
+            node = {
+                'id': row['id'],
+                'title': row['title'],
+                'icon': row['icon'],
+                'parent': row['parent_id'],
+                'position': row['position'],
+                'depth': row['depth'],
+                'children_count': row['children_count'],
+                'children': [],
+            }
+            if row['parent_id'] == top_parent:
+                top.append(node)
+            elif row['parent_id'] in nodes:
+                nodes[row['parent_id']]['children'].append(node)
+            else:
+                # Родитель скрыт (архив), поддерево в сайдбаре не показывается
+                continue
+            nodes[row['id']] = node
+        return top
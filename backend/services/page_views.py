@@ -0,0 +1,216 @@
+"""
+Учет просмотров страниц
+
+Просмотры копятся в буфере процесса и сбрасываются пакетом: bulk_create
+сырых PageView и инкремент почасовых и дневных PageViewRollup. Сброс
+происходит не позже PAGE_VIEW_FLUSH_INTERVAL секунд после первого
+просмотра в буфере или сразу при PAGE_VIEW_BUFFER_SIZE просмотрах.
+Просмотры удаленных к моменту сброса страниц отбрасываются.
+
+Аналитика читает счетчики; дневные выборки (views_by_day,
+annotate_view_count) начинаются с начала дня since по UTC, а
+workspace_views досчитывает неполный первый день по сырым PageView.
+"""
+import atexit
+import logging
+import threading
+from collections import Counter, defaultdict
+from datetime import datetime, timedelta, timezone as dt_timezone
+from typing import Any, Dict, List, Optional, Tuple
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F, IntegerField, OuterRef, Q, QuerySet, Subquery, Sum
+from django.db.models.functions import Coalesce, TruncDay, TruncHour
+from django.utils import timezone
+
+from backend.apps.notes.models import Page, PageView, PageViewRollup
+from backend.core.background import background
+
+logger = logging.getLogger(__name__)
+
+
+def hour_bucket(moment: datetime) -> datetime:
+    return moment.astimezone(dt_timezone.utc).replace(minute=0, second=0, microsecond=0)
+
+
+def day_bucket(moment: datetime) -> datetime:
+    return hour_bucket(moment).replace(hour=0)
+
+
+class PageViewBuffer:
+    """Буфер просмотров процесса"""
+
+    def __init__(self):
+        self._views: List[Tuple[PageView, Any]] = []
+        self._lock = threading.Lock()
+        self._timer: Optional[threading.Timer] = None
+
+    def record(self, page, user=None, ip_address: Optional[str] = None, user_agent: str = '') -> None:
+        """Регистрация просмотра; запись в базу откладывается до сброса"""
+        view = PageView(
+            page_id=page.pk,
+            user_id=getattr(user, 'pk', None),
+            ip_address=ip_address or None,
+            user_agent=user_agent[:1000],
+            viewed_at=timezone.now(),
+        )
+        interval = settings.PAGE_VIEW_FLUSH_INTERVAL
+        with self._lock:
+            self._views.append((view, page.workspace_id))
+            full = interval <= 0 or len(self._views) >= settings.PAGE_VIEW_BUFFER_SIZE
+            if not full and self._timer is None:
+                self._timer = threading.Timer(interval, self.schedule_flush)
+                self._timer.daemon = True
+                self._timer.start()
+        if full:
+            self.schedule_flush()
+
+    def schedule_flush(self) -> None:
+        background.enqueue(self.flush, key='page_view_flush')
+
+    def pending(self) -> int:
+        return len(self._views)
+
+    def discard(self) -> int:
+        """Сброс буфера без записи; возвращает количество отброшенных просмотров"""
+        return len(self._take())
+
+    def flush(self) -> int:
+        """Запись накопленных просмотров; возвращает их количество"""
+        views = self._take()
+        if not views:
+            return 0
+        page_ids = set(Page.objects.filter(
+            id__in={view.page_id for view, _ in views}
+        ).order_by().values_list('id', flat=True))
+        # Просмотры удаленных страниц отбрасываются
+        views = [(view, workspace_id) for view, workspace_id in views if view.page_id in page_ids]
+        if not views:
+            return 0
+
+        try:
+            PageViewRollups.write([view for view, _ in views], [workspace_id for _, workspace_id in views])
+        except IntegrityError:
+            # Страница удалена между проверкой и записью: повтор пакета
+            # упадет так же, поэтому просмотры не возвращаются в буфер
+            logger.exception('Отброшено %s просмотров страниц', len(views))
+            return 0
+        except Exception:
+            # Временная ошибка базы: просмотры возвращаются в буфер до следующего сброса
+            logger.exception('Не удалось записать %s просмотров страниц', len(views))
+            with self._lock:
+                self._views[:0] = views
+            raise
+        return len(views)
+
+    def _take(self) -> List[Tuple[PageView, Any]]:
+        with self._lock:
+            views, self._views = self._views, []
+            if self._timer is not None:
+                self._timer.cancel()
+                self._timer = None
+        return views
+
+
+class PageViewRollups:
+    """Запись и чтение счетчиков просмотров"""
+
+    @staticmethod
+    def write(views: List[PageView], workspace_ids: List[Any]) -> None:
+        """bulk_create сырых просмотров и атомарный инкремент счетчиков"""
+        counts: Counter = Counter()
+        for view, workspace_id in zip(views, workspace_ids):
+            counts[(view.page_id, workspace_id, 'hour', hour_bucket(view.viewed_at))] += 1
+            counts[(view.page_id, workspace_id, 'day', day_bucket(view.viewed_at))] += 1
+
+        with transaction.atomic():
+            PageView.objects.bulk_create(views, batch_size=1000)
+            PageViewRollup.objects.bulk_create(
+                [
+                    PageViewRollup(page_id=page_id, workspace_id=workspace_id,
+                                   granularity=granularity, bucket=bucket, views=0)
+                    for page_id, workspace_id, granularity, bucket in counts
+                ],
+                ignore_conflicts=True,
+                batch_size=1000,
+            )
+            # Один UPDATE на каждое различное приращение, без чтения счетчиков
+            by_increment = defaultdict(list)
+            for (page_id, _, granularity, bucket), increment in counts.items():
+                by_increment[increment].append(Q(page_id=page_id, granularity=granularity, bucket=bucket))
+            for increment, conditions in by_increment.items():
+                condition = Q()
+                for item in conditions:
+                    condition |= item
+                PageViewRollup.objects.filter(condition).update(views=F('views') + increment)
+
+    @staticmethod
+    def rebuild(since: datetime) -> int:
+        """Пересчет счетчиков по сырым просмотрам начиная с since"""
+        since = day_bucket(since)
+        total = 0
+        with transaction.atomic():
+            PageViewRollup.objects.filter(bucket__gte=since).delete()
+            for granularity, trunc in (('hour', TruncHour), ('day', TruncDay)):
+                rows = PageView.objects.filter(viewed_at__gte=since).annotate(
+                    bucket=trunc('viewed_at')
+                ).values('page_id', 'page__workspace_id', 'bucket').annotate(views=Count('id')).order_by()
+                created = PageViewRollup.objects.bulk_create(
+                    [
+                        PageViewRollup(
+                            page_id=row['page_id'], workspace_id=row['page__workspace_id'],
+                            granularity=granularity, bucket=row['bucket'], views=row['views']
+                        )
+                        for row in rows
+                    ],
+                    batch_size=1000,
+                )
+                total += len(created)
+        return total
+
+    @staticmethod
+    def workspace_views(workspace, since: datetime) -> int:
+        """
+        Просмотры страниц пространства начиная с момента since.
+
+        Полные дни -- из дневных счетчиков, неполный первый день -- по
+        сырым просмотрам (не больше суток, индекс (page, viewed_at)).
+        """
+        next_day = day_bucket(since) + timedelta(days=1)
+        partial = PageView.objects.filter(
+            page__workspace=workspace, viewed_at__gte=since, viewed_at__lt=next_day
+        ).count()
+        return partial + PageViewRollup.objects.filter(
+            workspace=workspace, granularity='day', bucket__gte=next_day
+        ).aggregate(total=Coalesce(Sum('views'), 0))['total']
+
+    @staticmethod
+    def views_by_day(workspace, since: datetime) -> Dict[str, int]:
+        """Просмотры по дням UTC начиная с дня since (целиком): {'YYYY-MM-DD': views}"""
+        rows = PageViewRollup.objects.filter(
+            workspace=workspace, granularity='day', bucket__gte=day_bucket(since)
+        ).values('bucket').annotate(total=Sum('views')).order_by()
+        return {row['bucket'].date().isoformat(): row['total'] for row in rows}
+
+    @staticmethod
+    def annotate_view_count(pages: QuerySet, since: Optional[datetime] = None) -> QuerySet:
+        """Аннотация view_count из дневных счетчиков (since округляется до начала дня UTC)"""
+        rollups = PageViewRollup.objects.filter(page=OuterRef('pk'), granularity='day')
+        if since is not None:
+            rollups = rollups.filter(bucket__gte=day_bucket(since))
+        total = rollups.order_by().values('page').annotate(total=Sum('views')).values('total')
+        return pages.annotate(
+            view_count=Coalesce(Subquery(total, output_field=IntegerField()), 0)
+        )
+
+
+page_view_buffer = PageViewBuffer()
+
+
+@atexit.register
+def _flush_at_exit():
+    try:
+        page_view_buffer.flush()
+    except Exception:
+        pass
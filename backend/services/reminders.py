@@ -0,0 +1,208 @@
+"""
+Отправка напоминаний и уведомлений о сроках задач
+
+Наступившие Reminder и задачи, срок которых подходит, выбираются пачками
+по частичным индексам (неотправленные напоминания, неуведомленные
+незавершенные задачи), поэтому стоимость прохода зависит от числа
+наступивших записей, а не от размера таблиц. Пачка блокируется через
+SELECT ... FOR UPDATE SKIP LOCKED: несколько диспетчеров разбирают
+очередь параллельно, не ожидая друг друга и не отправляя одно и то же
+дважды. Notification создаются одним bulk_create на пачку, отметка об
+отправке -- одним UPDATE.
+
+Диспетчер (DueSchedule, команда dispatch_reminders) держит в куче
+ближайшие моменты срабатывания и спит до первого из них, а не опрашивает
+таблицы с постоянным интервалом.
+"""
+import heapq
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional
+
+from django.conf import settings
+from django.contrib.contenttypes.models import ContentType
+from django.db import transaction
+from django.db.models import QuerySet
+from django.utils import timezone
+
+from backend.apps.notifications.models import Notification, NotificationSettings, Reminder
+from backend.apps.tasks.models import Task
+
+
+DEFAULT_BATCH_SIZE = 500
+
+
+def due_notice_lead() -> timedelta:
+    """За сколько до срока уведомлять о задаче"""
+    return timedelta(minutes=settings.TASK_DUE_NOTICE_MINUTES)
+
+
+class ReminderDispatcher:
+    """Пакетная отправка напоминаний и уведомлений о сроках"""
+
+    @staticmethod
+    def overdue_tasks(queryset: Optional[QuerySet] = None, now: Optional[datetime] = None) -> QuerySet:
+        """Просроченные задачи одним запросом (частичный индекс по due_date)"""
+        queryset = Task.objects.all() if queryset is None else queryset
+        return queryset.filter(due_date__lt=now or timezone.now()).exclude(status='done')
+
+    @staticmethod
+    def dispatch(now: Optional[datetime] = None, batch_size: int = DEFAULT_BATCH_SIZE) -> Dict[str, int]:
+        """Отправка всего наступившего к now; возвращает количество по видам"""
+        now = now or timezone.now()
+        sent = {'reminders': 0, 'tasks': 0}
+        while True:
+            count = ReminderDispatcher.dispatch_reminders(now, batch_size)
+            sent['reminders'] += count
+            if count < batch_size:
+                break
+        while True:
+            count = ReminderDispatcher.dispatch_due_tasks(now, batch_size)
+            sent['tasks'] += count
+            if count < batch_size:
+                break
+        return sent
+
+    @staticmethod
+    def dispatch_reminders(now: datetime, batch_size: int = DEFAULT_BATCH_SIZE) -> int:
+        """Одна пачка наступивших напоминаний; возвращает ее размер"""
+        with transaction.atomic():
+            reminders = list(
+                Reminder.objects.select_for_update(skip_locked=True)
+                .filter(is_sent=False, remind_at__lte=now)
+                .order_by('remind_at')[:batch_size]
+            )
+            if not reminders:
+                return 0
+            Notification.objects.bulk_create([
+                Notification(
+                    recipient_id=reminder.user_id,
+                    type='reminder',
+                    title=reminder.title,
+                    message=reminder.message,
+                    content_type_id=reminder.content_type_id,
+                    object_id=reminder.object_id,
+                    metadata={'reminder_id': str(reminder.id), 'remind_at': reminder.remind_at.isoformat()},
+                )
+                for reminder in reminders
+            ], batch_size=batch_size)
+            Reminder.objects.filter(id__in=[reminder.id for reminder in reminders]).update(
+                is_sent=True, sent_at=now
+            )
+        return len(reminders)
+
+    @staticmethod
+    def dispatch_due_tasks(now: datetime, batch_size: int = DEFAULT_BATCH_SIZE) -> int:
+        """
+        Одна пачка задач, срок которых наступит в пределах due_notice_lead().
+
+        Уведомляются исполнители, а если их нет -- автор задачи; пользователи
+        с выключенным push_on_task_due пропускаются.
+        """
+        with transaction.atomic():
+            tasks = list(
+                ReminderDispatcher._pending_tasks()
+                .select_for_update(skip_locked=True)
+                .filter(due_date__lte=now + due_notice_lead())
+                .order_by('due_date')
+                .only('id', 'title', 'due_date', 'created_by_id', 'board_id')[:batch_size]
+            )
+            if not tasks:
+                return 0
+
+            recipients: Dict[Any, List[Any]] = {task.id: [] for task in tasks}
+            for task_id, user_id in Task.assignees.through.objects.filter(
+                task_id__in=list(recipients)
+            ).values_list('task_id', 'user_id'):
+                recipients[task_id].append(user_id)
+            muted = set(NotificationSettings.objects.filter(
+                push_on_task_due=False,
+                user_id__in={user_id for users in recipients.values() for user_id in users}
+                | {task.created_by_id for task in tasks},
+            ).values_list('user_id', flat=True))
+
+            content_type = ContentType.objects.get_for_model(Task)
+            Notification.objects.bulk_create([
+                Notification(
+                    recipient_id=user_id,
+                    type='task_due',
+                    title=task.title,
+                    message=(
+                        f'Срок задачи истек {task.due_date:%d.%m.%Y %H:%M}' if task.due_date <= now
+                        else f'Срок задачи: {task.due_date:%d.%m.%Y %H:%M}'
+                    ),
+                    content_type=content_type,
+                    object_id=str(task.id),
+                    metadata={'board_id': str(task.board_id), 'due_date': task.due_date.isoformat()},
+                )
+                for task in tasks
+                for user_id in (recipients[task.id] or [task.created_by_id])
+                if user_id not in muted
+            ], batch_size=batch_size)
+            Task.objects.filter(id__in=list(recipients)).update(due_notified_at=now)
+        return len(tasks)
+
+    @staticmethod
+    def upcoming(limit: int = DEFAULT_BATCH_SIZE, until: Optional[datetime] = None) -> List[datetime]:
+        """Ближайшие моменты срабатывания (по частичным индексам), по возрастанию"""
+        reminders = Reminder.objects.filter(is_sent=False)
+        tasks = ReminderDispatcher._pending_tasks()
+        lead = due_notice_lead()
+        if until is not None:
+            reminders = reminders.filter(remind_at__lte=until)
+            tasks = tasks.filter(due_date__lte=until + lead)
+        moments = list(reminders.order_by('remind_at').values_list('remind_at', flat=True)[:limit])
+        moments += [
+            due_date - lead
+            for due_date in tasks.order_by('due_date').values_list('due_date', flat=True)[:limit]
+        ]
+        return heapq.nsmallest(limit, moments)
+
+    @staticmethod
+    def reset_due_notice(task: Task, previous_due_date: Optional[datetime]) -> None:
+        """Повторное уведомление, если срок задачи изменился"""
+        if task.due_notified_at is not None and task.due_date != previous_due_date:
+            task.due_notified_at = None
+
+    @staticmethod
+    def _pending_tasks() -> QuerySet:
+        return Task.objects.filter(
+            due_date__isnull=False, due_notified_at__isnull=True
+        ).exclude(status='done')
+
+
+class DueSchedule:
+    """
+    Куча ближайших моментов срабатывания для диспетчера.
+
+    Куча пополняется из базы окном не дальше horizon; новые напоминания,
+    созданные после пополнения, подхватываются не позже чем через horizon.
+    """
+
+    def __init__(self, horizon: timedelta = timedelta(minutes=1), window: int = DEFAULT_BATCH_SIZE):
+        self.horizon = horizon
+        self.window = window
+        self._heap: List[datetime] = []
+        self._loaded_until: Optional[datetime] = None
+
+    def refresh(self, now: datetime) -> None:
+        self._loaded_until = now + self.horizon
+        self._heap = ReminderDispatcher.upcoming(self.window, until=self._loaded_until)
+        heapq.heapify(self._heap)
+
+    def next_wakeup(self, now: datetime) -> datetime:
+        """Момент следующего прохода: первое срабатывание или граница окна"""
+        if self._loaded_until is None or now >= self._loaded_until:
+            self.refresh(now)
+        while self._heap and self._heap[0] <= now:
+            heapq.heappop(self._heap)
+        if self._heap:
+            return min(self._heap[0], self._loaded_until)
+        return self._loaded_until
+
+    def run_due(self, now: datetime, batch_size: int = DEFAULT_BATCH_SIZE) -> Dict[str, int]:
+        """Отправка наступившего; куча перечитывается, если что-то было отправлено"""
+        sent = ReminderDispatcher.dispatch(now, batch_size)
+        if any(sent.values()):
+            self._loaded_until = None
+        return sent
+
@@ -0,0 +1,259 @@
+"""
+Журнал активности задач
+
+TaskService считает разницу полей задачи до и после изменения в памяти и
+ставит событие в буфер процесса; строки TaskActivity пишутся одним
+bulk_create в фоновой очереди после фиксации транзакции, поэтому запись
+журнала не добавляет запросов к пути запроса. Время события фиксируется
+при постановке в буфер. Лента задачи отдается страницами по курсору
+(created_at, id).
+"""
+import base64
+import json
+import logging
+import threading
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from django.contrib.auth import get_user_model
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import IntegrityError
+from django.db.models import Q
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from backend.apps.tasks.models import Task, TaskActivity
+from backend.core.background import background
+from backend.core.exceptions import NotFoundException, ValidationException
+
+User = get_user_model()
+logger = logging.getLogger(__name__)
+
+# Поля задачи, изменения которых попадают в журнал
+TRACKED_FIELDS = (
+    'title', 'description', 'status', 'priority', 'column_id',
+    'due_date', 'start_date', 'estimated_hours',
+)
+
+DEFAULT_FEED_LIMIT = 50
+MAX_FEED_LIMIT = 200
+
+
+def _json_value(value: Any) -> Any:
+    if value is None or isinstance(value, (str, int, float, bool)):
+        return value
+    return DjangoJSONEncoder().default(value)
+
+
+class TaskActivityBuffer:
+    """Буфер событий активности процесса"""
+
+    def __init__(self):
+        self._events: List[TaskActivity] = []
+        self._lock = threading.Lock()
+
+    def add(self, events: List[TaskActivity]) -> None:
+        """Постановка событий; запись -- в фоновой очереди после фиксации"""
+        with self._lock:
+            self._events.extend(events)
+        background.enqueue_on_commit(self.flush, key='task_activity_flush')
+
+    def pending(self) -> int:
+        return len(self._events)
+
+    def discard(self) -> int:
+        """Сброс буфера без записи; возвращает количество отброшенных событий"""
+        return len(self._take())
+
+    def flush(self) -> int:
+        """Запись накопленных событий; возвращает их количество"""
+        events = self._take()
+        if not events:
+            return 0
+        task_ids = set(Task.objects.filter(
+            id__in={event.task_id for event in events}
+        ).order_by().values_list('id', flat=True))
+        # События удаленных задач отбрасываются
+        rows = [event for event in events if event.task_id in task_ids]
+        try:
+            TaskActivity.objects.bulk_create(rows, batch_size=1000)
+        except IntegrityError:
+            # Задача или автор удалены между проверкой и записью: повтор
+            # пакета упадет так же, поэтому события не возвращаются в буфер
+            logger.exception('Отброшено %s событий активности задач', len(rows))
+            return 0
+        except Exception:
+            # Временная ошибка базы: события возвращаются в буфер до следующего сброса
+            logger.exception('Не удалось записать %s событий активности задач', len(rows))
+            with self._lock:
+                self._events[:0] = rows
+            raise
+        return len(rows)
+
+    def _take(self) -> List[TaskActivity]:
+        with self._lock:
+            events, self._events = self._events, []
+        return events
+
+
+activity_buffer = TaskActivityBuffer()
+
+
+class TaskActivityLog:
+    """Запись и чтение активности задач"""
+
+    @staticmethod
+    def snapshot(task: Task) -> Dict[str, Any]:
+        """Значения отслеживаемых полей задачи"""
+        return {field: getattr(task, field) for field in TRACKED_FIELDS}
+
+    @staticmethod
+    def diff(before: Dict[str, Any], after: Dict[str, Any]) -> Dict[str, List[Any]]:
+        """Измененные поля: {поле: [старое, новое]} в виде JSON"""
+        return {
+            field: [_json_value(before[field]), _json_value(after[field])]
+            for field in TRACKED_FIELDS
+            if before[field] != after[field]
+        }
+
+    @staticmethod
+    def created(task: Task, user: User) -> None:
+        TaskActivityLog._record([
+            TaskActivityLog._event(task, user, 'created', 'Задача создана', {'column_id': str(task.column_id)})
+        ])
+
+    @staticmethod
+    def changed(task: Task, user: User, before: Dict[str, Any]) -> Optional[TaskActivity]:
+        """Событие по разнице состояний; None, если ничего не изменилось"""
+        entry = TaskActivityLog.changes_entry(task, before)
+        if entry is None:
+            return None
+        event = TaskActivityLog._event(entry[0], user, *entry[1:])
+        TaskActivityLog._record([event])
+        return event
+
+    @staticmethod
+    def moved(tasks: List[Task], user: User, columns: Dict[Any, Any]) -> None:
+        """События перемещения задач; columns -- исходные колонки по id задачи"""
+        TaskActivityLog._record([
+            TaskActivityLog._event(
+                task, user, 'moved', TaskActivityLog._description(task, {'column_id': []}),
+                {'changes': {'column_id': [_json_value(columns[task.id]), _json_value(task.column_id)]}},
+            )
+            for task in tasks
+            if columns[task.id] != task.column_id
+        ])
+
+    @staticmethod
+    def bulk(user: User, entries: Iterable[Tuple[Task, str, str, Dict[str, Any]]]) -> int:
+        """
+        Пачка событий одной постановкой в буфер.
+
+        Args:
+            entries: (задача, тип, описание, metadata)
+        """
+        events = [
+            TaskActivityLog._event(task, user, activity_type, description, metadata)
+            for task, activity_type, description, metadata in entries
+        ]
+        TaskActivityLog._record(events)
+        return len(events)
+
+    @staticmethod
+    def changes_entry(task: Task, before: Dict[str, Any]) -> Optional[Tuple[Task, str, str, Dict[str, Any]]]:
+        """Событие по разнице состояний для bulk; None, если ничего не изменилось"""
+        changes = TaskActivityLog.diff(before, TaskActivityLog.snapshot(task))
+        if not changes:
+            return None
+        return (
+            task,
+            TaskActivityLog._activity_type(changes),
+            TaskActivityLog._description(task, changes),
+            {'changes': changes},
+        )
+
+    @staticmethod
+    def feed(
+        task_id: str,
+        user: User,
+        cursor: Optional[str] = None,
+        limit: Optional[Any] = None
+    ) -> Tuple[List[TaskActivity], Optional[str]]:
+        """
+        Страница ленты задачи, от новых к старым.
+
+        Returns:
+            (события, курсор следующей страницы или None)
+        """
+        if not Task.objects.filter(id=task_id, board__workspace__members__user=user).exists():
+            raise NotFoundException("Задача не найдена")
+        limit = TaskActivityLog._limit(limit)
+
+        queryset = TaskActivity.objects.filter(task_id=task_id).select_related('user')
+        if cursor:
+            created_at, activity_id = TaskActivityLog.decode_cursor(cursor)
+            queryset = queryset.filter(
+                Q(created_at__lt=created_at) | Q(created_at=created_at, id__lt=activity_id)
+            )
+
+        events = list(queryset.order_by('-created_at', '-id')[:limit + 1])
+        next_cursor = TaskActivityLog.encode_cursor(events[limit - 1]) if len(events) > limit else None
+        return events[:limit], next_cursor
+
+    @staticmethod
+    def encode_cursor(event: TaskActivity) -> str:
+        payload = json.dumps([event.created_at.isoformat(), event.id])
+        return base64.urlsafe_b64encode(payload.encode()).decode()
+
+    @staticmethod
+    def decode_cursor(cursor: str) -> Tuple[Any, int]:
+        try:
+            created_at, activity_id = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+            created_at = parse_datetime(created_at)
+            if created_at is None or not isinstance(activity_id, int):
+                raise ValueError
+            return created_at, activity_id
+        except (ValueError, TypeError, AttributeError):
+            raise ValidationException("Некорректный курсор")
+
+    @staticmethod
+    def _record(events: List[TaskActivity]) -> None:
+        if events:
+            activity_buffer.add(events)
+
+    @staticmethod
+    def _event(task: Task, user: User, activity_type: str, description: str, metadata: Dict[str, Any]) -> TaskActivity:
+        return TaskActivity(
+            task_id=task.id,
+            user_id=user.pk,
+            activity_type=activity_type,
+            description=description,
+            metadata=metadata,
+            created_at=timezone.now(),
+        )
+
+    @staticmethod
+    def _activity_type(changes: Dict[str, List[Any]]) -> str:
+        if 'status' in changes:
+            if changes['status'][1] == 'done':
+                return 'completed'
+            if changes['status'][0] == 'done':
+                return 'reopened'
+        if 'column_id' in changes:
+            return 'moved'
+        return 'updated'
+
+    @staticmethod
+    def _description(task: Task, changes: Dict[str, List[Any]]) -> str:
+        if 'column_id' in changes:
+            return f'Задача перемещена в колонку «{task.column.title}»'
+        return 'Изменены поля: ' + ', '.join(changes)
+
+    @staticmethod
+    def _limit(limit: Optional[Any]) -> int:
+        if limit in (None, ''):
+            return DEFAULT_FEED_LIMIT
+        try:
+            limit = int(limit)
+        except (TypeError, ValueError):
+            raise ValidationException("Некорректный limit")
+        return max(1, min(limit, MAX_FEED_LIMIT))
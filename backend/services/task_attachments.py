@@ -0,0 +1,123 @@
+"""
+Вложения задач
+
+Загрузка идет через ChecksumUploadHandler (core.file_transfer): файл
+пишется на диск по частям, sha256 считается по ходу, затем файл
+передается хранилищу (FileSystemStorage перемещает временный файл, а не
+копирует его). Превью изображений строятся в фоновой очереди после
+фиксации транзакции, отдача файлов -- core.file_transfer.file_response.
+"""
+import logging
+import mimetypes
+import os
+from io import BytesIO
+from typing import List
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.files.base import ContentFile
+from django.db import transaction
+from PIL import Image, UnidentifiedImageError
+
+from backend.apps.tasks.models import Task, TaskAttachment
+from backend.core.background import background
+from backend.core.exceptions import NotFoundException, ValidationException
+
+User = get_user_model()
+logger = logging.getLogger(__name__)
+
+
+class TaskAttachmentService:
+    """Загрузка, отдача и превью вложений задач"""
+
+    @staticmethod
+    def get_task(task_id: str, user: User) -> Task:
+        task = Task.objects.filter(id=task_id, board__workspace__members__user=user).first()
+        if not task:
+            raise NotFoundException("Задача не найдена")
+        return task
+
+    @staticmethod
+    def list_attachments(task_id: str, user: User) -> List[TaskAttachment]:
+        task = TaskAttachmentService.get_task(task_id, user)
+        return list(task.attachments.select_related('uploaded_by').order_by('-uploaded_at', '-id'))
+
+    @staticmethod
+    def get_attachment(task_id: str, attachment_id: str, user: User) -> TaskAttachment:
+        attachment = TaskAttachment.objects.filter(
+            id=attachment_id,
+            task_id=task_id,
+            task__board__workspace__members__user=user
+        ).first()
+        if not attachment:
+            raise NotFoundException("Вложение не найдено")
+        return attachment
+
+    @staticmethod
+    def upload(task_id: str, user: User, uploaded_file) -> TaskAttachment:
+        """
+        Сохранение загруженного файла.
+
+        uploaded_file -- результат ChecksumUploadHandler (с атрибутом sha256).
+        """
+        task = TaskAttachmentService.get_task(task_id, user)
+        if uploaded_file.size > settings.TASK_ATTACHMENT_MAX_SIZE:
+            raise ValidationException('Файл слишком большой')
+
+        name = os.path.basename(uploaded_file.name)[:255] or 'file'
+        content_type = (
+            uploaded_file.content_type
+            or mimetypes.guess_type(name)[0]
+            or 'application/octet-stream'
+        )
+        with transaction.atomic():
+            attachment = TaskAttachment.objects.create(
+                task=task,
+                file=uploaded_file,
+                original_name=name,
+                size=uploaded_file.size,
+                content_type=content_type[:100],
+                sha256=getattr(uploaded_file, 'sha256', ''),
+                uploaded_by=user,
+            )
+            if content_type.startswith('image/'):
+                background.enqueue_on_commit(
+                    TaskAttachmentService.generate_thumbnail, attachment.id,
+                    key=('task_attachment_thumbnail', attachment.id)
+                )
+        return attachment
+
+    @staticmethod
+    def delete(task_id: str, attachment_id: str, user: User) -> None:
+        attachment = TaskAttachmentService.get_attachment(task_id, attachment_id, user)
+        files = [(field.storage, field.name) for field in (attachment.file, attachment.thumbnail) if field]
+        with transaction.atomic():
+            attachment.delete()
+            # Файлы удаляются только после фиксации удаления строки
+            transaction.on_commit(lambda: [storage.delete(name) for storage, name in files])
+
+    @staticmethod
+    def generate_thumbnail(attachment_id: int) -> bool:
+        """Превью изображения не больше TASK_ATTACHMENT_THUMBNAIL_SIZE по большей стороне"""
+        attachment = TaskAttachment.objects.filter(id=attachment_id).first()
+        if attachment is None or attachment.thumbnail:
+            return False
+
+        size = settings.TASK_ATTACHMENT_THUMBNAIL_SIZE
+        try:
+            with attachment.file.storage.open(attachment.file.name, 'rb') as handle:
+                image = Image.open(handle)
+                image.draft('RGB', (size, size))
+                image.thumbnail((size, size))
+                has_alpha = image.mode in ('RGBA', 'LA', 'P')
+                image = image.convert('RGBA' if has_alpha else 'RGB')
+                output = BytesIO()
+                image.save(output, format='PNG' if has_alpha else 'JPEG', quality=85)
+        except (OSError, UnidentifiedImageError, Image.DecompressionBombError):
+            logger.warning('Не удалось построить превью вложения %s', attachment_id)
+            return False
+
+        extension = 'png' if has_alpha else 'jpg'
+        attachment.thumbnail.save(f'{attachment.id}.{extension}', ContentFile(output.getvalue()), save=False)
+        TaskAttachment.objects.filter(id=attachment.id).update(thumbnail=attachment.thumbnail.name)
+        return True
@@ -0,0 +1,135 @@
+"""
+Загрузка доски задач по колонкам
+
+Доска отдается первыми K задачами каждой колонки: номер задачи в колонке
+и размер колонки считаются оконными функциями, число комментариев --
+подзапросом, все в одном запросе. Остальные задачи колонки догружаются
+страницами по курсору (ключ сортировки последней отданной задачи).
+"""
+import base64
+import json
+import uuid
+from typing import Any, Dict, List, Optional, Tuple
+
+from django.contrib.auth import get_user_model
+from django.db.models import Count, F, Q, QuerySet, Window
+from django.db.models.functions import RowNumber
+
+from backend.apps.tasks.models import Task, TaskColumn
+from backend.core.exceptions import NotFoundException, ValidationException
+from backend.services.taskboards import TaskBoardService, TaskService
+
+User = get_user_model()
+
+DEFAULT_COLUMN_LIMIT = 50
+MAX_COLUMN_LIMIT = 200
+
+# Порядок задач в колонке; последний ключ уникален, поэтому курсор однозначен
+TASK_ORDER = (F('rank').asc(), F('id').asc())
+
+
+class TaskBoardLoader:
+    """Постраничная загрузка задач доски"""
+
+    @staticmethod
+    def load_board(board_id: str, user: User, limit: Optional[int] = None, **filters) -> Dict[str, Any]:
+        """
+        Колонки доски с первыми limit задачами, размером и курсором.
+
+        Returns:
+            {"board": id, "columns": [{"column", "total", "tasks", "next_cursor"}]}
+        """
+        board = TaskBoardService.get_board_by_id(board_id, user)
+        limit = TaskBoardLoader._limit(limit)
+
+        tasks = TaskBoardLoader._queryset(board, filters).annotate(
+            row_number=Window(RowNumber(), partition_by=[F('column_id')], order_by=list(TASK_ORDER)),
+            column_total=Window(Count('id'), partition_by=[F('column_id')]),
+        ).filter(row_number__lte=limit)
+
+        by_column: Dict[Any, List[Task]] = {}
+        for task in tasks:
+            by_column.setdefault(task.column_id, []).append(task)
+
+        columns = []
+        for column in TaskColumn.objects.filter(board=board).order_by('position'):
+            column_tasks = sorted(by_column.get(column.id, []), key=lambda task: task.row_number)
+            total = column_tasks[0].column_total if column_tasks else 0
+            columns.append({
+                'column': column,
+                'total': total,
+                'tasks': column_tasks,
+                'next_cursor': TaskBoardLoader.encode_cursor(column_tasks[-1]) if total > len(column_tasks) else None,
+            })
+        return {'board': board.id, 'columns': columns}
+
+    @staticmethod
+    def load_column(
+        board_id: str,
+        column_id: str,
+        user: User,
+        cursor: Optional[str] = None,
+        limit: Optional[int] = None,
+        **filters
+    ) -> Tuple[List[Task], Optional[str]]:
+        """
+        Следующая страница задач колонки после cursor.
+
+        Returns:
+            (задачи, курсор следующей страницы или None)
+        """
+        board = TaskBoardService.get_board_by_id(board_id, user)
+        try:
+            column_id = uuid.UUID(str(column_id))
+        except ValueError:
+            raise NotFoundException("Колонка не найдена")
+        if not TaskColumn.objects.filter(id=column_id, board=board).exists():
+            raise NotFoundException("Колонка не найдена")
+        limit = TaskBoardLoader._limit(limit)
+
+        queryset = TaskBoardLoader._queryset(board, filters).filter(column_id=column_id)
+        if cursor:
+            rank, task_id = TaskBoardLoader.decode_cursor(cursor)
+            queryset = queryset.filter(Q(rank__gt=rank) | Q(rank=rank, id__gt=task_id))
+
+        tasks = list(queryset.order_by(*TASK_ORDER)[:limit + 1])
+        next_cursor = TaskBoardLoader.encode_cursor(tasks[limit - 1]) if len(tasks) > limit else None
+        return tasks[:limit], next_cursor
+
+    @staticmethod
+    def encode_cursor(task: Task) -> str:
+        payload = json.dumps([task.rank, str(task.id)])
+        return base64.urlsafe_b64encode(payload.encode()).decode()
+
+    @staticmethod
+    def decode_cursor(cursor: str) -> Tuple[str, str]:
+        try:
+            rank, task_id = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+            if not isinstance(rank, str):
+                raise ValueError
+            return rank, str(uuid.UUID(task_id))
+        except (ValueError, TypeError, AttributeError):
+            raise ValidationException("Некорректный курсор")
+
+    @staticmethod
+    def _queryset(board, filters: Dict[str, Any]) -> QuerySet:
+        queryset = Task.objects.filter(board=board).select_related(
+            'board', 'column', 'created_by'
+        ).prefetch_related('tags')
+        if filters.get('assignee_id'):
+            queryset = queryset.filter(assignees__id=filters['assignee_id'])
+        if filters.get('status'):
+            queryset = queryset.filter(status=filters['status'])
+        if filters.get('priority'):
+            queryset = queryset.filter(priority=filters['priority'])
+        return TaskService.with_comments_count(queryset)
+
+    @staticmethod
+    def _limit(limit: Optional[Any]) -> int:
+        if limit in (None, ''):
+            return DEFAULT_COLUMN_LIMIT
+        try:
+            limit = int(limit)
+        except (TypeError, ValueError):
+            raise ValidationException("Некорректный limit")
+        return max(1, min(limit, MAX_COLUMN_LIMIT))
@@ -0,0 +1,292 @@
+"""
+Сводные счетчики задач досок
+
+Для каждой доски хранятся строки TaskBoardCounter: всего задач, по
+колонкам, статусам, приоритетам, исполнителям и дням срока
+незавершенных задач. Сервисы задач передают сюда состояние задач до и
+после изменения, и счетчики меняются атомарными приращениями
+(F('count') + delta) в той же транзакции, без пересчета по таблице задач.
+Списки досок, шапка доски и аналитика читают только счетчики.
+
+Изменения в обход сервисов (queryset.update, удаление колонки) сводятся
+reconcile, который досчитывает расхождение теми же приращениями; его
+периодически запускает команда reconcile_board_summaries, а затем prune
+удаляет обнулившиеся строки. apply блокирует увеличиваемые строки и
+создает заново удаленные между вставкой и блокировкой, поэтому
+параллельное удаление не теряет приращений.
+"""
+import uuid
+from collections import Counter, defaultdict
+from datetime import datetime, timezone as dt_timezone
+from typing import Any, Dict, Iterable, Optional, Tuple
+
+from django.db import transaction
+from django.db.models import (
+    CharField, Count, F, IntegerField, OuterRef, Q, QuerySet, Subquery, Sum, Value,
+)
+from django.db.models.functions import Cast, Coalesce, TruncDate
+from django.utils import timezone
+
+from backend.apps.tasks.models import Task, TaskBoardCounter
+
+# Поля задачи, от которых зависят счетчики (кроме исполнителей)
+SUMMARY_FIELDS = ('column_id', 'status', 'priority', 'due_date')
+
+CounterKey = Tuple[str, str]
+
+
+def _due_key(due_date: datetime) -> str:
+    return due_date.astimezone(dt_timezone.utc).date().isoformat()
+
+
+class TaskBoardSummary:
+    """Инкрементальные счетчики задач доски"""
+
+    @staticmethod
+    def state(task: Task) -> Dict[str, Any]:
+        """Значения полей задачи, влияющих на счетчики"""
+        return {field: getattr(task, field) for field in SUMMARY_FIELDS}
+
+    @staticmethod
+    def state_from(snapshot: Dict[str, Any]) -> Dict[str, Any]:
+        """Состояние из снимка с теми же полями (TaskActivityLog.snapshot)"""
+        return {field: snapshot[field] for field in SUMMARY_FIELDS}
+
+    @staticmethod
+    def contribution(state: Dict[str, Any], sign: int = 1) -> Counter:
+        """Вклад задачи в счетчики доски"""
+        counts: Counter = Counter({
+            ('total', ''): sign,
+            ('column', str(state['column_id'])): sign,
+            ('status', state['status']): sign,
+            ('priority', state['priority']): sign,
+        })
+        if state['due_date'] is not None and state['status'] != 'done':
+            counts[('due', _due_key(state['due_date']))] += sign
+        return counts
+
+    @staticmethod
+    def created(task: Task, assignee_ids: Iterable[Any] = ()) -> None:
+        deltas = TaskBoardSummary.contribution(TaskBoardSummary.state(task))
+        for user_id in assignee_ids:
+            deltas[('assignee', str(user_id))] += 1
+        TaskBoardSummary.apply(task.board_id, deltas)
+
+    @staticmethod
+    def deleted(board_id, states: Iterable[Dict[str, Any]], assignee_ids: Iterable[Any] = ()) -> None:
+        """Удаление задач: states -- их состояния, assignee_ids -- по id на каждую связь"""
+        deltas: Counter = Counter()
+        for state in states:
+            deltas.update(TaskBoardSummary.contribution(state, -1))
+        for user_id in assignee_ids:
+            deltas[('assignee', str(user_id))] -= 1
+        TaskBoardSummary.apply(board_id, deltas)
+
+    @staticmethod
+    def changed(board_id, pairs: Iterable[Tuple[Dict[str, Any], Dict[str, Any]]]) -> None:
+        """Изменение задач: пары (состояние до, состояние после)"""
+        deltas: Counter = Counter()
+        for before, after in pairs:
+            if before != after:
+                deltas.update(TaskBoardSummary.contribution(after))
+                deltas.update(TaskBoardSummary.contribution(before, -1))
+        TaskBoardSummary.apply(board_id, deltas)
+
+    @staticmethod
+    def assignees_changed(board_id, added: Iterable[Any] = (), removed: Iterable[Any] = ()) -> None:
+        """Изменение исполнителей: по id пользователя на каждую связь"""
+        deltas: Counter = Counter()
+        for user_id in added:
+            deltas[('assignee', str(user_id))] += 1
+        for user_id in removed:
+            deltas[('assignee', str(user_id))] -= 1
+        TaskBoardSummary.apply(board_id, deltas)
+
+    @staticmethod
+    def apply(board_id, deltas: Dict[CounterKey, int]) -> None:
+        """Атомарное приращение счетчиков: по UPDATE на каждое различное приращение"""
+        deltas = {key: delta for key, delta in deltas.items() if delta}
+        if not deltas:
+            return
+
+        with transaction.atomic():
+            missing = {counter for counter, delta in deltas.items() if delta > 0}
+            while missing:
+                TaskBoardCounter.objects.bulk_create(
+                    [
+                        TaskBoardCounter(board_id=board_id, dimension=dimension, key=key, count=0)
+                        for dimension, key in missing
+                    ],
+                    ignore_conflicts=True,
+                )
+                condition = Q()
+                for dimension, key in missing:
+                    condition |= Q(dimension=dimension, key=key)
+                # Заблокированную строку prune не удалит до конца транзакции
+                missing -= set(
+                    TaskBoardCounter.objects.select_for_update().filter(
+                        condition, board_id=board_id
+                    ).values_list('dimension', 'key')
+                )
+            by_delta = defaultdict(list)
+            for (dimension, key), delta in sorted(deltas.items()):
+                by_delta[delta].append(Q(dimension=dimension, key=key))
+            for delta, conditions in sorted(by_delta.items()):
+                condition = Q()
+                for item in conditions:
+                    condition |= item
+                TaskBoardCounter.objects.filter(condition, board_id=board_id).update(count=F('count') + delta)
+
+    @staticmethod
+    def reconcile(board_ids: Optional[Iterable[Any]] = None) -> int:
+        """
+        Сверка счетчиков с задачами; None -- все доски.
+
+        Задачи и хранимые счетчики читаются одним запросом, то есть из
+        одного снимка базы, поэтому изменение, зафиксированное во время
+        сверки, попадает в обе стороны или ни в одну. Расхождение
+        досчитывается приращениями в той же транзакции: приращения
+        изменений после снимка с ним складываются, а не теряются.
+
+        Returns:
+            Количество исправленных счетчиков
+        """
+        tasks = Task.objects.all()
+        counters = TaskBoardCounter.objects.all()
+        if board_ids is not None:
+            board_ids = list(board_ids)
+            tasks = tasks.filter(board_id__in=board_ids)
+            counters = counters.filter(board_id__in=board_ids)
+
+        with transaction.atomic():
+            actual, stored = TaskBoardSummary._count(tasks, counters)
+            drift: Dict[Any, Dict[CounterKey, int]] = defaultdict(dict)
+            for counter in actual.keys() | stored.keys():
+                delta = actual.get(counter, 0) - stored.get(counter, 0)
+                if delta:
+                    board_id, dimension, key = counter
+                    drift[board_id][(dimension, key)] = delta
+
+            for board_id, deltas in drift.items():
+                TaskBoardSummary.apply(board_id, deltas)
+        return sum(len(deltas) for deltas in drift.values())
+
+    @staticmethod
+    def prune(board_ids: Optional[Iterable[Any]] = None) -> int:
+        """
+        Удаление обнулившихся счетчиков; None -- все доски.
+
+        Строки, которые увеличивает незавершенная транзакция apply,
+        заблокированы ею и после ее фиксации уже не нулевые.
+
+        Returns:
+            Количество удаленных строк
+        """
+        counters = TaskBoardCounter.objects.filter(count=0)
+        if board_ids is not None:
+            counters = counters.filter(board_id__in=list(board_ids))
+        deleted, _ = counters.delete()
+        return deleted
+
+    @staticmethod
+    def summary(board) -> Dict[str, Any]:
+        """
+        Сводка доски по счетчикам.
+
+        overdue совпадает с Task.is_overdue: прошедшие дни срока берутся из
+        счетчиков, а задачи со сроком сегодня (UTC), если они есть,
+        досчитываются по индексу (board, due_date) -- просрочены те, чей
+        срок раньше текущего момента.
+        """
+        result = {
+            'total': 0, 'overdue': 0,
+            'by_column': {}, 'by_status': {}, 'by_priority': {}, 'by_assignee': {},
+        }
+        now = timezone.now()
+        today = _due_key(now)
+        due_today = 0
+        for dimension, key, count in TaskBoardCounter.objects.filter(
+            board=board
+        ).exclude(count=0).values_list('dimension', 'key', 'count'):
+            if dimension == 'total':
+                result['total'] = count
+            elif dimension == 'due':
+                if key < today:
+                    result['overdue'] += count
+                elif key == today:
+                    due_today = count
+            else:
+                result[f'by_{dimension}'][key] = count
+        if due_today:
+            start = now.astimezone(dt_timezone.utc).replace(hour=0, minute=0, second=0, microsecond=0)
+            result['overdue'] += Task.objects.filter(
+                board=board, due_date__gte=start, due_date__lt=now
+            ).exclude(status='done').count()
+        return result
+
+    @staticmethod
+    def annotate_tasks_count(boards: QuerySet) -> QuerySet:
+        """Аннотация tasks_count досок из счетчиков"""
+        total = TaskBoardCounter.objects.filter(
+            board=OuterRef('pk'), dimension='total', key=''
+        ).values('count')[:1]
+        return boards.annotate(tasks_count=Coalesce(Subquery(total, output_field=IntegerField()), 0))
+
+    @staticmethod
+    def workspace_counts(workspace, dimension: str) -> Dict[str, int]:
+        """Сумма счетчиков измерения по всем доскам пространства"""
+        rows = TaskBoardCounter.objects.filter(
+            board__workspace=workspace, dimension=dimension
+        ).values('key').annotate(total=Sum('count')).order_by()
+        return {row['key']: row['total'] for row in rows if row['total']}
+
+    @staticmethod
+    def _count(
+        tasks: QuerySet, counters: QuerySet
+    ) -> Tuple[Dict[Tuple[Any, str, str], int], Dict[Tuple[Any, str, str], int]]:
+        """
+        Счетчики по задачам и хранимые счетчики одним запросом.
+
+        Группирующие запросы по задачам и выборка counters объединяются
+        через UNION ALL; ключи приводятся к строке на стороне базы, чтобы
+        типы столбцов частей совпадали.
+
+        Returns:
+            (по задачам, хранимые) по (id доски, измерение, ключ)
+        """
+        def grouped(rows: QuerySet, board_id: str, dimension: str, key) -> QuerySet:
+            return rows.annotate(
+                summary_board=F(board_id), summary_dimension=Value(dimension),
+                summary_key=Cast(key, CharField()) if key is not None else Value(''),
+            ).values(
+                'summary_board', 'summary_dimension', 'summary_key'
+            ).annotate(summary_count=Count('pk'), summary_stored=Value(False)).values_list(
+                'summary_board', 'summary_dimension', 'summary_key', 'summary_count', 'summary_stored'
+            ).order_by()
+
+        open_due = tasks.filter(due_date__isnull=False).exclude(status='done')
+        parts = [
+            grouped(tasks, 'board_id', 'total', None),
+            grouped(tasks, 'board_id', 'column', F('column_id')),
+            grouped(tasks, 'board_id', 'status', F('status')),
+            grouped(tasks, 'board_id', 'priority', F('priority')),
+            grouped(open_due, 'board_id', 'due', TruncDate('due_date', tzinfo=dt_timezone.utc)),
+            grouped(
+                Task.assignees.through.objects.filter(task__in=tasks), 'task__board_id', 'assignee', F('user_id')
+            ),
+        ]
+        stored_rows = counters.annotate(
+            summary_board=F('board_id'), summary_dimension=F('dimension'), summary_key=F('key'),
+            summary_count=F('count'), summary_stored=Value(True),
+        ).values_list(
+            'summary_board', 'summary_dimension', 'summary_key', 'summary_count', 'summary_stored'
+        ).order_by()
+
+        actual: Dict[Tuple[Any, str, str], int] = {}
+        stored: Dict[Tuple[Any, str, str], int] = {}
+        for board_id, dimension, key, count, is_stored in stored_rows.union(*parts, all=True):
+            if dimension == 'column' and not is_stored:
+                # Текстовый вид uuid зависит от базы (sqlite хранит без дефисов)
+                key = str(uuid.UUID(key))
+            (stored if is_stored else actual)[(board_id, dimension, key)] = count
+        return actual, stored
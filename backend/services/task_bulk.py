@@ -0,0 +1,234 @@
+"""
+Массовые операции над выделенными задачами
+
+Доступ ко всем задачам выделения проверяется одним запросом. Статус и
+приоритет пишутся одним UPDATE, перенос в колонку -- одним bulk_update
+ключей порядка, исполнители и теги -- вставкой и удалением строк
+промежуточных таблиц M2M пачкой. Счетчики доски меняются одним набором
+приращений, события активности всех задач ставятся в буфер журнала одной
+пачкой.
+"""
+import uuid
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple
+
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.utils import timezone
+
+from backend.apps.notes.models import Tag
+from backend.apps.tasks.models import Task, TaskColumn
+from backend.apps.workspaces.models import WorkspaceMember
+from backend.core.exceptions import NotFoundException, ValidationException
+from backend.services.task_activity import TaskActivityLog
+from backend.services.task_board_summary import TaskBoardSummary
+from backend.services.task_dependencies import TaskDependencyGraph
+from backend.services.task_ordering import TaskOrdering
+
+User = get_user_model()
+
+MAX_BULK_TASKS = 5000
+BATCH_SIZE = 1000
+
+
+def _ids(values: Optional[Iterable[Any]], cast=int) -> List[Any]:
+    try:
+        return list(dict.fromkeys(cast(str(value)) for value in values or []))
+    except (TypeError, ValueError):
+        raise ValidationException('Некорректный идентификатор')
+
+
+class TaskBulkService:
+    """Массовое изменение задач"""
+
+    @staticmethod
+    def apply(
+        user: User,
+        task_ids: Iterable[Any],
+        status: Optional[str] = None,
+        priority: Optional[str] = None,
+        column_id: Optional[str] = None,
+        add_assignees: Optional[Iterable[Any]] = None,
+        remove_assignees: Optional[Iterable[Any]] = None,
+        add_tags: Optional[Iterable[Any]] = None,
+        remove_tags: Optional[Iterable[Any]] = None,
+        delete: bool = False
+    ) -> Dict[str, int]:
+        """
+        Применение изменений к задачам выделения.
+
+        Все задачи должны быть на одной доске пространства, участником
+        которого является user.
+
+        Returns:
+            {"updated": n} или {"deleted": n}
+        """
+        task_ids = _ids(task_ids, uuid.UUID)
+        if not task_ids or len(task_ids) > MAX_BULK_TASKS:
+            raise ValidationException(f'Нужно от 1 до {MAX_BULK_TASKS} задач')
+
+        tasks = {
+            task.id: task
+            for task in Task.objects.filter(
+                id__in=task_ids, board__workspace__members__user=user
+            ).select_related('board', 'column')
+        }
+        if len(tasks) != len(task_ids):
+            raise NotFoundException("Задача не найдена")
+        boards = {task.board for task in tasks.values()}
+        if len(boards) > 1:
+            raise ValidationException('Задачи должны быть на одной доске')
+        board = boards.pop()
+
+        if delete:
+            with transaction.atomic():
+                tasks = TaskBulkService._lock(task_ids, board.id)
+                TaskBoardSummary.deleted(
+                    board.id,
+                    [TaskBoardSummary.state(task) for task in tasks.values()],
+                    Task.assignees.through.objects.filter(task_id__in=task_ids).values_list('user_id', flat=True),
+                )
+                TaskDependencyGraph.tasks_deleted(board.id, task_ids)
+                Task.objects.filter(id__in=task_ids).delete()
+            return {'deleted': len(task_ids)}
+
+        fields = {}
+        if status is not None:
+            if status not in dict(Task.STATUS_CHOICES):
+                raise ValidationException('Некорректный статус')
+            fields['status'] = status
+        if priority is not None:
+            if priority not in dict(Task.PRIORITY_CHOICES):
+                raise ValidationException('Некорректный приоритет')
+            fields['priority'] = priority
+        column = None
+        if column_id:
+            column = TaskColumn.objects.filter(id=_ids([column_id], uuid.UUID)[0], board=board).first()
+            if column is None:
+                raise NotFoundException("Колонка не найдена")
+
+        assignees = (_ids(add_assignees), _ids(remove_assignees))
+        tags = (_ids(add_tags), _ids(remove_tags))
+        # Одно значение в обоих списках исказило бы счетчики и журнал
+        if set(assignees[0]) & set(assignees[1]):
+            raise ValidationException('Исполнитель не может одновременно добавляться и сниматься')
+        if set(tags[0]) & set(tags[1]):
+            raise ValidationException('Тег не может одновременно добавляться и сниматься')
+        TaskBulkService._check_members(board.workspace_id, set(assignees[0]))
+        if tags[0] and Tag.objects.filter(id__in=tags[0]).count() != len(tags[0]):
+            raise NotFoundException("Тег не найден")
+
+        with transaction.atomic():
+            # Снимки берутся с заблокированных строк: параллельное изменение
+            # тех же задач дождется фиксации и не исказит счетчики и журнал
+            tasks = TaskBulkService._lock(task_ids, board.id)
+            # Порядок выделения сохраняется при переносе в колонку
+            selection = [tasks[task_id] for task_id in task_ids]
+            before = {task.id: TaskActivityLog.snapshot(task) for task in selection}
+            if fields:
+                Task.objects.filter(id__in=task_ids).update(updated_at=timezone.now(), **fields)
+                for task in selection:
+                    for field, value in fields.items():
+                        setattr(task, field, value)
+            if column is not None:
+                TaskOrdering.append([task for task in selection if task.column_id != column.id], column)
+            assigned, unassigned = TaskBulkService._update_links(
+                Task.assignees.through, 'user_id', task_ids, *assignees
+            )
+            tagged, untagged = TaskBulkService._update_links(
+                Task.tags.through, 'tag_id', task_ids, *tags
+            )
+            TaskBoardSummary.changed(board.id, [
+                (TaskBoardSummary.state_from(before[task.id]), TaskBoardSummary.state(task)) for task in selection
+            ])
+            TaskBoardSummary.assignees_changed(
+                board.id,
+                added=[user_id for user_ids in assigned.values() for user_id in user_ids],
+                removed=[user_id for user_ids in unassigned.values() for user_id in user_ids],
+            )
+
+        entries = [
+            entry for entry in (TaskActivityLog.changes_entry(task, before[task.id]) for task in selection)
+            if entry is not None
+        ]
+        for activity_type, description, links in (
+            ('assigned', 'Назначены исполнители', assigned),
+            ('unassigned', 'Сняты исполнители', unassigned),
+        ):
+            entries += [
+                (tasks[task_id], activity_type, description, {'users': user_ids})
+                for task_id, user_ids in links.items()
+            ]
+        for task_id in tagged.keys() | untagged.keys():
+            entries.append((tasks[task_id], 'updated', 'Изменены теги', {
+                'tags': {'added': tagged.get(task_id, []), 'removed': untagged.get(task_id, [])}
+            }))
+        TaskActivityLog.bulk(user, entries)
+        return {'updated': len(selection)}
+
+    @staticmethod
+    def _lock(task_ids: List[Any], board_id: Any) -> Dict[Any, Task]:
+        """
+        Повторная выборка задач выделения с блокировкой строк.
+
+        Строки блокируются в порядке id, чтобы встречные массовые операции
+        не ждали друг друга по кругу. Задача, удаленная или перенесенная на
+        другую доску после проверки доступа, считается не найденной.
+        """
+        tasks = {
+            task.id: task
+            for task in Task.objects.select_for_update(of=('self',)).select_related('board', 'column').filter(
+                id__in=task_ids, board_id=board_id
+            ).order_by('id')
+        }
+        if len(tasks) != len(task_ids):
+            raise NotFoundException("Задача не найдена")
+        return tasks
+
+    @staticmethod
+    def _check_members(workspace_id: int, user_ids: Set[int]) -> None:
+        if not user_ids:
+            return
+        members = set(WorkspaceMember.objects.filter(
+            workspace_id=workspace_id, user_id__in=user_ids
+        ).values_list('user_id', flat=True))
+        if members != user_ids:
+            raise ValidationException('Исполнители должны быть участниками рабочего пространства')
+
+    @staticmethod
+    def _update_links(
+        through, field: str, task_ids: List[Any], add: List[Any], remove: List[Any]
+    ) -> Tuple[Dict[Any, List[Any]], Dict[Any, List[Any]]]:
+        """
+        Вставка и удаление связей задач в промежуточной таблице M2M.
+
+        Вызывается под блокировкой строк задач, поэтому прочитанные
+        связи не меняются до фиксации и вставляются ровно new_links: без
+        ignore_conflicts чужая вставка той же пары оборвет транзакцию, а не
+        попадет в счетчики и журнал второй раз.
+
+        Returns:
+            (добавленные, удаленные) значения field по id задачи
+        """
+        added: Dict[Any, List[Any]] = {}
+        removed: Dict[Any, List[Any]] = {}
+        if not add and not remove:
+            return added, removed
+
+        existing = set(through.objects.filter(
+            task_id__in=task_ids, **{f'{field}__in': add + remove}
+        ).values_list('task_id', field))
+        new_links = [(task_id, value) for task_id in task_ids for value in add if (task_id, value) not in existing]
+        old_links = [(task_id, value) for task_id in task_ids for value in remove if (task_id, value) in existing]
+
+        if new_links:
+            through.objects.bulk_create(
+                [through(task_id=task_id, **{field: value}) for task_id, value in new_links],
+                batch_size=BATCH_SIZE,
+            )
+        if old_links:
+            through.objects.filter(task_id__in=task_ids, **{f'{field}__in': remove}).delete()
+
+        for links, result in ((new_links, added), (old_links, removed)):
+            for task_id, value in links:
+                result.setdefault(task_id, []).append(value)
+        return added, removed
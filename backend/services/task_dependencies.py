@@ -0,0 +1,295 @@
+"""
+Зависимости задач и расчет графика доски
+
+Связь blocker -> blocked означает, что blocked не начинается раньше, чем
+закончится blocker. При добавлении связи доска блокируется (SELECT ...
+FOR UPDATE), и цикл ищется обходом графа доски, загруженного одним
+запросом, -- параллельные вставки не могут замкнуть цикл.
+
+График (TaskDependencyGraph.schedule) -- топологический порядок и метод
+критического пути по start_date, due_date и estimated_hours: ранние и
+поздние начало и окончание, резерв (slack) и критический путь. Результат
+кэшируется по ключу (доска, schedule_revision); ревизия растет одним
+UPDATE при изменении связи, сроков или оценки связанной задачи, поэтому
+запросы таймлайна не пересчитывают граф, пока он не изменился, а старые
+записи кэша просто перестают читаться.
+"""
+import heapq
+import uuid
+from collections import defaultdict
+from datetime import datetime, timezone as dt_timezone
+from typing import Any, Dict, Iterable, List, Optional, Set
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import F, Q
+from django.utils import timezone
+
+from backend.apps.tasks.models import Task, TaskBoard, TaskDependency
+from backend.core.exceptions import NotFoundException, ValidationException
+
+User = get_user_model()
+
+SCHEDULE_CACHE_TIMEOUT = 24 * 60 * 60
+
+# Поля задачи, от которых зависит график
+SCHEDULE_FIELDS = ('start_date', 'due_date', 'estimated_hours')
+
+# Допуск сравнения моментов (секунды)
+EPSILON = 1e-6
+
+
+def _timestamp(value: Optional[datetime]) -> Optional[float]:
+    return value.timestamp() if value is not None else None
+
+
+def _isoformat(value: float) -> str:
+    return datetime.fromtimestamp(value, dt_timezone.utc).isoformat()
+
+
+def _uuid(value: Any) -> uuid.UUID:
+    try:
+        return uuid.UUID(str(value))
+    except ValueError:
+        raise ValidationException('Некорректный идентификатор задачи')
+
+
+class TaskDependencyGraph:
+    """Связи между задачами и график доски"""
+
+    @staticmethod
+    def links(task_id: str, user: User) -> Dict[str, List[Dict[str, Any]]]:
+        """Задачи, блокирующие задачу, и задачи, которые она блокирует"""
+        task = TaskDependencyGraph._get_task(task_id, user)
+        fields = ('id', 'title', 'status', 'start_date', 'due_date')
+        return {
+            'blocked_by': list(Task.objects.filter(blocking_links__blocked=task).order_by('rank', 'id').values(*fields)),
+            'blocking': list(Task.objects.filter(blocked_by_links__blocker=task).order_by('rank', 'id').values(*fields)),
+        }
+
+    @staticmethod
+    def add(task_id: str, blocker_id: str, user: User) -> TaskDependency:
+        """
+        Связь "blocker блокирует task".
+
+        Raises:
+            ValidationException: задачи на разных досках или связь замыкает цикл
+        """
+        task = TaskDependencyGraph._get_task(task_id, user)
+        blocker = TaskDependencyGraph._get_task(_uuid(blocker_id), user)
+        if blocker.id == task.id:
+            raise ValidationException('Задача не может блокировать саму себя')
+        if blocker.board_id != task.board_id:
+            raise ValidationException('Связанные задачи должны быть на одной доске')
+
+        with transaction.atomic():
+            # Вставки связей доски выполняются по одной
+            TaskBoard.objects.select_for_update().filter(id=task.board_id).values_list('id').first()
+            existing = TaskDependency.objects.filter(blocker=blocker, blocked=task).first()
+            if existing is not None:
+                return existing
+            if TaskDependencyGraph.has_path(task.board_id, task.id, blocker.id):
+                raise ValidationException('Связь создает цикл зависимостей')
+            dependency = TaskDependency.objects.create(
+                blocker=blocker, blocked=task, board_id=task.board_id, created_by=user
+            )
+            TaskDependencyGraph.invalidate(task.board_id)
+        return dependency
+
+    @staticmethod
+    def remove(task_id: str, blocker_id: str, user: User) -> None:
+        task = TaskDependencyGraph._get_task(task_id, user)
+        with transaction.atomic():
+            deleted, _ = TaskDependency.objects.filter(
+                blocker_id=_uuid(blocker_id), blocked=task
+            ).delete()
+            if not deleted:
+                raise NotFoundException("Связь не найдена")
+            TaskDependencyGraph.invalidate(task.board_id)
+
+    @staticmethod
+    def has_path(board_id, source, target) -> bool:
+        """Достижима ли target из source по связям доски"""
+        successors = defaultdict(list)
+        for blocker_id, blocked_id in TaskDependency.objects.filter(board_id=board_id).values_list(
+            'blocker_id', 'blocked_id'
+        ):
+            successors[blocker_id].append(blocked_id)
+        seen = {source}
+        stack = [source]
+        while stack:
+            node = stack.pop()
+            if node == target:
+                return True
+            for successor in successors[node]:
+                if successor not in seen:
+                    seen.add(successor)
+                    stack.append(successor)
+        return False
+
+    @staticmethod
+    def invalidate(board_ids: Any) -> None:
+        """Сброс кэша графика досок (id доски или список id)"""
+        if not isinstance(board_ids, (list, tuple, set)):
+            board_ids = [board_ids]
+        TaskBoard.objects.filter(id__in=board_ids).update(schedule_revision=F('schedule_revision') + 1)
+
+    @staticmethod
+    def task_changed(task: Task, before: Dict[str, Any]) -> None:
+        """Сброс графика, если у связанной задачи изменились сроки или оценка"""
+        if all(before.get(field) == getattr(task, field) for field in SCHEDULE_FIELDS):
+            return
+        if TaskDependency.objects.filter(Q(blocker=task) | Q(blocked=task)).exists():
+            TaskDependencyGraph.invalidate(task.board_id)
+
+    @staticmethod
+    def tasks_deleted(board_id, task_ids: Iterable[Any]) -> None:
+        """Сброс графика перед удалением задач, если у них есть связи"""
+        task_ids = list(task_ids)
+        if TaskDependency.objects.filter(Q(blocker_id__in=task_ids) | Q(blocked_id__in=task_ids)).exists():
+            TaskDependencyGraph.invalidate(board_id)
+
+    @staticmethod
+    def cache_key(board_id, revision: int) -> str:
+        return f'task_schedule:{board_id}:{revision}'
+
+    @staticmethod
+    def schedule(board_id: str, user: User) -> Dict[str, Any]:
+        """График связанных задач доски (из кэша текущей ревизии)"""
+        board = TaskBoard.objects.filter(
+            id=board_id, workspace__members__user=user
+        ).values('id', 'schedule_revision').first()
+        if not board:
+            raise NotFoundException("Доска не найдена")
+
+        key = TaskDependencyGraph.cache_key(board['id'], board['schedule_revision'])
+        result = cache.get(key)
+        if result is None:
+            result = TaskDependencyGraph.compute(board['id'])
+            cache.set(key, result, SCHEDULE_CACHE_TIMEOUT)
+        return result
+
+    @staticmethod
+    def compute(board_id) -> Dict[str, Any]:
+        """
+        Расчет графика двумя запросами: связи и задачи, в них участвующие.
+
+        Длительность задачи -- estimated_hours, иначе due_date - start_date,
+        иначе ноль. Раннее начало -- не раньше start_date и окончания всех
+        блокирующих задач; позднее окончание -- не позже due_date и позднего
+        начала всех блокируемых (у последних задач без срока -- окончание
+        графика). Отрицательный резерв значит, что срок
+        задачи недостижим.
+        """
+        edges = list(TaskDependency.objects.filter(board_id=board_id).values_list('blocker_id', 'blocked_id'))
+        successors: Dict[Any, List[Any]] = defaultdict(list)
+        predecessors: Dict[Any, List[Any]] = defaultdict(list)
+        for blocker_id, blocked_id in edges:
+            successors[blocker_id].append(blocked_id)
+            predecessors[blocked_id].append(blocker_id)
+        nodes: Set[Any] = set(successors) | set(predecessors)
+        if not nodes:
+            return {'order': [], 'tasks': {}, 'critical_path': [], 'finish': None}
+
+        tasks = {
+            row['id']: row for row in Task.objects.filter(id__in=nodes).values('id', *SCHEDULE_FIELDS)
+        }
+        start = {task_id: _timestamp(row['start_date']) for task_id, row in tasks.items()}
+        due = {task_id: _timestamp(row['due_date']) for task_id, row in tasks.items()}
+        duration = {}
+        for task_id, row in tasks.items():
+            if row['estimated_hours'] is not None:
+                duration[task_id] = float(row['estimated_hours']) * 3600
+            elif start[task_id] is not None and due[task_id] is not None:
+                duration[task_id] = max(due[task_id] - start[task_id], 0.0)
+            else:
+                duration[task_id] = 0.0
+        anchors = [value for value in start.values() if value is not None] or [
+            due[task_id] - duration[task_id] for task_id in tasks if due[task_id] is not None
+        ]
+        anchor = min(anchors) if anchors else timezone.now().timestamp()
+
+        order = TaskDependencyGraph._topological_order(tasks, successors, predecessors, start)
+
+        earliest_start: Dict[Any, float] = {}
+        earliest_finish: Dict[Any, float] = {}
+        for task_id in order:
+            value = start[task_id] if start[task_id] is not None else anchor
+            for blocker_id in predecessors[task_id]:
+                value = max(value, earliest_finish[blocker_id])
+            earliest_start[task_id] = value
+            earliest_finish[task_id] = value + duration[task_id]
+        finish = max(earliest_finish.values())
+
+        latest_finish: Dict[Any, float] = {}
+        latest_start: Dict[Any, float] = {}
+        for task_id in reversed(order):
+            # Без срока задача ограничена блокируемыми, последние -- окончанием графика
+            value = due[task_id] if due[task_id] is not None else float('inf')
+            for blocked_id in successors[task_id]:
+                value = min(value, latest_start[blocked_id])
+            if value == float('inf'):
+                value = finish
+            latest_finish[task_id] = value
+            latest_start[task_id] = value - duration[task_id]
+
+        # Критический путь: от задачи, заканчивающейся последней, назад по
+        # блокирующим задачам, окончание которых определяет раннее начало
+        path = [max(order, key=lambda task_id: (earliest_finish[task_id], str(task_id)))]
+        while True:
+            binding = [
+                blocker_id for blocker_id in predecessors[path[-1]]
+                if abs(earliest_finish[blocker_id] - earliest_start[path[-1]]) < EPSILON
+            ]
+            if not binding:
+                break
+            path.append(max(binding, key=lambda task_id: (earliest_finish[task_id], str(task_id))))
+        path.reverse()
+        critical = set(path)
+
+        return {
+            'order': [str(task_id) for task_id in order],
+            'tasks': {
+                str(task_id): {
+                    'earliest_start': _isoformat(earliest_start[task_id]),
+                    'earliest_finish': _isoformat(earliest_finish[task_id]),
+                    'latest_start': _isoformat(latest_start[task_id]),
+                    'latest_finish': _isoformat(latest_finish[task_id]),
+                    'slack_hours': round((latest_start[task_id] - earliest_start[task_id]) / 3600, 2),
+                    'critical': task_id in critical,
+                }
+                for task_id in order
+            },
+            'critical_path': [str(task_id) for task_id in path],
+            'finish': _isoformat(finish),
+        }
+
+    @staticmethod
+    def _topological_order(tasks, successors, predecessors, start) -> List[Any]:
+        """Порядок Кана; среди готовых задач первой идет начинающаяся раньше"""
+        def priority(task_id):
+            return (start[task_id] if start[task_id] is not None else float('-inf'), str(task_id))
+
+        remaining = {task_id: len(predecessors[task_id]) for task_id in tasks}
+        ready = [(priority(task_id), task_id) for task_id, count in remaining.items() if count == 0]
+        heapq.heapify(ready)
+        order = []
+        while ready:
+            _, task_id = heapq.heappop(ready)
+            order.append(task_id)
+            for blocked_id in successors[task_id]:
+                remaining[blocked_id] -= 1
+                if remaining[blocked_id] == 0:
+                    heapq.heappush(ready, (priority(blocked_id), blocked_id))
+        if len(order) != len(tasks):
+            # Вставка проверяет циклы, сюда попадают только данные в обход сервиса
+            raise ValidationException('В зависимостях доски есть цикл')
+        return order
+
+    @staticmethod
+    def _get_task(task_id: str, user: User) -> Task:
+        task = Task.objects.filter(id=task_id, board__workspace__members__user=user).first()
+        if not task:
+            raise NotFoundException("Задача не найдена")
+        return task
@@ -0,0 +1,185 @@
+"""
+Порядок задач в колонках
+
+Порядок задается строковым ключом Task.rank (core.fractional_index):
+перемещение задачи пишет только ее строку с ключом между новыми
+соседями, перемещение выделения -- по строке на задачу одним
+bulk_update. Если ключ получается длиннее MAX_KEY_LENGTH (много вставок в
+одно место), ключи колонки перераспределяются в той же транзакции.
+Изменения порядка в колонке сериализуются блокировкой строки TaskColumn.
+"""
+import uuid
+from typing import Any, Iterable, List, Optional, Sequence, Tuple
+
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.db.models import Q
+
+from backend.apps.tasks.models import Task, TaskColumn
+from backend.core.exceptions import NotFoundException, ValidationException
+from backend.core.fractional_index import MAX_KEY_LENGTH, keys_between, spread_keys
+from backend.services.task_activity import TaskActivityLog
+from backend.services.task_board_summary import TaskBoardSummary
+
+User = get_user_model()
+
+MAX_MOVE_TASKS = 500
+
+
+class TaskOrdering:
+    """Ключи порядка задач"""
+
+    @staticmethod
+    def move(
+        task: Task,
+        column: TaskColumn,
+        after_id: Optional[str] = None,
+        before_id: Optional[str] = None,
+        index: Optional[int] = None
+    ) -> Task:
+        """Перемещение задачи в column на место по соседу или индексу"""
+        return TaskOrdering._place([task], column, after_id, before_id, index)[0]
+
+    @staticmethod
+    def move_many(
+        user: User,
+        task_ids: Sequence[str],
+        column_id: str,
+        after_id: Optional[str] = None,
+        before_id: Optional[str] = None,
+        index: Optional[int] = None
+    ) -> List[Task]:
+        """
+        Перемещение выделенных задач подряд в колонку одной транзакцией.
+
+        Задачи встают в порядке task_ids после after_id, перед before_id,
+        на позицию index или в конец колонки.
+        """
+        if not task_ids or len(task_ids) > MAX_MOVE_TASKS:
+            raise ValidationException(f'Нужно от 1 до {MAX_MOVE_TASKS} задач')
+        try:
+            task_ids = [str(uuid.UUID(str(task_id))) for task_id in dict.fromkeys(task_ids)]
+            column_id = uuid.UUID(str(column_id))
+        except ValueError:
+            raise ValidationException('Некорректный идентификатор')
+
+        column = TaskColumn.objects.filter(
+            id=column_id, board__workspace__members__user=user
+        ).select_related('board').first()
+        if not column:
+            raise NotFoundException("Колонка не найдена")
+
+        tasks = {
+            str(task.id): task
+            for task in Task.objects.filter(id__in=task_ids, board_id=column.board_id)
+        }
+        if len(tasks) != len(task_ids):
+            raise NotFoundException("Задача не найдена")
+        columns = {task.id: task.column_id for task in tasks.values()}
+        before = {task.id: TaskBoardSummary.state(task) for task in tasks.values()}
+        with transaction.atomic():
+            moved = TaskOrdering._place([tasks[task_id] for task_id in task_ids], column, after_id, before_id, index)
+            TaskBoardSummary.changed(column.board_id, [
+                (before[task.id], TaskBoardSummary.state(task)) for task in moved
+            ])
+        TaskActivityLog.moved(moved, user, columns)
+        return moved
+
+    @staticmethod
+    def append(tasks: List[Task], column: TaskColumn) -> List[Task]:
+        """Перемещение уже проверенных задач подряд в конец колонки"""
+        return TaskOrdering._place(tasks, column, None, None, None)
+
+    @staticmethod
+    def rebalance(column_id, exclude: Iterable[Any] = ()) -> int:
+        """Равномерные короткие ключи для всех задач колонки"""
+        tasks = list(
+            Task.objects.filter(column_id=column_id).exclude(id__in=list(exclude)).order_by('rank', 'id').only('id')
+        )
+        for task, rank in zip(tasks, spread_keys(len(tasks))):
+            task.rank = rank
+        Task.objects.bulk_update(tasks, ['rank'], batch_size=1000)
+        return len(tasks)
+
+    @staticmethod
+    def _place(
+        tasks: List[Task],
+        column: TaskColumn,
+        after_id: Optional[str],
+        before_id: Optional[str],
+        index: Optional[int]
+    ) -> List[Task]:
+        moved_ids = [task.id for task in tasks]
+        with transaction.atomic():
+            TaskColumn.objects.select_for_update().filter(pk=column.pk).first()
+
+            lower, upper = TaskOrdering._neighbors(column.pk, moved_ids, after_id, before_id, index)
+            ranks = TaskOrdering._keys(lower, upper, len(tasks))
+            if ranks is None:
+                TaskOrdering.rebalance(column.pk, exclude=moved_ids)
+                lower, upper = TaskOrdering._neighbors(column.pk, moved_ids, after_id, before_id, index)
+                ranks = keys_between(lower, upper, len(tasks))
+
+            for task, rank in zip(tasks, ranks):
+                task.column = column
+                task.rank = rank
+            if len(tasks) == 1:
+                tasks[0].save(update_fields=['column', 'rank', 'updated_at'])
+            else:
+                Task.objects.bulk_update(tasks, ['column', 'rank'])
+        return tasks
+
+    @staticmethod
+    def _keys(lower: Optional[str], upper: Optional[str], count: int) -> Optional[List[str]]:
+        """Ключи между соседями или None, если нужно перераспределение"""
+        if '' in (lower, upper):
+            # Задачи без ключа (созданные в обход Task.save)
+            return None
+        if lower is not None and upper is not None and lower >= upper:
+            return None
+        ranks = keys_between(lower, upper, count)
+        if max(len(rank) for rank in ranks) > MAX_KEY_LENGTH:
+            return None
+        return ranks
+
+    @staticmethod
+    def _neighbors(
+        column_id,
+        moved_ids: List[Any],
+        after_id: Optional[str],
+        before_id: Optional[str],
+        index: Optional[int]
+    ) -> Tuple[Optional[str], Optional[str]]:
+        """Ключи соседей места вставки без учета перемещаемых задач"""
+        others = Task.objects.filter(column_id=column_id).exclude(id__in=moved_ids)
+
+        if after_id or before_id:
+            try:
+                anchor_id = uuid.UUID(str(after_id or before_id))
+            except ValueError:
+                raise ValidationException('Некорректный идентификатор соседней задачи')
+            anchor = others.filter(id=anchor_id).values('id', 'rank').first()
+            if anchor is None:
+                raise ValidationException('Соседняя задача не найдена в колонке')
+            if after_id:
+                upper = others.filter(
+                    Q(rank__gt=anchor['rank']) | Q(rank=anchor['rank'], id__gt=anchor['id'])
+                ).order_by('rank', 'id').values_list('rank', flat=True).first()
+                return anchor['rank'], upper
+            lower = others.filter(
+                Q(rank__lt=anchor['rank']) | Q(rank=anchor['rank'], id__lt=anchor['id'])
+            ).order_by('-rank', '-id').values_list('rank', flat=True).first()
+            return lower, anchor['rank']
+
+        if index is None:
+            return others.order_by('-rank', '-id').values_list('rank', flat=True).first(), None
+
+        try:
+            index = max(int(index), 0)
+        except (TypeError, ValueError):
+            raise ValidationException('Некорректная позиция')
+        ordered = others.order_by('rank', 'id').values_list('rank', flat=True)
+        if index == 0:
+            return None, ordered.first()
+        around = list(ordered[index - 1:index + 1])
+        return around[0] if around else ordered.last(), around[1] if len(around) > 1 else None
@@ -0,0 +1,215 @@
+"""
+Повторяющиеся задачи и календарь доски
+
+Правило повторения (RRULE, backend.core.recurrence) не разворачивается
+при каждом запросе: повторения материализуются в TaskOccurrence на окно
+TASK_RECURRENCE_WINDOW_DAYS вперед. Команда extend_task_recurrences
+продлевает окно правил, у которых впереди осталось меньше половины, --
+выбор идет по частичному индексу незавершенных правил, пачками с SELECT
+... FOR UPDATE SKIP LOCKED, поэтому проход не зависит от числа правил,
+которым продление не нужно. Продление дописывает только новые
+повторения: перебор правила начинается с границы окна.
+
+Календарь читает повторения и разовые задачи по индексам (доска, срок);
+если запрошенный период выходит за окно, правила доски досчитываются до
+его конца один раз и результат сохраняется.
+"""
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.utils import timezone
+
+from backend.apps.tasks.models import Task, TaskOccurrence, TaskRecurrence
+from backend.core.exceptions import NotFoundException, ValidationException
+from backend.core.recurrence import RecurrenceRule
+from backend.services.taskboards import TaskBoardService
+
+User = get_user_model()
+
+DEFAULT_BATCH_SIZE = 500
+
+
+def recurrence_window() -> timedelta:
+    return timedelta(days=settings.TASK_RECURRENCE_WINDOW_DAYS)
+
+
+class TaskRecurrenceService:
+    """Правила повторения задач и материализация повторений"""
+
+    @staticmethod
+    def get_recurrence(task_id: str, user: User) -> Optional[TaskRecurrence]:
+        task = TaskRecurrenceService._get_task(task_id, user)
+        return TaskRecurrence.objects.filter(task=task).first()
+
+    @staticmethod
+    def set_rule(task_id: str, user: User, rule: str, starts_at: Optional[datetime] = None) -> TaskRecurrence:
+        """
+        Установка правила повторения задачи.
+
+        starts_at -- срок первого повторения; по умолчанию срок задачи.
+        Длительность повторения берется из задачи (срок минус начало).
+        Ранее материализованные повторения заменяются.
+        """
+        task = TaskRecurrenceService._get_task(task_id, user)
+        try:
+            RecurrenceRule.parse(rule)
+        except ValueError as error:
+            raise ValidationException(str(error))
+        starts_at = starts_at or task.due_date
+        if starts_at is None:
+            raise ValidationException('Для повторения нужен срок задачи или starts_at')
+        duration = None
+        if task.start_date and task.due_date and task.start_date <= task.due_date:
+            duration = task.due_date - task.start_date
+
+        with transaction.atomic():
+            recurrence, _ = TaskRecurrence.objects.update_or_create(task=task, defaults={
+                'rule': rule.strip(),
+                'starts_at': starts_at,
+                'duration': duration,
+                'generated_until': None,
+                'generated_count': 0,
+                'is_finished': False,
+            })
+            recurrence.occurrences.all().delete()
+            TaskRecurrenceService.extend(recurrence, timezone.now() + recurrence_window())
+        return recurrence
+
+    @staticmethod
+    def clear(task_id: str, user: User) -> None:
+        """Снятие повторения: повторения удаляются каскадно"""
+        task = TaskRecurrenceService._get_task(task_id, user)
+        TaskRecurrence.objects.filter(task=task).delete()
+
+    @staticmethod
+    def extend(recurrence: TaskRecurrence, until: datetime) -> int:
+        """
+        Материализация повторений до until.
+
+        Returns:
+            Количество новых повторений
+        """
+        if recurrence.is_finished or (recurrence.generated_until and recurrence.generated_until >= until):
+            return 0
+
+        rule = RecurrenceRule.parse(recurrence.rule)
+        moments = []
+        for moment in rule.between(recurrence.starts_at, recurrence.generated_until, until):
+            moments.append(moment)
+            if rule.count is not None and recurrence.generated_count + len(moments) >= rule.count:
+                break
+        finished = (
+            (rule.count is not None and recurrence.generated_count + len(moments) >= rule.count)
+            or (rule.until is not None and rule.until <= until)
+        )
+
+        with transaction.atomic():
+            TaskOccurrence.objects.bulk_create(
+                [
+                    TaskOccurrence(
+                        recurrence_id=recurrence.id,
+                        task_id=recurrence.task_id,
+                        board_id=recurrence.task.board_id,
+                        due_at=moment,
+                        starts_at=moment - recurrence.duration if recurrence.duration is not None else None,
+                    )
+                    for moment in moments
+                ],
+                ignore_conflicts=True,
+                batch_size=DEFAULT_BATCH_SIZE,
+            )
+            recurrence.generated_until = until
+            recurrence.generated_count += len(moments)
+            recurrence.is_finished = finished
+            TaskRecurrence.objects.filter(id=recurrence.id).update(
+                generated_until=until,
+                generated_count=recurrence.generated_count,
+                is_finished=finished,
+            )
+        return len(moments)
+
+    @staticmethod
+    def extend_due(now: Optional[datetime] = None, batch_size: int = DEFAULT_BATCH_SIZE) -> Dict[str, int]:
+        """
+        Продление окна правил, у которых впереди меньше половины окна.
+
+        Returns:
+            {"recurrences": продленных правил, "occurrences": новых повторений}
+        """
+        now = now or timezone.now()
+        until = now + recurrence_window()
+        threshold = now + recurrence_window() / 2
+        result = {'recurrences': 0, 'occurrences': 0}
+        while True:
+            with transaction.atomic():
+                recurrences = list(
+                    TaskRecurrence.objects.select_for_update(skip_locked=True, of=('self',))
+                    .filter(is_finished=False, generated_until__lt=threshold)
+                    .select_related('task')
+                    .order_by('generated_until')[:batch_size]
+                )
+                for recurrence in recurrences:
+                    result['occurrences'] += TaskRecurrenceService.extend(recurrence, until)
+            result['recurrences'] += len(recurrences)
+            if len(recurrences) < batch_size:
+                return result
+
+    @staticmethod
+    def calendar(board_id: str, user: User, start: datetime, end: datetime) -> List[Dict[str, Any]]:
+        """
+        Задачи доски со сроком в [start, end): разовые и повторения, по сроку.
+
+        Raises:
+            ValidationException: некорректный или слишком широкий период
+        """
+        board = TaskBoardService.get_board_by_id(board_id, user)
+        if end <= start:
+            raise ValidationException('Конец периода должен быть позже начала')
+        if end - start > timedelta(days=settings.TASK_CALENDAR_MAX_RANGE_DAYS):
+            raise ValidationException(f'Период не больше {settings.TASK_CALENDAR_MAX_RANGE_DAYS} дней')
+        if end > timezone.now() + timedelta(days=settings.TASK_CALENDAR_HORIZON_DAYS):
+            raise ValidationException(f'Календарь доступен на {settings.TASK_CALENDAR_HORIZON_DAYS} дней вперед')
+
+        # Период за окном: правила доски досчитываются до его конца
+        stale = TaskRecurrence.objects.filter(task__board=board, is_finished=False, generated_until__lt=end)
+        if stale.exists():
+            with transaction.atomic():
+                for recurrence in stale.select_for_update(of=('self',)).select_related('task'):
+                    TaskRecurrenceService.extend(recurrence, end)
+
+        items = [
+            TaskRecurrenceService._item(occurrence.task, occurrence.due_at, occurrence.starts_at, True)
+            for occurrence in TaskOccurrence.objects.filter(
+                board=board, due_at__gte=start, due_at__lt=end
+            ).select_related('task')
+        ]
+        items += [
+            TaskRecurrenceService._item(task, task.due_date, task.start_date, False)
+            for task in Task.objects.filter(
+                board=board, due_date__gte=start, due_date__lt=end, recurrence__isnull=True
+            )
+        ]
+        items.sort(key=lambda item: (item['due_at'], item['task_id']))
+        return items
+
+    @staticmethod
+    def _item(task: Task, due_at: datetime, starts_at: Optional[datetime], recurring: bool) -> Dict[str, Any]:
+        return {
+            'task_id': str(task.id),
+            'title': task.title,
+            'status': task.status,
+            'priority': task.priority,
+            'due_at': due_at,
+            'starts_at': starts_at,
+            'recurring': recurring,
+        }
+
+    @staticmethod
+    def _get_task(task_id: str, user: User) -> Task:
+        task = Task.objects.filter(id=task_id, board__workspace__members__user=user).first()
+        if not task:
+            raise NotFoundException("Задача не найдена")
+        return task
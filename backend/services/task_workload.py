@@ -0,0 +1,120 @@
+"""
+Загрузка исполнителей рабочего пространства
+
+Для каждого исполнителя -- число незавершенных задач и сумма
+estimated_hours по неделям срока на всех досках пространства. Считается
+одним группирующим запросом по промежуточной таблице Task.assignees с
+усечением срока до недели (TruncWeek); задачи со сроком раньше периода
+попадают в "overdue", без срока -- в "unscheduled". Результат кэшируется
+на TASK_WORKLOAD_CACHE_TIMEOUT секунд: отчет читают часто, а небольшое
+отставание для него допустимо.
+"""
+from datetime import date, datetime, time, timedelta
+from decimal import Decimal
+from typing import Any, Dict, Optional
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db.models import Count, Q, Sum
+from django.db.models.functions import TruncWeek
+from django.utils import timezone
+
+from backend.apps.tasks.models import Task
+
+User = get_user_model()
+
+DEFAULT_WEEKS = 8
+MAX_WEEKS = 26
+
+
+def week_start(day: date) -> date:
+    """Понедельник недели, в которую попадает day"""
+    return day - timedelta(days=day.weekday())
+
+
+def _hours(value: Optional[Decimal]) -> float:
+    return float(value) if value is not None else 0.0
+
+
+class TaskWorkload:
+    """Отчет о загрузке исполнителей по неделям"""
+
+    @staticmethod
+    def cache_key(workspace_id, start: date, weeks: int) -> str:
+        return f'task_workload:{workspace_id}:{start.isoformat()}:{weeks}'
+
+    @staticmethod
+    def workload(workspace, start: Optional[date] = None, weeks: int = DEFAULT_WEEKS) -> Dict[str, Any]:
+        """
+        Загрузка исполнителей на weeks недель начиная с недели start.
+
+        Returns:
+            {"weeks": [понедельники], "assignees": [{"user_id", "name",
+            "open_tasks", "estimated_hours", "overdue", "unscheduled",
+            "by_week": [{"week", "tasks", "hours"}]}]}
+        """
+        start = week_start(start or timezone.localdate())
+        key = TaskWorkload.cache_key(workspace.id, start, weeks)
+        result = cache.get(key)
+        if result is None:
+            result = TaskWorkload.compute(workspace, start, weeks)
+            cache.set(key, result, settings.TASK_WORKLOAD_CACHE_TIMEOUT)
+        return result
+
+    @staticmethod
+    def compute(workspace, start: date, weeks: int) -> Dict[str, Any]:
+        """Расчет отчета одним запросом; start -- понедельник"""
+        week_keys = [(start + timedelta(weeks=index)).isoformat() for index in range(weeks)]
+        end = timezone.make_aware(datetime.combine(start + timedelta(weeks=weeks), time.min))
+
+        rows = Task.assignees.through.objects.filter(
+            Q(task__due_date__isnull=True) | Q(task__due_date__lt=end),
+            task__board__workspace=workspace,
+        ).exclude(
+            task__status='done'
+        ).values(
+            'user_id', 'user__first_name', 'user__last_name', 'user__username', 'user__email',
+            week=TruncWeek('task__due_date'),
+        ).annotate(
+            tasks=Count('id'),
+            hours=Sum('task__estimated_hours'),
+        ).order_by()
+
+        assignees: Dict[Any, Dict[str, Any]] = {}
+        for row in rows:
+            entry = assignees.get(row['user_id'])
+            if entry is None:
+                name = User(
+                    first_name=row['user__first_name'], last_name=row['user__last_name'],
+                    username=row['user__username'], email=row['user__email'],
+                ).full_name
+                entry = assignees[row['user_id']] = {
+                    'user_id': row['user_id'],
+                    'name': name,
+                    'open_tasks': 0,
+                    'estimated_hours': 0.0,
+                    'overdue': {'tasks': 0, 'hours': 0.0},
+                    'unscheduled': {'tasks': 0, 'hours': 0.0},
+                    'by_week': {week: {'week': week, 'tasks': 0, 'hours': 0.0} for week in week_keys},
+                }
+
+            if row['week'] is None:
+                bucket = entry['unscheduled']
+            else:
+                week = row['week']
+                week = week.date() if isinstance(week, datetime) else week
+                bucket = entry['overdue'] if week < start else entry['by_week'][week.isoformat()]
+            hours = _hours(row['hours'])
+            bucket['tasks'] += row['tasks']
+            bucket['hours'] += hours
+            entry['open_tasks'] += row['tasks']
+            entry['estimated_hours'] += hours
+
+        result = sorted(assignees.values(), key=lambda entry: (-entry['estimated_hours'], entry['name']))
+        for entry in result:
+            entry['estimated_hours'] = round(entry['estimated_hours'], 2)
+            entry['by_week'] = list(entry['by_week'].values())
+            for bucket in (entry['overdue'], entry['unscheduled'], *entry['by_week']):
+                bucket['hours'] = round(bucket['hours'], 2)
+        return {'weeks': week_keys, 'assignees': result}
@@ -3,11 +3,18 @@
 """
 from typing import List, Dict, Any, Optional
 from django.contrib.auth import get_user_model
-from django.db.models import Q, Max
+from django.db import transaction
+from django.db.models import IntegerField, Max, OuterRef, Q, QuerySet, Subquery, Count
+from django.db.models.functions import Coalesce
 
-from backend.apps.tasks.models import TaskBoard, TaskColumn, Task
+from backend.apps.tasks.models import TaskBoard, TaskColumn, Task, TaskComment
 from backend.apps.workspaces.models import Workspace
 from backend.core.exceptions import BusinessLogicException, NotFoundException
+from backend.services.reminders import ReminderDispatcher
+from backend.services.task_activity import TaskActivityLog
+from backend.services.task_board_summary import TaskBoardSummary
+from backend.services.task_dependencies import TaskDependencyGraph
+from backend.services.task_ordering import TaskOrdering
 
 User = get_user_model()
 
@@ -22,9 +29,9 @@ class TaskBoardService:
             members__user=user
         ).values_list('id', flat=True)
         
-        queryset = TaskBoard.objects.filter(
+        queryset = TaskBoardSummary.annotate_tasks_count(TaskBoard.objects.filter(
             workspace__in=user_workspaces
-        ).select_related('workspace', 'created_by').order_by('-updated_at')
+        ).select_related('workspace', 'created_by').order_by('-updated_at'))
         
         if workspace_id:
             queryset = queryset.filter(workspace_id=workspace_id)
@@ -148,13 +155,27 @@ class TaskColumnService:
         if not column:
             raise NotFoundException("Колонка не найдена")
         
-        column.delete()
+        with transaction.atomic():
+            column.delete()
+            # Задачи колонки удалены каскадом
+            TaskBoardSummary.reconcile([column.board_id])
+            TaskDependencyGraph.invalidate(column.board_id)
         return True
 
 
 class TaskService:
     """Сервис для управления задачами"""
     
+    @staticmethod
+    def with_comments_count(queryset: QuerySet) -> QuerySet:
+        """Аннотация comments_count подзапросом вместо COUNT на каждую задачу"""
+        comments = TaskComment.objects.filter(
+            task=OuterRef('pk')
+        ).order_by().values('task').annotate(total=Count('pk')).values('total')
+        return queryset.annotate(
+            comments_count=Coalesce(Subquery(comments, output_field=IntegerField()), 0)
+        )
+    
     @staticmethod
     def get_board_tasks(board_id: str, user: User, **filters) -> List[Task]:
         """Получение задач доски"""
@@ -162,7 +183,7 @@ class TaskService:
         
         queryset = Task.objects.filter(board=board).select_related(
             'board', 'column', 'created_by'
-        ).prefetch_related('assignees', 'tags').order_by('position', '-created_at')
+        ).prefetch_related('assignees', 'tags').order_by('rank', 'id')
         
         # Применяем фильтры
         if filters.get('column_id'):
@@ -174,7 +195,7 @@ class TaskService:
         if filters.get('status'):
             queryset = queryset.filter(status=filters['status'])
         
-        return list(queryset)
+        return list(TaskService.with_comments_count(queryset))
     
     @staticmethod
     def create_task(user: User, board_id: str, **data) -> Task:
@@ -193,18 +214,21 @@ class TaskService:
             if first_column:
                 data['column'] = first_column
         
-        task = Task.objects.create(
-            board=board,
-            created_by=user,
-            **data
-        )
-        
-        # Устанавливаем many-to-many поля отдельно
-        if tags:
-            task.tags.set(tags)
-        if assignees:
-            task.assignees.set(assignees)
-        
+        with transaction.atomic():
+            task = Task.objects.create(
+                board=board,
+                created_by=user,
+                **data
+            )
+            
+            # Устанавливаем many-to-many поля отдельно
+            if tags:
+                task.tags.set(tags)
+            if assignees:
+                task.assignees.set(assignees)
+            TaskBoardSummary.created(task, [getattr(assignee, 'pk', assignee) for assignee in assignees])
+        
+        TaskActivityLog.created(task, user)
         return task
     
     @staticmethod
@@ -218,11 +242,19 @@ class TaskService:
         if not task:
             raise NotFoundException("Задача не найдена")
         
+        before = TaskActivityLog.snapshot(task)
         for field, value in data.items():
             if hasattr(task, field):
                 setattr(task, field, value)
-        
-        task.save()
+        ReminderDispatcher.reset_due_notice(task, before['due_date'])
+        
+        with transaction.atomic():
+            task.save()
+            TaskBoardSummary.changed(task.board_id, [
+                (TaskBoardSummary.state_from(before), TaskBoardSummary.state(task))
+            ])
+            TaskDependencyGraph.task_changed(task, before)
+        TaskActivityLog.changed(task, user, before)
         return task
     
     @staticmethod
@@ -236,12 +268,29 @@ class TaskService:
         if not task:
             raise NotFoundException("Задача не найдена")
         
-        task.delete()
+        with transaction.atomic():
+            TaskBoardSummary.deleted(
+                task.board_id, [TaskBoardSummary.state(task)], task.assignees.values_list('id', flat=True)
+            )
+            TaskDependencyGraph.tasks_deleted(task.board_id, [task.id])
+            task.delete()
         return True
     
     @staticmethod
-    def move_task(task_id: str, user: User, column_id: str, position: int = 0) -> Task:
-        """Перемещение задачи в другую колонку"""
+    def move_task(
+        task_id: str,
+        user: User,
+        column_id: str,
+        position: Optional[int] = None,
+        after_id: Optional[str] = None,
+        before_id: Optional[str] = None
+    ) -> Task:
+        """
+        Перемещение задачи в другую колонку.
+
+        Место задается соседом (after_id/before_id) или индексом position
+        среди задач колонки; без них задача встает в конец.
+        """
         task = Task.objects.filter(
             id=task_id,
             board__workspace__members__user=user
@@ -259,8 +308,12 @@ class TaskService:
         if not column:
             raise NotFoundException("Колонка не найдена")
         
-        task.column = column
-        task.position = position
-        task.save()
-        
+        before = TaskActivityLog.snapshot(task)
+        with transaction.atomic():
+            task = TaskOrdering.move(task, column, after_id=after_id, before_id=before_id, index=position)
+            TaskBoardSummary.changed(task.board_id, [
+                (TaskBoardSummary.state_from(before), TaskBoardSummary.state(task))
+            ])
+            TaskDependencyGraph.task_changed(task, before)
+        TaskActivityLog.changed(task, user, before)
         return task
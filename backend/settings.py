@@ -189,6 +189,81 @@ CHANNEL_LAYERS = {
     },
 }
 
+# Фоновая очередь (backend.core.background): True -- выполнять задачи сразу
+# в вызывающем потоке
+BACKGROUND_TASKS_SYNC = config('BACKGROUND_TASKS_SYNC', default=False, cast=bool)
+
+# Буфер просмотров страниц: сброс в базу не позже FLUSH_INTERVAL секунд
+# после первого просмотра или при BUFFER_SIZE просмотрах (0 -- сразу)
+PAGE_VIEW_FLUSH_INTERVAL = 5
+PAGE_VIEW_BUFFER_SIZE = 1000
+
+# История версий страниц: снимок каждые SNAPSHOT_INTERVAL версий, между
+# ними дельты; правки одного автора за COALESCE_WINDOW секунд объединяются,
+# compact_page_versions оставляет по одной версии в день старше KEEP_ALL_DAYS
+PAGE_VERSION_SNAPSHOT_INTERVAL = 20
+PAGE_VERSION_COALESCE_WINDOW = 5 * 60
+PAGE_VERSION_RETENTION = {
+    'KEEP_ALL_DAYS': 30,
+}
+
+# За сколько минут до срока задачи dispatch_reminders уведомляет исполнителей
+TASK_DUE_NOTICE_MINUTES = 24 * 60
+
+# Вложения задач: предельный размер файла (байт) и размер превью (пикселей)
+TASK_ATTACHMENT_MAX_SIZE = 200 * 1024 * 1024
+TASK_ATTACHMENT_THUMBNAIL_SIZE = 320
+
+# Повторяющиеся задачи: на сколько дней вперед материализуются повторения
+# (extend_task_recurrences продлевает окно, когда впереди остается меньше
+# половины) и на сколько дней вперед и какой ширины доступен календарь
+TASK_RECURRENCE_WINDOW_DAYS = 90
+TASK_CALENDAR_HORIZON_DAYS = 3 * 365
+TASK_CALENDAR_MAX_RANGE_DAYS = 366
+
+# Сколько секунд кэшируется отчет о загрузке исполнителей
+TASK_WORKLOAD_CACHE_TIMEOUT = 60
+
+# Префикс internal-location nginx для отдачи файлов через X-Accel-Redirect;
+# пусто -- файлы отдает приложение потоком
+FILE_ACCEL_REDIRECT_PREFIX = config('FILE_ACCEL_REDIRECT_PREFIX', default='')
+
+# Окно (в секундах), за которое изменения записей базы данных, пришедшие
+# по WebSocket, объединяются в один пакет перед сохранением
+DATABASE_COLLABORATION_BATCH_WINDOW = 0.05
+
+# Heartbeat WebSocket-соединений (секунды): соединение без сообщений дольше
+# IDLE_TIMEOUT закрывается, присутствие продлевается не чаще TOUCH_INTERVAL,
+# сессии без продления дольше STALE_AFTER удаляет reap_collaboration_sessions
+COLLABORATION_IDLE_TIMEOUT = 75
+COLLABORATION_PRESENCE_TOUCH_INTERVAL = 30
+COLLABORATION_SESSION_STALE_AFTER = 120
+
+# Алиасы CHANNEL_LAYERS, по которым комнаты распределяются кольцом
+# консистентного хеширования по room_group_name
+COLLABORATION_CHANNEL_LAYER_RING = ['default']
+
+# Token bucket для входящих сообщений: (токенов в секунду, емкость)
+COLLABORATION_RATE_LIMITS = {
+    'user': (20, 40),
+    'room': (200, 400),
+}
+
+# Кэш пользователей WebSocket-аутентификации по (user_id, jti): запись живет
+# не дольше токена и не дольше MAX_TTL секунд
+WEBSOCKET_AUTH_CACHE_SIZE = 10000
+WEBSOCKET_AUTH_CACHE_MAX_TTL = 300
+
+# Журнал событий комнат для восстановления сессий после переподключения:
+# 'redis' (Redis Streams, общий для всех процессов) или 'memory'
+COLLABORATION_EVENT_LOG = {
+    'BACKEND': config('COLLABORATION_EVENT_LOG_BACKEND', default='redis'),
+    'URL': config('REDIS_URL', default='redis://localhost:6379'),
+    'MAXLEN': 500,  # Событий на комнату
+    'TTL': 24 * 60 * 60,  # Время жизни журнала неактивной комнаты
+    'MAX_ROOMS': 10000,  # Комнат в журнале memory
+}
+
 # Django allauth
 SITE_ID = 1
 AUTHENTICATION_BACKENDS = [
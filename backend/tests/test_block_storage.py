@@ -0,0 +1,294 @@
+"""
+Тесты для поблочного хранения содержимого страниц
+"""
+import uuid
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from rest_framework import status
+from rest_framework.test import APITestCase
+
+from backend.apps.notes.models import Block, Page, PageVersion
+from backend.apps.workspaces.models import Workspace, WorkspaceMember
+from backend.core.exceptions import ValidationException
+from backend.services.block_storage import BlockStorage
+from backend.services.note_service import PageService
+
+User = get_user_model()
+
+
+def make_document(*texts, children=None):
+    blocks = [
+        {'id': str(uuid.uuid4()), 'type': 'text', 'content': {'text': text}, 'children': []}
+        for text in texts
+    ]
+    if children:
+        blocks[0]['children'] = children
+    return {'blocks': blocks}
+
+
+class BlockStorageTest(TestCase):
+    """Тесты BlockStorage"""
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(
+            username='writer',
+            email='writer@example.com',
+            password='testpass123'
+        )
+        self.workspace = Workspace.objects.create(name='Test Workspace', owner=self.user)
+        WorkspaceMember.objects.create(workspace=self.workspace, user=self.user, role='owner')
+        self.page = Page.objects.create(
+            title='Blocks', workspace=self.workspace, author=self.user, last_edited_by=self.user
+        )
+
+    def test_sync_writes_only_changed_blocks(self):
+        """Повторное сохранение документа затрагивает только измененный блок"""
+        document = make_document('first', 'second', 'third')
+        BlockStorage.sync_from_content(self.page, self.user, document)
+        self.assertEqual(Block.objects.filter(page=self.page).count(), 3)
+
+        document['blocks'][1]['content'] = {'text': 'edited'}
+        with CaptureQueriesContext(connection) as queries:
+            revision = BlockStorage.sync_from_content(self.page, self.user, document)
+
+        writes = [q['sql'] for q in queries.captured_queries if q['sql'].startswith('UPDATE "notes_block"')]
+        self.assertEqual(len(writes), 1)
+        self.assertIn(document['blocks'][1]['id'].replace('-', ''), writes[0].replace('-', ''))
+        self.assertEqual(revision, 2)
+
+    def test_unchanged_document_keeps_revision(self):
+        document = make_document('same')
+        BlockStorage.sync_from_content(self.page, self.user, document)
+        self.assertEqual(BlockStorage.sync_from_content(self.page, self.user, document), 1)
+
+    def test_page_column_is_not_rewritten(self):
+        BlockStorage.sync_from_content(self.page, self.user, make_document('text'))
+        page = Page.objects.get(pk=self.page.pk)
+        self.assertEqual(page.content, {})
+        self.assertEqual(page.blocks_revision, 1)
+        self.assertEqual(page.content_revision, 0)
+
+    def test_materialize_builds_tree_and_caches(self):
+        child = {'id': str(uuid.uuid4()), 'type': 'todo', 'content': {'text': 'child'}, 'children': []}
+        document = make_document('parent', 'sibling', children=[child])
+        BlockStorage.sync_from_content(self.page, self.user, document)
+
+        page = Page.objects.get(pk=self.page.pk)
+        self.assertEqual(BlockStorage.materialize(page), document)
+        with self.assertNumQueries(0):
+            BlockStorage.materialize(page)
+
+    def test_deleted_blocks_are_removed(self):
+        document = make_document('keep', 'drop')
+        BlockStorage.sync_from_content(self.page, self.user, document)
+        document['blocks'].pop()
+        BlockStorage.sync_from_content(self.page, self.user, document)
+
+        page = Page.objects.get(pk=self.page.pk)
+        self.assertEqual(BlockStorage.materialize(page), document)
+
+    def test_legacy_document_is_imported_before_block_edit(self):
+        """Документ, сохраненный целиком в столбце, не теряется при поблочной правке"""
+        document = make_document('legacy')
+        Page.objects.filter(pk=self.page.pk).update(content=document)
+        page = Page.objects.get(pk=self.page.pk)
+
+        BlockStorage.apply_operations(page, self.user, [
+            {'op': 'upsert', 'type': 'text', 'content': {'text': 'new'}, 'position': 1}
+        ])
+
+        texts = [block['content']['text'] for block in BlockStorage.materialize(page)['blocks']]
+        self.assertEqual(texts, ['legacy', 'new'])
+
+    def test_unknown_parent_is_rejected(self):
+        with self.assertRaises(ValidationException):
+            BlockStorage.apply_operations(self.page, self.user, [
+                {'op': 'upsert', 'parent_id': str(uuid.uuid4())}
+            ])
+
+    def test_blocks_of_other_page_get_new_ids(self):
+        """Вставленный из другой страницы документ не перехватывает ее блоки"""
+        child = {'id': str(uuid.uuid4()), 'type': 'text', 'content': {'text': 'child'}, 'children': []}
+        document = make_document('shared', children=[child])
+        other = Page.objects.create(
+            title='Other', workspace=self.workspace, author=self.user, last_edited_by=self.user
+        )
+        BlockStorage.sync_from_content(other, self.user, document)
+        BlockStorage.sync_from_content(self.page, self.user, document)
+
+        own = BlockStorage.materialize(Page.objects.get(pk=self.page.pk))['blocks']
+        self.assertNotEqual(own[0]['id'], document['blocks'][0]['id'])
+        self.assertEqual(own[0]['children'][0]['content'], {'text': 'child'})
+        self.assertEqual(Block.objects.filter(page=other).count(), 2)
+
+        with self.assertRaises(ValidationException):
+            BlockStorage.apply_operations(self.page, self.user, [
+                {'op': 'upsert', 'id': child['id'], 'content': {'text': 'stolen'}}
+            ])
+
+    def test_html_content_stays_in_column(self):
+        BlockStorage.sync_from_content(self.page, self.user, make_document('blocks'))
+        page = PageService.update_page(self.page.id, self.user, content='<p>html</p>')
+        page = Page.objects.get(pk=page.pk)
+        self.assertEqual(BlockStorage.materialize(page), '<p>html</p>')
+
+    def test_update_page_versions_materialized_content(self):
+        document = make_document('versioned')
+        PageService.update_page(self.page.id, self.user, content=document, title='Renamed')
+
+        page = Page.objects.get(pk=self.page.pk)
+        self.assertEqual(page.title, 'Renamed')
+        self.assertEqual(PageVersion.objects.get(page=page).content, document)
+
+
+class PageBlockContentAPITest(APITestCase):
+    """Тесты API страницы с блочным содержимым"""
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(
+            username='reader',
+            email='reader@example.com',
+            password='testpass123'
+        )
+        self.workspace = Workspace.objects.create(name='Test Workspace', owner=self.user)
+        WorkspaceMember.objects.create(workspace=self.workspace, user=self.user, role='owner')
+        self.page = Page.objects.create(
+            title='Blocks', workspace=self.workspace, author=self.user, last_edited_by=self.user
+        )
+        self.client.force_authenticate(user=self.user)
+
+    def test_block_endpoint_changes_page_content(self):
+        response = self.client.post(
+            f'/api/notes/pages/{self.page.id}/blocks/',
+            {'type': 'text', 'content': {'text': 'from block api'}},
+            format='json'
+        )
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+
+        response = self.client.get(f'/api/notes/pages/{self.page.id}/')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        blocks = response.data['content']['blocks']
+        self.assertEqual([block['content']['text'] for block in blocks], ['from block api'])
+
+
+class BlockBatchTest(TestCase):
+    """Тесты пакетных операций над блоками"""
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(
+            username='mover',
+            email='mover@example.com',
+            password='testpass123'
+        )
+        self.workspace = Workspace.objects.create(name='Test Workspace', owner=self.user)
+        WorkspaceMember.objects.create(workspace=self.workspace, user=self.user, role='owner')
+        self.page = Page.objects.create(
+            title='Blocks', workspace=self.workspace, author=self.user, last_edited_by=self.user
+        )
+        self.document = make_document('a', 'b', 'c', 'd')
+        BlockStorage.sync_from_content(self.page, self.user, self.document)
+        self.ids = [block['id'] for block in self.document['blocks']]
+
+    def texts(self):
+        page = Page.objects.get(pk=self.page.pk)
+        return [block['content']['text'] for block in BlockStorage.materialize(page)['blocks']]
+
+    def test_move_writes_only_moved_block(self):
+        with CaptureQueriesContext(connection) as queries:
+            revision, positions = BlockStorage.apply_batch(self.page, self.user, [
+                {'op': 'move', 'id': self.ids[3], 'after_id': self.ids[0]}
+            ])
+        self.assertEqual(self.texts(), ['a', 'd', 'b', 'c'])
+        self.assertEqual(positions, {self.ids[3]: 0.5})
+        self.assertEqual(revision, 2)
+        writes = [q['sql'] for q in queries.captured_queries if q['sql'].startswith('UPDATE "notes_block"')]
+        self.assertEqual(len(writes), 1)
+
+    def test_operations_see_previous_results(self):
+        new_id = str(uuid.uuid4())
+        BlockStorage.apply_batch(self.page, self.user, [
+            {'op': 'insert', 'id': new_id, 'content': {'text': 'x'}, 'after_id': None},
+            {'op': 'move', 'id': self.ids[2], 'after_id': new_id},
+            {'op': 'update', 'id': self.ids[1], 'content': {'text': 'B'}},
+            {'op': 'delete', 'id': self.ids[0]},
+        ])
+        self.assertEqual(self.texts(), ['x', 'c', 'B', 'd'])
+
+    def test_exhausted_gap_rebalances_siblings(self):
+        for _ in range(60):
+            BlockStorage.apply_batch(self.page, self.user, [
+                {'op': 'move', 'id': self.ids[3], 'after_id': self.ids[0]},
+                {'op': 'move', 'id': self.ids[3], 'before_id': self.ids[1]},
+                {'op': 'move', 'id': self.ids[2], 'after_id': self.ids[0]},
+            ])
+            self.ids[2], self.ids[3] = self.ids[3], self.ids[2]
+        positions = list(
+            Block.objects.filter(page=self.page).order_by('position').values_list('position', flat=True)
+        )
+        self.assertEqual(len(set(positions)), 4)
+        self.assertEqual(len(self.texts()), 4)
+
+    def test_nesting_and_cycles(self):
+        BlockStorage.apply_batch(self.page, self.user, [
+            {'op': 'move', 'id': self.ids[1], 'parent_id': self.ids[0]},
+        ])
+        page = Page.objects.get(pk=self.page.pk)
+        self.assertEqual(BlockStorage.materialize(page)['blocks'][0]['children'][0]['id'], self.ids[1])
+
+        with self.assertRaises(ValidationException):
+            BlockStorage.apply_batch(self.page, self.user, [
+                {'op': 'move', 'id': self.ids[0], 'parent_id': self.ids[1]},
+            ])
+
+    def test_failed_batch_changes_nothing(self):
+        with self.assertRaises(ValidationException):
+            BlockStorage.apply_batch(self.page, self.user, [
+                {'op': 'delete', 'id': self.ids[0]},
+                {'op': 'move', 'id': self.ids[0], 'after_id': self.ids[1]},
+            ])
+        self.assertEqual(self.texts(), ['a', 'b', 'c', 'd'])
+
+
+class BlockBatchAPITest(APITestCase):
+    """Тесты pages/{id}/blocks/batch/"""
+
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username='dragger',
+            email='dragger@example.com',
+            password='testpass123'
+        )
+        self.workspace = Workspace.objects.create(name='Test Workspace', owner=self.user)
+        WorkspaceMember.objects.create(workspace=self.workspace, user=self.user, role='owner')
+        self.page = Page.objects.create(
+            title='Blocks', workspace=self.workspace, author=self.user, last_edited_by=self.user
+        )
+        self.client.force_authenticate(user=self.user)
+
+    def test_insert_many_in_one_request(self):
+        operations = [{'op': 'insert', 'content': {'text': str(index)}} for index in range(100)]
+        response = self.client.post(
+            f'/api/notes/pages/{self.page.id}/blocks/batch/', {'operations': operations}, format='json'
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['revision'], 1)
+        self.assertEqual(len(response.data['positions']), 100)
+        self.assertEqual(Block.objects.filter(page=self.page).count(), 100)
+
+    def test_batch_requires_membership(self):
+        stranger = User.objects.create_user(
+            username='stranger', email='stranger@example.com', password='testpass123'
+        )
+        self.client.force_authenticate(user=stranger)
+        response = self.client.post(
+            f'/api/notes/pages/{self.page.id}/blocks/batch/',
+            {'operations': [{'op': 'insert'}]}, format='json'
+        )
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
@@ -0,0 +1,128 @@
+"""
+Тесты для журнала событий комнат и восстановления сессий
+"""
+import time
+from unittest import mock
+
+import pytest
+from asgiref.sync import async_to_sync
+from channels.db import database_sync_to_async
+from channels.routing import URLRouter
+from channels.testing import WebsocketCommunicator
+from django.contrib.auth import get_user_model
+from django.test import SimpleTestCase, override_settings
+
+from backend.apps.collaboration.event_log import InMemoryRoomEventLog
+from backend.apps.collaboration.routing import websocket_urlpatterns
+from backend.apps.workspaces.models import Workspace, WorkspaceMember
+from backend.services.databases import DatabaseService
+
+User = get_user_model()
+
+IN_MEMORY_LAYERS = {'default': {'BACKEND': 'channels.layers.InMemoryChannelLayer'}}
+MEMORY_EVENT_LOG = {'BACKEND': 'memory', 'MAXLEN': 3}
+
+
+class InMemoryRoomEventLogTest(SimpleTestCase):
+    """Тесты кольцевого буфера событий"""
+
+    def setUp(self):
+        self.log = InMemoryRoomEventLog(maxlen=3)
+
+    def append(self, room, payload):
+        return async_to_sync(self.log.append)(room, payload)
+
+    def since(self, room, last_seq):
+        return async_to_sync(self.log.since)(room, last_seq)
+
+    def test_sequence_is_per_room(self):
+        self.assertEqual(self.append('a', {'type': 'x'}), 1)
+        self.assertEqual(self.append('a', {'type': 'x'}), 2)
+        self.assertEqual(self.append('b', {'type': 'x'}), 1)
+
+    def test_since_returns_missed_events(self):
+        for index in range(3):
+            self.append('room', {'type': 'change', 'index': index})
+
+        events = self.since('room', 1)
+        self.assertEqual([event['seq'] for event in events], [2, 3])
+        self.assertEqual(events[0]['index'], 1)
+        self.assertEqual(self.since('room', 3), [])
+
+    def test_since_requires_snapshot_after_eviction(self):
+        for index in range(5):
+            self.append('room', {'type': 'change'})
+
+        self.assertIsNone(self.since('room', 1))
+        self.assertEqual(len(self.since('room', 2)), 3)
+        # Номер из будущего (например, после сброса журнала)
+        self.assertIsNone(self.since('room', 10))
+
+    def test_idle_and_extra_rooms_are_evicted(self):
+        log = InMemoryRoomEventLog(maxlen=3, ttl=60, max_rooms=2)
+        for room in ('a', 'b', 'c'):
+            async_to_sync(log.append)(room, {'type': 'x'})
+        self.assertEqual(list(log.rooms), ['b', 'c'])
+
+        with mock.patch('backend.apps.collaboration.event_log.time.monotonic', return_value=time.monotonic() + 61):
+            async_to_sync(log.append)('d', {'type': 'x'})
+            self.assertEqual(list(log.rooms), ['d'])
+            # Клиент с номером из удаленного журнала получает запрос снимка
+            self.assertIsNone(async_to_sync(log.since)('c', 1))
+            self.assertEqual(async_to_sync(log.last_seq)('c'), 0)
+
+
+@database_sync_to_async
+def create_database():
+    user = User.objects.create_user(
+        username='resumer',
+        email='resumer@example.com',
+        password='testpass123'
+    )
+    workspace = Workspace.objects.create(name='Test Workspace', owner=user)
+    WorkspaceMember.objects.create(workspace=workspace, user=user, role='admin')
+    database = DatabaseService.create_database(user, workspace.id, title='Log')
+    return user, database
+
+
+async def connect(user, database):
+    communicator = WebsocketCommunicator(
+        URLRouter(websocket_urlpatterns), f'/ws/database/{database.id}/'
+    )
+    communicator.scope['user'] = user
+    assert (await communicator.connect())[0]
+    assert (await communicator.receive_json_from())['type'] == 'user_joined'
+    return communicator
+
+
+@pytest.mark.asyncio
+@pytest.mark.django_db(transaction=True)
+@override_settings(CHANNEL_LAYERS=IN_MEMORY_LAYERS, COLLABORATION_EVENT_LOG=MEMORY_EVENT_LOG)
+async def test_resume_replays_missed_events_or_requests_snapshot():
+    """После переподключения клиент получает пропущенные события по seq"""
+    user, database = await create_database()
+    communicator = await connect(user, database)
+
+    seqs = []
+    for index in range(5):
+        await communicator.send_json_to({
+            'type': 'record_create', 'record_data': {}, 'request_id': f'c{index}'
+        })
+        message = await communicator.receive_json_from(timeout=2)
+        assert message['type'] == 'record_created'
+        seqs.append(message['seq'])
+    assert seqs == sorted(seqs) and len(set(seqs)) == 5
+    await communicator.disconnect()
+
+    communicator = await connect(user, database)
+    await communicator.send_json_to({'type': 'resume', 'last_seq': seqs[2]})
+    replayed = [await communicator.receive_json_from() for _ in range(2)]
+    assert [message['request_id'] for message in replayed] == ['c3', 'c4']
+    assert await communicator.receive_json_from() == {'type': 'resumed', 'seq': seqs[4]}
+
+    # Событий до seqs[1] в журнале уже нет (MAXLEN=3)
+    await communicator.send_json_to({'type': 'resume', 'last_seq': seqs[0]})
+    assert await communicator.receive_json_from() == {
+        'type': 'snapshot_required', 'seq': seqs[4]
+    }
+    await communicator.disconnect()
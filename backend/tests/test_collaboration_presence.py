@@ -0,0 +1,109 @@
+"""
+Тесты для heartbeat и сборки зависших сессий присутствия
+"""
+from datetime import timedelta
+
+import pytest
+from channels.db import database_sync_to_async
+from channels.routing import URLRouter
+from channels.testing import WebsocketCommunicator
+from django.contrib.auth import get_user_model
+from django.test import override_settings
+from django.utils import timezone
+
+from backend.apps.collaboration.heartbeat import IDLE_CLOSE_CODE, REAPED_CLOSE_CODE
+from backend.apps.collaboration.models import ActiveSession
+from backend.apps.collaboration.routing import websocket_urlpatterns
+from backend.apps.notes.models import Page
+from backend.apps.workspaces.models import Workspace, WorkspaceMember
+from backend.services.collaboration_service import ActiveSessionService
+
+User = get_user_model()
+
+IN_MEMORY_LAYERS = {'default': {'BACKEND': 'channels.layers.InMemoryChannelLayer'}}
+MEMORY_EVENT_LOG = {'BACKEND': 'memory'}
+
+
+@database_sync_to_async
+def create_page():
+    owner = User.objects.create_user(
+        username='alive',
+        email='alive@example.com',
+        password='testpass123'
+    )
+    ghost = User.objects.create_user(
+        username='ghost',
+        email='ghost@example.com',
+        password='testpass123'
+    )
+    workspace = Workspace.objects.create(name='Test Workspace', owner=owner)
+    WorkspaceMember.objects.create(workspace=workspace, user=owner, role='owner')
+    WorkspaceMember.objects.create(workspace=workspace, user=ghost, role='editor')
+    page = Page.objects.create(
+        title='Presence', workspace=workspace, author=owner, last_edited_by=owner
+    )
+    return owner, ghost, page
+
+
+async def connect(user, page):
+    communicator = WebsocketCommunicator(
+        URLRouter(websocket_urlpatterns), f'/ws/collab/{page.workspace_id}/page/{page.id}/'
+    )
+    communicator.scope['user'] = user
+    assert (await communicator.connect())[0]
+    while not await communicator.receive_nothing(timeout=0.1):
+        await communicator.receive_output()
+    return communicator
+
+
+@pytest.mark.asyncio
+@pytest.mark.django_db(transaction=True)
+@override_settings(
+    CHANNEL_LAYERS=IN_MEMORY_LAYERS, COLLABORATION_EVENT_LOG=MEMORY_EVENT_LOG,
+    COLLABORATION_IDLE_TIMEOUT=0.5
+)
+async def test_ping_keeps_connection_and_idle_connection_is_closed():
+    """Ping получает pong, а соединение без сообщений закрывается сервером"""
+    owner, ghost, page = await create_page()
+    communicator = await connect(owner, page)
+
+    await communicator.send_json_to({'type': 'ping', 'timestamp': 1})
+    assert await communicator.receive_json_from() == {'type': 'pong', 'timestamp': 1}
+
+    output = await communicator.receive_output(timeout=2)
+    assert output == {'type': 'websocket.close', 'code': IDLE_CLOSE_CODE}
+    await communicator.disconnect()
+
+
+@pytest.mark.asyncio
+@pytest.mark.django_db(transaction=True)
+@override_settings(CHANNEL_LAYERS=IN_MEMORY_LAYERS, COLLABORATION_EVENT_LOG=MEMORY_EVENT_LOG)
+async def test_reaper_evicts_stale_sessions_and_closes_their_channels():
+    """Сборщик удаляет зависшие сессии, закрывает их каналы и рассылает user_left"""
+    owner, ghost, page = await create_page()
+    alive = await connect(owner, page)
+    zombie = await connect(ghost, page)
+    while not await alive.receive_nothing(timeout=0.1):
+        await alive.receive_output()
+
+    await database_sync_to_async(
+        ActiveSession.objects.filter(user=ghost).update
+    )(last_seen=timezone.now() - timedelta(hours=1))
+
+    reaped = await database_sync_to_async(ActiveSessionService.reap_stale_sessions)()
+    assert reaped == 1
+
+    assert await zombie.receive_output(timeout=1) == {
+        'type': 'websocket.close', 'code': REAPED_CLOSE_CODE
+    }
+    left = await alive.receive_json_from()
+    assert left['type'] == 'user_left'
+    assert left['user_id'] == str(ghost.id)
+
+    sessions = await database_sync_to_async(
+        lambda: list(ActiveSession.objects.values_list('user_id', flat=True))
+    )()
+    assert sessions == [owner.id]
+
+    await zombie.disconnect()
+    await alive.disconnect()
@@ -0,0 +1,158 @@
+"""
+Тесты для протоколов WebSocket-соединений совместной работы
+"""
+from unittest import mock
+
+import msgpack
+import pytest
+from channels.db import database_sync_to_async
+from channels.routing import URLRouter
+from channels.testing import WebsocketCommunicator
+from django.contrib.auth import get_user_model
+from django.test import SimpleTestCase, override_settings
+
+from backend.apps.collaboration import protocol
+from backend.apps.collaboration.routing import websocket_urlpatterns
+from backend.apps.notes.models import Page
+from backend.apps.workspaces.models import Workspace, WorkspaceMember
+
+User = get_user_model()
+
+IN_MEMORY_LAYERS = {'default': {'BACKEND': 'channels.layers.InMemoryChannelLayer'}}
+MEMORY_EVENT_LOG = {'BACKEND': 'memory'}
+
+
+class WireProtocolTest(SimpleTestCase):
+    """Тесты кодирования сообщений"""
+
+    def test_negotiate_prefers_offered_subprotocol(self):
+        scope = {'subprotocols': [protocol.JSON_PROTOCOL, protocol.MSGPACK_PROTOCOL]}
+        self.assertEqual(protocol.negotiate_protocol(scope), protocol.MSGPACK_PROTOCOL)
+
+    def test_negotiate_from_query_string_and_default(self):
+        self.assertEqual(
+            protocol.negotiate_protocol({'query_string': b'token=x&protocol=msgpack'}),
+            protocol.MSGPACK_PROTOCOL
+        )
+        self.assertEqual(protocol.negotiate_protocol({}), protocol.JSON_PROTOCOL)
+
+    def test_compact_roundtrip_keeps_user_data(self):
+        payload = {
+            'type': 'content_change',
+            'user_id': '1',
+            'timestamp': '2024-01-01T00:00:00+00:00',
+            'changes': [{'type': 'insert', 'user_id': 'kept'}],
+        }
+        frame = protocol.encode(payload, protocol.MSGPACK_PROTOCOL)
+        raw = msgpack.unpackb(frame, raw=False)
+
+        self.assertEqual(raw['t'], 'content_change')
+        self.assertEqual(raw['ts'], 1704067200000)
+        self.assertEqual(raw['c'], [{'type': 'insert', 'user_id': 'kept'}])
+
+        decoded = protocol.decode(bytes_data=frame)
+        self.assertEqual(decoded['user_id'], '1')
+        self.assertEqual(decoded['changes'], payload['changes'])
+
+    def test_decode_rejects_non_object(self):
+        with self.assertRaises(ValueError):
+            protocol.decode(text_data='[1, 2]')
+        with self.assertRaises(ValueError):
+            protocol.decode(bytes_data=b'\xc1')
+
+
+@database_sync_to_async
+def create_page():
+    user = User.objects.create_user(
+        username='writer',
+        email='writer@example.com',
+        password='testpass123'
+    )
+    reader = User.objects.create_user(
+        username='reader',
+        email='reader@example.com',
+        password='testpass123'
+    )
+    workspace = Workspace.objects.create(name='Test Workspace', owner=user)
+    WorkspaceMember.objects.create(workspace=workspace, user=user, role='owner')
+    WorkspaceMember.objects.create(workspace=workspace, user=reader, role='editor')
+    page = Page.objects.create(
+        title='Doc', workspace=workspace, author=user, last_edited_by=user
+    )
+    return user, reader, page
+
+
+@pytest.mark.asyncio
+@pytest.mark.django_db(transaction=True)
+@override_settings(CHANNEL_LAYERS=IN_MEMORY_LAYERS, COLLABORATION_EVENT_LOG=MEMORY_EVENT_LOG)
+async def test_json_and_msgpack_clients_share_room():
+    """JSON-клиент и MessagePack-клиент получают одно событие в своих форматах"""
+    user, reader, page = await create_page()
+    application = URLRouter(websocket_urlpatterns)
+    path = f'/ws/collab/{page.workspace_id}/page/{page.id}/'
+
+    writer_socket = WebsocketCommunicator(application, path)
+    writer_socket.scope['user'] = user
+    assert (await writer_socket.connect())[0]
+    greeting = [await writer_socket.receive_json_from() for _ in range(2)]
+    assert {message['type'] for message in greeting} == {'user_joined', 'active_users'}
+
+    reader_socket = WebsocketCommunicator(
+        application, path, subprotocols=[protocol.MSGPACK_PROTOCOL]
+    )
+    reader_socket.scope['user'] = reader
+    connected, subprotocol = await reader_socket.connect()
+    assert connected
+    assert subprotocol == protocol.MSGPACK_PROTOCOL
+    greeting = {
+        message['type']: message
+        for message in [
+            protocol.decode(bytes_data=await reader_socket.receive_from()) for _ in range(2)
+        ]
+    }
+    assert len(greeting['active_users']['users']) == 2
+    assert greeting['user_joined']['user_id'] == str(reader.id)
+    assert (await writer_socket.receive_json_from())['type'] == 'user_joined'
+
+    await writer_socket.send_json_to({'type': 'content_change', 'changes': [{'insert': 'a'}]})
+    change = protocol.decode(bytes_data=await reader_socket.receive_from())
+    assert change['type'] == 'content_change'
+    assert change['changes'] == [{'insert': 'a'}]
+    assert isinstance(change['timestamp'], int)
+    # Отправитель получает только подтверждение с номером события
+    assert await writer_socket.receive_json_from() == {'type': 'ack', 'seq': change['seq']}
+    assert await writer_socket.receive_nothing(timeout=0.1)
+
+    await reader_socket.disconnect()
+    await writer_socket.disconnect()
+
+
+@pytest.mark.asyncio
+@pytest.mark.django_db(transaction=True)
+@override_settings(CHANNEL_LAYERS=IN_MEMORY_LAYERS, COLLABORATION_EVENT_LOG=MEMORY_EVENT_LOG)
+async def test_group_event_is_encoded_once_for_all_recipients():
+    """Кадр кодируется отправителем один раз, получатели пересылают его как есть"""
+    user, reader, page = await create_page()
+    application = URLRouter(websocket_urlpatterns)
+    path = f'/ws/collab/{page.workspace_id}/page/{page.id}/'
+
+    sockets = []
+    for member in (user, reader, reader):
+        socket = WebsocketCommunicator(application, path)
+        socket.scope['user'] = member
+        assert (await socket.connect())[0]
+        sockets.append(socket)
+    for socket in sockets:
+        while not await socket.receive_nothing(timeout=0.1):
+            await socket.receive_from()
+
+    with mock.patch.object(protocol, 'encode', wraps=protocol.encode) as encode:
+        await sockets[0].send_json_to({'type': 'cursor_position', 'position': 5})
+        received = [await socket.receive_json_from() for socket in sockets[1:]]
+
+    assert encode.call_count == len(protocol.SUPPORTED_PROTOCOLS)
+    assert all(message['position'] == 5 for message in received)
+    assert await sockets[0].receive_nothing(timeout=0.1)
+
+    for socket in sockets:
+        await socket.disconnect()
@@ -0,0 +1,140 @@
+"""
+Тесты для шардирования channel layer и ограничения частоты сообщений
+"""
+import pytest
+from channels.db import database_sync_to_async
+from channels.routing import URLRouter
+from channels.testing import WebsocketCommunicator
+from django.contrib.auth import get_user_model
+from django.test import SimpleTestCase, override_settings
+
+from backend.apps.collaboration.routing import websocket_urlpatterns
+from backend.api.collaboration_consumers import DatabaseCollaborationConsumer
+from backend.apps.collaboration.consumers import CollaborationConsumer
+from backend.apps.collaboration.traffic import ChannelLayerRing, RateLimiter, RoomTrafficMixin, traffic_stats
+from backend.apps.notes.models import Page
+from backend.apps.workspaces.models import Workspace, WorkspaceMember
+
+User = get_user_model()
+
+SHARDED_LAYERS = {
+    'default': {'BACKEND': 'channels.layers.InMemoryChannelLayer'},
+    'shard': {'BACKEND': 'channels.layers.InMemoryChannelLayer'},
+}
+MEMORY_EVENT_LOG = {'BACKEND': 'memory'}
+
+
+class ChannelLayerRingTest(SimpleTestCase):
+    """Тесты кольца консистентного хеширования"""
+
+    def test_rooms_are_spread_and_stable(self):
+        ring = ChannelLayerRing(['a', 'b', 'c'])
+        rooms = [f'collab_page_{index}' for index in range(300)]
+        assignment = {room: ring.alias_for(room) for room in rooms}
+
+        self.assertEqual(set(assignment.values()), {'a', 'b', 'c'})
+        self.assertEqual(assignment, {room: ring.alias_for(room) for room in rooms})
+
+    def test_adding_shard_moves_only_part_of_rooms(self):
+        rooms = [f'database_{index}' for index in range(300)]
+        before = ChannelLayerRing(['a', 'b'])
+        after = ChannelLayerRing(['a', 'b', 'c'])
+
+        moved = [room for room in rooms if before.alias_for(room) != after.alias_for(room)]
+        self.assertTrue(all(after.alias_for(room) == 'c' for room in moved))
+        self.assertLess(len(moved), len(rooms) / 2)
+
+    def test_room_name_from_route_kwargs(self):
+        scope = {'url_route': {'kwargs': {'workspace_id': 'w', 'resource_type': 'page', 'resource_id': 'p'}}}
+        self.assertEqual(CollaborationConsumer.room_name_for_scope(scope), 'collab_page_p')
+        self.assertEqual(RoomTrafficMixin.room_name_for_scope(scope), 'room_w_page_p')
+        self.assertEqual(
+            DatabaseCollaborationConsumer.room_name_for_scope({'url_route': {'kwargs': {'database_id': 'd'}}}),
+            'database_d'
+        )
+
+
+class RateLimiterTest(SimpleTestCase):
+    """Тесты token bucket"""
+
+    def test_all_buckets_are_charged_together(self):
+        limiter = RateLimiter()
+        limits = [(('user', '1'), 0, 2), (('room', 'r'), 0, 3)]
+
+        self.assertTrue(limiter.allow(limits))
+        self.assertTrue(limiter.allow(limits))
+        self.assertFalse(limiter.allow(limits))
+        # Отказ по корзине пользователя не списывает токен комнаты
+        self.assertTrue(limiter.allow([(('room', 'r'), 0, 3)]))
+        self.assertFalse(limiter.allow([(('room', 'r'), 0, 3)]))
+
+
+@database_sync_to_async
+def create_page():
+    user = User.objects.create_user(
+        username='fast',
+        email='fast@example.com',
+        password='testpass123'
+    )
+    reader = User.objects.create_user(
+        username='slow',
+        email='slow@example.com',
+        password='testpass123'
+    )
+    workspace = Workspace.objects.create(name='Test Workspace', owner=user)
+    WorkspaceMember.objects.create(workspace=workspace, user=user, role='owner')
+    WorkspaceMember.objects.create(workspace=workspace, user=reader, role='editor')
+    page = Page.objects.create(title='Hot', workspace=workspace, author=user, last_edited_by=user)
+    return user, reader, page
+
+
+async def connect(user, page):
+    communicator = WebsocketCommunicator(
+        URLRouter(websocket_urlpatterns), f'/ws/collab/{page.workspace_id}/page/{page.id}/'
+    )
+    communicator.scope['user'] = user
+    assert (await communicator.connect())[0]
+    return communicator
+
+
+async def drain(communicator):
+    while not await communicator.receive_nothing(timeout=0.1):
+        await communicator.receive_output()
+
+
+@pytest.mark.asyncio
+@pytest.mark.django_db(transaction=True)
+@override_settings(
+    CHANNEL_LAYERS=SHARDED_LAYERS,
+    COLLABORATION_CHANNEL_LAYER_RING=['default', 'shard'],
+    COLLABORATION_EVENT_LOG=MEMORY_EVENT_LOG,
+    COLLABORATION_RATE_LIMITS={'user': (0, 2), 'room': (100, 100)},
+)
+async def test_room_on_shard_and_user_rate_limit():
+    """Комната работает на своем шарде, лишние сообщения отбрасываются или отклоняются"""
+    user, reader, page = await create_page()
+    writer = await connect(user, page)
+    watcher = await connect(reader, page)
+    await drain(writer)
+    await drain(watcher)
+
+    stats = traffic_stats.copy()
+    for offset in range(3):
+        await writer.send_json_to({'type': 'cursor_position', 'position': offset})
+    received = [await watcher.receive_json_from() for _ in range(2)]
+    assert [message['position'] for message in received] == [0, 1]
+    assert await watcher.receive_nothing(timeout=0.1)
+    assert traffic_stats['dropped'] - stats['dropped'] == 1
+
+    await writer.send_json_to({'type': 'content_change', 'changes': [], 'request_id': 'x'})
+    error = await writer.receive_json_from()
+    assert error['code'] == 'rate_limited'
+    assert error['request_ids'] == ['x']
+    assert traffic_stats['limited'] - stats['limited'] == 1
+
+    # Ping не расходует лимит
+    await writer.send_json_to({'type': 'ping'})
+    assert (await writer.receive_json_from())['type'] == 'pong'
+
+    await watcher.disconnect()
+    await writer.disconnect()
@@ -0,0 +1,137 @@
+"""
+Тесты для WebSocket-канала изменений базы данных
+"""
+import pytest
+from channels.db import database_sync_to_async
+from channels.routing import URLRouter
+from channels.testing import WebsocketCommunicator
+from django.contrib.auth import get_user_model
+from django.test import override_settings
+
+from backend.apps.collaboration.routing import websocket_urlpatterns
+from backend.apps.databases.models import DatabaseRecord, DatabaseRecordRevision
+from backend.apps.workspaces.models import Workspace, WorkspaceMember
+from backend.services.databases import DatabaseRecordService, DatabaseService, DatabasePropertyService
+
+User = get_user_model()
+
+IN_MEMORY_LAYERS = {'default': {'BACKEND': 'channels.layers.InMemoryChannelLayer'}}
+MEMORY_EVENT_LOG = {'BACKEND': 'memory'}
+
+
+@database_sync_to_async
+def create_fixture():
+    """Пользователь, рабочее пространство и база данных с формулой"""
+    user = User.objects.create_user(
+        username='dbuser',
+        email='db@example.com',
+        password='testpass123'
+    )
+    workspace = Workspace.objects.create(name='Test Workspace', owner=user)
+    WorkspaceMember.objects.create(workspace=workspace, user=user, role='admin')
+    database = DatabaseService.create_database(user, workspace.id, title='Tasks')
+    price = DatabasePropertyService.create_property(
+        database.id, user, name='Price', type='number', position=2
+    )
+    total = DatabasePropertyService.create_property(
+        database.id, user, name='Total', type='formula', position=3,
+        config={'expression': "prop('Price') * 2"}
+    )
+    record = DatabaseRecordService.create_record(database.id, user, {str(price.id): 1})
+    return user, database, record, str(price.id), str(total.id)
+
+
+async def connect(user, database):
+    application = URLRouter(websocket_urlpatterns)
+    communicator = WebsocketCommunicator(application, f'/ws/database/{database.id}/')
+    communicator.scope['user'] = user
+    connected, _ = await communicator.connect()
+    assert connected
+    # Собственное уведомление о подключении
+    assert (await communicator.receive_json_from())['type'] == 'user_joined'
+    return communicator
+
+
+@pytest.mark.asyncio
+@pytest.mark.django_db(transaction=True)
+@override_settings(
+    CHANNEL_LAYERS=IN_MEMORY_LAYERS, COLLABORATION_EVENT_LOG=MEMORY_EVENT_LOG,
+    DATABASE_COLLABORATION_BATCH_WINDOW=0.05
+)
+async def test_record_updates_are_batched_and_persisted():
+    """Несколько изменений за тик сохраняются одной ревизией и рассылаются канонически"""
+    user, database, record, price_id, total_id = await create_fixture()
+    communicator = await connect(user, database)
+
+    await communicator.send_json_to({
+        'type': 'record_update',
+        'record_id': str(record.id),
+        'changes': {price_id: 3},
+        'request_id': 'r1',
+    })
+    # То же UUID в другом написании попадает в ту же запись буфера
+    await communicator.send_json_to({
+        'type': 'record_update',
+        'record_id': str(record.id).upper(),
+        'changes': {price_id: 5, total_id: 'forged'},
+        'request_id': 'r2',
+    })
+
+    message = await communicator.receive_json_from(timeout=2)
+    assert message['type'] == 'record_updated'
+    assert message['request_ids'] == ['r1', 'r2']
+    assert message['record']['properties'][price_id] == 5
+    assert message['record']['properties'][total_id] == 10
+    assert await communicator.receive_nothing(timeout=0.2)
+
+    stored = await database_sync_to_async(DatabaseRecord.objects.get)(id=record.id)
+    assert stored.properties[total_id] == 10
+    revisions = await database_sync_to_async(
+        DatabaseRecordRevision.objects.filter(record=record, change_type='update').count
+    )()
+    assert revisions == 1
+
+    await communicator.disconnect()
+
+
+@pytest.mark.asyncio
+@pytest.mark.django_db(transaction=True)
+@override_settings(
+    CHANNEL_LAYERS=IN_MEMORY_LAYERS, COLLABORATION_EVENT_LOG=MEMORY_EVENT_LOG,
+    DATABASE_COLLABORATION_BATCH_WINDOW=0
+)
+async def test_record_create_and_unknown_record_error():
+    """Создание записи идет через сервис, ошибки возвращаются только отправителю"""
+    user, database, record, price_id, total_id = await create_fixture()
+    communicator = await connect(user, database)
+
+    await communicator.send_json_to({
+        'type': 'record_create',
+        'record_data': {price_id: 4},
+        'request_id': 'c1',
+    })
+    message = await communicator.receive_json_from(timeout=2)
+    assert message['type'] == 'record_created'
+    assert message['request_id'] == 'c1'
+    assert message['record_data']['properties'][total_id] == 8
+
+    await communicator.send_json_to({
+        'type': 'record_update',
+        'record_id': 'not-a-record',
+        'changes': {price_id: 1},
+        'request_id': 'u1',
+    })
+    message = await communicator.receive_json_from(timeout=2)
+    assert message['type'] == 'error'
+    assert message['request_ids'] == ['u1']
+
+    await communicator.send_json_to({
+        'type': 'record_delete',
+        'record_id': 'not-a-record',
+        'request_id': 'd1',
+    })
+    message = await communicator.receive_json_from(timeout=2)
+    assert message['type'] == 'error'
+    assert message['request_ids'] == ['d1']
+
+    await communicator.disconnect()
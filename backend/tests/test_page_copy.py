@@ -0,0 +1,141 @@
+"""
+Тесты для копирования поддерева страниц
+"""
+import uuid
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import TestCase
+from rest_framework import status
+from rest_framework.test import APITestCase
+
+from backend.apps.notes.models import Block, Page, PageVersion, Tag
+from backend.apps.search.models import SearchIndex
+from backend.apps.workspaces.models import Workspace, WorkspaceMember
+from backend.core.exceptions import ValidationException
+from backend.services.block_storage import BlockStorage
+from backend.services.page_copy import PageCopier
+from backend.services.page_tree import PageTree
+
+User = get_user_model()
+
+
+class PageCopyMixin:
+
+    def create_template(self):
+        cache.clear()
+        self.user = User.objects.create_user(
+            username='copier',
+            email='copier@example.com',
+            password='testpass123'
+        )
+        self.workspace = Workspace.objects.create(name='Test Workspace', owner=self.user)
+        WorkspaceMember.objects.create(workspace=self.workspace, user=self.user, role='owner')
+        self.template = self.page('Template', is_template=True)
+        self.section = self.page('Section', parent=self.template)
+        self.leaf = self.page('Leaf', parent=self.section)
+        self.tag = Tag.objects.create(name='copied')
+        self.section.tags.add(self.tag)
+
+        child_id = str(uuid.uuid4())
+        self.document = {'blocks': [{
+            'id': str(uuid.uuid4()), 'type': 'text', 'content': {'text': 'parent'},
+            'children': [{'id': child_id, 'type': 'todo', 'content': {'text': 'child'}, 'children': []}],
+        }]}
+        BlockStorage.sync_from_content(self.leaf, self.user, self.document)
+
+    def page(self, title, parent=None, **extra):
+        return Page.objects.create(
+            title=title, parent=parent, workspace=self.workspace,
+            author=self.user, last_edited_by=self.user, **extra
+        )
+
+
+class PageCopierTest(PageCopyMixin, TestCase):
+    """Тесты PageCopier"""
+
+    def setUp(self):
+        self.create_template()
+
+    def test_instantiate_copies_subtree(self):
+        root = PageCopier.instantiate(self.template.id, self.user, title='From template')
+
+        copies = list(PageTree.subtree(root).order_by('depth'))
+        self.assertEqual([page.title for page in copies], ['From template', 'Section', 'Leaf'])
+        self.assertFalse(any(page.is_template for page in copies))
+        self.assertEqual(copies[2].tree_path, f'{root.id.hex}/{copies[1].id.hex}/{copies[2].id.hex}/')
+        self.assertEqual(list(copies[1].tags.all()), [self.tag])
+
+    def test_blocks_are_copied_with_new_ids(self):
+        root = PageCopier.instantiate(self.template.id, self.user)
+        leaf = PageTree.subtree(root).get(title='Leaf')
+
+        original_ids = set(Block.objects.filter(page=self.leaf).values_list('id', flat=True))
+        copied_ids = set(Block.objects.filter(page=leaf).values_list('id', flat=True))
+        self.assertEqual(len(copied_ids), 2)
+        self.assertFalse(original_ids & copied_ids)
+
+        document = BlockStorage.materialize(leaf)
+        self.assertEqual(document['blocks'][0]['children'][0]['content'], {'text': 'child'})
+        self.assertEqual(PageVersion.objects.get(page=leaf).content, document)
+
+    def test_query_count_does_not_depend_on_size(self):
+        for index in range(30):
+            self.page(f'Extra {index}', parent=self.section)
+        with self.assertNumQueries(13):
+            # Шаблон, пространство, позиция, поддерево, блоки, затем в SAVEPOINT
+            # по одной вставке на таблицу и чтения тегов и индекса
+            PageCopier.instantiate(self.template.id, self.user)
+
+    def test_duplicate_keeps_template_flag_and_is_placed_after_source(self):
+        copy = PageCopier.duplicate(self.template.id, self.user)
+        self.assertEqual(copy.title, 'Template (копия)')
+        self.assertTrue(copy.is_template)
+        self.assertGreater(copy.position, self.template.position)
+
+    def test_search_index_is_copied(self):
+        SearchIndex.objects.create(
+            content_type='page', object_id=self.section.id, workspace=self.workspace,
+            title='Section', content='section text'
+        )
+        root = PageCopier.instantiate(self.template.id, self.user)
+        section = PageTree.subtree(root).get(title='Section')
+        self.assertEqual(
+            SearchIndex.objects.get(content_type='page', object_id=section.id).content, 'section text'
+        )
+
+    def test_only_templates_can_be_instantiated(self):
+        with self.assertRaises(ValidationException):
+            PageCopier.instantiate(self.section.id, self.user)
+
+
+class PageCopyAPITest(PageCopyMixin, APITestCase):
+    """Тесты pages/{id}/duplicate/ и pages/{id}/instantiate/"""
+
+    def setUp(self):
+        self.create_template()
+        self.client.force_authenticate(user=self.user)
+
+    def test_duplicate(self):
+        response = self.client.post(f'/api/notes/pages/{self.section.id}/duplicate/', {}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(response.data['title'], 'Section (копия)')
+        self.assertEqual(Page.objects.filter(title='Leaf').count(), 2)
+
+    def test_instantiate_under_parent(self):
+        target = self.page('Projects')
+        response = self.client.post(
+            f'/api/notes/pages/{self.template.id}/instantiate/',
+            {'parent': str(target.id), 'title': 'Project A'}, format='json'
+        )
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(response.data['title'], 'Project A')
+        self.assertEqual(Page.objects.get(id=response.data['id']).parent_id, target.id)
+
+    def test_copy_requires_membership(self):
+        stranger = User.objects.create_user(
+            username='stranger', email='stranger@example.com', password='testpass123'
+        )
+        self.client.force_authenticate(user=stranger)
+        response = self.client.post(f'/api/notes/pages/{self.template.id}/instantiate/', {}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
@@ -0,0 +1,209 @@
+"""
+Тесты для дельта-сжатой истории версий страниц
+"""
+import json
+import time
+from datetime import timedelta
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.test import APITestCase
+
+from backend.apps.notes.models import PageVersion
+from backend.apps.workspaces.models import Workspace, WorkspaceMember
+from backend.core.json_patch import apply_patch, make_patch
+from backend.services.note_service import PageService
+from backend.services.page_history import PageHistory
+
+User = get_user_model()
+
+PARAGRAPH = '<p>' + 'Lorem ipsum dolor sit amet. ' * 20 + '</p>'
+
+
+class JsonPatchTest(SimpleTestCase):
+    """Тесты make_patch / apply_patch"""
+
+    def assertRoundTrip(self, source, target):
+        self.assertEqual(apply_patch(source, make_patch(source, target)), target)
+
+    def test_nested_documents(self):
+        source = {'blocks': [{'id': 1, 'text': 'a'}, {'id': 2, 'text': 'b'}], 'title': 'x'}
+        target = {'blocks': [{'id': 1, 'text': 'a'}, {'id': 3, 'text': 'c'}, {'id': 2, 'text': 'B'}]}
+        self.assertRoundTrip(source, target)
+
+    def test_list_insert_is_single_operation(self):
+        source = {'blocks': [{'id': n} for n in range(50)]}
+        target = {'blocks': source['blocks'][:10] + [{'id': 'new'}] + source['blocks'][10:]}
+        patch = make_patch(source, target)
+        self.assertEqual(patch, [{'op': 'add', 'path': '/blocks/10', 'value': {'id': 'new'}}])
+
+    def test_long_string_is_spliced(self):
+        target = PARAGRAPH[:100] + 'inserted' + PARAGRAPH[100:]
+        patch = make_patch(PARAGRAPH, target)
+        self.assertEqual(patch, [{'op': 'splice', 'path': '', 'at': 100, 'remove': 0, 'insert': 'inserted'}])
+        self.assertRoundTrip(PARAGRAPH, target)
+
+    def test_type_changes_and_escaping(self):
+        self.assertRoundTrip({'a/b': 1, '~': [1, 2]}, {'a/b': '1', '~': {}})
+        self.assertRoundTrip([1, 2, 3], [3])
+        self.assertRoundTrip('short', {'now': 'dict'})
+
+    def test_number_and_bool_types_are_kept(self):
+        source = {'done': 1, 'size': 1, 'items': [1, {'flag': False}], 'level': 2.0}
+        target = {'done': True, 'size': 1.0, 'items': [True, {'flag': 0}], 'level': 2}
+        patch = make_patch(source, target)
+        self.assertEqual(len(patch), 5)
+        # json.dumps различает 1, 1.0 и true, в отличие от ==
+        self.assertEqual(json.dumps(apply_patch(source, patch)), json.dumps(target))
+
+
+@override_settings(PAGE_VERSION_SNAPSHOT_INTERVAL=5, PAGE_VERSION_COALESCE_WINDOW=0)
+class PageHistoryTest(TestCase):
+    """Тесты PageHistory"""
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(
+            username='historian',
+            email='historian@example.com',
+            password='testpass123'
+        )
+        self.workspace = Workspace.objects.create(name='Test Workspace', owner=self.user)
+        WorkspaceMember.objects.create(workspace=self.workspace, user=self.user, role='owner')
+        self.page = PageService.create_page(
+            self.user, title='History', content=PARAGRAPH, workspace=self.workspace
+        )
+
+    def edit(self, index):
+        content = PARAGRAPH[:index * 10] + f'[edit {index}]' + PARAGRAPH[index * 10:]
+        PageService.update_page(self.page.id, self.user, content=content, content_text=f'text {index}')
+        return content
+
+    def test_snapshot_every_interval(self):
+        for index in range(1, 12):
+            self.edit(index)
+
+        versions = list(PageVersion.objects.filter(page=self.page).order_by('version_number'))
+        self.assertEqual(len(versions), 12)
+        self.assertEqual([v.version_number for v in versions if v.is_snapshot], [1, 6, 11])
+        self.assertTrue(all(v.content is None for v in versions if not v.is_snapshot))
+
+    def test_reconstruct_any_version(self):
+        contents = {1: PARAGRAPH}
+        for index in range(1, 10):
+            contents[index + 1] = self.edit(index)
+        cache.clear()
+
+        for number, content in contents.items():
+            version = PageHistory.get_version(self.page.id, number)
+            self.assertEqual(version.content, content)
+        # Версия восстанавливается двумя запросами: метаданные и цепочка
+        cache.clear()
+        with self.assertNumQueries(2):
+            PageHistory.get_version(self.page.id, 9)
+
+    def test_reconstruct_is_fast(self):
+        big = {'sections': [{'id': n, 'text': PARAGRAPH} for n in range(200)]}
+        for index in range(5):
+            big['sections'][index]['text'] += str(index)
+            PageService.update_page(self.page.id, self.user, content=big)
+        cache.clear()
+
+        started = time.perf_counter()
+        PageHistory.get_version(self.page.id, 5)
+        self.assertLess(time.perf_counter() - started, 0.05)
+
+    @override_settings(PAGE_VERSION_COALESCE_WINDOW=300)
+    def test_same_author_edits_are_coalesced(self):
+        self.edit(1)
+        last = self.edit(2)
+        self.assertEqual(PageVersion.objects.filter(page=self.page).count(), 1)
+        self.assertEqual(PageHistory.get_version(self.page.id, 1).content, last)
+
+        other = User.objects.create_user(
+            username='other', email='other@example.com', password='testpass123'
+        )
+        WorkspaceMember.objects.create(workspace=self.workspace, user=other, role='editor')
+        PageService.update_page(self.page.id, other, content='changed')
+        self.assertEqual(PageVersion.objects.filter(page=self.page).count(), 2)
+
+    @override_settings(PAGE_VERSION_COALESCE_WINDOW=300)
+    def test_delta_base_is_not_read_from_stale_cache(self):
+        """Дельта следующей версии строится от переписанной версии из БД, а не от кэша"""
+        first = self.edit(1)
+        second = self.edit(2)
+        coalesced = PageVersion.objects.get(page=self.page)
+        # Кэш пропустил перезапись версии и хранит прежнее содержимое
+        cache.set(
+            PageHistory.cache_key(self.page.pk, 1, coalesced.updated_at),
+            {'content': first, 'content_text': 'text 1'}, 60
+        )
+
+        other = User.objects.create_user(
+            username='other', email='other@example.com', password='testpass123'
+        )
+        WorkspaceMember.objects.create(workspace=self.workspace, user=other, role='editor')
+        third = second + ' [other]'
+        PageService.update_page(self.page.id, other, content=third)
+
+        cache.clear()
+        self.assertEqual(PageHistory.get_version(self.page.id, 1).content, second)
+        self.assertEqual(PageHistory.get_version(self.page.id, 2).content, third)
+
+    def test_compact_thins_old_versions_and_rebuilds_chains(self):
+        contents = {1: PARAGRAPH}
+        for index in range(1, 8):
+            contents[index + 1] = self.edit(index)
+        old = timezone.now() - timedelta(days=60)
+        PageVersion.objects.filter(page=self.page, version_number__lte=6).update(created_at=old)
+        # Устаревшие полные снимки, как у версий до дельта-сжатия
+        PageVersion.objects.filter(page=self.page, version_number=7).update(
+            content=contents[7], content_text='text 6', delta=None, chain_position=0
+        )
+
+        self.assertIn(self.page.id, PageHistory.pages_to_compact())
+        call_command('compact_page_versions', verbosity=0)
+
+        numbers = list(PageVersion.objects.filter(page=self.page).values_list('version_number', flat=True))
+        self.assertEqual(sorted(numbers), [1, 6, 7, 8])
+        self.assertEqual(
+            PageVersion.objects.filter(page=self.page, delta__isnull=True).count(), 1
+        )
+        cache.clear()
+        for number in numbers:
+            self.assertEqual(PageHistory.get_version(self.page.id, number).content, contents[number])
+
+
+class PageVersionAPITest(APITestCase):
+    """Тесты API истории версий"""
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(
+            username='reader',
+            email='reader@example.com',
+            password='testpass123'
+        )
+        self.workspace = Workspace.objects.create(name='Test Workspace', owner=self.user)
+        WorkspaceMember.objects.create(workspace=self.workspace, user=self.user, role='owner')
+        self.page = PageService.create_page(
+            self.user, title='History', content=PARAGRAPH, workspace=self.workspace
+        )
+        self.client.force_authenticate(user=self.user)
+
+    def test_list_and_retrieve_versions(self):
+        response = self.client.get(f'/api/notes/pages/{self.page.id}/versions/')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual([v['version_number'] for v in response.data], [1])
+        self.assertNotIn('content', response.data[0])
+
+        response = self.client.get(f'/api/notes/pages/{self.page.id}/versions/1/')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['content'], PARAGRAPH)
+
+        response = self.client.get(f'/api/notes/pages/{self.page.id}/versions/7/')
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
@@ -0,0 +1,128 @@
+"""
+Тесты для извлечения текста страниц
+"""
+import threading
+import uuid
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import SimpleTestCase, TestCase, override_settings
+
+from backend.apps.notes.models import Page, PageVersion
+from backend.apps.search.models import SearchIndex
+from backend.apps.workspaces.models import Workspace, WorkspaceMember
+from backend.core.background import BackgroundQueue
+from backend.services.note_service import PageService
+from backend.services.page_history import PageHistory
+from backend.services.page_text import PageTextExtractor, PageTextIndexer
+
+User = get_user_model()
+
+TIPTAP_DOCUMENT = {
+    'type': 'doc',
+    'content': [
+        {'type': 'heading', 'attrs': {'level': 1}, 'content': [{'type': 'text', 'text': 'Plan'}]},
+        {'type': 'paragraph', 'content': [
+            {'type': 'text', 'text': 'Ship'},
+            {'type': 'text', 'marks': [{'type': 'bold'}], 'text': 'ping'},
+            {'type': 'text', 'text': ' soon'},
+        ]},
+    ],
+}
+
+
+class PageTextExtractorTest(SimpleTestCase):
+    """Тесты PageTextExtractor"""
+
+    def test_html(self):
+        text, _, _ = PageTextExtractor.extract('<h1>Title</h1><p>Hello&nbsp;<b>wor</b>ld</p><ul><li>one</li></ul>')
+        self.assertEqual(text, 'Title Hello world one')
+
+    def test_tiptap(self):
+        self.assertEqual(PageTextExtractor.extract(TIPTAP_DOCUMENT)[0], 'Plan Shipping soon')
+
+    def test_blocks(self):
+        content = {'blocks': [
+            {'id': str(uuid.uuid4()), 'type': 'todo', 'content': {'text': 'Buy milk', 'checked': True},
+             'children': [{'type': 'text', 'content': {'text': 'Nested'}}]},
+            {'type': 'image', 'content': {'url': 'https://example.com/a.png'}},
+        ]}
+        self.assertEqual(PageTextExtractor.extract(content)[0], 'Buy milk Nested')
+
+    def test_only_changed_segments_are_parsed(self):
+        paragraphs = ''.join(f'<p>paragraph {n}</p>' for n in range(50))
+        _, known, parsed = PageTextExtractor.extract(paragraphs)
+        self.assertEqual(parsed, 50)
+
+        edited = paragraphs.replace('paragraph 7<', 'paragraph seven<')
+        text, _, parsed = PageTextExtractor.extract(edited, known)
+        self.assertEqual(parsed, 1)
+        self.assertIn('paragraph seven paragraph 8', text)
+
+
+class BackgroundQueueTest(SimpleTestCase):
+    """Тесты BackgroundQueue"""
+
+    def test_pending_jobs_with_same_key_are_coalesced(self):
+        queue = BackgroundQueue('test')
+        gate = threading.Event()
+        calls = []
+        queue.enqueue(gate.wait, 5)
+        for value in range(5):
+            queue.enqueue(calls.append, value, key='page')
+        gate.set()
+        self.assertTrue(queue.drain(timeout=5))
+        self.assertEqual(calls, [4])
+
+    @override_settings(BACKGROUND_TASKS_SYNC=True)
+    def test_sync_mode(self):
+        calls = []
+        BackgroundQueue('test').enqueue(calls.append, 1)
+        self.assertEqual(calls, [1])
+
+
+@override_settings(BACKGROUND_TASKS_SYNC=True)
+class PageTextIndexerTest(TestCase):
+    """Тесты фоновой переиндексации"""
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(
+            username='indexer',
+            email='indexer@example.com',
+            password='testpass123'
+        )
+        self.workspace = Workspace.objects.create(name='Test Workspace', owner=self.user)
+        WorkspaceMember.objects.create(workspace=self.workspace, user=self.user, role='owner')
+
+    def test_update_reindexes_after_commit(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            page = PageService.create_page(
+                self.user, title='Indexed', content='<p>first draft</p>', workspace=self.workspace
+            )
+        self.assertEqual(Page.objects.get(pk=page.pk).content_text, 'first draft')
+
+        with self.captureOnCommitCallbacks(execute=False) as callbacks:
+            PageService.update_page(page.id, self.user, content=TIPTAP_DOCUMENT)
+        # До фиксации транзакции текст не извлекается ни для страницы, ни для версии
+        self.assertEqual(Page.objects.get(pk=page.pk).content_text, 'first draft')
+        version = PageVersion.objects.filter(page=page).latest('version_number')
+        self.assertEqual(PageHistory.get_version(page.id, version.version_number).content_text, 'first draft')
+        for callback in callbacks:
+            callback()
+
+        self.assertEqual(Page.objects.get(pk=page.pk).content_text, 'Plan Shipping soon')
+        self.assertEqual(
+            PageHistory.get_version(page.id, version.version_number).content_text, 'Plan Shipping soon'
+        )
+        index = SearchIndex.objects.get(content_type='page', object_id=page.pk)
+        self.assertEqual((index.title, index.content), ('Indexed', 'Plan Shipping soon'))
+
+    def test_block_pages_are_indexed(self):
+        page = Page.objects.create(
+            title='Blocks', workspace=self.workspace, author=self.user, last_edited_by=self.user
+        )
+        with self.captureOnCommitCallbacks(execute=True):
+            PageService.create_block(self.user, page.id, type='text', content={'text': 'from blocks'})
+        self.assertEqual(PageTextIndexer.reindex(page.id), 'from blocks')
+        self.assertEqual(Page.objects.get(pk=page.pk).content_text, 'from blocks')
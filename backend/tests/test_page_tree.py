@@ -0,0 +1,131 @@
+"""
+Тесты для материализованного пути и дерева страниц
+"""
+from django.contrib.auth import get_user_model
+from django.core.exceptions import ValidationError
+from django.test import TestCase
+from rest_framework import status
+from rest_framework.test import APITestCase
+
+from backend.apps.notes.models import Page
+from backend.apps.workspaces.models import Workspace, WorkspaceMember
+from backend.services.note_service import PageService
+from backend.services.page_tree import PageTree
+
+User = get_user_model()
+
+
+class PageTreeMixin:
+
+    def create_workspace(self):
+        self.user = User.objects.create_user(
+            username='gardener',
+            email='gardener@example.com',
+            password='testpass123'
+        )
+        self.workspace = Workspace.objects.create(name='Test Workspace', owner=self.user)
+        WorkspaceMember.objects.create(workspace=self.workspace, user=self.user, role='owner')
+
+    def page(self, title, parent=None, **extra):
+        return Page.objects.create(
+            title=title, parent=parent, workspace=self.workspace,
+            author=self.user, last_edited_by=self.user, **extra
+        )
+
+
+class PagePathTest(PageTreeMixin, TestCase):
+    """Тесты поддержки tree_path"""
+
+    def setUp(self):
+        self.create_workspace()
+        self.root = self.page('Root')
+        self.child = self.page('Child', parent=self.root)
+        self.leaf = self.page('Leaf', parent=self.child)
+
+    def test_paths_and_depth(self):
+        self.assertEqual(self.leaf.tree_path, f'{self.root.id.hex}/{self.child.id.hex}/{self.leaf.id.hex}/')
+        self.assertEqual([self.root.depth, self.child.depth, self.leaf.depth], [0, 1, 2])
+        self.assertEqual(list(PageTree.ancestors(self.leaf)), [self.root, self.child])
+
+    def test_get_path_is_one_query(self):
+        leaf = Page.objects.get(pk=self.leaf.pk)
+        with self.assertNumQueries(1):
+            self.assertEqual(leaf.get_path(), 'Root / Child / Leaf')
+
+    def test_move_subtree_with_single_update(self):
+        other = self.page('Other')
+        child = Page.objects.get(pk=self.child.pk)
+        child.parent = other
+        with self.assertNumQueries(5):
+            # Путь родителя, UPDATE страницы и UPDATE поддерева внутри SAVEPOINT
+            child.save(update_fields=['parent'])
+
+        leaf = Page.objects.get(pk=self.leaf.pk)
+        self.assertEqual(leaf.tree_path, f'{other.id.hex}/{child.id.hex}/{leaf.id.hex}/')
+        self.assertEqual(leaf.depth, 2)
+        self.assertEqual(
+            set(PageTree.subtree(self.root).values_list('id', flat=True)), {self.root.id}
+        )
+
+    def test_move_to_root(self):
+        child = Page.objects.get(pk=self.child.pk)
+        child.parent = None
+        child.save()
+        leaf = Page.objects.get(pk=self.leaf.pk)
+        self.assertEqual((leaf.depth, leaf.get_path()), (1, 'Child / Leaf'))
+
+    def test_cycle_is_rejected(self):
+        root = Page.objects.get(pk=self.root.pk)
+        root.parent = self.leaf
+        with self.assertRaises(ValidationError):
+            root.save()
+
+    def test_list_annotates_children_and_paths(self):
+        with self.assertNumQueries(3):
+            pages = PageService.get_user_pages(self.user, workspace_id=self.workspace.id)
+            paths = {page.title: (page.children_count, page.get_path()) for page in pages}
+        self.assertEqual(paths['Root'], (1, 'Root'))
+        self.assertEqual(paths['Leaf'], (0, 'Root / Child / Leaf'))
+
+
+class PageTreeAPITest(PageTreeMixin, APITestCase):
+    """Тесты pages/tree/"""
+
+    def setUp(self):
+        self.create_workspace()
+        self.client.force_authenticate(user=self.user)
+        self.first = self.page('First', position=1)
+        self.second = self.page('Second', position=2)
+        self.nested = self.page('Nested', parent=self.first)
+        self.deep = self.page('Deep', parent=self.nested)
+        self.page('Hidden', parent=self.second, is_archived=True)
+
+    def test_whole_workspace_tree(self):
+        response = self.client.get('/api/notes/pages/tree/', {'workspace': self.workspace.id})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual([node['title'] for node in response.data], ['First', 'Second'])
+        nested = response.data[0]['children'][0]
+        self.assertEqual((nested['title'], nested['children'][0]['title']), ('Nested', 'Deep'))
+        self.assertEqual(response.data[1]['children'], [])
+        # Архивная дочерняя страница скрыта и не учитывается в children_count
+        self.assertEqual(response.data[1]['children_count'], 0)
+
+    def test_lazy_level(self):
+        response = self.client.get(
+            '/api/notes/pages/tree/', {'root': str(self.first.id), 'depth': 1}
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(response.data), 1)
+        node = response.data[0]
+        self.assertEqual((node['title'], node['children_count'], node['children']), ('Nested', 1, []))
+
+    def test_tree_requires_membership(self):
+        stranger = User.objects.create_user(
+            username='stranger', email='stranger@example.com', password='testpass123'
+        )
+        self.client.force_authenticate(user=stranger)
+        response = self.client.get('/api/notes/pages/tree/', {'workspace': self.workspace.id})
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+        response = self.client.get('/api/notes/pages/tree/')
+        self.assertEqual(response.status_code, status.HTTP_422_UNPROCESSABLE_ENTITY)
@@ -0,0 +1,122 @@
+"""
+Тесты для буферизованного учета просмотров страниц
+"""
+from datetime import timedelta
+
+from django.contrib.auth import get_user_model
+from django.test import TestCase, override_settings
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.test import APITestCase
+
+from backend.apps.notes.models import Page, PageView, PageViewRollup
+from backend.apps.workspaces.models import Workspace, WorkspaceMember
+from backend.services.page_views import PageViewRollups, page_view_buffer
+
+User = get_user_model()
+
+
+class PageViewsMixin:
+
+    def create_page(self):
+        self.user = User.objects.create_user(
+            username='reader',
+            email='reader@example.com',
+            password='testpass123'
+        )
+        self.workspace = Workspace.objects.create(name='Test Workspace', owner=self.user)
+        WorkspaceMember.objects.create(workspace=self.workspace, user=self.user, role='owner')
+        self.page = Page.objects.create(
+            title='Read me', workspace=self.workspace, author=self.user, last_edited_by=self.user
+        )
+        # Просмотры, оставшиеся от других тестов, к этой базе не относятся
+        page_view_buffer.discard()
+
+
+@override_settings(PAGE_VIEW_FLUSH_INTERVAL=3600, PAGE_VIEW_BUFFER_SIZE=1000)
+class PageViewBufferTest(PageViewsMixin, TestCase):
+    """Тесты буфера и счетчиков"""
+
+    def setUp(self):
+        self.create_page()
+
+    def tearDown(self):
+        page_view_buffer.discard()
+
+    def test_views_are_buffered_until_flush(self):
+        for _ in range(3):
+            page_view_buffer.record(self.page, self.user, '10.0.0.1', 'agent')
+        self.assertEqual(PageView.objects.count(), 0)
+
+        self.assertEqual(page_view_buffer.flush(), 3)
+        self.assertEqual(PageView.objects.filter(page=self.page).count(), 3)
+        rollups = dict(PageViewRollup.objects.values_list('granularity', 'views'))
+        self.assertEqual(rollups, {'hour': 3, 'day': 3})
+
+    def test_increments_accumulate(self):
+        page_view_buffer.record(self.page, self.user)
+        page_view_buffer.flush()
+        page_view_buffer.record(self.page, None)
+        page_view_buffer.record(self.page, None)
+        with self.assertNumQueries(6):
+            # Проверка страниц, SAVEPOINT, INSERT просмотров, INSERT счетчиков,
+            # UPDATE, RELEASE -- без чтения текущих значений
+            page_view_buffer.flush()
+        self.assertEqual(
+            PageViewRollups.workspace_views(self.workspace, timezone.now() - timedelta(minutes=5)), 3
+        )
+
+    def test_partial_first_day_is_counted_from_raw_views(self):
+        page_view_buffer.record(self.page, self.user)
+        page_view_buffer.record(self.page, self.user)
+        page_view_buffer.flush()
+        # Первый просмотр раньше since: дневной счетчик его учитывает, отчет -- нет
+        first = PageView.objects.earliest('viewed_at')
+        PageView.objects.filter(pk=first.pk).update(viewed_at=first.viewed_at - timedelta(seconds=1))
+        since = first.viewed_at
+        self.assertEqual(PageViewRollups.workspace_views(self.workspace, since), 1)
+
+    def test_views_of_deleted_pages_are_dropped(self):
+        page_view_buffer.record(self.page, self.user)
+        Page.objects.filter(pk=self.page.pk).delete()
+        self.assertEqual(page_view_buffer.flush(), 0)
+        self.assertEqual(page_view_buffer.pending(), 0)
+        self.assertFalse(PageView.objects.exists())
+
+    def test_rebuild_matches_buffered_counts(self):
+        page_view_buffer.record(self.page, self.user)
+        page_view_buffer.record(self.page, self.user)
+        page_view_buffer.flush()
+        PageViewRollups.rebuild(timezone.now() - timedelta(days=1))
+        rollups = dict(PageViewRollup.objects.values_list('granularity', 'views'))
+        self.assertEqual(rollups, {'hour': 2, 'day': 2})
+
+
+@override_settings(BACKGROUND_TASKS_SYNC=True, PAGE_VIEW_FLUSH_INTERVAL=0)
+class PageViewAPITest(PageViewsMixin, APITestCase):
+    """Тесты учета просмотров через API"""
+
+    def setUp(self):
+        self.create_page()
+        self.client.force_authenticate(user=self.user)
+
+    def test_retrieve_records_view(self):
+        response = self.client.get(
+            f'/api/notes/pages/{self.page.id}/', HTTP_X_FORWARDED_FOR='203.0.113.5, 10.0.0.1'
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        view = PageView.objects.get(page=self.page)
+        self.assertEqual((view.user, view.ip_address), (self.user, '203.0.113.5'))
+
+    def test_analytics_reads_rollups(self):
+        self.client.get(f'/api/notes/pages/{self.page.id}/')
+        self.client.get(f'/api/notes/pages/{self.page.id}/')
+        response = self.client.get(
+            '/api/workspaces/analytics/overview/', {'workspace_id': self.workspace.id}
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        pages = response.data['pages']
+        self.assertEqual(pages['views_this_period'], 2)
+        self.assertEqual(pages['popular_pages'][0]['view_count'], 2)
+        today = response.data['activity']['daily_breakdown'][0]
+        self.assertEqual(today['page_views'], 2)
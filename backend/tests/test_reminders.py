@@ -0,0 +1,130 @@
+"""
+Тесты для отправки напоминаний и уведомлений о сроках задач
+"""
+import importlib
+from datetime import timedelta
+from io import StringIO
+
+from django.apps import apps as django_apps
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from backend.apps.notifications.models import Notification, NotificationSettings, Reminder
+from backend.apps.tasks.models import Task, TaskBoard, TaskColumn
+from backend.apps.workspaces.models import Workspace, WorkspaceMember
+from backend.services.reminders import DueSchedule, ReminderDispatcher
+from backend.services.taskboards import TaskService
+
+User = get_user_model()
+
+
+@override_settings(TASK_DUE_NOTICE_MINUTES=60)
+class ReminderDispatcherTest(TestCase):
+    """Тесты ReminderDispatcher"""
+
+    def setUp(self):
+        self.now = timezone.now()
+        self.user = User.objects.create_user(
+            username='planner',
+            email='planner@example.com',
+            password='testpass123'
+        )
+        self.assignee = User.objects.create_user(
+            username='assignee',
+            email='assignee@example.com',
+            password='testpass123'
+        )
+        self.workspace = Workspace.objects.create(name='Test Workspace', owner=self.user)
+        WorkspaceMember.objects.create(workspace=self.workspace, user=self.user, role='owner')
+        self.board = TaskBoard.objects.create(title='Board', workspace=self.workspace, created_by=self.user)
+        self.column = TaskColumn.objects.create(board=self.board, title='To Do', position=1)
+
+    def create_task(self, title, due_in, **data):
+        return Task.objects.create(
+            title=title, board=self.board, column=self.column, created_by=self.user,
+            due_date=self.now + due_in, **data
+        )
+
+    def create_reminder(self, title, remind_in):
+        return Reminder.objects.create(
+            user=self.user, type='custom', title=title, remind_at=self.now + remind_in
+        )
+
+    def test_due_reminders_are_sent_once(self):
+        self.create_reminder('Past', -timedelta(minutes=5))
+        self.create_reminder('Future', timedelta(hours=2))
+
+        self.assertEqual(ReminderDispatcher.dispatch(self.now), {'reminders': 1, 'tasks': 0})
+        self.assertEqual(ReminderDispatcher.dispatch(self.now), {'reminders': 0, 'tasks': 0})
+        notification = Notification.objects.get()
+        self.assertEqual((notification.type, notification.title), ('reminder', 'Past'))
+        self.assertTrue(Reminder.objects.get(title='Past').is_sent)
+
+    def test_batches_cover_all_due_reminders(self):
+        for index in range(7):
+            self.create_reminder(f'Reminder {index}', -timedelta(minutes=index))
+        sent = ReminderDispatcher.dispatch(self.now, batch_size=3)
+        self.assertEqual(sent['reminders'], 7)
+        self.assertEqual(Notification.objects.filter(type='reminder').count(), 7)
+
+    def test_due_tasks_notify_assignees(self):
+        assigned = self.create_task('Assigned', timedelta(minutes=30))
+        assigned.assignees.add(self.assignee)
+        self.create_task('Own', -timedelta(days=1))
+        self.create_task('Later', timedelta(hours=5))
+        self.create_task('Done', timedelta(minutes=10), status='done')
+
+        self.assertEqual(ReminderDispatcher.dispatch(self.now)['tasks'], 2)
+        recipients = dict(Notification.objects.filter(type='task_due').values_list('title', 'recipient__username'))
+        self.assertEqual(recipients, {'Assigned': 'assignee', 'Own': 'planner'})
+        self.assertEqual(ReminderDispatcher.dispatch(self.now)['tasks'], 0)
+
+    def test_muted_users_are_skipped(self):
+        NotificationSettings.objects.create(user=self.user, push_on_task_due=False)
+        self.create_task('Muted', timedelta(minutes=5))
+        self.assertEqual(ReminderDispatcher.dispatch(self.now)['tasks'], 1)
+        self.assertFalse(Notification.objects.exists())
+
+    def test_changed_due_date_is_notified_again(self):
+        task = self.create_task('Moved', timedelta(minutes=5))
+        ReminderDispatcher.dispatch(self.now)
+        TaskService.update_task(task.id, self.user, due_date=self.now + timedelta(minutes=20))
+        self.assertEqual(ReminderDispatcher.dispatch(self.now)['tasks'], 1)
+        self.assertEqual(Notification.objects.filter(type='task_due').count(), 2)
+
+    def test_overdue_tasks(self):
+        self.create_task('Late', -timedelta(hours=1))
+        self.create_task('Late but done', -timedelta(hours=1), status='done')
+        self.create_task('On time', timedelta(hours=1))
+        titles = list(ReminderDispatcher.overdue_tasks(now=self.now).values_list('title', flat=True))
+        self.assertEqual(titles, ['Late'])
+
+    def test_migration_marks_past_notices_as_sent(self):
+        """После добавления due_notified_at старые просроченные задачи не уведомляются"""
+        migration = importlib.import_module('backend.apps.tasks.migrations.0005_task_due_scanner')
+        self.create_task('Years ago', -timedelta(days=800))
+        self.create_task('Soon', timedelta(minutes=30))
+        later = self.create_task('Later', timedelta(hours=5))
+        migration.mark_past_notices_sent(django_apps, None)
+
+        self.assertEqual(list(Task.objects.filter(due_notified_at__isnull=True)), [later])
+        self.assertEqual(ReminderDispatcher.dispatch(timezone.now())['tasks'], 0)
+
+    def test_schedule_wakes_up_at_next_due_moment(self):
+        self.create_reminder('Soon', timedelta(seconds=20))
+        self.create_task('Task', timedelta(minutes=60, seconds=10))
+        schedule = DueSchedule(horizon=timedelta(minutes=1))
+        self.assertEqual(schedule.next_wakeup(self.now), self.now + timedelta(seconds=10))
+
+        empty = DueSchedule(horizon=timedelta(minutes=1))
+        Reminder.objects.all().delete()
+        Task.objects.all().delete()
+        self.assertEqual(empty.next_wakeup(self.now), self.now + timedelta(minutes=1))
+
+    def test_command(self):
+        self.create_reminder('Past', -timedelta(minutes=1))
+        out = StringIO()
+        call_command('dispatch_reminders', stdout=out)
+        self.assertIn('Отправлено напоминаний: 1', out.getvalue())
@@ -0,0 +1,130 @@
+"""
+Тесты для журнала активности задач
+"""
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.db import IntegrityError
+from django.test import TestCase, override_settings
+from rest_framework import status
+from rest_framework.test import APITestCase
+
+from backend.apps.tasks.models import Task, TaskActivity, TaskBoard, TaskColumn
+from backend.apps.workspaces.models import Workspace, WorkspaceMember
+from backend.services.task_activity import TaskActivityLog, activity_buffer
+from backend.services.task_ordering import TaskOrdering
+from backend.services.taskboards import TaskService
+
+User = get_user_model()
+
+
+class ActivityMixin:
+
+    def create_task(self):
+        self.user = User.objects.create_user(
+            username='editor',
+            email='editor@example.com',
+            password='testpass123'
+        )
+        self.workspace = Workspace.objects.create(name='Test Workspace', owner=self.user)
+        WorkspaceMember.objects.create(workspace=self.workspace, user=self.user, role='owner')
+        self.board = TaskBoard.objects.create(title='Board', workspace=self.workspace, created_by=self.user)
+        self.todo = TaskColumn.objects.create(board=self.board, title='To Do', position=1)
+        self.done = TaskColumn.objects.create(board=self.board, title='Done', position=2)
+        self.task = Task.objects.create(title='Task', board=self.board, column=self.todo, created_by=self.user)
+        # События, оставшиеся от других тестов, к этой базе не относятся
+        activity_buffer.discard()
+
+
+@override_settings(BACKGROUND_TASKS_SYNC=True)
+class TaskActivityLogTest(ActivityMixin, TestCase):
+    """Тесты записи активности"""
+
+    def setUp(self):
+        self.create_task()
+
+    def tearDown(self):
+        activity_buffer.discard()
+
+    def test_update_writes_diff_after_commit(self):
+        with self.captureOnCommitCallbacks(execute=False) as callbacks:
+            TaskService.update_task(self.task.id, self.user, title='Renamed', priority='high')
+        self.assertEqual(TaskActivity.objects.count(), 0)
+        self.assertEqual(activity_buffer.pending(), 1)
+
+        for callback in callbacks:
+            callback()
+        activity = TaskActivity.objects.get()
+        self.assertEqual(activity.activity_type, 'updated')
+        self.assertEqual(activity.metadata['changes'], {
+            'title': ['Task', 'Renamed'], 'priority': ['medium', 'high'],
+        })
+
+    def test_unchanged_update_is_not_recorded(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            TaskService.update_task(self.task.id, self.user, title='Task')
+        self.assertFalse(TaskActivity.objects.exists())
+
+    def test_status_and_move_types(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            TaskService.update_task(self.task.id, self.user, status='done')
+            TaskService.move_task(self.task.id, self.user, column_id=self.done.id)
+            TaskService.update_task(self.task.id, self.user, status='todo')
+        types = list(TaskActivity.objects.order_by('created_at', 'id').values_list('activity_type', flat=True))
+        self.assertEqual(types, ['completed', 'moved', 'reopened'])
+        moved = TaskActivity.objects.get(activity_type='moved')
+        self.assertEqual(moved.metadata['changes']['column_id'], [str(self.todo.id), str(self.done.id)])
+
+    def test_events_are_flushed_in_one_insert(self):
+        other = Task.objects.create(title='Other', board=self.board, column=self.todo, created_by=self.user)
+        activity_buffer.discard()
+        with self.captureOnCommitCallbacks(execute=False) as callbacks:
+            TaskOrdering.move_many(self.user, [self.task.id, other.id], self.done.id)
+            TaskService.update_task(self.task.id, self.user, description='text')
+        with self.assertNumQueries(2):
+            # SELECT существующих задач и один INSERT
+            activity_buffer.flush()
+        self.assertEqual(TaskActivity.objects.count(), 3)
+
+    def test_events_of_deleted_tasks_are_dropped(self):
+        TaskService.update_task(self.task.id, self.user, title='Gone')
+        self.task.delete()
+        self.assertEqual(activity_buffer.flush(), 0)
+
+    def test_rejected_events_are_not_requeued(self):
+        TaskService.update_task(self.task.id, self.user, title='Broken')
+        with mock.patch.object(TaskActivity.objects, 'bulk_create', side_effect=IntegrityError):
+            self.assertEqual(activity_buffer.flush(), 0)
+        self.assertEqual(activity_buffer.pending(), 0)
+
+
+class TaskActivityAPITest(ActivityMixin, APITestCase):
+    """Тесты tasks/{id}/activity/"""
+
+    def setUp(self):
+        self.create_task()
+        self.client.force_authenticate(user=self.user)
+        for index in range(5):
+            TaskActivityLog._event(self.task, self.user, 'updated', f'Изменение {index}', {}).save()
+
+    def test_feed_pages_by_cursor(self):
+        url = f'/api/tasks/{self.task.id}/activity/'
+        response = self.client.get(url, {'limit': 2})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        seen = [item['description'] for item in response.data['results']]
+        while response.data['next_cursor']:
+            response = self.client.get(url, {'limit': 2, 'cursor': response.data['next_cursor']})
+            seen += [item['description'] for item in response.data['results']]
+        self.assertEqual(seen, [f'Изменение {index}' for index in reversed(range(5))])
+
+    def test_feed_requires_membership(self):
+        stranger = User.objects.create_user(
+            username='stranger', email='stranger@example.com', password='testpass123'
+        )
+        self.client.force_authenticate(user=stranger)
+        response = self.client.get(f'/api/tasks/{self.task.id}/activity/')
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_invalid_cursor(self):
+        response = self.client.get(f'/api/tasks/{self.task.id}/activity/', {'cursor': 'bad'})
+        self.assertEqual(response.status_code, 422)
@@ -0,0 +1,141 @@
+"""
+Тесты для потоковой загрузки и отдачи вложений задач
+"""
+import hashlib
+import shutil
+import tempfile
+from io import BytesIO
+
+from django.contrib.auth import get_user_model
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import SimpleTestCase, override_settings
+from PIL import Image
+from rest_framework import status
+from rest_framework.test import APITestCase
+
+from backend.apps.tasks.models import Task, TaskAttachment, TaskBoard, TaskColumn
+from backend.apps.workspaces.models import Workspace, WorkspaceMember
+from backend.core.file_transfer import parse_range
+
+User = get_user_model()
+
+CONTENT = bytes(range(256)) * 40
+
+
+class ParseRangeTest(SimpleTestCase):
+    """Тесты разбора заголовка Range"""
+
+    def test_ranges(self):
+        self.assertEqual(parse_range('bytes=0-99', 1000), (0, 99))
+        self.assertEqual(parse_range('bytes=900-', 1000), (900, 999))
+        self.assertEqual(parse_range('bytes=-100', 1000), (900, 999))
+        self.assertEqual(parse_range('bytes=990-2000', 1000), (990, 999))
+        self.assertIsNone(parse_range(None, 1000))
+        self.assertIsNone(parse_range('bytes=0-1,5-6', 1000))
+
+    def test_unsatisfiable(self):
+        for header in ('bytes=1000-', 'bytes=5-1', 'bytes=-0'):
+            with self.assertRaises(ValueError):
+                parse_range(header, 1000)
+
+
+class TaskAttachmentAPITest(APITestCase):
+    """Тесты tasks/{id}/attachments/"""
+
+    def setUp(self):
+        self.media_root = tempfile.mkdtemp()
+        self.settings_override = override_settings(MEDIA_ROOT=self.media_root, BACKGROUND_TASKS_SYNC=True)
+        self.settings_override.enable()
+        self.user = User.objects.create_user(
+            username='uploader',
+            email='uploader@example.com',
+            password='testpass123'
+        )
+        self.workspace = Workspace.objects.create(name='Test Workspace', owner=self.user)
+        WorkspaceMember.objects.create(workspace=self.workspace, user=self.user, role='owner')
+        self.board = TaskBoard.objects.create(title='Board', workspace=self.workspace, created_by=self.user)
+        self.column = TaskColumn.objects.create(board=self.board, title='To Do', position=1)
+        self.task = Task.objects.create(title='Task', board=self.board, column=self.column, created_by=self.user)
+        self.url = f'/api/tasks/{self.task.id}/attachments/'
+        self.client.force_authenticate(user=self.user)
+
+    def tearDown(self):
+        self.settings_override.disable()
+        shutil.rmtree(self.media_root, ignore_errors=True)
+
+    def upload(self, name='data.bin', content=CONTENT, content_type='application/octet-stream'):
+        with self.captureOnCommitCallbacks(execute=True):
+            return self.client.post(
+                self.url, {'file': SimpleUploadedFile(name, content, content_type=content_type)}, format='multipart'
+            )
+
+    def test_upload_records_checksum(self):
+        response = self.upload()
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(response.data['sha256'], hashlib.sha256(CONTENT).hexdigest())
+        self.assertEqual(response.data['size'], len(CONTENT))
+        self.assertEqual(len(self.client.get(self.url).data), 1)
+
+    @override_settings(TASK_ATTACHMENT_MAX_SIZE=1024)
+    def test_upload_size_limit(self):
+        response = self.upload()
+        self.assertEqual(response.status_code, 422)
+        self.assertFalse(TaskAttachment.objects.exists())
+
+    def test_download_full_and_range(self):
+        attachment_id = self.upload().data['id']
+        url = f'{self.url}{attachment_id}/download/'
+
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(b''.join(response.streaming_content), CONTENT)
+        self.assertEqual(response['Accept-Ranges'], 'bytes')
+        self.assertIn('attachment; filename="data.bin"', response['Content-Disposition'])
+
+        response = self.client.get(url, HTTP_RANGE='bytes=100-199')
+        self.assertEqual(response.status_code, status.HTTP_206_PARTIAL_CONTENT)
+        self.assertEqual(b''.join(response.streaming_content), CONTENT[100:200])
+        self.assertEqual(response['Content-Range'], f'bytes 100-199/{len(CONTENT)}')
+
+        response = self.client.get(url, HTTP_RANGE=f'bytes={len(CONTENT)}-')
+        self.assertEqual(response.status_code, 416)
+
+        etag = self.client.get(url)['ETag']
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+        response = self.client.get(url, HTTP_RANGE='bytes=0-9', HTTP_IF_RANGE='"stale"')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    @override_settings(FILE_ACCEL_REDIRECT_PREFIX='/protected-media/')
+    def test_download_through_nginx(self):
+        attachment_id = self.upload().data['id']
+        response = self.client.get(f'{self.url}{attachment_id}/download/')
+        attachment = TaskAttachment.objects.get(id=attachment_id)
+        self.assertEqual(response['X-Accel-Redirect'], f'/protected-media/{attachment.file.name}')
+        self.assertEqual(response.content, b'')
+
+    def test_image_thumbnail(self):
+        image = BytesIO()
+        Image.new('RGB', (1200, 600), color='red').save(image, format='JPEG')
+        attachment_id = self.upload('photo.jpg', image.getvalue(), 'image/jpeg').data['id']
+
+        response = self.client.get(f'{self.url}{attachment_id}/thumbnail/')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        thumbnail = Image.open(BytesIO(b''.join(response.streaming_content)))
+        self.assertEqual(thumbnail.size, (320, 160))
+
+    def test_delete_removes_file(self):
+        attachment_id = self.upload().data['id']
+        attachment = TaskAttachment.objects.get(id=attachment_id)
+        storage, name = attachment.file.storage, attachment.file.name
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.delete(f'{self.url}{attachment_id}/')
+        self.assertEqual(response.status_code, status.HTTP_204_NO_CONTENT)
+        self.assertFalse(storage.exists(name))
+
+    def test_requires_membership(self):
+        attachment_id = self.upload().data['id']
+        self.client.force_authenticate(user=User.objects.create_user(
+            username='stranger', email='stranger@example.com', password='testpass123'
+        ))
+        self.assertEqual(self.client.get(f'{self.url}{attachment_id}/download/').status_code, 404)
+        self.assertEqual(self.upload().status_code, 404)
@@ -0,0 +1,118 @@
+"""
+Тесты для загрузки доски задач по колонкам
+"""
+from django.contrib.auth import get_user_model
+from django.test import TestCase
+from rest_framework import status
+from rest_framework.test import APITestCase
+
+from backend.apps.tasks.models import Task, TaskBoard, TaskColumn, TaskComment
+from backend.apps.workspaces.models import Workspace, WorkspaceMember
+from backend.core.exceptions import ValidationException
+from backend.services.task_board_loader import TaskBoardLoader
+
+User = get_user_model()
+
+
+class BoardMixin:
+
+    def create_board(self):
+        self.user = User.objects.create_user(
+            username='planner',
+            email='planner@example.com',
+            password='testpass123'
+        )
+        self.workspace = Workspace.objects.create(name='Test Workspace', owner=self.user)
+        WorkspaceMember.objects.create(workspace=self.workspace, user=self.user, role='owner')
+        self.board = TaskBoard.objects.create(title='Board', workspace=self.workspace, created_by=self.user)
+        self.todo = TaskColumn.objects.create(board=self.board, title='To Do', position=1)
+        self.done = TaskColumn.objects.create(board=self.board, title='Done', position=2)
+        self.empty = TaskColumn.objects.create(board=self.board, title='Empty', position=3)
+
+    def task(self, column, position, **extra):
+        return Task.objects.create(
+            title=f'{column.title} {position}', board=self.board, column=column,
+            position=position, created_by=self.user, **extra
+        )
+
+
+class TaskBoardLoaderTest(BoardMixin, TestCase):
+    """Тесты TaskBoardLoader"""
+
+    def setUp(self):
+        self.create_board()
+        self.todo_tasks = [self.task(self.todo, position) for position in range(7)]
+        self.done_tasks = [self.task(self.done, position) for position in range(2)]
+        TaskComment.objects.create(task=self.todo_tasks[0], author=self.user, content='one')
+        TaskComment.objects.create(task=self.todo_tasks[0], author=self.user, content='two')
+
+    def test_first_tasks_per_column_in_one_query(self):
+        with self.assertNumQueries(4):
+            # Доска, задачи с окнами и комментариями, теги, колонки
+            result = TaskBoardLoader.load_board(self.board.id, self.user, limit=3)
+
+        columns = {item['column'].title: item for item in result['columns']}
+        self.assertEqual([task.id for task in columns['To Do']['tasks']], [t.id for t in self.todo_tasks[:3]])
+        self.assertEqual((columns['To Do']['total'], columns['Done']['total'], columns['Empty']['total']), (7, 2, 0))
+        self.assertIsNotNone(columns['To Do']['next_cursor'])
+        self.assertIsNone(columns['Done']['next_cursor'])
+        self.assertEqual(columns['To Do']['tasks'][0].comments_count, 2)
+
+    def test_cursor_walks_whole_column(self):
+        result = TaskBoardLoader.load_board(self.board.id, self.user, limit=3)
+        cursor = next(item for item in result['columns'] if item['column'] == self.todo)['next_cursor']
+        seen = []
+        while cursor:
+            tasks, cursor = TaskBoardLoader.load_column(self.board.id, self.todo.id, self.user, cursor=cursor, limit=3)
+            seen.extend(task.id for task in tasks)
+        self.assertEqual(seen, [task.id for task in self.todo_tasks[3:]])
+
+    def test_equal_positions_are_not_skipped(self):
+        tied = [self.task(self.empty, 0) for _ in range(5)]
+        tasks, cursor = TaskBoardLoader.load_column(self.board.id, self.empty.id, self.user, limit=2)
+        while cursor:
+            page, cursor = TaskBoardLoader.load_column(self.board.id, self.empty.id, self.user, cursor=cursor, limit=2)
+            tasks.extend(page)
+        self.assertEqual(sorted(task.id for task in tasks), sorted(task.id for task in tied))
+        self.assertEqual(len({task.id for task in tasks}), 5)
+
+    def test_bad_cursor_is_rejected(self):
+        with self.assertRaises(ValidationException):
+            TaskBoardLoader.load_column(self.board.id, self.todo.id, self.user, cursor='garbage')
+
+
+class TaskBoardKanbanAPITest(BoardMixin, APITestCase):
+    """Тесты taskboards/{id}/kanban/ и taskboards/{id}/columns/{column}/tasks/"""
+
+    def setUp(self):
+        self.create_board()
+        self.client.force_authenticate(user=self.user)
+        for position in range(4):
+            self.task(self.todo, position, priority='high' if position % 2 else 'low')
+
+    def test_kanban(self):
+        response = self.client.get(f'/api/taskboards/{self.board.id}/kanban/', {'limit': 2})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        todo = response.data['columns'][0]
+        self.assertEqual((todo['title'], todo['total'], len(todo['tasks'])), ('To Do', 4, 2))
+        self.assertEqual(todo['tasks'][0]['comments_count'], 0)
+
+        response = self.client.get(
+            f'/api/taskboards/{self.board.id}/columns/{self.todo.id}/tasks/',
+            {'cursor': todo['next_cursor'], 'limit': 2}
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual([task['title'] for task in response.data['results']], ['To Do 2', 'To Do 3'])
+        self.assertIsNone(response.data['next_cursor'])
+
+    def test_kanban_filters(self):
+        response = self.client.get(f'/api/taskboards/{self.board.id}/kanban/', {'priority': 'high'})
+        self.assertEqual(response.data['columns'][0]['total'], 2)
+
+    def test_kanban_requires_membership(self):
+        stranger = User.objects.create_user(
+            username='stranger', email='stranger@example.com', password='testpass123'
+        )
+        self.client.force_authenticate(user=stranger)
+        response = self.client.get(f'/api/taskboards/{self.board.id}/kanban/')
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
@@ -0,0 +1,171 @@
+"""
+Тесты для счетчиков задач досок
+"""
+from datetime import timedelta
+from io import StringIO
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.test import APITestCase
+
+from backend.apps.tasks.models import Task, TaskBoard, TaskBoardCounter, TaskColumn
+from backend.apps.workspaces.models import Workspace, WorkspaceMember
+from backend.services.task_activity import activity_buffer
+from backend.services.task_board_summary import TaskBoardSummary
+from backend.services.task_bulk import TaskBulkService
+from backend.services.task_ordering import TaskOrdering
+from backend.services.taskboards import TaskColumnService, TaskService
+
+User = get_user_model()
+
+
+class SummaryMixin:
+
+    def create_board(self):
+        self.user = User.objects.create_user(
+            username='counter',
+            email='counter@example.com',
+            password='testpass123'
+        )
+        self.workspace = Workspace.objects.create(name='Test Workspace', owner=self.user)
+        WorkspaceMember.objects.create(workspace=self.workspace, user=self.user, role='owner')
+        self.board = TaskBoard.objects.create(title='Board', workspace=self.workspace, created_by=self.user)
+        self.todo = TaskColumn.objects.create(board=self.board, title='To Do', position=1)
+        self.done = TaskColumn.objects.create(board=self.board, title='Done', position=2)
+
+    def create_task(self, title, **data):
+        return TaskService.create_task(self.user, self.board.id, title=title, column=self.todo, **data)
+
+    def tearDown(self):
+        activity_buffer.discard()
+
+
+class TaskBoardSummaryTest(SummaryMixin, TestCase):
+    """Тесты инкрементального обновления счетчиков"""
+
+    def setUp(self):
+        self.create_board()
+
+    def assertMatchesRecount(self):
+        self.assertEqual(TaskBoardSummary.reconcile(), 0)
+
+    def test_create_update_move_delete(self):
+        first = self.create_task('First', priority='high', due_date=timezone.now() - timedelta(days=2))
+        second = self.create_task('Second', assignees=[self.user])
+        summary = TaskBoardSummary.summary(self.board)
+        self.assertEqual(summary['total'], 2)
+        self.assertEqual(summary['by_priority'], {'high': 1, 'medium': 1})
+        self.assertEqual(summary['by_assignee'], {str(self.user.id): 1})
+        self.assertEqual(summary['overdue'], 1)
+
+        TaskService.update_task(first.id, self.user, status='done')
+        TaskService.move_task(second.id, self.user, column_id=self.done.id)
+        summary = TaskBoardSummary.summary(self.board)
+        self.assertEqual(summary['by_status'], {'done': 1, 'todo': 1})
+        self.assertEqual(summary['by_column'], {str(self.todo.id): 1, str(self.done.id): 1})
+        self.assertEqual(summary['overdue'], 0)
+        self.assertMatchesRecount()
+
+        TaskService.delete_task(second.id, self.user)
+        summary = TaskBoardSummary.summary(self.board)
+        self.assertEqual((summary['total'], summary['by_assignee']), (1, {}))
+        self.assertMatchesRecount()
+
+    def test_overdue_includes_tasks_due_earlier_today(self):
+        noon = timezone.now().replace(hour=12, minute=0, second=0, microsecond=0)
+        self.create_task('Earlier', due_date=noon - timedelta(hours=1))
+        self.create_task('Later', due_date=noon + timedelta(hours=1))
+        self.create_task('Done', due_date=noon - timedelta(hours=2), status='done')
+        with mock.patch('django.utils.timezone.now', return_value=noon):
+            self.assertEqual(TaskBoardSummary.summary(self.board)['overdue'], 1)
+
+    def test_unchanged_update_writes_nothing(self):
+        task = self.create_task('Task')
+        with self.assertNumQueries(4):
+            # SELECT задачи, SAVEPOINT, UPDATE задачи, RELEASE -- без записи счетчиков
+            TaskService.update_task(task.id, self.user, title='Renamed')
+
+    def test_move_many_and_bulk(self):
+        tasks = [self.create_task(f'Task {index}') for index in range(3)]
+        TaskOrdering.move_many(self.user, [task.id for task in tasks[:2]], self.done.id)
+        TaskBulkService.apply(self.user, [task.id for task in tasks], status='review', add_assignees=[self.user.id])
+        self.assertMatchesRecount()
+        TaskBulkService.apply(self.user, [tasks[0].id], remove_assignees=[self.user.id])
+        TaskBulkService.apply(self.user, [tasks[1].id], delete=True)
+        self.assertMatchesRecount()
+        self.assertEqual(TaskBoardSummary.summary(self.board)['by_assignee'], {str(self.user.id): 1})
+
+    def test_reconcile_fixes_drift(self):
+        self.create_task('Task')
+        Task.objects.update(status='done')
+        self.assertEqual(TaskBoardSummary.reconcile([self.board.id]), 2)
+        self.assertEqual(TaskBoardSummary.summary(self.board)['by_status'], {'done': 1})
+        # Обнулившиеся строки удаляются отдельным проходом
+        self.assertTrue(TaskBoardCounter.objects.filter(count=0).exists())
+        self.assertEqual(TaskBoardSummary.prune([self.board.id]), 1)
+        self.assertFalse(TaskBoardCounter.objects.filter(count=0).exists())
+
+        # Задачи удаленной колонки удаляются каскадом, счетчики сверяются сразу
+        TaskColumnService.delete_column(self.todo.id, self.user)
+        self.assertEqual(TaskBoardSummary.summary(self.board)['total'], 0)
+
+        out = StringIO()
+        call_command('reconcile_board_summaries', stdout=out)
+        self.assertIn('Исправлено счетчиков: 0', out.getvalue())
+
+    def test_reconcile_keeps_changes_after_snapshot(self):
+        task = self.create_task('Task')
+        Task.objects.update(status='done')
+        count = TaskBoardSummary._count
+
+        def interleaved(tasks, counters):
+            snapshot = count(tasks, counters)
+            # Изменение фиксируется между снимком и записью расхождения
+            TaskService.update_task(task.id, self.user, priority='high')
+            return snapshot
+
+        with mock.patch.object(TaskBoardSummary, '_count', side_effect=interleaved):
+            self.assertEqual(TaskBoardSummary.reconcile([self.board.id]), 2)
+        self.assertMatchesRecount()
+        summary = TaskBoardSummary.summary(self.board)
+        self.assertEqual(summary['by_status'], {'done': 1})
+        self.assertEqual(summary['by_priority'], {'high': 1})
+
+    def test_reconcile_reads_one_snapshot(self):
+        self.create_task('Task')
+        with CaptureQueriesContext(connection) as queries:
+            TaskBoardSummary.reconcile([self.board.id])
+        selects = [query['sql'] for query in queries.captured_queries if query['sql'].startswith('SELECT')]
+        self.assertEqual(len(selects), 1)
+
+
+class TaskBoardSummaryAPITest(SummaryMixin, APITestCase):
+    """Тесты чтения счетчиков через API"""
+
+    def setUp(self):
+        self.create_board()
+        self.client.force_authenticate(user=self.user)
+        for index in range(3):
+            self.create_task(f'Task {index}')
+
+    def test_board_list_reads_counters(self):
+        TaskBoard.objects.create(title='Empty', workspace=self.workspace, created_by=self.user)
+        with self.assertNumQueries(1):
+            # Счетчики досок -- подзапросом в запросе списка
+            response = self.client.get('/api/taskboards/')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        results = response.data['results'] if isinstance(response.data, dict) else response.data
+        counts = {board['title']: board['tasks_count'] for board in results}
+        self.assertEqual(counts, {'Board': 3, 'Empty': 0})
+
+    def test_summary(self):
+        response = self.client.get(f'/api/taskboards/{self.board.id}/summary/')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['total'], 3)
+        self.assertEqual(response.data['by_column'], {str(self.todo.id): 3})
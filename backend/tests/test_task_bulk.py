@@ -0,0 +1,162 @@
+"""
+Тесты для массовых операций над задачами
+"""
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test import override_settings
+from django.test.utils import CaptureQueriesContext
+from rest_framework import status
+from rest_framework.test import APITestCase
+
+from backend.apps.notes.models import Tag
+from backend.apps.tasks.models import Task, TaskActivity, TaskBoard, TaskColumn
+from backend.apps.workspaces.models import Workspace, WorkspaceMember
+from backend.services.task_activity import activity_buffer
+from backend.services.task_board_summary import TaskBoardSummary
+from backend.services.task_bulk import TaskBulkService
+
+User = get_user_model()
+
+URL = '/api/tasks/bulk/'
+
+
+@override_settings(BACKGROUND_TASKS_SYNC=True)
+class TaskBulkAPITest(APITestCase):
+    """Тесты tasks/bulk/"""
+
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username='lead',
+            email='lead@example.com',
+            password='testpass123'
+        )
+        self.member = User.objects.create_user(
+            username='member',
+            email='member@example.com',
+            password='testpass123'
+        )
+        self.workspace = Workspace.objects.create(name='Test Workspace', owner=self.user)
+        WorkspaceMember.objects.create(workspace=self.workspace, user=self.user, role='owner')
+        WorkspaceMember.objects.create(workspace=self.workspace, user=self.member, role='editor')
+        self.board = TaskBoard.objects.create(title='Board', workspace=self.workspace, created_by=self.user)
+        self.todo = TaskColumn.objects.create(board=self.board, title='To Do', position=1)
+        self.done = TaskColumn.objects.create(board=self.board, title='Done', position=2)
+        self.tasks = [
+            Task.objects.create(title=f'Task {index}', board=self.board, column=self.todo, created_by=self.user)
+            for index in range(4)
+        ]
+        self.ids = [str(task.id) for task in self.tasks]
+        self.tag = Tag.objects.create(name='urgent')
+        self.client.force_authenticate(user=self.user)
+        activity_buffer.discard()
+
+    def tearDown(self):
+        activity_buffer.discard()
+
+    def test_status_and_priority_in_one_update(self):
+        response = self.client.post(URL, {
+            'tasks': self.ids[:3], 'status': 'in_progress', 'priority': 'high'
+        }, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data, {'updated': 3})
+        self.assertEqual(Task.objects.filter(status='in_progress', priority='high').count(), 3)
+        self.assertEqual(Task.objects.get(id=self.tasks[3].id).status, 'todo')
+
+    def test_query_count_does_not_grow_with_selection(self):
+        def run(ids):
+            with self.captureOnCommitCallbacks(execute=True):
+                self.client.post(URL, {
+                    'tasks': ids, 'status': 'review', 'add_assignees': [self.member.id], 'add_tags': [self.tag.id]
+                }, format='json')
+
+        with CaptureQueriesContext(connection) as small:
+            run(self.ids[:1])
+        Task.objects.update(status='todo')
+        Task.tags.through.objects.all().delete()
+        Task.assignees.through.objects.all().delete()
+        with CaptureQueriesContext(connection) as large:
+            run(self.ids)
+        self.assertEqual(len(small.captured_queries), len(large.captured_queries))
+
+    def test_assignees_and_tags(self):
+        self.tasks[0].assignees.add(self.member)
+        response = self.client.post(URL, {
+            'tasks': self.ids, 'add_assignees': [self.member.id], 'add_tags': [self.tag.id]
+        }, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(self.member.assigned_tasks.count(), 4)
+        self.assertEqual(self.tag.tasks.count(), 4)
+
+        self.client.post(URL, {
+            'tasks': self.ids[:2], 'remove_assignees': [self.member.id], 'remove_tags': [self.tag.id]
+        }, format='json')
+        self.assertEqual(self.member.assigned_tasks.count(), 2)
+        self.assertEqual(self.tag.tasks.count(), 2)
+
+    def test_activity_is_one_batch(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(URL, {
+                'tasks': self.ids[:2], 'status': 'done', 'add_assignees': [self.member.id]
+            }, format='json')
+        types = sorted(TaskActivity.objects.values_list('activity_type', flat=True))
+        self.assertEqual(types, ['assigned', 'assigned', 'completed', 'completed'])
+
+    def test_move_to_column_keeps_selection_order(self):
+        self.client.post(URL, {'tasks': [self.ids[2], self.ids[0]], 'column': str(self.done.id)}, format='json')
+        titles = list(Task.objects.filter(column=self.done).order_by('rank', 'id').values_list('title', flat=True))
+        self.assertEqual(titles, ['Task 2', 'Task 0'])
+
+    def test_snapshots_are_taken_under_lock(self):
+        TaskBoardSummary.reconcile([self.board.id])
+        lock = TaskBulkService._lock
+
+        def interleaved(task_ids, board_id):
+            # Параллельная операция успевает между проверкой доступа и блокировкой
+            if len(task_ids) > 1:
+                TaskBulkService.apply(
+                    self.user, [self.ids[0]], status='done', add_assignees=[self.member.id]
+                )
+            return lock(task_ids, board_id)
+
+        with mock.patch.object(TaskBulkService, '_lock', side_effect=interleaved):
+            with self.captureOnCommitCallbacks(execute=True):
+                self.client.post(URL, {
+                    'tasks': self.ids, 'status': 'done', 'add_assignees': [self.member.id]
+                }, format='json')
+        types = list(TaskActivity.objects.values_list('activity_type', flat=True))
+        self.assertEqual(types.count('assigned'), 4)
+        self.assertEqual(types.count('completed'), 4)
+        self.assertEqual(TaskBoardSummary.reconcile([self.board.id]), 0)
+
+    def test_delete(self):
+        response = self.client.post(URL, {'tasks': self.ids[:2], 'delete': True}, format='json')
+        self.assertEqual(response.data, {'deleted': 2})
+        self.assertEqual(Task.objects.count(), 2)
+
+    def test_validation(self):
+        outsider = User.objects.create_user(
+            username='outsider', email='outsider@example.com', password='testpass123'
+        )
+        response = self.client.post(URL, {'tasks': self.ids, 'add_assignees': [outsider.id]}, format='json')
+        self.assertEqual(response.status_code, 422)
+        response = self.client.post(URL, {'tasks': self.ids, 'status': 'unknown'}, format='json')
+        self.assertEqual(response.status_code, 422)
+        response = self.client.post(URL, {
+            'tasks': self.ids, 'add_assignees': [self.member.id], 'remove_assignees': [self.member.id]
+        }, format='json')
+        self.assertEqual(response.status_code, 422)
+        response = self.client.post(URL, {
+            'tasks': self.ids, 'add_tags': [self.tag.id], 'remove_tags': [self.tag.id]
+        }, format='json')
+        self.assertEqual(response.status_code, 422)
+        self.assertFalse(Task.assignees.through.objects.exists())
+
+    def test_requires_access_to_every_task(self):
+        self.client.force_authenticate(user=User.objects.create_user(
+            username='stranger', email='stranger@example.com', password='testpass123'
+        ))
+        response = self.client.post(URL, {'tasks': self.ids, 'delete': True}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+        self.assertEqual(Task.objects.count(), 4)
@@ -0,0 +1,149 @@
+"""
+Тесты для зависимостей задач и графика доски
+"""
+from datetime import datetime, timedelta, timezone as dt_timezone
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
+from django.test import TestCase
+from rest_framework import status
+from rest_framework.test import APITestCase
+
+from backend.apps.tasks.models import Task, TaskBoard, TaskColumn, TaskDependency
+from backend.apps.workspaces.models import Workspace, WorkspaceMember
+from backend.core.exceptions import ValidationException
+from backend.services.task_dependencies import TaskDependencyGraph
+from backend.services.taskboards import TaskService
+
+User = get_user_model()
+
+START = datetime(2025, 3, 3, 9, tzinfo=dt_timezone.utc)
+
+
+class TaskDependencyGraphTest(TestCase):
+    """Тесты TaskDependencyGraph"""
+
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username='planner',
+            email='planner@example.com',
+            password='testpass123'
+        )
+        self.workspace = Workspace.objects.create(name='Test Workspace', owner=self.user)
+        WorkspaceMember.objects.create(workspace=self.workspace, user=self.user, role='owner')
+        self.board = TaskBoard.objects.create(title='Board', workspace=self.workspace, created_by=self.user)
+        self.column = TaskColumn.objects.create(board=self.board, title='To Do', position=1)
+
+    def create_task(self, title, hours=None, **dates):
+        return Task.objects.create(
+            title=title, board=self.board, column=self.column, created_by=self.user,
+            estimated_hours=Decimal(hours) if hours is not None else None, **dates
+        )
+
+    def link(self, blocker, blocked):
+        return TaskDependencyGraph.add(blocked.id, blocker.id, self.user)
+
+    def test_cycles_are_rejected(self):
+        a, b, c = self.create_task('A'), self.create_task('B'), self.create_task('C')
+        self.link(a, b)
+        self.link(b, c)
+        self.link(a, b)  # повторная связь не дублируется
+        self.assertEqual(TaskDependency.objects.count(), 2)
+
+        with self.assertRaises(ValidationException):
+            self.link(c, a)
+        with self.assertRaises(ValidationException):
+            self.link(a, a)
+        other_board = TaskBoard.objects.create(title='Other', workspace=self.workspace, created_by=self.user)
+        stranger = Task.objects.create(
+            title='X', board=other_board,
+            column=TaskColumn.objects.create(board=other_board, title='To Do'), created_by=self.user
+        )
+        with self.assertRaises(ValidationException):
+            self.link(stranger, a)
+
+    def test_critical_path_and_slack(self):
+        design = self.create_task('Design', 8, start_date=START)
+        backend = self.create_task('Backend', 16)
+        frontend = self.create_task('Frontend', 4)
+        release = self.create_task('Release', 2, due_date=START + timedelta(hours=30))
+        self.link(design, backend)
+        self.link(design, frontend)
+        self.link(backend, release)
+        self.link(frontend, release)
+
+        schedule = TaskDependencyGraph.compute(self.board.id)
+        self.assertEqual(schedule['order'], [str(design.id)] + sorted(
+            [str(backend.id), str(frontend.id)]
+        ) + [str(release.id)])
+        self.assertEqual(schedule['critical_path'], [str(design.id), str(backend.id), str(release.id)])
+        self.assertEqual(schedule['finish'], (START + timedelta(hours=26)).isoformat())
+
+        tasks = schedule['tasks']
+        self.assertEqual(tasks[str(frontend.id)]['earliest_start'], (START + timedelta(hours=8)).isoformat())
+        # До срока Release 4 часа запаса, у Frontend -- еще 12 сверх них
+        self.assertEqual(tasks[str(release.id)]['slack_hours'], 4)
+        self.assertEqual(tasks[str(backend.id)]['slack_hours'], 4)
+        self.assertEqual(tasks[str(frontend.id)]['slack_hours'], 16)
+        self.assertFalse(tasks[str(frontend.id)]['critical'])
+
+    def test_schedule_is_cached_until_revision_changes(self):
+        design = self.create_task('Design', 8, start_date=START)
+        review = self.create_task('Review', 1)
+        self.link(design, review)
+
+        first = TaskDependencyGraph.schedule(self.board.id, self.user)
+        with self.assertNumQueries(1):
+            self.assertEqual(TaskDependencyGraph.schedule(self.board.id, self.user), first)
+
+        # Изменение названия график не сбрасывает, изменение оценки -- сбрасывает
+        TaskService.update_task(design.id, self.user, title='Design v2')
+        self.board.refresh_from_db()
+        revision = self.board.schedule_revision
+        TaskService.update_task(design.id, self.user, estimated_hours=Decimal(10))
+        self.board.refresh_from_db()
+        self.assertEqual(self.board.schedule_revision, revision + 1)
+        self.assertEqual(
+            TaskDependencyGraph.schedule(self.board.id, self.user)['tasks'][str(review.id)]['earliest_start'],
+            (START + timedelta(hours=10)).isoformat()
+        )
+
+        TaskService.delete_task(review.id, self.user)
+        self.assertEqual(TaskDependencyGraph.schedule(self.board.id, self.user)['order'], [])
+
+
+class TaskDependencyAPITest(APITestCase):
+    """Тесты tasks/{id}/dependencies/ и taskboards/{id}/schedule/"""
+
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username='planner',
+            email='planner@example.com',
+            password='testpass123'
+        )
+        self.workspace = Workspace.objects.create(name='Test Workspace', owner=self.user)
+        WorkspaceMember.objects.create(workspace=self.workspace, user=self.user, role='owner')
+        self.board = TaskBoard.objects.create(title='Board', workspace=self.workspace, created_by=self.user)
+        self.column = TaskColumn.objects.create(board=self.board, title='To Do', position=1)
+        self.first = Task.objects.create(title='First', board=self.board, column=self.column, created_by=self.user)
+        self.second = Task.objects.create(title='Second', board=self.board, column=self.column, created_by=self.user)
+        self.client.force_authenticate(user=self.user)
+
+    def test_link_lifecycle(self):
+        url = f'/api/tasks/{self.second.id}/dependencies/'
+        response = self.client.post(url, {'blocker': str(self.first.id)}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual([item['id'] for item in response.data['blocked_by']], [self.first.id])
+
+        response = self.client.post(
+            f'/api/tasks/{self.first.id}/dependencies/', {'blocker': str(self.second.id)}, format='json'
+        )
+        self.assertEqual(response.status_code, 422)
+        self.assertEqual(self.client.post(url, {'blocker': 'nope'}, format='json').status_code, 422)
+
+        schedule = self.client.get(f'/api/taskboards/{self.board.id}/schedule/').data
+        self.assertEqual(schedule['order'], [str(self.first.id), str(self.second.id)])
+
+        self.assertEqual(self.client.delete(f'{url}{self.first.id}/').status_code, status.HTTP_204_NO_CONTENT)
+        self.assertEqual(self.client.delete(f'{url}{self.first.id}/').status_code, status.HTTP_404_NOT_FOUND)
+        self.assertEqual(self.client.get(f'/api/taskboards/{self.board.id}/schedule/').data['order'], [])
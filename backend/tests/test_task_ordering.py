@@ -0,0 +1,164 @@
+"""
+Тесты для ключей порядка задач
+"""
+import random
+
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test import SimpleTestCase, TestCase
+from django.test.utils import CaptureQueriesContext
+from rest_framework import status
+from rest_framework.test import APITestCase
+
+from backend.apps.tasks.models import Task, TaskBoard, TaskColumn
+from backend.apps.workspaces.models import Workspace, WorkspaceMember
+from backend.core.fractional_index import key_between, keys_between, spread_keys
+from backend.services.task_ordering import TaskOrdering
+
+User = get_user_model()
+
+
+class RankKeyTest(SimpleTestCase):
+    """Тесты строковых ключей core.fractional_index"""
+
+    def test_random_inserts_keep_order(self):
+        generator = random.Random(42)
+        keys = []
+        for _ in range(2000):
+            index = generator.randint(0, len(keys))
+            before = keys[index - 1] if index else None
+            after = keys[index] if index < len(keys) else None
+            key = key_between(before, after)
+            self.assertTrue((before is None or before < key) and (after is None or key < after))
+            keys.insert(index, key)
+        self.assertEqual(len(set(keys)), len(keys))
+
+    def test_appends_stay_short(self):
+        key = None
+        for _ in range(10000):
+            key = key_between(key, None)
+        self.assertLessEqual(len(key), 6)
+
+    def test_batches_and_spread(self):
+        keys = keys_between('a', 'b', 100)
+        self.assertEqual(keys, sorted(keys))
+        self.assertTrue('a' < keys[0] and keys[-1] < 'b')
+        spread = spread_keys(5000)
+        self.assertEqual(spread, sorted(spread))
+        self.assertEqual(len(set(spread)), 5000)
+
+    def test_invalid_keys(self):
+        with self.assertRaises(ValueError):
+            key_between('b', 'a')
+        with self.assertRaises(ValueError):
+            key_between('a0', None)
+
+
+class OrderingMixin:
+
+    def create_board(self):
+        self.user = User.objects.create_user(
+            username='sorter',
+            email='sorter@example.com',
+            password='testpass123'
+        )
+        self.workspace = Workspace.objects.create(name='Test Workspace', owner=self.user)
+        WorkspaceMember.objects.create(workspace=self.workspace, user=self.user, role='owner')
+        self.board = TaskBoard.objects.create(title='Board', workspace=self.workspace, created_by=self.user)
+        self.todo = TaskColumn.objects.create(board=self.board, title='To Do', position=1)
+        self.done = TaskColumn.objects.create(board=self.board, title='Done', position=2)
+        self.tasks = [
+            Task.objects.create(title=f'Task {index}', board=self.board, column=self.todo, created_by=self.user)
+            for index in range(5)
+        ]
+
+    def titles(self, column):
+        return list(Task.objects.filter(column=column).order_by('rank', 'id').values_list('title', flat=True))
+
+
+class TaskOrderingTest(OrderingMixin, TestCase):
+    """Тесты TaskOrdering"""
+
+    def setUp(self):
+        self.create_board()
+
+    def test_new_tasks_are_appended(self):
+        self.assertEqual(self.titles(self.todo), [f'Task {index}' for index in range(5)])
+
+    def test_move_writes_one_row(self):
+        with CaptureQueriesContext(connection) as queries:
+            TaskOrdering.move(self.tasks[4], self.todo, after_id=self.tasks[0].id)
+        writes = [q['sql'] for q in queries.captured_queries if q['sql'].startswith('UPDATE "tasks_task"')]
+        self.assertEqual(len(writes), 1)
+        self.assertEqual(self.titles(self.todo), ['Task 0', 'Task 4', 'Task 1', 'Task 2', 'Task 3'])
+
+    def test_move_by_index_and_before(self):
+        TaskOrdering.move(self.tasks[0], self.done)
+        TaskOrdering.move(self.tasks[3], self.todo, index=0)
+        TaskOrdering.move(self.tasks[1], self.done, before_id=self.tasks[0].id)
+        self.assertEqual(self.titles(self.todo), ['Task 3', 'Task 2', 'Task 4'])
+        self.assertEqual(self.titles(self.done), ['Task 1', 'Task 0'])
+
+    def test_move_many_keeps_selection_order(self):
+        TaskOrdering.move_many(
+            self.user, [self.tasks[4].id, self.tasks[1].id], self.done.id
+        )
+        TaskOrdering.move_many(
+            self.user, [self.tasks[3].id, self.tasks[0].id], self.done.id, after_id=self.tasks[4].id
+        )
+        self.assertEqual(self.titles(self.done), ['Task 4', 'Task 3', 'Task 0', 'Task 1'])
+        self.assertEqual(self.titles(self.todo), ['Task 2'])
+
+    def test_long_keys_trigger_rebalance(self):
+        first, second = self.tasks[0], self.tasks[1]
+        for _ in range(250):
+            # Вставка раз за разом в один и тот же промежуток
+            TaskOrdering.move(self.tasks[4], self.todo, after_id=first.id)
+            TaskOrdering.move(self.tasks[3], self.todo, before_id=self.tasks[4].id)
+            self.tasks[3], self.tasks[4] = self.tasks[4], self.tasks[3]
+        ranks = list(Task.objects.filter(column=self.todo).values_list('rank', flat=True))
+        self.assertLessEqual(max(len(rank) for rank in ranks), 33)
+        self.assertEqual(self.titles(self.todo)[0], 'Task 0')
+        self.assertEqual(self.titles(self.todo)[-1], 'Task 2')
+        self.assertIn(second.title, self.titles(self.todo))
+
+    def test_tasks_without_rank_are_rebalanced(self):
+        Task.objects.filter(column=self.todo).update(rank='')
+        TaskOrdering.move(self.tasks[2], self.todo, index=0)
+        self.assertEqual(self.titles(self.todo)[0], 'Task 2')
+        self.assertNotIn('', Task.objects.values_list('rank', flat=True))
+
+
+class TaskMoveAPITest(OrderingMixin, APITestCase):
+    """Тесты tasks/{id}/move/ и tasks/move_many/"""
+
+    def setUp(self):
+        self.create_board()
+        self.client.force_authenticate(user=self.user)
+
+    def test_move(self):
+        response = self.client.patch(
+            f'/api/tasks/{self.tasks[0].id}/move/',
+            {'column': str(self.todo.id), 'after': str(self.tasks[2].id)}, format='json'
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(self.titles(self.todo), ['Task 1', 'Task 2', 'Task 0', 'Task 3', 'Task 4'])
+
+    def test_move_many(self):
+        response = self.client.post('/api/tasks/move_many/', {
+            'tasks': [str(self.tasks[2].id), str(self.tasks[0].id)],
+            'column': str(self.done.id),
+        }, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(response.data['tasks']), 2)
+        self.assertEqual(self.titles(self.done), ['Task 2', 'Task 0'])
+
+    def test_move_many_requires_membership(self):
+        stranger = User.objects.create_user(
+            username='stranger', email='stranger@example.com', password='testpass123'
+        )
+        self.client.force_authenticate(user=stranger)
+        response = self.client.post('/api/tasks/move_many/', {
+            'tasks': [str(self.tasks[0].id)], 'column': str(self.done.id),
+        }, format='json')
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
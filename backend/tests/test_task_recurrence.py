@@ -0,0 +1,208 @@
+"""
+Тесты для повторяющихся задач и календаря доски
+"""
+from datetime import datetime, timedelta, timezone as dt_timezone
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.test import APITestCase
+
+from backend.apps.tasks.models import Task, TaskBoard, TaskColumn, TaskOccurrence, TaskRecurrence
+from backend.apps.workspaces.models import Workspace, WorkspaceMember
+from backend.core.recurrence import RecurrenceRule
+from backend.services.task_recurrence import TaskRecurrenceService
+
+User = get_user_model()
+
+
+def utc(*args):
+    return datetime(*args, tzinfo=dt_timezone.utc)
+
+
+def expand(rule, dtstart, after=None, before=None):
+    return list(RecurrenceRule.parse(rule).between(dtstart, after, before))
+
+
+class RecurrenceRuleTest(SimpleTestCase):
+    """Тесты разбора и перебора правил"""
+
+    def test_daily_and_weekly(self):
+        start = utc(2025, 1, 6, 9)  # понедельник
+        self.assertEqual(
+            expand('FREQ=DAILY;INTERVAL=2', start, before=utc(2025, 1, 12)),
+            [utc(2025, 1, 6, 9), utc(2025, 1, 8, 9), utc(2025, 1, 10, 9)]
+        )
+        self.assertEqual(
+            expand('RRULE:FREQ=WEEKLY;BYDAY=MO,FR', start, before=utc(2025, 1, 14)),
+            [utc(2025, 1, 6, 9), utc(2025, 1, 10, 9), utc(2025, 1, 13, 9)]
+        )
+        self.assertEqual(
+            expand('FREQ=DAILY;BYDAY=SA,SU', start, before=utc(2025, 1, 13)),
+            [utc(2025, 1, 11, 9), utc(2025, 1, 12, 9)]
+        )
+
+    def test_monthly_skips_missing_days(self):
+        self.assertEqual(
+            expand('FREQ=MONTHLY', utc(2025, 1, 31, 12), before=utc(2025, 6, 1)),
+            [utc(2025, 1, 31, 12), utc(2025, 3, 31, 12), utc(2025, 5, 31, 12)]
+        )
+        self.assertEqual(
+            expand('FREQ=MONTHLY;BYMONTHDAY=1,-1', utc(2025, 2, 1), before=utc(2025, 3, 31)),
+            [utc(2025, 2, 1), utc(2025, 2, 28), utc(2025, 3, 1), utc(2025, 3, 31)]
+        )
+        self.assertEqual(
+            expand('FREQ=YEARLY', utc(2024, 2, 29), before=utc(2029, 1, 1)),
+            [utc(2024, 2, 29), utc(2028, 2, 29)]
+        )
+
+    def test_resume_after_matches_full_expansion(self):
+        rule, start = 'FREQ=WEEKLY;INTERVAL=3;BYDAY=TU,SU', utc(2020, 3, 4, 8)
+        full = expand(rule, start, before=utc(2026, 1, 1))
+        middle = full[len(full) // 2]
+        self.assertEqual(expand(rule, start, after=middle, before=utc(2026, 1, 1)), full[len(full) // 2 + 1:])
+
+    def test_until(self):
+        self.assertEqual(
+            expand('FREQ=DAILY;UNTIL=20250103', utc(2025, 1, 1, 10)),
+            [utc(2025, 1, 1, 10), utc(2025, 1, 2, 10), utc(2025, 1, 3, 10)]
+        )
+
+    def test_invalid_rules(self):
+        for rule in (
+            '', 'FREQ=HOURLY', 'FREQ=DAILY;INTERVAL=0', 'FREQ=DAILY;COUNT=2;UNTIL=20250101',
+            'FREQ=MONTHLY;BYDAY=1MO', 'FREQ=WEEKLY;BYDAY=XX', 'FREQ=DAILY;BYSETPOS=1',
+            'FREQ=MONTHLY;BYMONTHDAY=32', 'FREQ=DAILY;UNTIL=tomorrow',
+        ):
+            with self.assertRaises(ValueError, msg=rule):
+                RecurrenceRule.parse(rule)
+
+
+@override_settings(TASK_RECURRENCE_WINDOW_DAYS=30)
+class TaskRecurrenceServiceTest(TestCase):
+    """Тесты материализации повторений"""
+
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username='planner',
+            email='planner@example.com',
+            password='testpass123'
+        )
+        self.workspace = Workspace.objects.create(name='Test Workspace', owner=self.user)
+        WorkspaceMember.objects.create(workspace=self.workspace, user=self.user, role='owner')
+        self.board = TaskBoard.objects.create(title='Board', workspace=self.workspace, created_by=self.user)
+        self.column = TaskColumn.objects.create(board=self.board, title='To Do', position=1)
+        self.due = timezone.now().replace(microsecond=0) + timedelta(hours=1)
+        self.task = Task.objects.create(
+            title='Chore', board=self.board, column=self.column, created_by=self.user,
+            start_date=self.due - timedelta(hours=2), due_date=self.due
+        )
+
+    def test_set_rule_materializes_window(self):
+        recurrence = TaskRecurrenceService.set_rule(self.task.id, self.user, 'FREQ=DAILY')
+        occurrences = list(TaskOccurrence.objects.filter(recurrence=recurrence))
+        self.assertEqual(len(occurrences), 30)
+        self.assertEqual(occurrences[0].due_at, self.due)
+        self.assertEqual(occurrences[0].starts_at, self.due - timedelta(hours=2))
+        self.assertEqual(recurrence.generated_count, 30)
+
+        # Новое правило заменяет повторения
+        TaskRecurrenceService.set_rule(self.task.id, self.user, 'FREQ=WEEKLY')
+        self.assertEqual(TaskOccurrence.objects.filter(task=self.task).count(), 5)
+
+    def test_extend_due_appends_only_new_occurrences(self):
+        recurrence = TaskRecurrenceService.set_rule(self.task.id, self.user, 'FREQ=DAILY')
+        first_ids = set(TaskOccurrence.objects.values_list('id', flat=True))
+
+        # Впереди больше половины окна -- продление не нужно
+        self.assertEqual(TaskRecurrenceService.extend_due(), {'recurrences': 0, 'occurrences': 0})
+
+        later = timezone.now() + timedelta(days=20)
+        self.assertEqual(TaskRecurrenceService.extend_due(later), {'recurrences': 1, 'occurrences': 20})
+        recurrence.refresh_from_db()
+        self.assertEqual(recurrence.generated_until, later + timedelta(days=30))
+        self.assertEqual(recurrence.generated_count, 50)
+        self.assertTrue(first_ids < set(TaskOccurrence.objects.values_list('id', flat=True)))
+
+    def test_count_finishes_rule(self):
+        recurrence = TaskRecurrenceService.set_rule(self.task.id, self.user, 'FREQ=WEEKLY;COUNT=3')
+        self.assertTrue(recurrence.is_finished)
+        self.assertEqual(TaskOccurrence.objects.count(), 3)
+        self.assertEqual(TaskRecurrenceService.extend_due(timezone.now() + timedelta(days=365))['recurrences'], 0)
+
+    def test_command(self):
+        TaskRecurrenceService.set_rule(self.task.id, self.user, 'FREQ=DAILY;COUNT=100')
+        TaskRecurrence.objects.update(generated_until=timezone.now())
+        out = StringIO()
+        call_command('extend_task_recurrences', stdout=out)
+        self.assertIn('Продлено правил: 1', out.getvalue())
+
+
+class TaskCalendarAPITest(APITestCase):
+    """Тесты taskboards/{id}/calendar/ и tasks/{id}/recurrence/"""
+
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username='planner',
+            email='planner@example.com',
+            password='testpass123'
+        )
+        self.workspace = Workspace.objects.create(name='Test Workspace', owner=self.user)
+        WorkspaceMember.objects.create(workspace=self.workspace, user=self.user, role='owner')
+        self.board = TaskBoard.objects.create(title='Board', workspace=self.workspace, created_by=self.user)
+        self.column = TaskColumn.objects.create(board=self.board, title='To Do', position=1)
+        self.due = timezone.now().replace(microsecond=0) + timedelta(hours=1)
+        self.chore = Task.objects.create(
+            title='Chore', board=self.board, column=self.column, created_by=self.user, due_date=self.due
+        )
+        self.one_off = Task.objects.create(
+            title='Release', board=self.board, column=self.column, created_by=self.user,
+            due_date=self.due + timedelta(days=2, minutes=30)
+        )
+        self.client.force_authenticate(user=self.user)
+
+    def calendar(self, start, end):
+        return self.client.get(f'/api/taskboards/{self.board.id}/calendar/', {
+            'start': start.isoformat(), 'end': end.isoformat()
+        })
+
+    def test_recurrence_endpoint(self):
+        url = f'/api/tasks/{self.chore.id}/recurrence/'
+        self.assertEqual(self.client.get(url).status_code, status.HTTP_404_NOT_FOUND)
+        response = self.client.put(url, {'rule': 'FREQ=DAILY'}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(self.client.get(url).data['rule'], 'FREQ=DAILY')
+        self.assertEqual(self.client.put(url, {'rule': 'FREQ=HOURLY'}, format='json').status_code, 422)
+
+        self.assertEqual(self.client.delete(url).status_code, status.HTTP_204_NO_CONTENT)
+        self.assertFalse(TaskOccurrence.objects.exists())
+
+    def test_calendar_merges_occurrences_and_tasks(self):
+        TaskRecurrenceService.set_rule(self.chore.id, self.user, 'FREQ=DAILY')
+        response = self.calendar(self.due - timedelta(hours=1), self.due + timedelta(days=3))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            [(item['title'], item['recurring']) for item in response.data],
+            [('Chore', True), ('Chore', True), ('Chore', True), ('Release', False)]
+        )
+
+    @override_settings(TASK_RECURRENCE_WINDOW_DAYS=7)
+    def test_calendar_beyond_window_extends_rules(self):
+        recurrence = TaskRecurrenceService.set_rule(self.chore.id, self.user, 'FREQ=WEEKLY')
+        start, end = self.due + timedelta(days=60), self.due + timedelta(days=90)
+        response = self.calendar(start, end)
+        self.assertEqual(len(response.data), 4)
+        recurrence.refresh_from_db()
+        self.assertEqual(recurrence.generated_until, end)
+
+        # Повторный запрос читает только сохраненные повторения
+        with self.assertNumQueries(4):
+            self.assertEqual(len(self.calendar(start, end).data), 4)
+
+    def test_calendar_validation(self):
+        self.assertEqual(self.client.get(f'/api/taskboards/{self.board.id}/calendar/').status_code, 422)
+        self.assertEqual(self.calendar(self.due, self.due - timedelta(days=1)).status_code, 422)
+        self.assertEqual(self.calendar(self.due, self.due + timedelta(days=400)).status_code, 422)
@@ -0,0 +1,110 @@
+"""
+Тесты для отчета о загрузке исполнителей
+"""
+from datetime import date, datetime, timedelta, timezone as dt_timezone
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from rest_framework import status
+from rest_framework.test import APITestCase
+
+from backend.apps.tasks.models import Task, TaskBoard, TaskColumn
+from backend.apps.workspaces.models import Workspace, WorkspaceMember
+from backend.services.task_workload import TaskWorkload
+
+User = get_user_model()
+
+MONDAY = date(2025, 3, 3)
+
+
+def at(day_offset, hour=12):
+    return datetime(2025, 3, 3, hour, tzinfo=dt_timezone.utc) + timedelta(days=day_offset)
+
+
+class TaskWorkloadTest(APITestCase):
+    """Тесты TaskWorkload и workspaces/analytics/workload/"""
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(
+            username='manager',
+            email='manager@example.com',
+            password='testpass123',
+            first_name='Anna',
+            last_name='Lead'
+        )
+        self.dev = User.objects.create_user(
+            username='dev',
+            email='dev@example.com',
+            password='testpass123'
+        )
+        self.workspace = Workspace.objects.create(name='Test Workspace', owner=self.user)
+        WorkspaceMember.objects.create(workspace=self.workspace, user=self.user, role='owner')
+        WorkspaceMember.objects.create(workspace=self.workspace, user=self.dev, role='member')
+        self.boards = [
+            TaskBoard.objects.create(title=title, workspace=self.workspace, created_by=self.user)
+            for title in ('Backend', 'Frontend')
+        ]
+        self.client.force_authenticate(user=self.user)
+
+    def create_task(self, board, assignees, due_date=None, hours=None, status='todo'):
+        column = board.columns.first() or TaskColumn.objects.create(board=board, title='To Do')
+        task = Task.objects.create(
+            title='Task', board=board, column=column, created_by=self.user, status=status,
+            due_date=due_date, estimated_hours=Decimal(hours) if hours is not None else None
+        )
+        task.assignees.set(assignees)
+        return task
+
+    def test_buckets_by_week_across_boards(self):
+        backend, frontend = self.boards
+        self.create_task(backend, [self.dev], at(1), '4.5')
+        self.create_task(frontend, [self.dev, self.user], at(3), '2')
+        self.create_task(frontend, [self.dev], at(8), '6')
+        self.create_task(backend, [self.dev], at(-10), '1')
+        self.create_task(backend, [self.dev])
+        self.create_task(backend, [self.dev], at(2), '10', status='done')
+        self.create_task(backend, [self.dev], at(30), '10')  # за пределами периода
+
+        with self.assertNumQueries(1):
+            report = TaskWorkload.compute(self.workspace, MONDAY, 2)
+        self.assertEqual(report['weeks'], ['2025-03-03', '2025-03-10'])
+
+        dev, manager = report['assignees']
+        self.assertEqual((dev['user_id'], dev['open_tasks'], dev['estimated_hours']), (self.dev.id, 5, 13.5))
+        self.assertEqual(dev['by_week'], [
+            {'week': '2025-03-03', 'tasks': 2, 'hours': 6.5},
+            {'week': '2025-03-10', 'tasks': 1, 'hours': 6.0},
+        ])
+        self.assertEqual(dev['overdue'], {'tasks': 1, 'hours': 1.0})
+        self.assertEqual(dev['unscheduled'], {'tasks': 1, 'hours': 0.0})
+        self.assertEqual((manager['name'], manager['open_tasks']), ('Anna Lead', 1))
+
+    def test_endpoint_is_cached(self):
+        url = '/api/workspaces/analytics/workload/'
+        params = {'workspace_id': self.workspace.id, 'start': '2025-03-05', 'weeks': 2}
+        self.create_task(self.boards[0], [self.dev], at(1), '3')
+
+        response = self.client.get(url, params)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['weeks'][0], '2025-03-03')
+        self.assertEqual(response.data['assignees'][0]['open_tasks'], 1)
+
+        # В пределах TTL отдается кэш
+        self.create_task(self.boards[0], [self.dev], at(2), '3')
+        self.assertEqual(self.client.get(url, params).data['assignees'][0]['open_tasks'], 1)
+
+    def test_endpoint_validation(self):
+        url = '/api/workspaces/analytics/workload/'
+        self.assertEqual(self.client.get(url).status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(
+            self.client.get(url, {'workspace_id': self.workspace.id, 'weeks': 100}).status_code,
+            status.HTTP_400_BAD_REQUEST
+        )
+        self.assertEqual(
+            self.client.get(url, {'workspace_id': self.workspace.id, 'start': 'soon'}).status_code,
+            status.HTTP_400_BAD_REQUEST
+        )
+        other = Workspace.objects.create(name='Other', owner=self.dev)
+        self.assertEqual(self.client.get(url, {'workspace_id': other.id}).status_code, status.HTTP_404_NOT_FOUND)
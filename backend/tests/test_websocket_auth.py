@@ -0,0 +1,95 @@
+"""
+Тесты для JWT-аутентификации WebSocket соединений
+"""
+from asgiref.sync import async_to_sync
+from django.contrib.auth import get_user_model
+from django.test import SimpleTestCase, TransactionTestCase
+from rest_framework_simplejwt.tokens import AccessToken
+
+from backend.apps.collaboration.middleware import (
+    JWTAuthMiddleware, UserCache, extract_token, user_cache
+)
+
+User = get_user_model()
+
+
+class ExtractTokenTest(SimpleTestCase):
+    """Тесты поиска токена в scope"""
+
+    def test_header_has_priority(self):
+        scope = {
+            'headers': [(b'authorization', b'Bearer from-header')],
+            'query_string': b'token=from-query',
+        }
+        self.assertEqual(extract_token(scope), ('from-header', 'header'))
+
+    def test_subprotocol_is_removed_from_scope(self):
+        scope = {'subprotocols': ['notion.json.v1', 'bearer.abc.def'], 'headers': []}
+        self.assertEqual(extract_token(scope), ('abc.def', 'subprotocol'))
+        self.assertEqual(scope['subprotocols'], ['notion.json.v1'])
+
+    def test_token_subprotocol_alone_is_ignored(self):
+        scope = {'subprotocols': ['bearer.x'], 'headers': [], 'query_string': b''}
+        self.assertEqual(extract_token(scope), (None, 'query'))
+        self.assertEqual(scope['subprotocols'], [])
+
+    def test_query_string_is_url_decoded(self):
+        scope = {'query_string': b'protocol=json&token=a%2Bb'}
+        self.assertEqual(extract_token(scope), ('a+b', 'query'))
+        self.assertEqual(extract_token({}), (None, 'query'))
+
+    def test_cache_expires_and_evicts(self):
+        cache = UserCache(max_size=2, max_ttl=None)
+        cache.set(('1', 'a'), 'first', token_exp=0)
+        self.assertIsNone(cache.get(('1', 'a')))
+
+        cache.set(('1', 'a'), 'first', token_exp=4102444800)
+        cache.set(('2', 'b'), 'second', token_exp=4102444800)
+        cache.get(('1', 'a'))
+        cache.set(('3', 'c'), 'third', token_exp=4102444800)
+        self.assertIsNone(cache.get(('2', 'b')))
+        self.assertEqual(cache.get(('1', 'a')), 'first')
+
+
+class JWTAuthMiddlewareTest(TransactionTestCase):
+    """Тесты middleware поверх простого ASGI-приложения"""
+
+    def setUp(self):
+        user_cache.clear()
+        self.user = User.objects.create_user(
+            username='socket',
+            email='socket@example.com',
+            password='testpass123'
+        )
+        self.scopes = []
+
+        async def inner(scope, receive, send):
+            self.scopes.append(scope)
+
+        self.middleware = JWTAuthMiddleware(inner)
+
+    def connect(self, **scope):
+        scope.setdefault('type', 'websocket')
+        scope.setdefault('path', '/ws/notifications/')
+        async_to_sync(self.middleware)(scope, None, None)
+        return self.scopes[-1]['user']
+
+    def test_reconnect_with_same_token_skips_database(self):
+        token = str(AccessToken.for_user(self.user))
+
+        with self.assertNumQueries(1):
+            self.assertEqual(self.connect(query_string=f'token={token}'.encode()), self.user)
+        with self.assertNumQueries(0):
+            user = self.connect(headers=[(b'authorization', f'Bearer {token}'.encode())])
+        self.assertEqual(user, self.user)
+
+    def test_invalid_or_missing_token_is_anonymous(self):
+        self.assertFalse(self.connect(query_string=b'token=broken').is_authenticated)
+        self.assertFalse(self.connect(headers=[]).is_authenticated)
+
+    def test_inactive_user_is_anonymous(self):
+        self.user.is_active = False
+        self.user.save()
+        token = str(AccessToken.for_user(self.user))
+
+        self.assertFalse(self.connect(subprotocols=['notion.json.v1', f'bearer.{token}']).is_authenticated)
@@ -0,0 +1,30 @@
+"""
+Тесты для нагрузочного стенда WebSocket consumers
+"""
+from django.test import TransactionTestCase
+
+from backend.apps.collaboration.benchmark import SCENARIOS, percentile, run_benchmark
+
+
+class WebSocketBenchmarkTest(TransactionTestCase):
+    """Короткий прогон каждого сценария через полное ASGI-приложение"""
+
+    def test_percentile(self):
+        self.assertIsNone(percentile([], 0.5))
+        self.assertEqual(percentile([3, 1, 2], 0.5), 2)
+        self.assertEqual(percentile(list(range(101)), 0.99), 99)
+
+    def test_all_scenarios_deliver_every_event(self):
+        for scenario in SCENARIOS:
+            with self.subTest(scenario=scenario):
+                result = run_benchmark(scenario, rooms=1, clients=3, events=3)
+
+                self.assertEqual(result['delivered'], result['expected'])
+                self.assertIsNotNone(result['p99_ms'])
+                self.assertGreater(result['messages_per_sec'], 0)
+
+    def test_collaboration_broadcasts_do_not_hit_database(self):
+        result = run_benchmark('collaboration', rooms=1, clients=2, events=3)
+
+        self.assertEqual(result['queries_per_event'], 0)
+        self.assertGreater(result['queries_per_connect'], 0)